@@ -146,3 +146,59 @@ class Config(object):
 
     .. versionadded:: 0.10
     """
+
+    DEFAULT_SPECFILE_INDEX_CACHE = False
+    """Default index cache used when opening SPEC files.
+
+    Reading the index of scans from a cache avoids parsing the whole file
+    each time it is opened.
+    It will have an influence on :class:`silx.io.specfile.SpecFile` and
+    :class:`silx.io.spech5.SpecH5`.
+
+    This attribute can be set with:
+
+    - False (default): No index cache
+    - True: The index is stored next to the SPEC file
+    - The path of a directory where index files are stored
+
+    .. versionadded:: 0.15
+    """
+
+    DEFAULT_FABIOH5_FRAME_CACHE_SIZE = 256 * 1024 ** 2
+    """Default size in bytes of the cache of frames read from fabio images.
+
+    Frames of a cube are read on demand when slices are accessed, the last
+    used ones being kept in memory up to this size.
+    It will have an influence on :class:`silx.io.fabioh5.File` and
+    :class:`silx.io.fabioh5.FabioReader`.
+
+    .. versionadded:: 0.15
+    """
+
+    DEFAULT_FABIOH5_DECODING_WORKERS = None
+    """Default number of threads decoding frames of fabio images in parallel.
+
+    It will have an influence on :class:`silx.io.fabioh5.File` and
+    :class:`silx.io.fabioh5.FabioReader`.
+
+    This attribute can be set with:
+
+    - None (default): The number of CPUs
+    - 1: Frames are decoded sequentially
+    - A number of threads
+
+    .. versionadded:: 0.15
+    """
+
+    DEFAULT_CONVERT_MEMORY_BUDGET = 64 * 1024 ** 2
+    """Default size in bytes of the blocks copied at once when converting
+    datasets to HDF5.
+
+    Large datasets are created empty in the output file, then filled block
+    by block along their first axis, so that the whole dataset is never
+    loaded in memory.
+    It will have an influence on :func:`silx.io.convert.write_to_h5` and
+    :class:`silx.io.convert.Hdf5Writer`.
+
+    .. versionadded:: 0.15
+    """
@@ -28,18 +28,24 @@ __license__ = "MIT"
 __date__ = "05/02/2019"
 
 import ast
+import collections
+import concurrent.futures
 import os
 import argparse
 from glob import glob
 import logging
 import re
+import sys
 import time
 import numpy
 import six
 
 import silx.io
 from silx.io.specfile import is_specfile
+from silx.io.utils import is_dataset
+from silx.io import commonh5
 from silx.io import fabioh5
+from silx import config
 
 _logger = logging.getLogger(__name__)
 """Module logger"""
@@ -168,6 +174,102 @@ def contains_specfile(filenames):
     return False
 
 
+def print_progress(h5_name, written, total):
+    """Display the progress of the copy of a dataset on the standard output.
+
+    :param str h5_name: Name of the output dataset
+    :param int written: Number of bytes written so far
+    :param int total: Size of the dataset in bytes
+    """
+    percent = 100. * written / total if total else 100.
+    sys.stdout.write("\r%s: %.1f/%.1f MB (%3d%%)" % (
+        h5_name, written / 1024. ** 2, total / 1024. ** 2, percent))
+    if written >= total:
+        sys.stdout.write("\n")
+    sys.stdout.flush()
+
+
+def read_input_file(filename, memory_budget):
+    """Read the datasets of an input file, within a memory budget.
+
+    This is the part of the conversion done by the worker processes in
+    ``--jobs`` mode: SPEC files are parsed and images are decoded there,
+    and the arrays are sent to the process writing the output file.
+    Datasets which do not fit in the remaining budget are not read, they
+    are copied block by block by the writer.
+
+    :param str filename: Name of the input file
+    :param int memory_budget: Maximum size in bytes of the data read
+    :return: Dictionary mapping dataset names, as given by ``visititems``,
+        to numpy arrays
+    :rtype: dict
+    """
+    preloaded_data = {}
+    remaining = [memory_budget]
+
+    def read_dataset(name, obj):
+        if not is_dataset(obj):
+            return
+        nbytes = int(obj.size or 0) * obj.dtype.itemsize
+        if nbytes <= remaining[0]:
+            preloaded_data[name] = obj[()]
+            remaining[0] -= nbytes
+
+    with silx.io.open(filename) as h5file:
+        # HDF5 input files are not converted, see write_to_h5
+        if isinstance(h5file, commonh5.Group):
+            h5file.visititems(read_dataset, visit_links=True)
+    return preloaded_data
+
+
+def iter_read_files(filenames, workers, memory_budget):
+    """Iterate over input files read by a pool of processes, in order.
+
+    At most *workers* files are read ahead of the one being consumed,
+    each of them keeping at most *memory_budget* bytes of data.
+
+    :param List[str] filenames: Names of the input files
+    :param int workers: Number of processes reading files
+    :param int memory_budget: Maximum size in bytes of the data read
+        from each file, see :func:`read_input_file`
+    :return: Iterator of *(filename, future)* tuples, the result of the
+        future being the data read from the file
+    """
+    names = iter(filenames)
+    pending = collections.deque()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit_next():
+            name = next(names, None)
+            if name is not None:
+                pending.append((name, executor.submit(
+                    read_input_file, name, memory_budget)))
+
+        try:
+            for _i in range(workers):
+                submit_next()
+            while pending:
+                name, future = pending.popleft()
+                submit_next()
+                yield name, future
+        finally:
+            for _name, future in pending:
+                future.cancel()
+
+
+def format_statistics(nfiles, nbytes, elapsed):
+    """Returns a human readable summary of the conversion throughput.
+
+    :param int nfiles: Number of converted files
+    :param int nbytes: Total size of the input files in bytes
+    :param float elapsed: Duration of the conversion in seconds
+    :rtype: str
+    """
+    elapsed = max(elapsed, 1e-6)
+    mbytes = nbytes / 1024. ** 2
+    return "Converted %d files (%.1f MB) in %.2f s: %.2f files/s, %.2f MB/s" % (
+        nfiles, mbytes, elapsed, nfiles / elapsed, mbytes / elapsed)
+
+
 def main(argv):
     """
     Main function to launch the converter as an application
@@ -281,6 +383,34 @@ def main(argv):
         '--fletcher32',
         action="store_true",
         help='Adds a checksum to each chunk to detect data corruption.')
+    parser.add_argument(
+        '--memory-budget',
+        type=float,
+        help='Maximum size in MB of the blocks of data read and written at '
+             'once. Large datasets are copied block by block (frame by frame '
+             'for image stacks) to keep the memory usage low. By default, '
+             '%d MB are used.' % (silx.config.DEFAULT_CONVERT_MEMORY_BUDGET // 1024 ** 2))
+    parser.add_argument(
+        '--progress',
+        action="store_true",
+        help='Display the progress of the copy of each dataset.')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Number of threads decoding the images of a file series in '
+             'parallel. By default, the number of CPUs is used. Use 1 to '
+             'decode the images sequentially.')
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        help='Number of processes reading input files in parallel while '
+             'the previous ones are written to the output file. This '
+             'applies when converting several SPEC files, or when using '
+             '--add-root-group. Each process reads at most --memory-budget '
+             'bytes of data of a file, larger datasets are copied block by '
+             'block by the writer. Throughput statistics are logged at the '
+             'end. By default, files are read and written one after the '
+             'other.')
     parser.add_argument(
         '--debug',
         action="store_true",
@@ -458,11 +588,25 @@ def main(argv):
     if options.fletcher32:
         create_dataset_args["fletcher32"] = True
 
+    memory_budget = None
+    if options.memory_budget is not None:
+        if options.memory_budget <= 0:
+            _logger.error("--memory-budget must be a positive number")
+            return -1
+        memory_budget = int(options.memory_budget * 1024 ** 2)
+
+    progress_callback = print_progress if options.progress else None
+
+    if options.jobs is not None and options.jobs < 1:
+        _logger.error("--jobs must be a positive number")
+        return -1
+
     if (len(options.input_files) > 1 and
             not contains_specfile(options.input_files) and
             not options.add_root_group) or options.file_pattern is not None:
         # File series -> stack of images
-        input_group = fabioh5.File(file_series=options.input_files)
+        input_group = fabioh5.File(file_series=options.input_files,
+                                   workers=options.workers)
         if hdf5_path != "/":
             # we want to append only data and headers to an existing file
             input_group = input_group["/scan_0/instrument/detector_0"]
@@ -471,35 +615,79 @@ def main(argv):
                         h5path=hdf5_path,
                         overwrite_data=options.overwrite_data,
                         create_dataset_args=create_dataset_args,
-                        min_size=options.min_size)
+                        min_size=options.min_size,
+                        memory_budget=memory_budget,
+                        progress_callback=progress_callback)
 
     elif len(options.input_files) == 1 or \
             are_all_specfile(options.input_files) or\
             options.add_root_group:
         # single file, or spec files
-        h5paths_and_groups = []
-        for input_name in options.input_files:
-            hdf5_path_for_file = hdf5_path
+        def get_hdf5_path_for_file(input_name):
             if options.add_root_group:
-                hdf5_path_for_file = hdf5_path.rstrip("/") + "/" + os.path.basename(input_name)
-            try:
-                h5paths_and_groups.append((hdf5_path_for_file,
-                                           silx.io.open(input_name)))
-            except IOError:
-                _logger.error("Cannot read file %s. If this is a file format "
-                              "supported by the fabio library, you can try to"
-                              " install fabio (`pip install fabio`)."
-                              " Aborting conversion.",
-                              input_name)
-                return -1
+                return hdf5_path.rstrip("/") + "/" + os.path.basename(input_name)
+            return hdf5_path
+
+        if options.jobs is not None:
+            # pipeline: files are read by a pool of processes, and written
+            # by this process as soon as they are available
+            if memory_budget is None:
+                memory_budget = config.DEFAULT_CONVERT_MEMORY_BUDGET
+            start_time = time.time()
+            nbytes = 0
+            with h5py.File(output_name, mode=options.mode) as h5f:
+                for input_name, future in iter_read_files(
+                        options.input_files, options.jobs, memory_budget):
+                    try:
+                        preloaded_data = future.result()
+                        # the structure of the file is read here, the
+                        # data of its datasets by the worker
+                        input_group = silx.io.open(input_name)
+                    except IOError:
+                        _logger.debug("Backtrace", exc_info=True)
+                        _logger.error("Cannot read file %s. If this is a file format "
+                                      "supported by the fabio library, you can try to"
+                                      " install fabio (`pip install fabio`)."
+                                      " Aborting conversion.",
+                                      input_name)
+                        return -1
+                    with input_group:
+                        write_to_h5(input_group, h5f,
+                                    h5path=get_hdf5_path_for_file(input_name),
+                                    overwrite_data=options.overwrite_data,
+                                    create_dataset_args=create_dataset_args,
+                                    min_size=options.min_size,
+                                    memory_budget=memory_budget,
+                                    progress_callback=progress_callback,
+                                    preloaded_data=preloaded_data)
+                    nbytes += os.path.getsize(input_name)
+            _logger.info(format_statistics(len(options.input_files), nbytes,
+                                           time.time() - start_time))
 
-        with h5py.File(output_name, mode=options.mode) as h5f:
-            for hdf5_path_for_file, input_group in h5paths_and_groups:
-                write_to_h5(input_group, h5f,
-                            h5path=hdf5_path_for_file,
-                            overwrite_data=options.overwrite_data,
-                            create_dataset_args=create_dataset_args,
-                            min_size=options.min_size)
+        else:
+            h5paths_and_groups = []
+            for input_name in options.input_files:
+                hdf5_path_for_file = get_hdf5_path_for_file(input_name)
+                try:
+                    h5paths_and_groups.append((hdf5_path_for_file,
+                                               silx.io.open(input_name)))
+                except IOError:
+                    _logger.error("Cannot read file %s. If this is a file format "
+                                  "supported by the fabio library, you can try to"
+                                  " install fabio (`pip install fabio`)."
+                                  " Aborting conversion.",
+                                  input_name)
+                    return -1
+
+            with h5py.File(output_name, mode=options.mode) as h5f:
+                for hdf5_path_for_file, input_group in h5paths_and_groups:
+                    write_to_h5(input_group, h5f,
+                                h5path=hdf5_path_for_file,
+                                overwrite_data=options.overwrite_data,
+                                create_dataset_args=create_dataset_args,
+                                min_size=options.min_size,
+                                memory_budget=memory_budget,
+                                progress_callback=progress_callback)
 
     else:
         # multiple file, SPEC and fabio images mixed
@@ -155,6 +155,138 @@ class TestConvertCommand(unittest.TestCase):
         os.unlink(h5name)
         os.rmdir(tempdir)
 
+    def testMemoryBudget(self):
+        tempdir = tempfile.mkdtemp()
+        specname = os.path.join(tempdir, "input.dat")
+        with io.open(specname, "wb") as fd:
+            if sys.version_info < (3, ):
+                fd.write(sftext)
+            else:
+                fd.write(bytes(sftext, 'ascii'))
+
+        h5name = os.path.join(tempdir, "output.h5")
+        command_list = ["convert", "-m", "w", "--min-size", "0",
+                        "--memory-budget", "0.00001", "--progress",
+                        specname, "-o", h5name]
+        result = convert.main(command_list)
+        self.assertEqual(result, 0)
+
+        with h5py.File(h5name, "r") as h5f:
+            data = h5f["/1.2/measurement/mca_1/data"][()]
+            self.assertEqual(data.tolist(),
+                             [[10, 9, 8], [7, 6, 5], [4, 3, 2]])
+
+        with testutils.TestLogging(convert._logger.name, error=1):
+            result = convert.main(["convert", "-m", "w",
+                                   "--memory-budget", "0",
+                                   specname, "-o", h5name])
+        self.assertNotEqual(result, 0)
+
+        gc.collect()
+        os.unlink(specname)
+        os.unlink(h5name)
+        os.rmdir(tempdir)
+
+    def testJobs(self):
+        tempdir = tempfile.mkdtemp()
+        specnames = []
+        for i in range(3):
+            specname = os.path.join(tempdir, "input%d.dat" % i)
+            with io.open(specname, "wb") as fd:
+                if sys.version_info < (3, ):
+                    fd.write(sftext)
+                else:
+                    fd.write(bytes(sftext, 'ascii'))
+            specnames.append(specname)
+
+        h5name = os.path.join(tempdir, "output.h5")
+        command_list = ["convert", "-m", "w", "--jobs", "2",
+                        "--add-root-group", "-o", h5name] + specnames
+        result = convert.main(command_list)
+        self.assertEqual(result, 0)
+
+        with h5py.File(h5name, "r") as h5f:
+            for i in range(3):
+                title12 = h5py_read_dataset(h5f["/input%d.dat/1.2/title" % i])
+                if sys.version_info < (3, ):
+                    title12 = title12.encode("utf-8")
+                self.assertEqual(title12, "aaaaaa")
+                data = h5f["/input%d.dat/1.2/measurement/mca_0/data" % i][()]
+                self.assertEqual(data.tolist(),
+                                 [[0, 1, 2], [3.1, 4, 5], [6, 7.7, 8]])
+            self.assertIn("silx convert", h5f.attrs["creator"])
+
+        gc.collect()
+        for filename in specnames + [h5name]:
+            os.unlink(filename)
+        os.rmdir(tempdir)
+
+    def testReadInputFile(self):
+        fd, specname = tempfile.mkstemp(suffix=".dat")
+        os.write(fd, sftext.encode('ascii'))
+        os.close(fd)
+
+        data = convert.read_input_file(specname, 1024 ** 2)
+        self.assertEqual(data["1.2/instrument/mca_0/data"].tolist(),
+                         [[0, 1, 2], [3.1, 4, 5], [6, 7.7, 8]])
+        # datasets out of the memory budget are not read
+        self.assertEqual(convert.read_input_file(specname, 0), {})
+
+        os.unlink(specname)
+
+    def testJobsUnreadableFile(self):
+        tempdir = tempfile.mkdtemp()
+        specname = os.path.join(tempdir, "input.dat")
+        with io.open(specname, "wb") as fd:
+            fd.write(sftext.encode('ascii'))
+        badname = os.path.join(tempdir, "unknown.bin")
+        with io.open(badname, "wb") as fd:
+            fd.write(b"\x00\x01\x02 not a supported file")
+
+        h5name = os.path.join(tempdir, "output.h5")
+        command_list = ["convert", "-m", "w", "--jobs", "2",
+                        "--add-root-group", "-o", h5name, specname, badname]
+        with testutils.TestLogging(convert._logger.name, error=1):
+            result = convert.main(command_list)
+        self.assertEqual(result, -1)
+
+        gc.collect()
+        for filename in (specname, badname, h5name):
+            if os.path.exists(filename):
+                os.unlink(filename)
+        os.rmdir(tempdir)
+
+    def testFileSeries(self):
+        try:
+            import fabio
+        except ImportError:
+            self.skipTest("fabio is needed")
+        import numpy
+
+        tempdir = tempfile.mkdtemp()
+        filenames = []
+        for i in range(5):
+            filename = os.path.join(tempdir, "image_%04d.edf" % i)
+            data = numpy.full((3, 4), i, dtype=numpy.uint16)
+            fabio.edfimage.edfimage(data=data).write(filename)
+            filenames.append(filename)
+
+        h5name = os.path.join(tempdir, "output.h5")
+        command_list = ["convert", "-m", "w", "--workers", "2",
+                        "-o", h5name] + filenames
+        result = convert.main(command_list)
+        self.assertEqual(result, 0)
+
+        with h5py.File(h5name, "r") as h5f:
+            data = h5f["/scan_0/instrument/detector_0/data"][()]
+            self.assertEqual(data.shape, (5, 3, 4))
+            self.assertEqual(data[:, 0, 0].tolist(), list(range(5)))
+
+        gc.collect()
+        for filename in filenames + [h5name]:
+            os.unlink(filename)
+        os.rmdir(tempdir)
+
 
 def suite():
     test_suite = unittest.TestSuite()
@@ -40,6 +40,7 @@ from silx.gui import qt
 from silx.gui.utils import blockSignals
 from silx.math.combo import min_max
 from silx.math import colormap as _colormap
+from silx.math.histogram import Histogramnd, iter_blocks
 from silx.utils.exceptions import NotEditableError
 from silx.utils import deprecation
 from silx.resources import resource_filename as _resource_filename
@@ -334,12 +335,28 @@ def _getColormap(name):
 
 # Normalizations
 
+_AutoscaleStats = collections.namedtuple(
+    '_AutoscaleStats',
+    ('minimum', 'maximum', 'mean', 'std', 'histogram', 'edges'))
+"""Statistics of the data used by autoscale.
+
+minimum and maximum are in data space, mean, std and the histogram are
+computed in the space used by :meth:`_NormalizationMixIn.autoscaleStats`.
+"""
+
+
 class _NormalizationMixIn:
     """Colormap normalization mix-in class"""
 
     DEFAULT_RANGE = 0, 1
     """Fallback for (vmin, vmax)"""
 
+    AUTOSCALE_HISTOGRAM_BINS = 4096
+    """Number of bins of the histogram used for percentile autoscale"""
+
+    AUTOSCALE_BLOCK_SIZE = 1024 ** 2
+    """Number of elements processed at once to compute autoscale statistics"""
+
     def isValid(self, value):
         """Check if a value is in the valid range for this normalization.
 
@@ -353,11 +370,14 @@ class _NormalizationMixIn:
         else:
             return True
 
-    def autoscale(self, data, mode):
+    def autoscale(self, data, mode, stats=None):
         """Returns range for given data and autoscale mode.
 
         :param Union[None,numpy.ndarray] data:
         :param str mode: Autoscale mode, see :class:`Colormap`
+        :param Union[None,_AutoscaleStats] stats:
+            Statistics of data returned by :meth:`autoscaleStats`.
+            If None, the default, they are computed if needed.
         :returns: Range as (min, max)
         :rtype: Tuple[float,float]
         """
@@ -366,10 +386,26 @@ class _NormalizationMixIn:
             return self.DEFAULT_RANGE
 
         if mode == Colormap.MINMAX:
-            vmin, vmax = self.autoscaleMinMax(data)
-        elif mode == Colormap.STDDEV3:
-            dmin, dmax = self.autoscaleMinMax(data)
-            stdmin, stdmax = self.autoscaleMean3Std(data)
+            if stats is None:
+                vmin, vmax = self.autoscaleMinMax(data)
+            else:
+                vmin, vmax = stats.minimum, stats.maximum
+
+        elif mode in Colormap.AUTOSCALE_MODES:
+            if stats is None:
+                stats = self.autoscaleStats(data)
+
+            dmin, dmax = stats.minimum, stats.maximum
+            if mode == Colormap.STDDEV3:
+                if stats.mean is None:
+                    stdmin, stdmax = None, None
+                else:
+                    stdmin = self._revertStats(stats.mean - 3 * stats.std)
+                    stdmax = self._revertStats(stats.mean + 3 * stats.std)
+            else:
+                stdmin, stdmax = self.autoscalePercentile(
+                    stats, *Colormap._AUTOSCALE_PERCENTILES[mode])
+
             if dmin is None:
                 vmin = stdmin
             elif stdmin is None:
@@ -435,10 +471,131 @@ class _NormalizationMixIn:
 
         return self.revert(mean - 3 * std, 0., 1.), self.revert(mean + 3 * std, 0., 1.)
 
+    def _applyStats(self, data):
+        """Convert data to the space where statistics are computed.
+
+        This implementation uses the normalized data.
+        Override this method for normalization using the range.
+
+        :param Union[float,numpy.ndarray] data:
+        :rtype: Union[float,numpy.ndarray]
+        """
+        return self.apply(data, 0., 1.)
+
+    def _revertStats(self, data):
+        """Inverse of :meth:`_applyStats`
+
+        :param Union[float,numpy.ndarray] data:
+        :rtype: Union[float,numpy.ndarray]
+        """
+        return self.revert(data, 0., 1.)
+
+    def autoscaleStats(self, data):
+        """Compute all statistics needed by autoscale modes in a single pass.
+
+        Data is processed by blocks of :attr:`AUTOSCALE_BLOCK_SIZE` elements,
+        which are used to accumulate both the sums needed for the mean and
+        standard deviation and a histogram of :attr:`AUTOSCALE_HISTOGRAM_BINS`
+        bins between the data min and max.
+        Non-finite values are ignored.
+
+        :param numpy.ndarray data:
+        :rtype: _AutoscaleStats
+        """
+        vmin, vmax = self.autoscaleMinMax(data)
+        if vmin is None or vmax is None or vmax < vmin:
+            vmin, vmax = None, None
+            histogram = None
+        else:
+            histoMin = self._applyStats(vmin)
+            histoMax = self._applyStats(vmax)
+            if histoMin < histoMax:
+                histogram = Histogramnd(
+                    None,
+                    histo_range=((histoMin, histoMax),),
+                    n_bins=self.AUTOSCALE_HISTOGRAM_BINS,
+                    last_bin_closed=True)
+            else:  # Single value: no histogram needed
+                histogram = None
+
+        count, sum1, sum2 = 0, 0., 0.
+        reference = None
+        for block, _ in iter_blocks(numpy.ravel(data),
+                                    block_size=self.AUTOSCALE_BLOCK_SIZE):
+            values = self._applyStats(block)
+            if values.dtype.kind == 'f':
+                values = values[numpy.isfinite(values)]
+            # Histogramnd only supports those types (e.g., not float16)
+            if values.dtype not in (numpy.float32, numpy.float64, numpy.int32):
+                values = values.astype(numpy.float64)
+            if values.size == 0:
+                continue
+
+            if reference is None:  # Offset limiting cancellation in sums
+                reference = float(values[0])
+            offset = numpy.subtract(values, reference, dtype=numpy.float64)
+            count += offset.size
+            sum1 += numpy.sum(offset)
+            sum2 += numpy.dot(offset, offset)
+
+            if histogram is not None:
+                histogram.accumulate(values)
+
+        if count == 0:
+            mean, std = None, None
+        else:
+            mean = sum1 / count
+            std = numpy.sqrt(max(0., sum2 / count - mean ** 2))
+            mean += reference
+
+        if histogram is None or histogram[0] is None:
+            histo, edges = None, None
+        else:
+            histo, edges = histogram[0], histogram[2][0]
+        return _AutoscaleStats(vmin, vmax, mean, std, histo, edges)
+
+    def autoscalePercentile(self, stats, low, high):
+        """Autoscale using percentiles of the histogram of the data.
+
+        Percentiles are linearly interpolated within histogram bins.
+
+        :param _AutoscaleStats stats: Statistics from :meth:`autoscaleStats`
+        :param float low: Percentile of the lower bound in [0, 100]
+        :param float high: Percentile of the upper bound in [0, 100]
+        :returns: (vmin, vmax)
+        :rtype: Tuple[float,float]
+        """
+        if stats.histogram is None:  # No or single value
+            return stats.minimum, stats.maximum
+
+        cumsum = numpy.cumsum(stats.histogram, dtype=numpy.float64)
+        if cumsum[-1] == 0:
+            return stats.minimum, stats.maximum
+
+        targets = numpy.array((low, high), dtype=numpy.float64)
+        targets = numpy.clip(targets, 0., 100.) * (cumsum[-1] / 100.)
+        indices = numpy.searchsorted(cumsum, targets, side='left')
+        indices = numpy.clip(indices, 0, len(cumsum) - 1)
+
+        counts = stats.histogram[indices]
+        before = cumsum[indices] - counts
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            fractions = numpy.where(
+                counts > 0, (targets - before) / counts, 0.)
+        binWidth = stats.edges[1] - stats.edges[0]
+        values = stats.edges[indices] + numpy.clip(fractions, 0., 1.) * binWidth
+        vmin, vmax = self._revertStats(values)
+        return float(vmin), float(vmax)
+
 
 class _LinearNormalizationMixIn(_NormalizationMixIn):
     """Colormap normalization mix-in class specific to autoscale taken from initial range"""
 
+    def autoscaleMinMax(self, data):
+        # All values are valid: no need to filter data
+        result = min_max(data, min_positive=False, finite=True)
+        return result.minimum, result.maximum
+
     def autoscaleMean3Std(self, data):
         """Autoscale using mean+/-3std
 
@@ -460,6 +617,13 @@ class _LinearNormalizationMixIn(_NormalizationMixIn):
             mean, std = numpy.nanmean(data), numpy.nanstd(data)
         return mean - 3 * std, mean + 3 * std
 
+    def _applyStats(self, data):
+        # Compute statistics on the data itself
+        return data
+
+    def _revertStats(self, data):
+        return data
+
 
 class _LinearNormalization(_colormap.LinearNormalization, _LinearNormalizationMixIn):
     """Linear normalization"""
@@ -568,9 +732,15 @@ class Colormap(qt.QObject):
     """constant for autoscale using mean +/- 3*std(data)
     with a clamp on min/max of the data"""
 
-    AUTOSCALE_MODES = (MINMAX, STDDEV3)
+    PERCENTILE_1_99 = 'percentile_1_99'
+    """constant for autoscale using 1st and 99th percentiles of data"""
+
+    AUTOSCALE_MODES = (MINMAX, STDDEV3, PERCENTILE_1_99)
     """Tuple of managed auto scale algorithms"""
 
+    _AUTOSCALE_PERCENTILES = {PERCENTILE_1_99: (1., 99.)}
+    """Percentiles (low, high) of percentile autoscale modes"""
+
     sigChanged = qt.Signal()
     """Signal emitted when the colormap has changed."""
 
@@ -792,14 +962,15 @@ class Colormap(qt.QObject):
         return self.__gamma
 
     def getAutoscaleMode(self):
-        """Return the autoscale mode of the colormap ('minmax' or 'stddev3')
+        """Return the autoscale mode of the colormap
+        ('minmax', 'stddev3' or 'percentile_1_99')
 
         :rtype: str
         """
         return self._autoscaleMode
 
     def setAutoscaleMode(self, mode):
-        """Set the autoscale mode: either 'minmax' or 'stddev3'
+        """Set the autoscale mode: 'minmax', 'stddev3' or 'percentile_1_99'
 
         :param str mode: the mode to set
         """
@@ -891,14 +1062,24 @@ class Colormap(qt.QObject):
         else:
             return self._BASIC_NORMALIZATIONS[normalization]
 
-    def _computeAutoscaleRange(self, data):
+    def _computeAutoscaleStats(self, data):
+        """Compute the statistics of data used by all autoscale modes.
+
+        :param numpy.ndarray data: The data for which to compute statistics
+        :rtype: _AutoscaleStats
+        """
+        return self._getNormalizer().autoscaleStats(data)
+
+    def _computeAutoscaleRange(self, data, stats=None):
         """Compute the data range which will be used in autoscale mode.
 
         :param numpy.ndarray data: The data for which to compute the range
+        :param Union[None,_AutoscaleStats] stats:
+            Statistics of data from :meth:`_computeAutoscaleStats`, if any
         :return: (vmin, vmax) range
         """
         return self._getNormalizer().autoscale(
-            data, mode=self.getAutoscaleMode())
+            data, mode=self.getAutoscaleMode(), stats=stats)
 
     def getColormapRange(self, data=None):
         """Return (vmin, vmax) the range of the colormap for the given data or item.
@@ -27,6 +27,7 @@ This module defines a data model for displaying and editing arrays of any
 number of dimensions in a table view.
 """
 from __future__ import division
+import collections
 import numpy
 import logging
 from silx.gui import qt
@@ -40,6 +41,17 @@ __date__ = "27/09/2017"
 _logger = logging.getLogger(__name__)
 
 
+_BLOCK_SHAPE = 64, 16
+"""Default number of (rows, columns) of the blocks read from array-like
+objects which are not numpy arrays"""
+
+_MAX_CHUNK_ALIGNED_SIZE = 256
+"""Blocks are not aligned on chunks larger than this along an axis"""
+
+_CACHE_MAX_NBYTES = 32 * 1024 ** 2
+"""Default memory limit of the cache of formatted blocks"""
+
+
 def _is_array(data):
     """Return True if object implements all necessary attributes to be used
     as a numpy array.
@@ -54,6 +66,71 @@ def _is_array(data):
     return True
 
 
+class _BlockCache(object):
+    """Least recently used cache of blocks of formatted values.
+
+    :param int maxNBytes: Estimated memory size of the blocks above which
+        the least recently used ones are discarded
+    """
+
+    def __init__(self, maxNBytes=_CACHE_MAX_NBYTES):
+        self._blocks = collections.OrderedDict()
+        self._nbytes = 0
+        self._maxNBytes = maxNBytes
+
+    def get(self, key):
+        """Returns the block stored for key or None if not cached
+
+        :param key: Hashable identifier of the block
+        :rtype: Union[numpy.ndarray,None]
+        """
+        item = self._blocks.get(key)
+        if item is None:
+            return None
+        self._blocks.move_to_end(key)
+        return item[0]
+
+    def add(self, key, block):
+        """Store a 2D array of strings, discarding old blocks if needed
+
+        :param key: Hashable identifier of the block
+        :param numpy.ndarray block: Object array of str
+        """
+        self.discard(key)
+        # str object overhead + pointer in the array + characters
+        nbytes = 64 * block.size + sum(len(text) for text in block.flat)
+        self._blocks[key] = block, nbytes
+        self._nbytes += nbytes
+        while self._nbytes > self._maxNBytes and len(self._blocks) > 1:
+            _key, (_block, size) = self._blocks.popitem(last=False)
+            self._nbytes -= size
+
+    def discard(self, key):
+        """Remove the block stored for key if any
+
+        :param key: Hashable identifier of the block
+        """
+        item = self._blocks.pop(key, None)
+        if item is not None:
+            self._nbytes -= item[1]
+
+    def clear(self):
+        """Remove all blocks"""
+        self._blocks.clear()
+        self._nbytes = 0
+
+    def __contains__(self, key):
+        return key in self._blocks
+
+    def __len__(self):
+        return len(self._blocks)
+
+    @property
+    def nbytes(self):
+        """Estimated memory size of the stored blocks"""
+        return self._nbytes
+
+
 class ArrayTableModel(qt.QAbstractTableModel):
     """This data model provides access to 2D slices in a N-dimensional
     array.
@@ -73,6 +150,12 @@ class ArrayTableModel(qt.QAbstractTableModel):
         Default is ``"%g"``.
     :param sequence[int] perspective: See documentation
         of :meth:`setPerspective`.
+
+    When the data is an array-like object which is not a numpy array
+    (e.g., a h5py dataset used with ``copy=False``), values are read
+    and formatted by blocks of rows and columns aligned on the chunks of
+    the dataset. Blocks are kept in a cache of limited size, and the next
+    block in the scrolling direction is read ahead.
     """
     def __init__(self, parent=None, data=None, perspective=None):
         qt.QAbstractTableModel.__init__(self, parent)
@@ -80,6 +163,15 @@ class ArrayTableModel(qt.QAbstractTableModel):
         self._array = None
         """n-dimensional numpy array"""
 
+        self._cache = _BlockCache()
+        """Cache of formatted blocks for array-like data"""
+
+        self._blockShape = None
+        """(rows, columns) of a cached block, None if the cache is not used"""
+
+        self._lastBlock = None
+        """(row, column) of the last block accessed, used for read-ahead"""
+
         self._bgcolors = None
         """(n+1)-dimensional numpy array containing RGB(A) color data
         for the background color
@@ -165,6 +257,103 @@ class ArrayTableModel(qt.QAbstractTableModel):
             selection.insert(col_dim, table_col)
         return tuple(selection)
 
+    def _resetCache(self):
+        """Clear the cache of formatted blocks and update the block shape.
+
+        The cache is used for array-like objects which are not numpy arrays.
+        """
+        self._cache.clear()
+        self._lastBlock = None
+        self._blockShape = None
+        if (self._array is None or isinstance(self._array, numpy.ndarray) or
+                len(self._array.shape) < 1 or self._perspective is None):
+            return
+
+        chunks = getattr(self._array, "chunks", None)
+        dims = self._getRowDim(), self._getColumnDim()
+        if dims[0] is None:
+            # 1D data: a single row of blocks
+            default_shape = 1, _BLOCK_SHAPE[0] * _BLOCK_SHAPE[1]
+        else:
+            default_shape = _BLOCK_SHAPE
+        shape = []
+        for dim, size in zip(dims, default_shape):
+            if dim is None:
+                size = 1
+            elif chunks is not None and chunks[dim] <= _MAX_CHUNK_ALIGNED_SIZE:
+                # Round up to a multiple of the chunk size
+                size = - (- size // chunks[dim]) * chunks[dim]
+            shape.append(size)
+        self._blockShape = tuple(shape)
+
+    def _loadBlocks(self, blockRow, blockCol):
+        """Read, format and cache the block at the given block indices,
+        together with the next one in the scrolling direction.
+
+        :param int blockRow: Row index of the block
+        :param int blockCol: Column index of the block
+        """
+        nrows, ncols = self.rowCount(), self.columnCount()
+        brows, bcols = self._blockShape
+
+        rows = [blockRow, blockRow]
+        cols = [blockCol, blockCol]
+        if self._lastBlock is not None:
+            # Read ahead in the scrolling direction
+            if blockRow > self._lastBlock[0]:
+                rows[1] += 1
+            elif blockRow < self._lastBlock[0]:
+                rows[0] -= 1
+            if blockCol > self._lastBlock[1]:
+                cols[1] += 1
+            elif blockCol < self._lastBlock[1]:
+                cols[0] -= 1
+        rows[0] = max(rows[0], 0)
+        rows[1] = min(rows[1], (nrows - 1) // brows)
+        cols[0] = max(cols[0], 0)
+        cols[1] = min(cols[1], (ncols - 1) // bcols)
+
+        row0, row1 = rows[0] * brows, min((rows[1] + 1) * brows, nrows)
+        col0, col1 = cols[0] * bcols, min((cols[1] + 1) * bcols, ncols)
+
+        # Read the whole region at once
+        selection = list(self._index)
+        row_dim = self._getRowDim()
+        if row_dim is not None:
+            selection.insert(row_dim, slice(row0, row1))
+        selection.insert(self._getColumnDim(), slice(col0, col1))
+        values = numpy.asarray(self._array[tuple(selection)])
+        values = values.reshape(row1 - row0, col1 - col0)
+
+        dtype = self._array.dtype
+        toString = self._formatter.toString
+        for brow in range(rows[0], rows[1] + 1):
+            for bcol in range(cols[0], cols[1] + 1):
+                if (brow, bcol) in self._cache and (brow, bcol) != (blockRow, blockCol):
+                    continue
+                block = values[brow * brows - row0:(brow + 1) * brows - row0,
+                               bcol * bcols - col0:(bcol + 1) * bcols - col0]
+                texts = numpy.empty(block.shape, dtype=object)
+                for index, value in numpy.ndenumerate(block):
+                    texts[index] = toString(value, dtype)
+                self._cache.add((brow, bcol), texts)
+
+    def _getCachedText(self, table_row, table_col):
+        """Returns the formatted value of a cell using the block cache
+
+        :param int table_row: Row index (0-based) of a table cell
+        :param int table_col: Column index (0-based) of a table cell
+        :rtype: str
+        """
+        brows, bcols = self._blockShape
+        key = table_row // brows, table_col // bcols
+        block = self._cache.get(key)
+        if block is None:
+            self._loadBlocks(*key)
+            block = self._cache.get(key)
+        self._lastBlock = key
+        return block[table_row % brows, table_col % bcols]
+
     # Methods to be implemented to subclass QAbstractTableModel
     def rowCount(self, parent_idx=None):
         """QAbstractTableModel method
@@ -188,6 +377,9 @@ class ArrayTableModel(qt.QAbstractTableModel):
         """QAbstractTableModel method to access data values
         in the format ready to be displayed"""
         if index.isValid():
+            if role == qt.Qt.DisplayRole and self._blockShape is not None:
+                return self._getCachedText(index.row(), index.column())
+
             selection = self._getIndexTuple(index.row(),
                                             index.column())
             if role == qt.Qt.DisplayRole:
@@ -252,6 +444,10 @@ class ArrayTableModel(qt.QAbstractTableModel):
             selection = self._getIndexTuple(index.row(),
                                             index.column())
             self._array[selection] = v
+            if self._blockShape is not None:
+                brows, bcols = self._blockShape
+                self._cache.discard(
+                    (index.row() // brows, index.column() // bcols))
             self.dataChanged.emit(index, index)
             return True
         else:
@@ -327,6 +523,7 @@ class ArrayTableModel(qt.QAbstractTableModel):
         self._index = [0 for _i in range((len(self._array.shape) - 2))]
         self._perspective = tuple(perspective) if perspective is not None else\
             tuple(range(0, len(self._array.shape) - 2))
+        self._resetCache()
 
         if qt.qVersion() > "4.6":
             self.endResetModel()
@@ -449,6 +646,7 @@ class ArrayTableModel(qt.QAbstractTableModel):
                     raise IndexError("Invalid index %d " % idx +
                                      "not in range 0-%d" % (shape[i_] - 1))
             self._index = index
+        self._resetCache()
 
         if qt.qVersion() > "4.6":
             self.endResetModel()
@@ -470,6 +668,7 @@ class ArrayTableModel(qt.QAbstractTableModel):
         self._formatter = formatter
         if self._formatter is not None:
             self._formatter.formatChanged.connect(self.__formatChanged)
+        self._resetCache()
 
         if qt.qVersion() > "4.6":
             self.endResetModel()
@@ -486,6 +685,7 @@ class ArrayTableModel(qt.QAbstractTableModel):
     def __formatChanged(self):
         """Called when the format changed.
         """
+        self._resetCache()
         self.reset()
 
     def setPerspective(self, perspective):
@@ -548,6 +748,7 @@ class ArrayTableModel(qt.QAbstractTableModel):
 
         # reset index
         self._index = [0 for _i in range(n_dimensions - 2)]
+        self._resetCache()
 
         if qt.qVersion() > "4.6":
             self.endResetModel()
@@ -593,6 +794,7 @@ class ArrayTableModel(qt.QAbstractTableModel):
         self._perspective = perspective
         # reset index
         self._index = [0 for _i in range(n_dimensions - 2)]
+        self._resetCache()
 
         if qt.qVersion() > "4.6":
             self.endResetModel()
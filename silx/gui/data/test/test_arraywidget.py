@@ -34,6 +34,7 @@ import numpy
 
 from silx.gui import qt
 from silx.gui.data import ArrayTableWidget
+from silx.gui.data import ArrayTableModel
 from silx.gui.utils.testutils import TestCaseQt
 
 import h5py
@@ -302,6 +303,56 @@ class TestH5pyArrayWidget(TestCaseQt):
 
         h5f.close()
 
+    def testBlockCache(self):
+        """Compare values displayed from a dataset with copy=False
+        to the ones displayed from a numpy array"""
+        h5f = h5py.File(self.h5_fname, "r+")
+        h5f.create_dataset("chunked", data=self.data, chunks=(1, 5, 3))
+        ref_model = ArrayTableModel.ArrayTableModel(data=self.data)
+
+        for name in ("my_array", "chunked"):
+            with self.subTest(name=name):
+                self.aw.setArrayData(h5f[name], copy=False, editable=True)
+                model = self.aw.model
+                self.assertIsNotNone(model._blockShape)
+                for perspective in (0, 1, 2):
+                    model.setPerspective(perspective)
+                    ref_model.setPerspective(perspective)
+                    model.setFrameIndex(3)
+                    ref_model.setFrameIndex(3)
+                    # scroll backward through the frame
+                    for row in reversed(range(model.rowCount())):
+                        for col in reversed(range(model.columnCount())):
+                            idx = model.createIndex(row, col)
+                            ref_idx = ref_model.createIndex(row, col)
+                            self.assertEqual(model.data(idx),
+                                             ref_model.data(ref_idx))
+
+                # Edition invalidates the cached value
+                idx = model.createIndex(2, 2)
+                model.setData(idx, 123.4, role=qt.Qt.EditRole)
+                self.assertEqual(model.data(idx), "123.4")
+        h5f.close()
+
+    def testBlockCache1D(self):
+        h5f = h5py.File(self.h5_fname, "r")
+        self.aw.setArrayData(h5f["my_1D_array"], copy=False)
+        model = self.aw.model
+        self.assertEqual(model.rowCount(), 1)
+        for col in range(0, model.columnCount(), 7):
+            idx = model.createIndex(0, col)
+            self.assertEqual(model.data(idx), "%d" % col)
+        h5f.close()
+
+    def testBlockCacheMemoryLimit(self):
+        cache = ArrayTableModel._BlockCache(maxNBytes=1000)
+        block = numpy.array([["1.5"] * 4] * 2, dtype=object)
+        for key in range(5):
+            cache.add(key, block)
+        self.assertLessEqual(cache.nbytes, 1000)
+        self.assertIsNone(cache.get(0))
+        self.assertIs(cache.get(4), block)
+
 
 def suite():
     test_suite = unittest.TestSuite()
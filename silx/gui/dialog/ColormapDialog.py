@@ -207,6 +207,7 @@ class _AutoscaleModeComboBox(qt.QComboBox):
     DATA = {
         Colormap.MINMAX: ("Min/max", "Use the data min/max"),
         Colormap.STDDEV3: ("Mean ± 3 × stddev", "Use the data mean ± 3 × standard deviation"),
+        Colormap.PERCENTILE_1_99: ("Percentile 1-99", "Use the 1st and 99th percentiles of the data"),
     }
 
     def __init__(self, parent: qt.QWidget):
@@ -190,13 +190,14 @@ class ImageMask(BaseMask):
         assert 0 < level < 256
         if row + height <= 0 or col + width <= 0:
             return  # Rectangle outside image, avoid negative indices
-        selection = self._mask[max(0, row):row + height + 1,
-                               max(0, col):col + width + 1]
+        region = (slice(max(0, row), row + height + 1),
+                  slice(max(0, col), col + width + 1))
+        selection = self._mask[region]
         if mask:
             selection[:, :] = level
         else:
             selection[selection == level] = 0
-        self._notify()
+        self._notify(region)
 
     def updatePolygon(self, level, vertices, mask=True):
         """Mask/Unmask a polygon of the given mask level.
@@ -205,13 +206,27 @@ class ImageMask(BaseMask):
         :param vertices: Nx2 array of polygon corners as (row, col)
         :param bool mask: True to mask (default), False to unmask.
         """
-        fill = shapes.polygon_fill_mask(vertices, self._mask.shape)
-        if mask:
-            self._mask[fill != 0] = level
+        vertices = numpy.array(vertices, dtype=numpy.float64)
+        height, width = self._mask.shape
+        if len(vertices) == 0:
+            row0, row1, col0, col1 = 0, 0, 0, 0
         else:
-            self._mask[numpy.logical_and(fill != 0,
-                                         self._mask == level)] = 0
-        self._notify()
+            # Only fill the bounding box of the polygon
+            row0 = min(max(0, int(numpy.floor(vertices[:, 0].min()))), height)
+            row1 = min(max(row0, int(numpy.ceil(vertices[:, 0].max())) + 1), height)
+            col0 = min(max(0, int(numpy.floor(vertices[:, 1].min())) - 1), width)
+            col1 = min(max(col0, int(numpy.ceil(vertices[:, 1].max())) + 1), width)
+        region = slice(row0, row1), slice(col0, col1)
+
+        if row1 > row0 and col1 > col0:
+            fill = shapes.polygon_fill_mask(
+                vertices - (row0, col0), (row1 - row0, col1 - col0)) != 0
+            selection = self._mask[region]
+            if mask:
+                selection[fill] = level
+            else:
+                selection[numpy.logical_and(fill, selection == level)] = 0
+        self._notify(region)
 
     def updatePoints(self, level, rows, cols, mask=True):
         """Mask/Unmask points with given coordinates.
@@ -234,7 +249,13 @@ class ImageMask(BaseMask):
         else:
             inMask = self._mask[rows, cols] == level
             self._mask[rows[inMask], cols[inMask]] = 0
-        self._notify()
+
+        if len(rows) == 0:
+            region = slice(0, 0), slice(0, 0)
+        else:
+            region = (slice(rows.min(), rows.max() + 1),
+                      slice(cols.min(), cols.max() + 1))
+        self._notify(region)
 
     def updateDisk(self, level, crow, ccol, radius, mask=True):
         """Mask/Unmask a disk of the given mask level.
@@ -105,7 +105,17 @@ class ScatterMask(BaseMask):
             indices_stencil = numpy.zeros_like(self._mask, dtype=bool)
             indices_stencil[indices] = True
             self._mask[numpy.logical_and(self._mask == level, indices_stencil)] = 0
-        self._notify()
+
+        indices = numpy.asarray(indices)
+        if indices.size == 0:
+            region = (slice(0, 0),)
+        elif indices.dtype.kind not in 'iu':
+            region = None
+        elif indices.min() < 0:
+            region = None
+        else:
+            region = (slice(indices.min(), indices.max() + 1),)
+        self._notify(region)
 
     # update shapes
     def updatePolygon(self, level, vertices, mask=True):
@@ -376,7 +376,11 @@ class StackView(qt.QMainWindow):
         if isinstance(self._stack, numpy.ndarray):
             self.__transposed_view = self._stack
 
-        elif is_dataset(self._stack) or isinstance(self._stack, DatasetView):
+        elif is_dataset(self._stack):
+            # Read neighbouring frames in background while browsing
+            self.__transposed_view = DatasetView(self._stack, prefetch=True)
+
+        elif isinstance(self._stack, DatasetView):
             self.__transposed_view = DatasetView(self._stack)
 
         elif isinstance(self._stack, ListOfImages):
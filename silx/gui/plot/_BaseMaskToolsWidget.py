@@ -33,6 +33,7 @@ __date__ = "12/04/2019"
 
 import os
 import weakref
+import zlib
 
 import numpy
 
@@ -43,6 +44,122 @@ from silx.gui.colors import rgba
 from .actions.mode import PanModeAction
 
 
+_THRESHOLD_TILE_SIZE = 1024 ** 2
+"""Number of data elements processed at once by threshold operations"""
+
+
+def _normalizeRegion(region, shape):
+    """Returns a region of a mask as a tuple of slices with explicit
+    start and stop clipped to the shape.
+
+    :param region: Sequence of slices, one per dimension
+    :param tuple shape: Shape of the mask
+    :rtype: tuple of slice
+    """
+    normalized = []
+    for dimSlice, size in zip(region, shape):
+        start, stop, _step = dimSlice.indices(size)
+        normalized.append(slice(start, max(start, stop)))
+    return tuple(normalized)
+
+
+def _isEmptyRegion(region):
+    """Returns True if a normalized region contains no element"""
+    return any(dimSlice.stop <= dimSlice.start for dimSlice in region)
+
+
+def _unionRegion(region1, region2):
+    """Returns the bounding box of two normalized regions.
+
+    None stands for the whole mask.
+    """
+    if region1 is None or region2 is None:
+        return None
+    if _isEmptyRegion(region1):
+        return region2
+    if _isEmptyRegion(region2):
+        return region1
+    return tuple(slice(min(slice1.start, slice2.start),
+                       max(slice1.stop, slice2.stop))
+                 for slice1, slice2 in zip(region1, region2))
+
+
+class _MaskDelta(object):
+    """Difference between two states of a mask, for undo/redo.
+
+    For masks of the same shape, only the bounding box of the changed
+    elements is stored, as the compressed XOR of the two states.
+    Applying it to one state gives the other one.
+
+    :param numpy.ndarray before: Mask before the change
+    :param numpy.ndarray after: Mask after the change
+    :param region: Normalized region of the masks from which before and
+        after were extracted, None if they are the whole masks
+    """
+
+    def __init__(self, before, after, region=None):
+        if before.shape != after.shape:
+            # Store both states
+            self._bbox = None
+            self._data = (self._compress(before), self._compress(after))
+            return
+
+        if region is None:
+            region = tuple(slice(0, size) for size in before.shape)
+
+        changed = before != after
+        bbox = []
+        for axis in range(changed.ndim):
+            others = tuple(i for i in range(changed.ndim) if i != axis)
+            indices = numpy.nonzero(numpy.any(changed, axis=others))[0]
+            if len(indices) == 0:
+                bbox = [slice(0, 0)] * changed.ndim
+                break
+            bbox.append(slice(indices[0], indices[-1] + 1))
+        bbox = tuple(bbox)
+        self._data = self._compress(
+            numpy.bitwise_xor(before[bbox], after[bbox]))
+        # Bounding box in the whole mask
+        self._bbox = tuple(
+            slice(dimSlice.start + offset.start, dimSlice.stop + offset.start)
+            for dimSlice, offset in zip(bbox, region))
+
+    @staticmethod
+    def _compress(array):
+        return array.shape, zlib.compress(array.tobytes(), 1)
+
+    @staticmethod
+    def _decompress(data):
+        shape, buffer_ = data
+        return numpy.frombuffer(
+            zlib.decompress(buffer_), dtype=numpy.uint8).reshape(shape)
+
+    @property
+    def nbytes(self):
+        """Size of the stored difference in bytes"""
+        if self._bbox is None:
+            return len(self._data[0][1]) + len(self._data[1][1])
+        return len(self._data[1])
+
+    def apply(self, mask, undo):
+        """Returns the other state of the mask
+
+        :param numpy.ndarray mask: State of the mask to update in place
+        :param bool undo: True to get the state before the change,
+            False to get the state after the change
+        :rtype: numpy.ndarray
+        """
+        if self._bbox is None:
+            return numpy.array(self._decompress(self._data[0 if undo else 1]))
+        mask[self._bbox] ^= self._decompress(self._data)
+        return mask
+
+    @property
+    def region(self):
+        """Bounding box of the changes or None if the shape changed"""
+        return self._bbox
+
+
 class BaseMask(qt.QObject):
     """Base class for :class:`ImageMask` and :class:`ScatterMask`
 
@@ -67,11 +184,17 @@ class BaseMask(qt.QObject):
     """Signal emitted when redo becomes possible/impossible"""
 
     def __init__(self, dataItem=None):
-        self.historyDepth = 10
+        self.historyDepth = 100
         """Maximum number of operation stored in history list for undo"""
-        # Init lists for undo/redo
+        # Init lists of _MaskDelta for undo/redo
         self._history = []
         self._redo = []
+        # Copy of the mask at the last commit
+        self._committed = None
+        # Bounding box of the changes since the last commit (None: all)
+        self._dirtyRegion = None
+        # Bounding box of the last change (None: all)
+        self._changedRegion = None
 
         # Store the mask
         self._mask = numpy.array((), dtype=numpy.uint8)
@@ -104,10 +227,30 @@ class BaseMask(qt.QObject):
         """
         raise NotImplementedError("To be implemented in subclass")
 
-    def _notify(self):
-        """Notify of mask change."""
+    def _notify(self, region=None):
+        """Notify of mask change.
+
+        :param region: Sequence of slices, one per dimension, containing
+            all modified elements, or None if the whole mask may have changed
+        """
+        if region is not None:
+            region = _normalizeRegion(region, self._mask.shape)
+        self._changedRegion = region
+        self._dirtyRegion = _unionRegion(self._dirtyRegion, region)
         self.sigChanged.emit()
 
+    def getChangedRegion(self):
+        """Returns the region of the mask modified by the last change.
+
+        This is meant to be used by :attr:`sigChanged` handlers to only
+        process the modified part of the mask.
+
+        :return: Tuple of slices, one per dimension, or None if the whole
+            mask may have changed
+        :rtype: Union[tuple,None]
+        """
+        return self._changedRegion
+
     def getMask(self, copy=True):
         """Get the current mask as a numpy array.
 
@@ -133,51 +276,101 @@ class BaseMask(qt.QObject):
     # History control
     def resetHistory(self):
         """Reset history"""
-        self._history = [numpy.array(self._mask, copy=True)]
+        self._committed = numpy.array(self._mask, copy=True)
+        self._dirtyRegion = (slice(0, 0),) * self._mask.ndim
+        self._history = []
         self._redo = []
         self.sigUndoable.emit(False)
         self.sigRedoable.emit(False)
 
+    def getHistoryNBytes(self):
+        """Returns the memory size used by the undo/redo history
+
+        :rtype: int
+        """
+        nbytes = sum(delta.nbytes for delta in self._history + self._redo)
+        if self._committed is not None:
+            nbytes += self._committed.nbytes
+        return nbytes
+
     def commit(self):
-        """Append the current mask to history if changed"""
-        if (not self._history or self._redo or
-                not numpy.array_equal(self._mask, self._history[-1])):
-            if self._redo:
-                self._redo = []  # Reset redo as a new action as been performed
-                self.sigRedoable[bool].emit(False)
-
-            while len(self._history) >= self.historyDepth:
-                self._history.pop(0)
-            self._history.append(numpy.array(self._mask, copy=True))
-
-            if len(self._history) == 2:
-                self.sigUndoable.emit(True)
+        """Append the current mask to history if changed.
+
+        Only the region modified since the last commit is compared.
+        """
+        region, self._dirtyRegion = (self._dirtyRegion,
+                                     (slice(0, 0),) * self._mask.ndim)
+        if self._committed is None:
+            self._committed = numpy.array(self._mask, copy=True)
+            return
+
+        if self._redo:
+            self._redo = []  # Reset redo as a new action as been performed
+            self.sigRedoable[bool].emit(False)
+
+        if self._mask.shape != self._committed.shape:
+            delta = _MaskDelta(self._committed, self._mask)
+            self._committed = numpy.array(self._mask, copy=True)
+        else:
+            if region is None:
+                region = tuple(slice(0, size) for size in self._mask.shape)
+            elif _isEmptyRegion(region):
+                return
+            before = self._committed[region]
+            after = self._mask[region]
+            if numpy.array_equal(before, after):
+                return
+            delta = _MaskDelta(before, after, region)
+            before[...] = after
+
+        while self._history and len(self._history) >= self.historyDepth:
+            self._history.pop(0)
+        self._history.append(delta)
+        if len(self._history) == 1:
+            self.sigUndoable.emit(True)
+
+    def _restore(self, delta, undo):
+        """Apply a history step to the last committed mask and use it
+        as the current mask.
+
+        :param _MaskDelta delta: Step to apply
+        :param bool undo: True to undo the step, False to redo it
+        """
+        # Uncommitted changes are discarded as well
+        region = _unionRegion(self._dirtyRegion, delta.region)
+        committed = delta.apply(self._committed, undo)
+        self._mask = committed
+        # The previous mask array is not reused: It can be shared through
+        # getMask(copy=False) or setMask(copy=False)
+        self._committed = numpy.array(committed, copy=True)
+        self._notify(region)  # Do not store this change in history
+        self._dirtyRegion = (slice(0, 0),) * self._mask.ndim
 
     def undo(self):
         """Restore previous mask if any"""
-        if len(self._history) > 1:
-            self._redo.append(self._history.pop())
-            self._mask = numpy.array(self._history[-1], copy=True)
-            self._notify()  # Do not store this change in history
+        if self._history:
+            delta = self._history.pop()
+            self._redo.append(delta)
+            self._restore(delta, undo=True)
 
             if len(self._redo) == 1:  # First redo
                 self.sigRedoable.emit(True)
-            if len(self._history) == 1:  # Last value in history
+            if not self._history:  # Last value in history
                 self.sigUndoable.emit(False)
 
     def redo(self):
         """Restore previously undone modification if any"""
         if self._redo:
-            self._mask = self._redo.pop()
-            self._history.append(numpy.array(self._mask, copy=True))
-            self._notify()
+            delta = self._redo.pop()
+            self._history.append(delta)
+            self._restore(delta, undo=False)
 
             if not self._redo:  # No more redo
                 self.sigRedoable.emit(False)
-            if len(self._history) == 2:  # Something to undo
+            if len(self._history) == 1:  # Something to undo
                 self.sigUndoable.emit(True)
 
-                # Whole mask operations
+    # Whole mask operations
 
     def clear(self, level):
         """Set all values of the given mask level to 0.
@@ -246,6 +439,41 @@ class BaseMask(qt.QObject):
             self._mask[numpy.logical_and(self._mask == level, stencil)] = 0
         self._notify()
 
+    def _updateByTiles(self, level, condition, mask=True):
+        """Mask/Unmask points whose data values fulfill a condition.
+
+        Data is processed by tiles of consecutive rows (or points) to
+        avoid temporary arrays of the size of the whole data.
+
+        :param int level: Mask level to update.
+        :param callable condition: Function returning a boolean array
+            from an array of data values
+        :param bool mask: True to mask (default), False to unmask.
+        """
+        values = self.getDataValues()
+        nrows = len(self._mask)
+        rowSize = max(1, int(numpy.prod(values.shape[1:])))
+        rowsPerTile = max(1, _THRESHOLD_TILE_SIZE // rowSize)
+
+        firstRow, lastRow = nrows, -1
+        for start in range(0, nrows, rowsPerTile):
+            tile = slice(start, start + rowsPerTile)
+            stencil = condition(values[tile])
+            maskTile = self._mask[tile]
+            if mask:
+                numpy.copyto(maskTile, level, where=stencil)
+            else:
+                numpy.logical_and(stencil, maskTile == level, out=stencil)
+                numpy.copyto(maskTile, 0, where=stencil)
+
+            rows = numpy.nonzero(
+                stencil.reshape(len(stencil), -1).any(axis=1))[0]
+            if len(rows) > 0:
+                firstRow = min(firstRow, start + rows[0])
+                lastRow = start + rows[-1]
+
+        self._notify((slice(firstRow, lastRow + 1),))
+
     def updateBelowThreshold(self, level, threshold, mask=True):
         """Mask/unmask all points whose values are below a threshold.
 
@@ -253,9 +481,9 @@ class BaseMask(qt.QObject):
         :param float threshold: Threshold
         :param bool mask: True to mask (default), False to unmask.
         """
-        self.updateStencil(level,
-                           self.getDataValues() < threshold,
-                           mask)
+        self._updateByTiles(level,
+                            lambda values: values < threshold,
+                            mask)
 
     def updateBetweenThresholds(self, level, min_, max_, mask=True):
         """Mask/unmask all points whose values are in a range.
@@ -265,9 +493,11 @@ class BaseMask(qt.QObject):
         :param float max_: Upper threshold
         :param bool mask: True to mask (default), False to unmask.
         """
-        stencil = numpy.logical_and(min_ <= self.getDataValues(),
-                                    self.getDataValues() <= max_)
-        self.updateStencil(level, stencil, mask)
+        def condition(values):
+            stencil = min_ <= values
+            stencil &= values <= max_
+            return stencil
+        self._updateByTiles(level, condition, mask)
 
     def updateAboveThreshold(self, level, threshold, mask=True):
         """Mask/unmask all points whose values are above a threshold.
@@ -276,9 +506,9 @@ class BaseMask(qt.QObject):
         :param float threshold: Threshold.
         :param bool mask: True to mask (default), False to unmask.
         """
-        self.updateStencil(level,
-                           self.getDataValues() > threshold,
-                           mask)
+        self._updateByTiles(level,
+                            lambda values: values > threshold,
+                            mask)
 
     def updateNotFinite(self, level, mask=True):
         """Mask/unmask all points whose values are not finite.
@@ -286,9 +516,9 @@ class BaseMask(qt.QObject):
         :param int level: Mask level to update.
         :param bool mask: True to mask (default), False to unmask.
         """
-        self.updateStencil(level,
-                           numpy.logical_not(numpy.isfinite(self.getDataValues())),
-                           mask)
+        self._updateByTiles(level,
+                            lambda values: numpy.logical_not(numpy.isfinite(values)),
+                            mask)
 
     # Drawing operations:
     def updateRectangle(self, level, row, col, height, width, mask=True):
@@ -398,7 +628,7 @@ class BaseMaskToolsWidget(qt.QWidget):
             raise TypeError("mask is not an instance of BaseMask")
         self._mask = mask
 
-        self._mask.sigChanged.connect(self._updatePlotMask)
+        self._mask.sigChanged.connect(self._maskChanged)
         self._mask.sigChanged.connect(self._emitSigMaskChanged)
 
         self._drawingMode = None  # Store current drawing mode
@@ -415,6 +645,13 @@ class BaseMaskToolsWidget(qt.QWidget):
         """Notify mask changes"""
         self.sigMaskChanged.emit()
 
+    def _maskChanged(self):
+        """Handle mask changes, the plot is not updated if the operation
+        did not touch the mask."""
+        region = self._mask.getChangedRegion()
+        if region is None or not _isEmptyRegion(region):
+            self._updatePlotMask()
+
     def getSelectionMask(self, copy=True):
         """Get the current mask as a numpy array.
 
@@ -602,6 +602,7 @@ class ColormapMixIn(ItemMixInBase):
         self._colormap.sigChanged.connect(self._colormapChanged)
         self.__data = None
         self.__cacheColormapRange = {}  # Store {normalization: range}
+        self.__cacheAutoscaleStats = {}  # Store {normalization: stats}
 
     def getColormap(self):
         """Return the used colormap"""
@@ -644,6 +645,7 @@ class ColormapMixIn(ItemMixInBase):
         """
         self.__data = None if data is None else numpy.array(data, copy=copy)
         self.__cacheColormapRange = {}  # Reset cache
+        self.__cacheAutoscaleStats = {}
 
         # Fill-up colormap range cache if values are provided
         if max_ is not None and numpy.isfinite(max_):
@@ -688,7 +690,12 @@ class ColormapMixIn(ItemMixInBase):
         key = normalization, autoscaleMode
         vRange = self.__cacheColormapRange.get(key, None)
         if vRange is None:
-            vRange = colormap._computeAutoscaleRange(data)
+            # Statistics are shared by all autoscale modes but min/max
+            stats = self.__cacheAutoscaleStats.get(normalization, None)
+            if stats is None and autoscaleMode != Colormap.MINMAX:
+                stats = colormap._computeAutoscaleStats(data)
+                self.__cacheAutoscaleStats[normalization] = stats
+            vRange = colormap._computeAutoscaleRange(data, stats=stats)
             self.__cacheColormapRange[key] = vRange
         return vRange
 
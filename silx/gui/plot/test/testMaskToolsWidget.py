@@ -39,7 +39,8 @@ from silx.gui import qt
 from silx.test.utils import temp_dir
 from silx.utils.testutils import ParametricTestCase
 from silx.gui.utils.testutils import getQToolButtonFromAction
-from silx.gui.plot import PlotWindow, MaskToolsWidget
+from silx.gui.plot import PlotWindow, MaskToolsWidget, items
+from silx.image import shapes
 from .utils import PlotWidgetTestCase
 
 import fabio
@@ -284,9 +285,166 @@ class TestMaskToolsWidget(PlotWidgetTestCase, ParametricTestCase):
         self.assertGreater(len(l), 0)
 
 
+class TestImageMaskHistory(unittest.TestCase):
+    """Test undo/redo of ImageMask"""
+
+    def testUndoRedo(self):
+        mask = MaskToolsWidget.ImageMask()
+        mask.reset((1000, 1000))
+        mask.commit()
+
+        states = [mask.getMask()]
+        for index in range(20):
+            mask.updateRectangle(
+                level=index + 1, row=10 * index, col=20 * index,
+                height=30, width=40)
+            if index % 2:
+                mask.clear(index)
+            mask.commit()
+            states.append(mask.getMask())
+
+        # Only changed regions are stored
+        self.assertLess(mask.getHistoryNBytes(), 2 * mask.getMask().nbytes)
+
+        for state in reversed(states[:-1]):
+            mask.undo()
+            self.assertTrue(numpy.array_equal(mask.getMask(), state))
+        for state in states[1:10]:
+            mask.redo()
+            self.assertTrue(numpy.array_equal(mask.getMask(), state))
+
+        # A new change discards redo
+        mask.updateRectangle(level=1, row=0, col=0, height=5, width=5)
+        mask.commit()
+        mask.redo()
+        self.assertEqual(mask.getMask()[0, 0], 1)
+        mask.undo()
+        self.assertTrue(numpy.array_equal(mask.getMask(), states[9]))
+
+    def testNoCopyArrays(self):
+        mask = MaskToolsWidget.ImageMask()
+        mask.reset((10, 10))
+        mask.commit()
+        mask.updateRectangle(level=1, row=0, col=0, height=4, width=4)
+        mask.commit()
+        array = numpy.zeros((10, 10), dtype=numpy.uint8)
+        array[2:5, 3:8] = 2
+        mask.setMask(array, copy=False)
+        mask.commit()
+
+        self.assertIs(mask.getMask(copy=False), array)
+
+        # Arrays shared with the caller are not modified by undo/redo
+        state = numpy.array(array, copy=True)
+        mask.undo()
+        mask.redo()
+        mask.undo()
+        mask.updateRectangle(level=3, row=6, col=6, height=4, width=4)
+        mask.commit()
+        self.assertTrue(numpy.array_equal(array, state))
+
+    def testShapeChange(self):
+        mask = MaskToolsWidget.ImageMask()
+        mask.reset((5, 5))
+        mask.commit()
+        mask.setMask(numpy.ones((3, 4)))
+        mask.commit()
+        mask.undo()
+        self.assertTrue(numpy.array_equal(mask.getMask(), numpy.zeros((5, 5))))
+        mask.redo()
+        self.assertTrue(numpy.array_equal(mask.getMask(), numpy.ones((3, 4))))
+
+    def testHistoryDepth(self):
+        mask = MaskToolsWidget.ImageMask()
+        mask.reset((10, 10))
+        mask.commit()
+        mask.historyDepth = 3
+        for level in range(1, 6):
+            mask.updateRectangle(level=level, row=level, col=0,
+                                 height=1, width=10)
+            mask.commit()
+        for _ in range(5):
+            mask.undo()
+        # Changes of the first 2 levels can not be undone
+        self.assertEqual(set(numpy.unique(mask.getMask())), {0, 1, 2})
+
+
+class TestImageMaskRegion(unittest.TestCase):
+    """Test region-limited operations of ImageMask"""
+
+    def setUp(self):
+        self.data = numpy.random.random((300, 200))
+        self.data[10, 20] = numpy.nan
+        image = items.ImageData()
+        image.setData(self.data)
+        self.mask = MaskToolsWidget.ImageMask(image)
+        self.mask.reset(self.data.shape)
+        self.mask.commit()
+
+    def tearDown(self):
+        del self.mask
+
+    def testChangedRegion(self):
+        self.mask.updateRectangle(level=1, row=10, col=20, height=5, width=7)
+        self.assertEqual(self.mask.getChangedRegion(),
+                         (slice(10, 16), slice(20, 28)))
+
+        self.mask.updateDisk(level=1, crow=100, ccol=50, radius=5)
+        region = self.mask.getChangedRegion()
+        masked = numpy.nonzero(self.mask.getMask()[region])
+        self.assertEqual(masked[0].min(), 0)
+        self.assertEqual(masked[1].max(), region[1].stop - region[1].start - 1)
+
+        # Out of the mask
+        self.mask.updatePoints(1, numpy.array([-2]), numpy.array([-3]))
+        region = self.mask.getChangedRegion()
+        self.assertTrue(any(s.stop <= s.start for s in region))
+
+        self.mask.invert(1)
+        self.assertIsNone(self.mask.getChangedRegion())
+
+    def testPolygon(self):
+        vertices = numpy.array([(10.5, 10.5), (10.5, 160.5), (250.5, 90.5)])
+        self.mask.updatePolygon(2, vertices)
+        expected = shapes.polygon_fill_mask(vertices, self.data.shape) != 0
+        self.assertTrue(numpy.array_equal(self.mask.getMask() == 2, expected))
+        self.mask.updatePolygon(2, vertices, mask=False)
+        self.assertFalse(numpy.any(self.mask.getMask()))
+
+    def testCommitRegion(self):
+        self.mask.updateRectangle(level=3, row=50, col=60, height=2, width=2)
+        self.mask.commit()
+        self.mask.updateRectangle(level=3, row=50, col=60, height=2, width=2)
+        self.mask.commit()  # No change: nothing to undo
+        self.mask.undo()
+        self.assertFalse(numpy.any(self.mask.getMask()))
+        self.mask.redo()
+        self.assertEqual(numpy.count_nonzero(self.mask.getMask()), 9)
+
+    def testThresholds(self):
+        data = self.data
+        expected = numpy.zeros(data.shape, dtype=numpy.uint8)
+
+        self.mask.updateBelowThreshold(1, 0.2)
+        expected[data < 0.2] = 1
+        self.mask.updateBetweenThresholds(2, 0.4, 0.6)
+        expected[numpy.logical_and(0.4 <= data, data <= 0.6)] = 2
+        self.mask.updateAboveThreshold(2, 0.5, mask=False)
+        expected[numpy.logical_and(expected == 2, data > 0.5)] = 0
+        self.mask.updateNotFinite(3)
+        expected[numpy.logical_not(numpy.isfinite(data))] = 3
+        self.assertTrue(numpy.array_equal(self.mask.getMask(), expected))
+        self.assertEqual(self.mask.getChangedRegion(), (slice(10, 11),))
+
+        self.mask.updateAboveThreshold(3, 2.)
+        region = self.mask.getChangedRegion()
+        self.assertTrue(any(s.stop <= s.start for s in region))
+
+
 def suite():
     test_suite = unittest.TestSuite()
-    for TestClass in (TestMaskToolsWidget,):
+    for TestClass in (TestMaskToolsWidget, TestImageMaskHistory,
+                      TestImageMaskRegion):
         test_suite.addTest(
             unittest.defaultTestLoader.loadTestsFromTestCase(TestClass))
     return test_suite
@@ -27,13 +27,13 @@
 
 __authors__ = ["V.A. Sole", "T. Vincent", "P. Knobel", "H. Payno", "V. Valls"]
 __license__ = "MIT"
-__date__ = "17/04/2020"
+__date__ = "16/10/2026"
 
 import collections
 import numpy
 import weakref
 
-from silx.image.bilinear import BilinearImage
+from silx.image.bilinear import profile_stack
 from silx.gui import qt
 
 
@@ -446,16 +446,13 @@ def createProfile(roiInfo, currentData, origin, scale, lineWidth, method):
             if method == 'none':
                 profile = None
             else:
-                profile = []
-                for slice_idx in range(currentData3D.shape[0]):
-                    bilinear = BilinearImage(currentData3D[slice_idx, :, :])
-
-                    profile.append(bilinear.profile_line(
-                        (startPt[0] - 0.5, startPt[1] - 0.5),
-                        (endPt[0] - 0.5, endPt[1] - 0.5),
-                        roiWidth,
-                        method=method))
-                profile = numpy.array(profile)
+                # Sampling is computed once for all frames
+                profile = profile_stack(
+                    currentData3D,
+                    (startPt[0] - 0.5, startPt[1] - 0.5),
+                    (endPt[0] - 0.5, endPt[1] - 0.5),
+                    roiWidth,
+                    method=method)
 
             # Extend ROI with half a pixel on each end, and
             # Convert back to plot coords (x, y)
@@ -31,6 +31,7 @@ __authors__ = ["H.Payno"]
 __license__ = "MIT"
 __date__ = "09/11/2018"
 
+import itertools
 import unittest
 import numpy
 from silx.utils.testutils import ParametricTestCase
@@ -602,6 +603,45 @@ class TestAutoscaleRange(ParametricTestCase):
                     self.assertAlmostEqual(vRange[0], expectedRange[0])
                     self.assertAlmostEqual(vRange[1], expectedRange[1])
 
+    def testPercentileAutoscaleRange(self):
+        """Test percentile autoscale against numpy.percentile"""
+        data = numpy.arange(10001, dtype=numpy.float64)
+        data[::100] = numpy.nan
+        expected = numpy.nanpercentile(data, (1, 99))
+        # Tolerance of one histogram bin
+        binWidth = 10000 / colors._NormalizationMixIn.AUTOSCALE_HISTOGRAM_BINS
+        for norm in (Colormap.LINEAR, Colormap.LOGARITHM, Colormap.SQRT):
+            with self.subTest(norm=norm):
+                colormap = Colormap(normalization=norm,
+                                    autoscaleMode=Colormap.PERCENTILE_1_99)
+                vmin, vmax = colormap._computeAutoscaleRange(data)
+                self.assertLess(abs(vmin - expected[0]), binWidth)
+                self.assertLess(abs(vmax - expected[1]), binWidth)
+
+        colormap = Colormap(autoscaleMode=Colormap.PERCENTILE_1_99)
+        self.assertEqual(
+            colormap._computeAutoscaleRange(numpy.array((5., 5., numpy.nan))),
+            (5., 5.))
+
+    def testAutoscaleStats(self):
+        """Test that statistics are reused by all autoscale modes"""
+        data = numpy.random.random((100, 100)).astype(numpy.float32)
+        data[0, 0] = numpy.inf
+        for dtype, norm in itertools.product(
+                (numpy.float32, numpy.float16),
+                (Colormap.LINEAR, Colormap.LOGARITHM, Colormap.GAMMA)):
+            values = data.astype(dtype)
+            colormap = Colormap(normalization=norm)
+            stats = colormap._computeAutoscaleStats(values)
+            for mode in Colormap.AUTOSCALE_MODES:
+                with self.subTest(dtype=dtype, norm=norm, mode=mode):
+                    colormap.setAutoscaleMode(mode)
+                    vRange = colormap._computeAutoscaleRange(values)
+                    statsRange = colormap._computeAutoscaleRange(
+                        values, stats=stats)
+                    self.assertAlmostEqual(vRange[0], statsRange[0])
+                    self.assertAlmostEqual(vRange[1], statsRange[1])
+
 def suite():
     test_suite = unittest.TestSuite()
     loadTests = unittest.defaultTestLoader.loadTestsFromTestCase
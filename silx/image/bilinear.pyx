@@ -33,12 +33,14 @@
 """Bilinear interpolator, peak finder, line-profile for images"""
 __authors__ = ["J. Kieffer"]
 __license__ = "MIT"
-__date__ = "26/11/2020"
+__date__ = "16/10/2026"
 
 # C-level imports
 from libc.stdint cimport uint8_t
 from libc.math cimport floor, ceil, sqrt, NAN, isfinite
 from libc.float cimport FLT_MAX
+from ..utils._num_threads cimport get_max_num_threads
+from cython.parallel import prange
 
 import cython
 import numpy
@@ -56,6 +58,308 @@ ctypedef uint8_t mask_t
 mask_d = numpy.uint8
 
 
+cdef Py_ssize_t USE_OPENMP_THRESHOLD = 100000
+"""OpenMP is not used for less samples than this threshold"""
+
+STACK_BLOCK_SIZE = 64 * 1024 ** 2
+"""Size in bytes of the blocks of frames converted at once by
+:func:`profile_stack`"""
+
+
+cdef int _get_num_threads(Py_ssize_t length) except -1:
+    """Returns the number of threads to use to process length samples"""
+    if length < USE_OPENMP_THRESHOLD:
+        return 1
+    return get_max_num_threads()
+
+
+def _line_geometry(lines, int linewidth=1):
+    """Compute the scan lines of profiles as :meth:`BilinearImage.profile_line`
+
+    :param lines: Sequence of (src, dst) points as (row, column)
+    :param int linewidth: Width of the scanlines (unit image pixel)
+    :return: (offsets, geometry, same_point): Start of each profile in
+        the concatenated profiles (with the total length as last element),
+        (src row, src column, row step, column step, row width, column width)
+        of each line, shape (nlines, 6), and whether src and dst are the same
+    """
+    cdef:
+        data_t src_row, src_col, dst_row, dst_col, d_row, d_col
+        data_t length, col_width, row_width
+        Py_ssize_t lengt, line
+        Py_ssize_t nlines = len(lines)
+        Py_ssize_t[::1] offsets = numpy.zeros(nlines + 1, dtype=numpy.intp)
+        data_t[:, ::1] geometry = numpy.zeros((nlines, 6), dtype=data_d)
+        uint8_t[::1] same_point = numpy.zeros(nlines, dtype=numpy.uint8)
+
+    if linewidth < 1:
+        raise ValueError("linewidth must be at least 1")
+
+    for line, (src, dst) in enumerate(lines):
+        src_row, src_col = src
+        dst_row, dst_col = dst
+        if (src_row == dst_row) and (src_col == dst_col):
+            same_point[line] = True
+            lengt = 1
+            d_row = d_col = row_width = col_width = 0
+        else:
+            d_row = dst_row - src_row
+            d_col = dst_col - src_col
+            length = sqrt(d_row * d_row + d_col * d_col)
+            row_width = d_col / length
+            col_width = - d_row / length
+
+            lengt = <int> ceil(length + 1)
+            d_row /= <data_t> (lengt -1)
+            d_col /= <data_t> (lengt -1)
+
+            src_row -= row_width * (linewidth - 1) / 2.
+            src_col -= col_width * (linewidth - 1) / 2.
+        geometry[line, 0] = src_row
+        geometry[line, 1] = src_col
+        geometry[line, 2] = d_row
+        geometry[line, 3] = d_col
+        geometry[line, 4] = row_width
+        geometry[line, 5] = col_width
+        offsets[line + 1] = offsets[line] + lengt
+
+    return (numpy.asarray(offsets), numpy.asarray(geometry),
+            numpy.asarray(same_point))
+
+
+def _line_sampling(Py_ssize_t height, Py_ssize_t width, mask, lines,
+                   int linewidth=1):
+    """Precompute the bilinear sampling of profile lines.
+
+    Sampling positions are the same as :meth:`BilinearImage.profile_line`.
+    Each sample is the weighted sum of 4 pixels, with weights of masked
+    pixels set to 0 and the other ones normalized.
+
+    :param int height: Height of the images
+    :param int width: Width of the images
+    :param mask: 2D array of the masked pixels or None
+    :param lines: Sequence of (src, dst) points as (row, column)
+    :param int linewidth: Width of the scanlines (unit image pixel)
+    :return: (offsets, indices, weights, valid): Start of each profile in
+        the concatenated profiles (with the total length as last element),
+        flat pixel indices and weights, shape (nsamples, 4), and whether
+        each sample is inside the image and not fully masked
+    """
+    cdef:
+        data_t src_row, src_col, d_row, d_col
+        data_t col_width, row_width, row, col, new_row, new_col
+        data_t d0, d1, x0, x1, y0, y1
+        double wr0, wr1, wc0, wc1, total
+        Py_ssize_t line, i, j, k, sample, nsamples, i0, i1, j0, j1
+        Py_ssize_t nlines = len(lines)
+        Py_ssize_t[::1] offsets
+        data_t[:, ::1] geometry
+        uint8_t[::1] same_point
+        Py_ssize_t[:, ::1] indices
+        double[:, ::1] weights
+        uint8_t[::1] valid
+        mask_t[:, ::1] cmask = None
+        bint has_mask = mask is not None
+
+    if has_mask:
+        cmask = numpy.ascontiguousarray(mask, dtype=mask_d)
+        assert cmask.shape[0] == height and cmask.shape[1] == width
+
+    offsets, geometry, same_point = _line_geometry(lines, linewidth)
+    nsamples = offsets[nlines] * linewidth
+    indices = numpy.zeros((nsamples, 4), dtype=numpy.intp)
+    weights = numpy.zeros((nsamples, 4), dtype=numpy.float64)
+    valid = numpy.zeros(nsamples, dtype=numpy.uint8)
+
+    with nogil:
+        for line in range(nlines):
+            src_row = geometry[line, 0]
+            src_col = geometry[line, 1]
+            d_row = geometry[line, 2]
+            d_col = geometry[line, 3]
+            row_width = geometry[line, 4]
+            col_width = geometry[line, 5]
+            for i in range(offsets[line + 1] - offsets[line]):
+                row = src_row + i * d_row
+                col = src_col + i * d_col
+                for j in range(linewidth):
+                    sample = (offsets[line] + i) * linewidth + j
+                    new_row = row + j * row_width
+                    new_col = col + j * col_width
+                    if same_point[line]:
+                        if j > 0:
+                            continue  # Single point as in profile_line
+                    elif not ((new_col >= 0) and (new_col < width) and
+                              (new_row >= 0) and (new_row < height)):
+                        continue
+
+                    # Same pixels and weights as BilinearImage.c_funct
+                    d0 = min(max(new_row, 0.0), (height - 1.0))
+                    d1 = min(max(new_col, 0.0), (width - 1.0))
+                    x0 = floor(d0)
+                    x1 = ceil(d0)
+                    y0 = floor(d1)
+                    y1 = ceil(d1)
+                    i0 = < int > x0
+                    i1 = < int > x1
+                    j0 = < int > y0
+                    j1 = < int > y1
+                    if i0 == i1:
+                        wr0 = 1.
+                        wr1 = 0.
+                    else:
+                        wr0 = x1 - d0
+                        wr1 = d0 - x0
+                    if j0 == j1:
+                        wc0 = 1.
+                        wc1 = 0.
+                    else:
+                        wc0 = y1 - d1
+                        wc1 = d1 - y0
+
+                    indices[sample, 0] = i0 * width + j0
+                    indices[sample, 1] = i1 * width + j0
+                    indices[sample, 2] = i0 * width + j1
+                    indices[sample, 3] = i1 * width + j1
+                    weights[sample, 0] = wr0 * wc0
+                    weights[sample, 1] = wr1 * wc0
+                    weights[sample, 2] = wr0 * wc1
+                    weights[sample, 3] = wr1 * wc1
+
+                    if has_mask:
+                        if cmask[i0, j0]:
+                            weights[sample, 0] = 0.
+                        if cmask[i1, j0]:
+                            weights[sample, 1] = 0.
+                        if cmask[i0, j1]:
+                            weights[sample, 2] = 0.
+                        if cmask[i1, j1]:
+                            weights[sample, 3] = 0.
+                        total = (weights[sample, 0] + weights[sample, 1] +
+                                 weights[sample, 2] + weights[sample, 3])
+                        if total == 0.:
+                            continue  # All pixels are masked
+                        for k in range(4):
+                            weights[sample, k] /= total
+                    valid[sample] = 1
+
+    return (numpy.asarray(offsets), numpy.asarray(indices),
+            numpy.asarray(weights), numpy.asarray(valid))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _profile_samples(const data_t *frame,
+                           Py_ssize_t start,
+                           Py_ssize_t stop,
+                           int linewidth,
+                           const Py_ssize_t[:, ::1] indices,
+                           const double[:, ::1] weights,
+                           const uint8_t[::1] valid,
+                           bint compute_mean,
+                           data_t *result) nogil:
+    """Compute profile points [start, stop) from precomputed samples
+
+    :param frame: Pointer to the flattened image
+    :param result: Pointer to the profile of the frame
+    """
+    cdef:
+        Py_ssize_t i, j, sample
+        Py_ssize_t cnt
+        double sum, val
+
+    for i in range(start, stop):
+        sum = 0
+        cnt = 0
+        for j in range(linewidth):
+            sample = i * linewidth + j
+            if valid[sample]:
+                val = (weights[sample, 0] * frame[indices[sample, 0]] +
+                       weights[sample, 1] * frame[indices[sample, 1]] +
+                       weights[sample, 2] * frame[indices[sample, 2]] +
+                       weights[sample, 3] * frame[indices[sample, 3]])
+                if isfinite(val):
+                    cnt += 1
+                    sum += val
+        if cnt:
+            if compute_mean:
+                result[i] = sum / cnt
+            else:
+                result[i] = sum
+        elif compute_mean:
+            result[i] = NAN
+        else:
+            result[i] = 0
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def profile_stack(stack, src, dst, int linewidth=1, method='mean', mask=None):
+    """Return the profiles of each frame of a stack of images along
+    the same scan line.
+
+    The sampling coordinates and interpolation weights are computed once
+    and used for all frames, which are processed in parallel.
+    The profile of each frame is the same as
+    ``BilinearImage(frame, mask).profile_line(src, dst, linewidth, method)``.
+
+    :param stack: 3D array of images (frame, row, column)
+    :param src: The start point of the scan line as (row, column)
+    :param dst: The end point of the scan line, included in the profile
+    :param int linewidth: Width of the scanline (unit image pixel).
+    :param str method: 'mean' or 'sum'
+    :param mask: 2D array of pixels to ignore in all frames or None
+    :return: The intensity profiles, shape (number of frames, length)
+    :rtype: 2d array of float32
+    """
+    cdef:
+        Py_ssize_t[::1] offsets
+        Py_ssize_t nframes, frame_size, length, index, block_start
+        Py_ssize_t[:, ::1] indices
+        double[:, ::1] weights
+        uint8_t[::1] valid
+        data_t[:, ::1] frames
+        data_t[:, ::1] result
+        bint compute_mean = (method == 'mean')
+        int num_threads
+
+    stack = numpy.asarray(stack)
+    assert stack.ndim == 3
+    nframes, height, width = stack.shape
+    if src[0] == dst[0] and src[1] == dst[1]:
+        logger.warning("Source and destination points are the same")
+
+    offsets, indices, weights, valid = _line_sampling(
+        height, width, mask, [(src, dst)], linewidth)
+    length = offsets[1]
+    result = numpy.empty((nframes, length), dtype=data_d)
+    if nframes == 0:
+        return numpy.asarray(result)
+
+    if src[0] == dst[0] and src[1] == dst[1]:
+        # Interpolated value at the point as for profile_line
+        if not valid[0]:
+            return numpy.full((nframes, 1), numpy.nan, dtype=data_d)
+        values = stack.reshape(nframes, -1)[:, numpy.asarray(indices[0])]
+        return numpy.dot(values.astype(data_d),
+                         numpy.asarray(weights[0], dtype=data_d))[:, None]
+
+    frame_size = height * width
+    num_threads = _get_num_threads(nframes * length * linewidth)
+    block_frames = max(1, STACK_BLOCK_SIZE // max(1, frame_size * 4))
+
+    for block_start in range(0, nframes, block_frames):
+        frames = numpy.ascontiguousarray(
+            stack[block_start:block_start + block_frames],
+            dtype=data_d).reshape(-1, frame_size)
+        with nogil:
+            for index in prange(frames.shape[0], num_threads=num_threads):
+                _profile_samples(&frames[index, 0], 0, length, linewidth,
+                                 indices, weights, valid, compute_mean,
+                                 &result[block_start + index, 0])
+    return numpy.asarray(result)
+
+
 cdef class BilinearImage:
     """Bilinear interpolator for images ... or any data on a regular grid
     """
@@ -70,6 +374,8 @@ cdef class BilinearImage:
     cpdef Py_ssize_t coarse_local_maxi(self, Py_ssize_t)
     cdef Py_ssize_t c_local_maxi(self, Py_ssize_t) nogil
     cdef data_t c_funct(self, data_t, data_t) nogil
+    cdef void _c_profile_line(self, data_t, data_t, data_t, data_t, data_t,
+                              data_t, Py_ssize_t, int, bint, data_t *) nogil
     cdef void _init_min_max(self) nogil
     
     def __cinit__(self, data not None, mask=None):
@@ -387,6 +693,46 @@ cdef class BilinearImage:
                 res[i] = self.c_funct(d1[i], d0[i])
         return numpy.asarray(res).reshape(shape)
 
+    cdef void _c_profile_line(self,
+                              data_t src_row, data_t src_col,
+                              data_t d_row, data_t d_col,
+                              data_t row_width, data_t col_width,
+                              Py_ssize_t lengt, int linewidth,
+                              bint compute_mean, data_t *result) nogil:
+        """Compute the profile along a scan line, see :meth:`profile_line`
+
+        :param result: Pointer to the zero-initialized profile of lengt values
+
+        Cython only function due to NOGIL
+        """
+        cdef:
+            data_t sum, row, col, new_row, new_col, val
+            Py_ssize_t i, j, cnt
+
+        for i in range(lengt):
+            sum = 0
+            cnt = 0
+
+            row = src_row + i * d_row
+            col = src_col + i * d_col
+
+            for j in range(linewidth):
+                new_row = row + j * row_width
+                new_col = col + j * col_width
+                if ((new_col >= 0) and (new_col < self.width) and
+                        (new_row >= 0) and (new_row < self.height)):
+                    val = self.c_funct(new_col, new_row)
+                    if isfinite(val):
+                        cnt += 1
+                        sum += val
+            if cnt:
+                if compute_mean:
+                    result[i] += sum / cnt
+                else:
+                    result[i] += sum
+            elif compute_mean:
+                result[i] += NAN
+
     def profile_line(self, src, dst, int linewidth=1, method='mean'):
         """Return the mean or sum of intensity profile of an image measured
         along a scan line.
@@ -409,8 +755,8 @@ cdef class BilinearImage:
         """
         cdef:
             data_t src_row, src_col, dst_row, dst_col, d_row, d_col
-            data_t length, col_width, row_width, sum, row, col, new_row, new_col, val
-            Py_ssize_t lengt, i, j, cnt
+            data_t length, col_width, row_width
+            Py_ssize_t lengt
             bint compute_mean
             data_t[::1] result
         src_row, src_col = src
@@ -438,28 +784,58 @@ cdef class BilinearImage:
 
         compute_mean = (method == 'mean')
         with nogil:
-            for i in range(lengt):
-                sum = 0
-                cnt = 0
-
-                row = src_row + i * d_row
-                col = src_col + i * d_col
-
-                for j in range(linewidth):
-                    new_row = row + j * row_width
-                    new_col = col + j * col_width
-                    if ((new_col >= 0) and (new_col < self.width) and
-                            (new_row >= 0) and (new_row < self.height)):
-                        val = self.c_funct(new_col, new_row)
-                        if isfinite(val):
-                            cnt += 1
-                            sum += val  
-                if cnt:
-                        if compute_mean:
-                            result[i] += sum / cnt
-                        else:
-                            result[i] += sum
-                elif compute_mean:
-                    result[i] += NAN
+            self._c_profile_line(src_row, src_col, d_row, d_col,
+                                 row_width, col_width, lengt, linewidth,
+                                 compute_mean, &result[0])
         # Ensures the result is exported as numpy array and not memory view.
         return numpy.asarray(result)
+
+    def profile_lines(self, lines, int linewidth=1, method='mean'):
+        """Return the profiles of the image along many scan lines at once.
+
+        The profiles are the same as the ones of :meth:`profile_line`.
+        They are computed without the GIL, in parallel for many lines.
+
+        :param lines: Sequence of (src, dst) pairs of points as
+            (row, column), e.g., to get profiles of all rows at an angle.
+        :param int linewidth: Width of the scanlines (unit image pixel).
+        :param str method: 'mean' or 'sum' depending if we want to compute
+            the mean intensity along the lines or the sum.
+        :return: List of the intensity profiles along the scan lines
+        :rtype: List[1d array]
+        """
+        cdef:
+            Py_ssize_t[::1] offsets
+            data_t[:, ::1] geometry
+            uint8_t[::1] same_point
+            data_t[::1] result
+            Py_ssize_t line, nlines
+            bint compute_mean = (method == 'mean')
+            int num_threads
+
+        lines = list(lines)
+        if not lines:
+            return []
+        offsets, geometry, same_point = _line_geometry(lines, linewidth)
+        nlines = len(lines)
+        result = numpy.zeros(offsets[nlines], dtype=data_d)
+
+        num_threads = _get_num_threads(offsets[nlines] * linewidth)
+        with nogil:
+            for line in prange(nlines, num_threads=num_threads,
+                               schedule='dynamic'):
+                if not same_point[line]:
+                    self._c_profile_line(
+                        geometry[line, 0], geometry[line, 1],
+                        geometry[line, 2], geometry[line, 3],
+                        geometry[line, 4], geometry[line, 5],
+                        offsets[line + 1] - offsets[line], linewidth,
+                        compute_mean, &result[offsets[line]])
+
+        profiles = numpy.split(numpy.asarray(result),
+                               numpy.asarray(offsets)[1:offsets.shape[0] - 1])
+        for index, (src, dst) in enumerate(lines):
+            if src[0] == dst[0] and src[1] == dst[1]:
+                # Interpolated value at the point as for profile_line
+                profiles[index] = self.profile_line(src, dst, linewidth, method)
+        return profiles
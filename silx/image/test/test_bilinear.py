@@ -24,13 +24,14 @@
 
 __authors__ = ["J. Kieffer"]
 __license__ = "MIT"
-__date__ = "25/11/2020"
+__date__ = "16/10/2026"
 
+import itertools
 import unittest
 import numpy
 import logging
 logger = logging.getLogger(__name__)
-from ..bilinear import BilinearImage
+from ..bilinear import BilinearImage, profile_stack
 
 
 class TestBilinear(unittest.TestCase):
@@ -166,6 +167,54 @@ class TestBilinear(unittest.TestCase):
         self.assertLess(abs(res_ver - expected_profile).max(), 1e-5,
                         "correct vertical profile")
 
+    def test_profile_lines(self):
+        """Test many profiles at once against profile_line"""
+        numpy.random.seed(0)
+        img = numpy.random.random((50, 60)).astype(numpy.float32)
+        mask = numpy.random.random(img.shape) > 0.8
+        lines = [((10, 0), (10, 59)),  # Horizontal
+                 ((0, 20.5), (49, 20.5)),  # Vertical
+                 ((-5, -5), (60, 70)),  # Partly outside
+                 ((3.2, 50.7), (45.1, 2.3)),  # Any angle
+                 ((7, 8), (7, 8))]  # Single point
+        for use_mask in (False, True):
+            b = BilinearImage(img, mask if use_mask else None)
+            for linewidth in (1, 4):
+                for method in ('mean', 'sum'):
+                    profiles = b.profile_lines(lines, linewidth, method)
+                    self.assertEqual(len(profiles), len(lines))
+                    for (src, dst), profile in zip(lines, profiles):
+                        expected = b.profile_line(src, dst, linewidth, method)
+                        self.assertTrue(numpy.allclose(
+                            profile, expected, atol=1e-5, equal_nan=True),
+                            "profile_lines matches profile_line")
+
+        self.assertEqual(b.profile_lines([]), [])
+
+    def test_profile_stack(self):
+        """Test profiles of a stack of images against profile_line"""
+        numpy.random.seed(0)
+        stack = numpy.random.random((5, 40, 30)) * 100
+        stack[2, 10:20, 10:20] = numpy.nan
+        mask = numpy.zeros(stack.shape[1:], dtype=numpy.uint8)
+        mask[5:15, :] = 1
+        lines = [((2.5, 1.2), (37.3, 25.8)),  # Any angle
+                 ((7.5, 3.2), (7.5, 3.2)),  # Single masked point
+                 ((20.5, 3.2), (20.5, 3.2))]  # Single point
+        for (src, dst), frame_mask, method in itertools.product(
+                lines, (None, mask), ('mean', 'sum')):
+            result = profile_stack(stack, src, dst, 3, method, frame_mask)
+            self.assertEqual(result.dtype, numpy.float32)
+            for frame, profile in zip(stack, result):
+                expected = BilinearImage(frame, frame_mask).profile_line(
+                    src, dst, 3, method)
+                self.assertTrue(numpy.allclose(
+                    profile, expected, atol=1e-4, equal_nan=True),
+                    "profile_stack matches profile_line")
+
+        result = profile_stack(stack[:0], (2.5, 1.2), (37.3, 25.8))
+        self.assertEqual(result.shape, (0, 44))
+
 
 def suite():
     testsuite = unittest.TestSuite()
@@ -175,4 +224,6 @@ def suite():
     testsuite.addTest(TestBilinear("test_profile_grad"))
     testsuite.addTest(TestBilinear("test_profile_gaus"))
     testsuite.addTest(TestBilinear("test_mask_grad"))
+    testsuite.addTest(TestBilinear("test_profile_lines"))
+    testsuite.addTest(TestBilinear("test_profile_stack"))
     return testsuite
@@ -63,6 +63,7 @@ import numpy
 import six
 
 import silx.io
+from silx import config
 from silx.io import is_dataset, is_group, is_softlink
 from silx.io import fabioh5
 
@@ -128,7 +129,9 @@ class Hdf5Writer(object):
                  overwrite_data=False,
                  link_type="soft",
                  create_dataset_args=None,
-                 min_size=500):
+                 min_size=500,
+                 memory_budget=None,
+                 progress_callback=None):
         """
 
         :param h5path: Target path where the scan groups will be written
@@ -141,6 +144,10 @@ class Hdf5Writer(object):
             See documentation of :func:`write_to_h5`
         :param int min_size:
             See documentation of :func:`write_to_h5`
+        :param int memory_budget:
+            See documentation of :func:`write_to_h5`
+        :param callable progress_callback:
+            See documentation of :func:`write_to_h5`
         """
         self.h5path = h5path
         if not h5path.startswith("/"):
@@ -158,6 +165,13 @@ class Hdf5Writer(object):
 
         self.min_size = min_size
 
+        if memory_budget is None:
+            memory_budget = config.DEFAULT_CONVERT_MEMORY_BUDGET
+        self.memory_budget = memory_budget
+        """Maximum size in bytes of a block of data copied at once"""
+
+        self.progress_callback = progress_callback
+
         self.overwrite_data = overwrite_data   # boolean
 
         self.link_type = link_type
@@ -166,7 +180,11 @@ class Hdf5Writer(object):
         self._links = []
         """List of *(link_path, target_path)* tuples."""
 
-    def write(self, infile, h5f):
+        self._preloaded_data = {}
+        """Data of the datasets of the input file already read, assigned
+        in :meth:`write`"""
+
+    def write(self, infile, h5f, preloaded_data=None):
         """Do the conversion from :attr:`sfh5` (Spec file) to *h5f* (HDF5)
 
         All the parameters needed for the conversion have been initialized
@@ -174,10 +192,16 @@ class Hdf5Writer(object):
 
         :param infile: :class:`SpecH5` object
         :param h5f: :class:`h5py.File` instance
+        :param dict preloaded_data:
+            See documentation of :func:`write_to_h5`
         """
         # Recurse through all groups and datasets to add them to the HDF5
         self._h5f = h5f
-        infile.visititems(self.append_member_to_h5, visit_links=True)
+        self._preloaded_data = dict(preloaded_data or {})
+        try:
+            infile.visititems(self.append_member_to_h5, visit_links=True)
+        finally:
+            self._preloaded_data = {}
 
         # Handle the attributes of the root group
         root_grp = h5f[self.h5path]
@@ -210,23 +234,25 @@ class Hdf5Writer(object):
                 _logger.warning("Overwriting dataset: " + h5_name)
                 del self._h5f[h5_name]
 
+            # data already read, else the dataset is read when written
+            data = self._preloaded_data.pop(h5like_name, None)
+
             if self.overwrite_data or not member_initially_exists:
-                if isinstance(obj, fabioh5.FrameData) and len(obj.shape) > 2:
-                    # special case of multiframe data
-                    # write frame by frame to save memory usage low
-                    ds = self._h5f.create_dataset(h5_name,
-                                                  shape=obj.shape,
-                                                  dtype=obj.dtype,
-                                                  **self.create_dataset_args)
-                    for i, frame in enumerate(obj):
-                        ds[i] = frame
+                # fancy arguments don't apply to small or scalar dataset
+                if obj.size < self.min_size or len(obj.shape) == 0:
+                    if data is None:
+                        data = obj.value
+                    ds = self._h5f.create_dataset(h5_name, data=data)
+                    self._notify_progress(h5_name, obj.size * obj.dtype.itemsize)
+                elif self._is_streamable(obj):
+                    ds = self._copy_dataset_by_blocks(
+                        h5_name, obj if data is None else data)
                 else:
-                    # fancy arguments don't apply to small dataset
-                    if obj.size < self.min_size:
-                        ds = self._h5f.create_dataset(h5_name, data=obj.value)
-                    else:
-                        ds = self._h5f.create_dataset(h5_name, data=obj.value,
-                                                      **self.create_dataset_args)
+                    if data is None:
+                        data = obj.value
+                    ds = self._h5f.create_dataset(h5_name, data=data,
+                                                  **self.create_dataset_args)
+                    self._notify_progress(h5_name, obj.size * obj.dtype.itemsize)
             else:
                 ds = self._h5f[h5_name]
 
@@ -253,6 +279,50 @@ class Hdf5Writer(object):
                                      _attr_utf8(obj.attrs[key]))
 
 
+    @staticmethod
+    def _is_streamable(obj):
+        """Returns True if a dataset can be copied block by block
+        along its first axis"""
+        return len(obj.shape) > 0 and obj.dtype.kind in "biufc"
+
+    def _get_block_length(self, obj, chunks):
+        """Returns the number of items along the first axis of *obj* to copy
+        at once, within :attr:`memory_budget`"""
+        row_size = obj.dtype.itemsize * int(numpy.prod(obj.shape[1:]))
+        length = max(1, self.memory_budget // max(row_size, 1))
+        if chunks is not None and length > chunks[0]:
+            # avoid writing partial chunks which would be compressed twice
+            length -= length % chunks[0]
+        return min(length, obj.shape[0])
+
+    def _copy_dataset_by_blocks(self, h5_name, obj):
+        """Create a dataset in :attr:`h5f` and fill it block by block.
+
+        This avoids loading in memory the whole content of the source
+        dataset: fabio frames are decoded and SPEC MCA spectra are parsed
+        only for the block being written.
+        """
+        ds = self._h5f.create_dataset(h5_name,
+                                      shape=obj.shape,
+                                      dtype=obj.dtype,
+                                      **self.create_dataset_args)
+        total = obj.size * obj.dtype.itemsize
+        length = self._get_block_length(obj, ds.chunks)
+        row_size = total // obj.shape[0] if obj.shape[0] else 0
+        for start in range(0, obj.shape[0], length):
+            stop = min(start + length, obj.shape[0])
+            ds[start:stop] = obj[start:stop]
+            self._notify_progress(h5_name, stop * row_size, total)
+        return ds
+
+    def _notify_progress(self, h5_name, written, total=None):
+        """Call :attr:`progress_callback` if it is defined"""
+        if self.progress_callback is not None:
+            if total is None:
+                total = written
+            self.progress_callback(h5_name, written, total)
+
+
 def _is_commonh5_group(grp):
     """Return True if grp is a commonh5 group.
     (h5py.Group objects are not commonh5 groups)"""
@@ -261,7 +331,9 @@ def _is_commonh5_group(grp):
 
 def write_to_h5(infile, h5file, h5path='/', mode="a",
                 overwrite_data=False, link_type="soft",
-                create_dataset_args=None, min_size=500):
+                create_dataset_args=None, min_size=500,
+                memory_budget=None, progress_callback=None,
+                preloaded_data=None):
     """Write content of a h5py-like object into a HDF5 file.
 
     :param infile: Path of input file, or :class:`commonh5.File` object
@@ -284,6 +356,20 @@ def write_to_h5(infile, h5file, h5path='/', mode="a",
         These arguments are only applied to datasets larger than 1MB.
     :param int min_size: Minimum number of elements in a dataset to apply
         chunking and compression. Default is 500.
+    :param int memory_budget: Maximum size in bytes of the blocks of data
+        copied at once. Numerical datasets larger than ``min_size`` are
+        created empty in the output file and filled block by block along
+        their first axis (i.e. frame by frame for image stacks, and spectrum
+        by spectrum for MCA data). Default is
+        :attr:`silx.config.DEFAULT_CONVERT_MEMORY_BUDGET`.
+    :param callable progress_callback: Function called after each block of
+        data is written, with the output dataset name, the number of bytes
+        written so far and the total number of bytes of this dataset.
+    :param dict preloaded_data: Data of datasets of ``infile`` already read,
+        e.g. by another process, as a dictionary mapping the dataset names
+        relative to ``infile`` (as given by ``visititems``) to numpy arrays.
+        Those datasets are written from this data instead of being read
+        from ``infile``.
 
     The structure of the spec data in an HDF5 file is described in the
     documentation of :mod:`silx.io.spech5`.
@@ -292,7 +378,9 @@ def write_to_h5(infile, h5file, h5path='/', mode="a",
                         overwrite_data=overwrite_data,
                         link_type=link_type,
                         create_dataset_args=create_dataset_args,
-                        min_size=min_size)
+                        min_size=min_size,
+                        memory_budget=memory_budget,
+                        progress_callback=progress_callback)
 
     # both infile and h5file can be either file handle or a file name: 4 cases
     if not isinstance(h5file, h5py.File) and not is_group(infile):
@@ -300,21 +388,21 @@ def write_to_h5(infile, h5file, h5path='/', mode="a",
             if not _is_commonh5_group(h5pylike):
                 raise IOError("Cannot convert HDF5 file %s to HDF5" % infile)
             with h5py.File(h5file, mode) as h5f:
-                writer.write(h5pylike, h5f)
+                writer.write(h5pylike, h5f, preloaded_data)
     elif isinstance(h5file, h5py.File) and not is_group(infile):
         with silx.io.open(infile) as h5pylike:
             if not _is_commonh5_group(h5pylike):
                 raise IOError("Cannot convert HDF5 file %s to HDF5" % infile)
-            writer.write(h5pylike, h5file)
+            writer.write(h5pylike, h5file, preloaded_data)
     elif is_group(infile) and not isinstance(h5file, h5py.File):
         if not _is_commonh5_group(infile):
             raise IOError("Cannot convert HDF5 file %s to HDF5" % infile.file.name)
         with h5py.File(h5file, mode) as h5f:
-            writer.write(infile, h5f)
+            writer.write(infile, h5f, preloaded_data)
     else:
         if not _is_commonh5_group(infile):
             raise IOError("Cannot convert HDF5 file %s to HDF5" % infile.file.name)
-        writer.write(infile, h5file)
+        writer.write(infile, h5file, preloaded_data)
 
 
 def convert(infile, h5file, mode="w-", create_dataset_args=None):
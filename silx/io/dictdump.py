@@ -26,11 +26,14 @@ by text strings to following file formats: `HDF5, INI, JSON`
 """
 
 from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+import fnmatch
 import json
 import logging
 import numpy
 import os.path
 import sys
+import time
 import h5py
 
 from .configdict import ConfigDict
@@ -136,19 +139,274 @@ class _SafeH5FileRead(object):
             self.h5file.close()
 
 
+AUTO_DATASET_POLICY = (
+    (1024 ** 2, {"chunks": True, "compression": "gzip", "shuffle": True}),
+)
+"""Dataset policy used by :func:`dicttoh5` with ``dataset_policy="auto"``.
+
+Arrays of at least 1 MB are chunked and compressed with gzip.
+"""
+
+
+class H5WritePlan(object):
+    """Operations done by :func:`dicttoh5` to write a nested dictionary.
+
+    The whole dictionary is traversed first, then the groups, datasets,
+    links and attributes are written in this order.
+    """
+
+    def __init__(self):
+        self.groups = []
+        """List of (parent path, name, empty) of the groups to create.
+        Existing empty groups are replaced as datasets are."""
+        self.datasets = []
+        """List of (parent path, name, value, create_dataset_args).
+        The value is converted with :func:`_prepare_hdf5_write_value`, and
+        read if it is lazy, only when the dataset is written."""
+        self.links = []
+        """List of (parent path, name, link)"""
+        self.attributes = []
+        """List of (path, {attribute name: data}), written at once per
+        object"""
+        self.packed_scalars = 0
+        """Number of scalars packed into attributes or compound datasets"""
+        self.planning_time = 0.
+        """Time spent traversing the dictionary in seconds"""
+        self.writing_time = 0.
+        """Time spent writing to the file in seconds"""
+
+    @property
+    def nbytes(self):
+        """Size in bytes of the data of the datasets"""
+        return sum(_get_nbytes(value) for _, _, value, _ in self.datasets)
+
+    def summary(self):
+        """Returns a one line description of the plan and of the timings
+
+        :rtype: str
+        """
+        nattrs = sum(len(attrs) for _, attrs in self.attributes)
+        return ("%d groups, %d datasets (%d bytes), %d links, "
+                "%d attributes, %d packed scalars; "
+                "planned in %.3fs, written in %.3fs" % (
+                    len(self.groups), len(self.datasets), self.nbytes,
+                    len(self.links), nattrs, self.packed_scalars,
+                    self.planning_time, self.writing_time))
+
+
+def _is_array_like(value):
+    """Returns True if the shape and the dtype of a value are known without
+    reading or converting it (numpy array, h5py dataset, lazy dataset)"""
+    return (isinstance(value, _LazyDataset) or
+            (hasattr(value, "shape") and hasattr(value, "dtype")))
+
+
+def _get_nbytes(value):
+    """Returns the size in bytes of an array-like or prepared value"""
+    if value.shape is None:  # empty HDF5 dataset
+        return 0
+    return int(numpy.prod(value.shape)) * value.dtype.itemsize
+
+
+def _read_value(value):
+    """Returns the data of a value of the dictionary, reading it from the
+    file if it is a lazy dataset
+
+    :raises KeyError: If a lazy dataset cannot be read
+    """
+    if isinstance(value, _LazyDataset):
+        return value.read()
+    return value
+
+
+def _get_dataset_args(data, create_dataset_args, dataset_policy):
+    """Returns the arguments of ``create_dataset`` used to write data
+
+    :param data: Prepared data, or array-like value (see
+        :func:`_is_array_like`)
+    :param dict create_dataset_args: Arguments for all non-scalar datasets
+    :param dataset_policy: Sequence of (min size in bytes, arguments),
+        sorted by size
+    :rtype: dict
+    """
+    # can't apply filters on scalars (datasets with shape == () )
+    if data.shape == ():
+        return {}
+    args = {} if create_dataset_args is None else dict(create_dataset_args)
+    if dataset_policy:
+        nbytes = _get_nbytes(data)
+        policy_args = None
+        for min_nbytes, size_args in dataset_policy:
+            if nbytes < min_nbytes:
+                break
+            policy_args = size_args
+        if policy_args is not None:
+            args.update(policy_args)
+    return args
+
+
+def _is_packable_scalar(data):
+    """Returns True if prepared data or array-like value is a numerical or
+    boolean scalar"""
+    return data.shape == () and data.dtype.kind in "biufc"
+
+
+def _plan_dicttoh5(plan, treedict, h5path, create_dataset_args,
+                   dataset_policy, pack_scalars, compound_name):
+    """Add the operations needed to write a dictionary to a plan.
+
+    :param H5WritePlan plan: Plan to fill
+    :param h5path: Path of the group of treedict, ending with "/"
+    """
+    # datasets referenced by attribute keys can't be packed
+    attr_targets = set(key[0] for key in treedict if isinstance(key, tuple))
+    packed = []
+    # keep the datasets of a LazyH5Dict unread until they are written
+    raw_values = (dict(treedict._raw_items())
+                  if isinstance(treedict, LazyH5Dict) else treedict)
+
+    for key in filter(lambda k: not isinstance(k, tuple), treedict):
+        value = raw_values[key]
+        key_is_group = isinstance(value, Mapping)
+
+        if key_is_group and value:
+            # non-empty group: recurse
+            plan.groups.append((h5path, key, False))
+            _plan_dicttoh5(plan, value, h5path + key + "/",
+                           create_dataset_args=create_dataset_args,
+                           dataset_policy=dataset_policy,
+                           pack_scalars=pack_scalars,
+                           compound_name=compound_name)
+        elif value is None or key_is_group:
+            plan.groups.append((h5path, key, True))
+        elif is_link(value):
+            plan.links.append((h5path, key, value))
+        else:
+            if not _is_array_like(value):
+                # python objects are converted to know their shape
+                value = _prepare_hdf5_write_value(value)
+            if (pack_scalars is not None and key not in attr_targets and
+                    _is_packable_scalar(value)):
+                try:
+                    data = _prepare_hdf5_write_value(_read_value(value))
+                except KeyError:
+                    continue
+                packed.append((key, data))
+                continue
+            args = _get_dataset_args(value, create_dataset_args, dataset_policy)
+            plan.datasets.append((h5path, key, value, args))
+
+    if packed:
+        plan.packed_scalars += len(packed)
+        if pack_scalars == "attributes":
+            plan.attributes.append((h5path, OrderedDict(packed)))
+        else:
+            if compound_name in treedict:
+                raise ValueError(
+                    'Cannot pack scalars of "%s": "%s" is already used' %
+                    (h5path, compound_name))
+            dtype = [(key, data.dtype) for key, data in packed]
+            data = numpy.array(tuple(data[()] for _, data in packed),
+                               dtype=dtype)
+            plan.datasets.append((h5path, compound_name, data, {}))
+
+    # deal with h5 attributes which have tuples as keys in treedict
+    attributes = OrderedDict()
+    for key in filter(lambda k: isinstance(k, tuple), treedict):
+        assert len(key) == 2, "attribute must be defined by 2 values"
+        h5name = h5path + key[0]
+        data = _prepare_hdf5_write_value(treedict[key])
+        attributes.setdefault(h5name, OrderedDict())[key[1]] = data
+    plan.attributes.extend(attributes.items())
+
+
+def _write_plan(plan, h5f, h5path, overwrite_data, check_existing):
+    """Write the operations of a plan to a file
+
+    :param H5WritePlan plan: Operations to do
+    :param h5py.File h5f: File to write to
+    :param str h5path: Path of the root group of the plan
+    :param bool overwrite_data: Whether to overwrite existing members
+    :param bool check_existing: False if the file was just created empty
+    """
+    groups = {h5path: h5f[h5path]}
+
+    def _remove_existing(parent_path, name):
+        """Returns True if the member can be written"""
+        parent = groups[parent_path]
+        if not check_existing or name not in parent:
+            return True
+        if overwrite_data:
+            del parent[name]
+            return True
+        logger.warning('key (%s) already exists. '
+                       'Not overwriting.' % (parent_path + name))
+        return False
+
+    for parent_path, name, empty in plan.groups:
+        if empty:
+            # Create empty group
+            if _remove_existing(parent_path, name):
+                groups[parent_path].create_group(name)
+            continue
+        group = groups[parent_path].get(name) if check_existing else None
+        if group is None:
+            group = groups[parent_path].create_group(name)
+        groups[parent_path + name + "/"] = group
+
+    for parent_path, name, value, args in plan.datasets:
+        if _remove_existing(parent_path, name):
+            try:
+                data = _prepare_hdf5_write_value(_read_value(value))
+            except KeyError:
+                # lazy dataset which cannot be read, errors are not raised
+                continue
+            groups[parent_path].create_dataset(name, data=data, **args)
+
+    for parent_path, name, link in plan.links:
+        if _remove_existing(parent_path, name):
+            groups[parent_path][name] = link
+
+    for h5name, attributes in plan.attributes:
+        if h5name not in h5f:
+            # Create empty group if key for attr does not exist
+            h5f.create_group(h5name)
+            logger.warning(
+                "key (%s) does not exist. attr %s "
+                "will be written to ." % (h5name, ", ".join(attributes))
+            )
+        attrs = h5f[h5name].attrs
+        for attr_name, data in attributes.items():
+            if attr_name in attrs and not overwrite_data:
+                logger.warning(
+                    "attribute %s@%s already exists. Not overwriting."
+                    "" % (h5name, attr_name)
+                )
+                continue
+            # Write attribute
+            attrs[attr_name] = data
+
+
 def dicttoh5(treedict, h5file, h5path='/',
              mode="w", overwrite_data=False,
-             create_dataset_args=None):
+             create_dataset_args=None,
+             dataset_policy=None,
+             pack_scalars=None,
+             compound_name="scalars"):
     """Write a nested dictionary to a HDF5 file, using keys as member names.
 
     If a dictionary value is a sub-dictionary, a group is created. If it is
     any other data type, it is cast into a numpy array and written as a
     :mod:`h5py` dataset. Dictionary keys must be strings and cannot contain
     the ``/`` character.
-    
+
     If dictionary keys are tuples they are interpreted to set h5 attributes.
     The tuples should have the format (dataset_name,attr_name)
 
+    The whole dictionary is traversed before writing anything, and the
+    members are then created group by group. A summary of this
+    :class:`H5WritePlan` and the timings are logged at debug level.
+
     .. note::
 
         This function requires `h5py <http://www.h5py.org/>`_ to be installed.
@@ -173,6 +431,20 @@ def dicttoh5(treedict, h5file, h5path='/',
     :param create_dataset_args: Dictionary of args you want to pass to
         ``h5f.create_dataset``. This allows you to specify filters and
         compression parameters. Don't specify ``name`` and ``data``.
+    :param dataset_policy: Sequence of ``(min_size, create_dataset_args)``
+        sorted by increasing ``min_size`` in bytes. Non-scalar datasets use
+        the args of the largest ``min_size`` they reach, on top of
+        ``create_dataset_args``. ``"auto"`` to use
+        :data:`AUTO_DATASET_POLICY`. Default is None (no policy).
+    :param str pack_scalars: How to write the numerical and boolean scalars
+        of each group. Scalars having attributes are not packed.
+
+        - None (default): One dataset per scalar
+        - 'attributes': As attributes of the group
+        - 'compound': As a single compound dataset named ``compound_name``
+    :param str compound_name: Name of the datasets of packed scalars
+    :return: The operations which were done and their timings
+    :rtype: H5WritePlan
 
     Example::
 
@@ -200,79 +472,38 @@ def dicttoh5(treedict, h5file, h5path='/',
         dicttoh5(city_area, "cities.h5", h5path="/area",
                  create_dataset_args=create_ds_args)
     """
+    if pack_scalars not in (None, "attributes", "compound"):
+        raise ValueError("Unsupported scalar packing: %s" % pack_scalars)
+    if dataset_policy == "auto":
+        dataset_policy = AUTO_DATASET_POLICY
 
     if not h5path.endswith("/"):
         h5path += "/"
 
-    with _SafeH5FileWrite(h5file, mode=mode) as h5f:
-        if isinstance(treedict, dict) and h5path != "/":
-            if h5path not in h5f:
-                h5f.create_group(h5path)
-
-        for key in filter(lambda k: not isinstance(k, tuple), treedict):
-            key_is_group = isinstance(treedict[key], dict)
-            h5name = h5path + key
-
-            if key_is_group and treedict[key]:
-                # non-empty group: recurse
-                dicttoh5(treedict[key], h5f, h5name,
-                         overwrite_data=overwrite_data,
-                         create_dataset_args=create_dataset_args)
-                continue
+    plan = H5WritePlan()
+    start_time = time.time()
+    _plan_dicttoh5(plan, treedict, h5path,
+                   create_dataset_args=create_dataset_args,
+                   dataset_policy=dataset_policy,
+                   pack_scalars=pack_scalars,
+                   compound_name=compound_name)
+    plan.planning_time = time.time() - start_time
 
-            if h5name in h5f:
-                # key already exists: delete or skip
-                if overwrite_data is True:
-                    del h5f[h5name]
-                else:
-                    logger.warning('key (%s) already exists. '
-                                    'Not overwriting.' % (h5name))
-                    continue
-
-            value = treedict[key]
+    # a file created by this function has no member to check
+    check_existing = (isinstance(h5file, h5py.File) or
+                      mode not in ("w", "w-", "x"))
 
-            if value is None or key_is_group:
-                # Create empty group
-                h5f.create_group(h5name)
-            elif is_link(value):
-                h5f[h5name] = value
-            else:
-                data = _prepare_hdf5_write_value(value)
-                # can't apply filters on scalars (datasets with shape == () )
-                if data.shape == () or create_dataset_args is None:
-                    h5f.create_dataset(h5name,
-                                       data=data)
-                else:
-                    h5f.create_dataset(h5name,
-                                       data=data,
-                                       **create_dataset_args)
-
-        # deal with h5 attributes which have tuples as keys in treedict
-        for key in filter(lambda k: isinstance(k, tuple), treedict):
-            assert len(key) == 2, "attribute must be defined by 2 values"
-            h5name = h5path + key[0]
-            attr_name = key[1]
-
-            if h5name not in h5f:
-                # Create empty group if key for attr does not exist
-                h5f.create_group(h5name)
-                logger.warning(
-                    "key (%s) does not exist. attr %s "
-                    "will be written to ." % (h5name, attr_name)
-                )
+    start_time = time.time()
+    with _SafeH5FileWrite(h5file, mode=mode) as h5f:
+        if h5path not in h5f:
+            h5f.create_group(h5path)
+        _write_plan(plan, h5f, h5path,
+                    overwrite_data=overwrite_data,
+                    check_existing=check_existing)
+    plan.writing_time = time.time() - start_time
 
-            if attr_name in h5f[h5name].attrs:
-                if not overwrite_data:
-                    logger.warning(
-                        "attribute %s@%s already exists. Not overwriting."
-                        "" % (h5name, attr_name)
-                    )
-                    continue
-
-            # Write attribute
-            value = treedict[key]
-            data = _prepare_hdf5_write_value(value)
-            h5f[h5name].attrs[attr_name] = data
+    logger.debug("dicttoh5 %s: %s", h5path, plan.summary())
+    return plan
 
 
 def nexus_to_h5_dict(treedict, parents=tuple()):
@@ -314,7 +545,7 @@ def nexus_to_h5_dict(treedict, parents=tuple()):
                     value = h5py.SoftLink(first)
             elif is_link(value):
                 key = key[1:]
-        if isinstance(value, dict):
+        if isinstance(value, Mapping):
             copy[key] = nexus_to_h5_dict(value, parents=parents+(key,))
         else:
             copy[key] = value
@@ -333,8 +564,14 @@ def h5_to_nexus_dict(treedict):
 
     :rtype dict:
     """
-    copy = dict()
-    for key, value in treedict.items():
+    if isinstance(treedict, LazyH5Dict):
+        # keep datasets not read yet lazy
+        copy = LazyH5Dict()
+        items = treedict._raw_items()
+    else:
+        copy = dict()
+        items = treedict.items()
+    for key, value in items:
         if isinstance(key, tuple):
             assert len(key)==2, "attribute must be defined by 2 values"
             key = "%s@%s" % (key[0], key[1])
@@ -344,7 +581,7 @@ def h5_to_nexus_dict(treedict):
         elif is_externallink(value):
             key = ">" + key
             value = value.filename + "::" + value.path
-        if isinstance(value, dict):
+        if isinstance(value, Mapping):
             copy[key] = h5_to_nexus_dict(value)
         else:
             copy[key] = value
@@ -378,13 +615,152 @@ def _handle_error(mode: str, exception, msg: str, *args) -> None:
         raise ValueError("Unsupported error handling: %s" % mode)
 
 
+class _LazyDataset(object):
+    """Reference to a dataset of a :class:`LazyH5Dict`, read on first
+    access"""
+
+    def __init__(self, h5file, name, asarray, errors, shape, dtype):
+        self.h5file = h5file
+        self.name = name
+        self.asarray = asarray
+        self.errors = errors
+        self.shape = shape
+        """Shape of the dataset in the file"""
+        self.dtype = dtype
+        """Data type of the dataset in the file"""
+
+    def read(self):
+        """Read the dataset.
+
+        :raises KeyError: If the dataset cannot be read and errors are
+            not raised
+        """
+        with _SafeH5FileRead(self.h5file) as h5f:
+            try:
+                data = h5py_read_dataset(h5f[self.name])
+            except OSError:
+                _handle_error(self.errors,
+                              OSError,
+                              'Cannot retrieve dataset "%s"',
+                              self.name)
+                raise KeyError(self.name)
+        if self.asarray:
+            data = numpy.array(data, copy=False)
+        return data
+
+
+class LazyH5Dict(MutableMapping):
+    """Nested dictionary returned by :func:`h5todict` in lazy mode.
+
+    The structure of the HDF5 tree and the attributes are read when it is
+    created, but the datasets are only read from the file the first time
+    they are accessed. The values are then kept in the mapping.
+
+    .. note:: If it was created from a file object rather than a file name,
+        this file must be kept open until all the needed datasets are read.
+    """
+
+    def __init__(self):
+        self._data = {}
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        if isinstance(value, _LazyDataset):
+            try:
+                value = value.read()
+            except KeyError:
+                del self._data[key]
+                raise
+            self._data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, list(self._data.keys()))
+
+    def _raw_items(self):
+        """Items without reading the datasets"""
+        return self._data.items()
+
+    def is_loaded(self, key):
+        """Returns True if the value of a key was already read from the file
+
+        :param key: Key of the item
+        :rtype: bool
+        """
+        return not isinstance(self._data[key], _LazyDataset)
+
+    def to_dict(self):
+        """Read all the remaining datasets and return a nested :class:`dict`
+
+        :rtype: dict
+        """
+        ddict = {}
+        for key in list(self._data.keys()):
+            try:
+                value = self[key]
+            except KeyError:
+                continue
+            if isinstance(value, LazyH5Dict):
+                value = value.to_dict()
+            ddict[key] = value
+        return ddict
+
+
+def _split_patterns(patterns):
+    """Split glob patterns on "/" to match them one level at a time"""
+    if patterns is None:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return [tuple(p for p in pattern.split("/") if p) for pattern in patterns]
+
+
+def _match_patterns(key, patterns):
+    """Match a group member against the first level of split patterns.
+
+    :param str key: Name of the member
+    :param patterns: Split patterns, or None to include everything
+    :return: (included, child_patterns), where *included* is True if the
+        member itself is selected, and *child_patterns* are the patterns
+        to apply to its children (None to include all of them, an empty
+        list if none can match)
+    """
+    if patterns is None:
+        return True, None
+    child_patterns = []
+    for pattern in patterns:
+        if not fnmatch.fnmatchcase(key, pattern[0]):
+            continue
+        if len(pattern) == 1:
+            # the whole member is selected
+            return True, None
+        child_patterns.append(pattern[1:])
+    return False, child_patterns
+
+
 def h5todict(h5file,
              path="/",
              exclude_names=None,
              asarray=True,
              dereference_links=True,
              include_attributes=False,
-             errors='raise'):
+             errors='raise',
+             lazy=False,
+             lazy_min_size=0,
+             max_depth=None,
+             include_patterns=None):
     """Read a HDF5 file and return a nested dictionary with the complete file
     structure and all data.
 
@@ -403,6 +779,15 @@ def h5todict(h5file,
                                              "/94.1/measurement",
                                              exclude_names="mca_")
 
+    To read only the metadata of a large file::
+
+        # datasets are read when they are accessed
+        entry = h5todict("processed.h5", "/entry", lazy=True)
+        title = entry["title"]
+        # only read the instrument description, 2 levels deep
+        instrument = h5todict("processed.h5", "/entry",
+                              include_patterns=["instrument/*/*"])
+
 
     .. note:: This function requires `h5py <http://www.h5py.org/>`_ to be
         installed.
@@ -429,82 +814,145 @@ def h5todict(h5file,
         - 'raise' (default): Raise an exception
         - 'log': Log as errors
         - 'ignore': Ignore errors
+    :param bool lazy: If True, return a :class:`LazyH5Dict` whose datasets
+        are read on first access. If ``h5file`` is a file name, the file is
+        opened again to read them. False (default) to read everything.
+    :param int lazy_min_size: In lazy mode, datasets with less elements than
+        this are read immediately. Default is 0.
+    :param int max_depth: Number of levels of sub-groups to read.
+        Deeper groups are ignored. 0 only reads the datasets of the
+        root group. Default is None (no limit).
+    :param List[str] include_patterns: Glob patterns (``*``, ``?``, ``[]``)
+        of the paths relative to ``path`` to read. Each level of a pattern
+        is matched against the group members of the same level, and groups
+        which cannot match are not traversed. Default is None (read all)
     :return: Nested dictionary
     """
     with _SafeH5FileRead(h5file) as h5f:
-        ddict = {}
-        if path not in h5f:
-            _handle_error(
-                errors, KeyError, 'Path "%s" does not exist in file.', path)
-            return ddict
+        if lazy and h5f is not h5file:
+            # the file is closed on return: read lazy datasets from the name
+            source = h5file
+        else:
+            source = h5f
+        return _h5todict(h5f, path,
+                         source=source,
+                         exclude_names=exclude_names,
+                         asarray=asarray,
+                         dereference_links=dereference_links,
+                         include_attributes=include_attributes,
+                         errors=errors,
+                         lazy=lazy,
+                         lazy_min_size=lazy_min_size,
+                         max_depth=max_depth,
+                         patterns=_split_patterns(include_patterns))
+
+
+def _h5todict(h5f, path, source, exclude_names, asarray, dereference_links,
+              include_attributes, errors, lazy, lazy_min_size, max_depth,
+              patterns):
+    """Recursive implementation of :func:`h5todict`
+
+    :param h5f: Opened file
+    :param source: File object or file name to read lazy datasets from
+    :param patterns: Include patterns split by level
+    """
+    ddict = LazyH5Dict() if lazy else {}
+    if path not in h5f:
+        _handle_error(
+            errors, KeyError, 'Path "%s" does not exist in file.', path)
+        return ddict
+
+    try:
+        root = h5f[path]
+    except KeyError as e:
+        if not isinstance(h5f.get(path, getlink=True), h5py.HardLink):
+            _handle_error(errors,
+                          KeyError,
+                          'Cannot retrieve path "%s" (broken link)',
+                          path)
+        else:
+            _handle_error(errors, KeyError, ', '.join(e.args))
+        return ddict
+
+    # Read the attributes of the group
+    if include_attributes:
+        attrs = H5pyAttributesReadWrapper(root.attrs)
+        for aname, avalue in attrs.items():
+            ddict[("", aname)] = avalue
+    # Read the children of the group
+    for key in root:
+        if _name_contains_string_in_list(key, exclude_names):
+            continue
+        included, child_patterns = _match_patterns(key, patterns)
+        if not included and not child_patterns:
+            continue
+        h5name = path + "/" + key
+        # Preserve HDF5 link when requested
+        if not dereference_links:
+            lnk = h5f.get(h5name, getlink=True)
+            if is_link(lnk):
+                if included:
+                    ddict[key] = lnk
+                continue
 
         try:
-            root = h5f[path]
+            h5obj = h5f[h5name]
         except KeyError as e:
-            if not isinstance(h5f.get(path, getlink=True), h5py.HardLink):
+            if not isinstance(h5f.get(h5name, getlink=True), h5py.HardLink):
                 _handle_error(errors,
                               KeyError,
                               'Cannot retrieve path "%s" (broken link)',
-                              path)
+                              h5name)
             else:
                 _handle_error(errors, KeyError, ', '.join(e.args))
-            return ddict
+            continue
 
-        # Read the attributes of the group
-        if include_attributes:
-            attrs = H5pyAttributesReadWrapper(root.attrs)
-            for aname, avalue in attrs.items():
-                ddict[("", aname)] = avalue
-        # Read the children of the group
-        for key in root:
-            if _name_contains_string_in_list(key, exclude_names):
+        if is_group(h5obj):
+            # Child is an HDF5 group
+            if max_depth is not None and max_depth <= 0:
                 continue
-            h5name = path + "/" + key
-            # Preserve HDF5 link when requested
-            if not dereference_links:
-                lnk = h5f.get(h5name, getlink=True)
-                if is_link(lnk):
-                    ddict[key] = lnk
-                    continue
-
+            ddict[key] = _h5todict(
+                h5f,
+                h5name,
+                source=source,
+                exclude_names=exclude_names,
+                asarray=asarray,
+                dereference_links=dereference_links,
+                include_attributes=include_attributes,
+                errors=errors,
+                lazy=lazy,
+                lazy_min_size=lazy_min_size,
+                max_depth=None if max_depth is None else max_depth - 1,
+                patterns=child_patterns)
+            if not included and not ddict[key]:
+                # no member of the group matches the patterns
+                del ddict[key]
+            continue
+
+        # Child is an HDF5 dataset
+        if not included:
+            continue
+        # empty datasets (null dataspace, size is None) are read at once
+        if lazy and h5obj.size is not None and h5obj.size >= lazy_min_size:
+            ddict[key] = _LazyDataset(source, h5name, asarray, errors,
+                                      h5obj.shape, h5obj.dtype)
+        else:
             try:
-                h5obj = h5f[h5name]
-            except KeyError as e:
-                if not isinstance(h5f.get(h5name, getlink=True), h5py.HardLink):
-                    _handle_error(errors,
-                                  KeyError,
-                                  'Cannot retrieve path "%s" (broken link)',
-                                  h5name)
-                else:
-                    _handle_error(errors, KeyError, ', '.join(e.args))
+                data = h5py_read_dataset(h5obj)
+            except OSError:
+                _handle_error(errors,
+                              OSError,
+                              'Cannot retrieve dataset "%s"',
+                              h5name)
                 continue
-
-            if is_group(h5obj):
-                # Child is an HDF5 group
-                ddict[key] = h5todict(h5f,
-                                      h5name,
-                                      exclude_names=exclude_names,
-                                      asarray=asarray,
-                                      dereference_links=dereference_links,
-                                      include_attributes=include_attributes)
-            else:
-                # Child is an HDF5 dataset
-                try:
-                    data = h5py_read_dataset(h5obj)
-                except OSError:
-                    _handle_error(errors,
-                                  OSError,
-                                  'Cannot retrieve dataset "%s"',
-                                  h5name)
-                else:
-                    if asarray:  # Convert HDF5 dataset to numpy array
-                        data = numpy.array(data, copy=False)
-                    ddict[key] = data
-                    # Read the attributes of the child
-                    if include_attributes:
-                        attrs = H5pyAttributesReadWrapper(h5obj.attrs)
-                        for aname, avalue in attrs.items():
-                            ddict[(key, aname)] = avalue
+            if asarray:  # Convert HDF5 dataset to numpy array
+                data = numpy.array(data, copy=False)
+            ddict[key] = data
+        # Read the attributes of the child
+        if include_attributes:
+            attrs = H5pyAttributesReadWrapper(h5obj.attrs)
+            for aname, avalue in attrs.items():
+                ddict[(key, aname)] = avalue
     return ddict
 
 
@@ -33,16 +33,20 @@
 """
 
 import collections
+import concurrent.futures
 import datetime
+import io
 import logging
 import numbers
 import os
+import sys
 
 import fabio.file_series
 import numpy
 import six
 
 from . import commonh5
+from silx import config
 from silx import version as silx_version
 import silx.utils.number
 import h5py
@@ -92,9 +96,58 @@ class _FileSeries(fabio.file_series.file_series):
         return self[self._current]
 
 
+def _edf_frame_memmap(fabio_image, frame_id):
+    """Returns a read-only memory map of the data of an uncompressed EDF
+    frame, or None if the frame data can't be mapped.
+
+    Frames which are compressed, stored in a separated binary file, in a
+    compressed file, or with a non-native byte order are not mapped.
+
+    :param fabio.fabioimage.FabioImage fabio_image: Image containing the frame
+    :param int frame_id: Index of the frame in the image
+    :rtype: Union[numpy.memmap,None]
+    """
+    if not isinstance(fabio_image, fabio.edfimage.EdfImage):
+        return None
+    try:
+        frame = fabio_image.get_frame(frame_id)
+        if getattr(frame, "_data", None) is not None:
+            # Already decoded
+            return None
+        # Private attributes of fabio EDF frames, frame.data is used without them
+        dtype = getattr(frame, "_dtype", None)
+        byteorder = getattr(frame, "_data_byteorder", None)
+        compression = getattr(frame, "_data_compression", "unknown")
+        start = getattr(frame, "start", None)
+        if dtype is None or byteorder is None or start is None:
+            return None
+        byteorder = str(byteorder)
+        if compression is not None or getattr(frame, "bfname", None) is not None:
+            return None
+        if not isinstance(getattr(frame, "file", None), io.FileIO):
+            return None
+        native = "<" if sys.byteorder == "little" else ">"
+        if dtype.itemsize > 1 and byteorder != native:
+            return None
+        shape = tuple(frame.shape)
+        size = int(numpy.prod(shape)) * dtype.itemsize
+        filename = frame.file.name
+        if (getattr(frame, "size", None) != size or
+                os.path.getsize(filename) < start + size):
+            return None
+    except Exception:
+        # Unexpected fabio version or EDF layout
+        _logger.debug("Frame %d can't be memory mapped", frame_id, exc_info=True)
+        return None
+    return numpy.memmap(filename, dtype=dtype, mode="r", offset=start, shape=shape)
+
+
 class FrameData(commonh5.LazyLoadableDataset):
     """Expose a cube of image from a Fabio file using `FabioReader` as
-    cache."""
+    cache.
+
+    Slices of the cube are read on demand frame by frame, the whole cube
+    is only loaded when it is requested with ``[()]`` or ``[...]``."""
 
     def __init__(self, name, fabio_reader, parent=None):
         if fabio_reader.is_spectrum():
@@ -110,18 +163,8 @@ class FrameData(commonh5.LazyLoadableDataset):
         return self.__fabio_reader.get_data()
 
     def _update_cache(self):
-        if isinstance(self.__fabio_reader.fabio_file(),
-                      fabio.file_series.file_series):
-            # Reading all the files is taking too much time
-            # Reach the information from the only first frame
-            first_image = self.__fabio_reader.fabio_file().first_image()
-            self._dtype = first_image.data.dtype
-            shape0 = self.__fabio_reader.frame_count()
-            shape1, shape2 = first_image.data.shape
-            self._shape = shape0, shape1, shape2
-        else:
-            self._dtype = super(commonh5.LazyLoadableDataset, self).dtype
-            self._shape = super(commonh5.LazyLoadableDataset, self).shape
+        self._dtype = self.__fabio_reader.get_data_dtype()
+        self._shape = self.__fabio_reader.get_data_shape()
 
     @property
     def dtype(self):
@@ -135,20 +178,23 @@ class FrameData(commonh5.LazyLoadableDataset):
             self._update_cache()
         return self._shape
 
+    @property
+    def size(self):
+        return int(numpy.prod(self.shape))
+
+    def __len__(self):
+        return self.shape[0]
+
     def __iter__(self):
-        for frame in self.__fabio_reader.iter_frames():
-            yield frame.data
+        for frame in self.__fabio_reader.iter_frame_data():
+            yield numpy.array(frame)
 
     def __getitem__(self, item):
-        # optimization for fetching a single frame if data not already loaded
+        # read only the requested frames if data not already loaded
         if not self._is_initialized:
-            if isinstance(item, six.integer_types) and \
-                    isinstance(self.__fabio_reader.fabio_file(),
-                               fabio.file_series.file_series):
-                if item < 0:
-                    # negative indexing
-                    item += len(self)
-                return self.__fabio_reader.fabio_file().jump_image(item).data
+            full = item is Ellipsis or (isinstance(item, tuple) and len(item) == 0)
+            if not full:
+                return self.__fabio_reader.get_data_slice(item)
         return super(FrameData, self).__getitem__(item)
 
 
@@ -346,7 +392,8 @@ class FabioReader(object):
     COUNTER = 1
     POSITIONER = 2
 
-    def __init__(self, file_name=None, fabio_image=None, file_series=None):
+    def __init__(self, file_name=None, fabio_image=None, file_series=None,
+                 frame_cache_size=None, workers=None, read_ahead=None):
         """
         Constructor
 
@@ -356,6 +403,14 @@ class FabioReader(object):
         :param Union[list[str],fabio.file_series.file_series] file_series: An
             list of file name or a :class:`fabio.file_series.file_series`
             instance
+        :param int frame_cache_size: Size in bytes of the cache of frames read
+            on demand. If None, :attr:`silx.config.DEFAULT_FABIOH5_FRAME_CACHE_SIZE`
+            is used.
+        :param int workers: Number of threads decoding frames in parallel.
+            If None, :attr:`silx.config.DEFAULT_FABIOH5_DECODING_WORKERS` is
+            used. 1 disables parallel decoding.
+        :param int read_ahead: Number of frames decoded ahead of the frame
+            which is consumed. Default: twice the number of workers.
         """
         self.__at_least_32bits = False
         self.__signed_type = False
@@ -366,6 +421,21 @@ class FabioReader(object):
         self.__measurements = {}
         self.__key_filters = set([])
         self.__data = None
+        self.__geometry = None
+        if frame_cache_size is None:
+            frame_cache_size = config.DEFAULT_FABIOH5_FRAME_CACHE_SIZE
+        self.__frame_cache_size = frame_cache_size
+        self.__frame_cache = collections.OrderedDict()
+        self.__frame_cache_nbytes = 0
+        if workers is None:
+            workers = config.DEFAULT_FABIOH5_DECODING_WORKERS
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.__workers = max(workers, 1)
+        if read_ahead is None:
+            read_ahead = 2 * self.__workers
+        self.__read_ahead = max(read_ahead, 0)
+        self.__executor = None
         self.__frame_count = self.frame_count()
         self._read()
 
@@ -408,6 +478,11 @@ class FabioReader(object):
             if hasattr(self.__fabio_file, "close"):
                 self.__fabio_file.close()
         self.__fabio_file = None
+        self.__frame_cache.clear()
+        self.__frame_cache_nbytes = 0
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
 
     def fabio_file(self):
         return self.__fabio_file
@@ -427,11 +502,18 @@ class FabioReader(object):
         A frame provides at least `data` and `header` attributes.
         """
         if isinstance(self.__fabio_file, fabio.file_series.file_series):
-            for file_number in range(len(self.__fabio_file)):
-                with self.__fabio_file.jump_image(file_number) as fabio_image:
-                    # return the first frame only
-                    assert(fabio_image.nframes == 1)
-                    yield fabio_image
+            # Files are opened (and decoded by some formats) ahead in parallel
+            opened_images = self._map_frames(self._open_file,
+                                             range(len(self.__fabio_file)),
+                                             release=self._close_file)
+            try:
+                for fabio_image in opened_images:
+                    with fabio_image:
+                        # return the first frame only
+                        assert(fabio_image.nframes == 1)
+                        yield fabio_image
+            finally:
+                opened_images.close()
         elif isinstance(self.__fabio_file, fabio.fabioimage.FabioImage):
             for frame_count in range(self.__fabio_file.nframes):
                 if self.__fabio_file.nframes == 1:
@@ -441,44 +523,323 @@ class FabioReader(object):
         else:
             raise TypeError("Unsupported type %s", self.__fabio_file.__class__)
 
-    def _create_data(self):
-        """Initialize hold data by merging all frames into a single cube.
+    def _get_executor(self):
+        """Returns the pool of threads decoding frames, or None if frames have
+        to be decoded sequentially.
 
-        Choose the cube size which fit the best the data. If some images are
-        smaller than expected, the empty space is set to 0.
+        Files of a series are decoded in parallel, and also the frames of a
+        multi-frame EDF (fabio serializes the reads of its file).
+        Other multi-frame formats share a file without lock.
 
-        The computation is cached into the class, and only done ones.
+        :rtype: Union[concurrent.futures.Executor,None]
+        """
+        if self.__workers <= 1:
+            return None
+        fabio_file = self.__fabio_file
+        if not isinstance(fabio_file, (fabio.file_series.file_series,
+                                       fabio.edfimage.EdfImage)):
+            return None
+        if self.__executor is None:
+            self.__executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.__workers)
+        return self.__executor
+
+    def _map_frames(self, function, frames, release=None):
+        """Iterate the results of a function applied to frames, in order.
+
+        When possible the function is computed by the pool of workers,
+        up to `read_ahead` frames ahead of the iteration.
+
+        :param callable function: Function called with each frame
+        :param Iterable frames: Frames (indexes, or any description of the
+            frames understood by the function)
+        :param callable release: Function called with the results computed
+            ahead which are not consumed, when the iteration is stopped early
+            or fails
+        """
+        executor = self._get_executor()
+        if executor is None:
+            for frame in frames:
+                yield function(frame)
+            return
+
+        pending = collections.deque()
+        try:
+            for frame in frames:
+                pending.append(executor.submit(function, frame))
+                if len(pending) > self.__read_ahead:
+                    yield pending.popleft().result()
+            while len(pending) > 0:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                if future.cancel() or release is None:
+                    continue
+                # Already running or done
+                try:
+                    result = future.result()
+                except Exception:
+                    continue
+                release(result)
+
+    def _open_file(self, file_number):
+        """Open a file of the series.
+
+        Unlike `file_series.jump_image`, it does not change the state of the
+        series, and can be called from many threads.
+
+        :rtype: fabio.fabioimage.FabioImage
+        """
+        return fabio.open(self.__fabio_file[file_number])
+
+    def _close_file(self, fabio_image):
+        """Close a file of the series opened by :meth:`_open_file`"""
+        fabio_image.close()
+
+    def _read_frame_data(self, frame_id):
+        """Returns the data of a frame as stored in the file.
+
+        Uncompressed EDF frames are memory mapped, other ones are decoded.
+
+        :param int frame_id: Index of the frame
+        :rtype: numpy.ndarray
+        """
+        if isinstance(self.__fabio_file, fabio.file_series.file_series):
+            with self._open_file(frame_id) as fabio_image:
+                data = _edf_frame_memmap(fabio_image, 0)
+                if data is None:
+                    data = fabio_image.data
+            return data
+        elif isinstance(self.__fabio_file, fabio.fabioimage.FabioImage):
+            data = _edf_frame_memmap(self.__fabio_file, frame_id)
+            if data is not None:
+                return data
+            if self.__fabio_file.nframes == 1:
+                return self.__fabio_file.data
+            return self.__fabio_file.getframe(frame_id).data
+        else:
+            raise TypeError("Unsupported type %s", self.__fabio_file.__class__)
+
+    def _get_geometry(self):
+        """Returns the shape and the dtype of the frames in the cube, and the
+        number of frames, or None if the data is a single frame without
+        extra dimension.
+
+        :rtype: Tuple[Tuple[int],numpy.dtype,Union[int,None]]
         """
-        images = []
-        for fabio_frame in self.iter_frames():
-            images.append(fabio_frame.data)
+        if self.__geometry is not None:
+            return self.__geometry
 
-        # returns the data without extra dim in case of single frame
-        if len(images) == 1:
-            return images[0]
+        fabio_file = self.__fabio_file
+        if isinstance(fabio_file, fabio.file_series.file_series):
+            # Reading all the files is taking too much time
+            # Reach the information from the only first frame
+            data = self._read_frame_data(0)
+            shapes, dtypes = [data.shape], [data.dtype]
+        elif self.__frame_count == 1:
+            data = self._read_frame_data(0)
+            self.__geometry = data.shape, data.dtype, None
+            return self.__geometry
+        elif isinstance(fabio_file, fabio.edfimage.EdfImage):
+            # Frame shapes are known from the headers
+            frames = [fabio_file.get_frame(i) for i in range(self.__frame_count)]
+            shapes = [tuple(f.shape) for f in frames]
+            dtypes = [f.dtype for f in frames]
+        else:
+            # Decoding all the frames is taking too much time
+            # Reach the information from the only first frame, the other
+            # ones are decoded when they are accessed
+            data = self._read_frame_data(0)
+            shapes, dtypes = [data.shape], [data.dtype]
 
         # get the max size
-        max_dim = max([i.ndim for i in images])
+        max_dim = max([len(shape) for shape in shapes])
         max_shape = [0] * max_dim
-        for image in images:
-            for dim in range(image.ndim):
-                if image.shape[dim] > max_shape[dim]:
-                    max_shape[dim] = image.shape[dim]
-        max_shape = tuple(max_shape)
-
-        # fix smallest images
-        for index, image in enumerate(images):
-            if image.shape == max_shape:
-                continue
-            location = [slice(0, i) for i in image.shape]
-            while len(location) < max_dim:
-                location.append(0)
-            normalized_image = numpy.zeros(max_shape, dtype=image.dtype)
-            normalized_image[tuple(location)] = image
-            images[index] = normalized_image
+        for shape in shapes:
+            for dim in range(len(shape)):
+                if shape[dim] > max_shape[dim]:
+                    max_shape[dim] = shape[dim]
+        dtype = numpy.result_type(*dtypes)
+        self.__geometry = tuple(max_shape), dtype, self.__frame_count
+        return self.__geometry
+
+    def _normalize_frame(self, image):
+        """Returns a frame with the shape and the dtype of the cube.
+
+        If the image is smaller than expected, the empty space is set to 0.
+        """
+        shape, dtype, _ = self._get_geometry()
+        if image.shape == shape:
+            if image.dtype != dtype:
+                image = image.astype(dtype)
+            return image
+        location = [slice(0, i) for i in image.shape]
+        while len(location) < len(shape):
+            location.append(0)
+        normalized_image = numpy.zeros(shape, dtype=dtype)
+        normalized_image[tuple(location)] = image
+        return normalized_image
+
+    def get_frame(self, frame_id):
+        """Returns the data of a frame of the cube.
+
+        Frames are kept in a cache of limited size. Uncompressed EDF frames
+        are memory mapped. The returned array is read-only.
+
+        :param int frame_id: Index of the frame
+        :rtype: numpy.ndarray
+        """
+        data = self.__frame_cache.get(frame_id)
+        if data is None:
+            data = self._read_normalized_frame(frame_id)
+        return self._cache_frame(frame_id, data)
+
+    def iter_frame_data(self, frame_ids=None):
+        """Iterate the data of frames of the cube.
 
-        # create a cube
-        return numpy.array(images)
+        Frames which are not in the cache are decoded in parallel ahead of
+        the iteration (see `workers` and `read_ahead`).
+        The returned arrays are read-only.
+
+        :param Iterable[int] frame_ids: Indexes of the frames,
+            default to all the frames
+        :rtype: Iterator[numpy.ndarray]
+        """
+        if frame_ids is None:
+            frame_ids = range(self.__frame_count)
+
+        def read(frame):
+            frame_id, data = frame
+            if data is None:
+                data = self._read_normalized_frame(frame_id)
+            return frame_id, data
+
+        # The cache is only used from this thread, workers only decode
+        frames = ((frame_id, self.__frame_cache.get(frame_id))
+                  for frame_id in frame_ids)
+        for frame_id, data in self._map_frames(read, frames):
+            yield self._cache_frame(frame_id, data)
+
+    def _read_normalized_frame(self, frame_id):
+        """Read a frame and returns it with the shape and the dtype of the
+        cube, as a read-only array"""
+        # Read-only view to protect the cache and the fabio image
+        data = self._normalize_frame(self._read_frame_data(frame_id)).view()
+        data.flags.writeable = False
+        return data
+
+    def _cache_frame(self, frame_id, data):
+        """Store a frame as the most recently used one of the cache"""
+        previous = self.__frame_cache.pop(frame_id, None)
+        if previous is not None:
+            self.__frame_cache_nbytes -= previous.nbytes
+        self.__frame_cache[frame_id] = data
+        self.__frame_cache_nbytes += data.nbytes
+
+        while self.__frame_cache_nbytes > self.__frame_cache_size and self.__frame_cache:
+            _, older = self.__frame_cache.popitem(last=False)
+            self.__frame_cache_nbytes -= older.nbytes
+        return data
+
+    def get_data_shape(self):
+        """Returns the shape of the cube returned by :meth:`get_data` without
+        reading all the frames.
+
+        :rtype: Tuple[int]
+        """
+        if self.__data is not None:
+            return self.__data.shape
+        shape, _, frame_count = self._get_geometry()
+        if frame_count is None:
+            return shape
+        return (frame_count, ) + shape
+
+    def get_data_dtype(self):
+        """Returns the dtype of the cube returned by :meth:`get_data` without
+        reading all the frames.
+
+        :rtype: numpy.dtype
+        """
+        if self.__data is not None:
+            return self.__data.dtype
+        return self._get_geometry()[1]
+
+    @staticmethod
+    def _copy(data):
+        """Returns a copy of an array detached from the frame cache
+        (and from memory maps), and numpy scalars as is.
+
+        :param Union[numpy.ndarray,numpy.generic] data:
+        :rtype: Union[numpy.ndarray,numpy.generic]
+        """
+        if isinstance(data, numpy.ndarray):
+            return numpy.array(data)
+        return data
+
+    def get_data_slice(self, item):
+        """Returns a slice of the cube, only reading the requested frames.
+
+        :param item: Index, slice or tuple of them, as used with numpy
+        :rtype: Union[numpy.ndarray,numpy.generic]
+        """
+        if self.__data is not None:
+            return self.__data[item]
+
+        shape, dtype, frame_count = self._get_geometry()
+        if frame_count is None:
+            return self._copy(self.get_frame(0)[item])
+
+        if not isinstance(item, tuple):
+            item = (item, )
+        if len(item) == 0 or item[0] is Ellipsis:
+            frame_item, item = slice(None), item
+        else:
+            frame_item, item = item[0], item[1:]
+
+        if isinstance(frame_item, numbers.Integral):
+            frame_id = int(frame_item)
+            if frame_id < 0:
+                frame_id += frame_count
+            if not 0 <= frame_id < frame_count:
+                raise IndexError("Index (%d) out of range (0-%d)" %
+                                 (frame_item, frame_count - 1))
+            return self._copy(self.get_frame(frame_id)[item])
+
+        if isinstance(frame_item, slice):
+            frame_ids = range(*frame_item.indices(frame_count))
+        else:
+            frame_ids = numpy.arange(frame_count)[frame_item]
+            if frame_ids.ndim != 1:
+                # Unsupported indexing (e.g. numpy.newaxis): use the full cube
+                return self.get_data()[(frame_item, ) + item]
+
+        # Shape of a slice of a frame, without allocating a frame
+        frame_shape = numpy.broadcast_to(numpy.zeros((), dtype), shape)[item].shape
+        data = numpy.empty((len(frame_ids), ) + frame_shape, dtype=dtype)
+        for index, frame in enumerate(self.iter_frame_data(frame_ids)):
+            data[index] = frame[item]
+        return data
+
+    def _create_data(self):
+        """Initialize hold data by merging all frames into a single cube.
+
+        Choose the cube size which fit the best the data. If some images are
+        smaller than expected, the empty space is set to 0.
+
+        The computation is cached into the class, and only done ones.
+        """
+        shape, dtype, frame_count = self._get_geometry()
+        if frame_count is None:
+            # returns the data without extra dim in case of single frame
+            data = self._read_frame_data(0)
+            if isinstance(data, numpy.memmap):
+                data = numpy.array(data)
+            return data
+
+        data = numpy.empty((frame_count, ) + shape, dtype=dtype)
+        for frame_id, frame in enumerate(self.iter_frame_data()):
+            data[frame_id] = frame
+        return data
 
     def __get_dict(self, kind):
         """Returns a dictionary from according to an expected kind"""
@@ -787,8 +1148,10 @@ class EdfFabioReader(FabioReader):
     motor_mne are parsed using a special way.
     """
 
-    def __init__(self, file_name=None, fabio_image=None, file_series=None):
-        FabioReader.__init__(self, file_name, fabio_image, file_series)
+    def __init__(self, file_name=None, fabio_image=None, file_series=None,
+                 frame_cache_size=None, workers=None, read_ahead=None):
+        FabioReader.__init__(self, file_name, fabio_image, file_series,
+                             frame_cache_size, workers, read_ahead)
         self.__unit_cell_abc = None
         self.__unit_cell_alphabetagamma = None
         self.__ub_matrix = None
@@ -944,7 +1307,8 @@ class File(commonh5.File):
     """Class which handle a fabio image as a mimick of a h5py.File.
     """
 
-    def __init__(self, file_name=None, fabio_image=None, file_series=None):
+    def __init__(self, file_name=None, fabio_image=None, file_series=None,
+                 frame_cache_size=None, workers=None, read_ahead=None):
         """
         Constructor
 
@@ -954,8 +1318,18 @@ class File(commonh5.File):
         :param Union[list[str],fabio.file_series.file_series] file_series: An
             list of file name or a :class:`fabio.file_series.file_series`
             instance
+        :param int frame_cache_size: Size in bytes of the cache of frames read
+            on demand (see :class:`FabioReader`)
+        :param int workers: Number of threads decoding frames in parallel
+            (see :class:`FabioReader`)
+        :param int read_ahead: Number of frames decoded ahead
+            (see :class:`FabioReader`)
         """
-        self.__fabio_reader = self.create_fabio_reader(file_name, fabio_image, file_series)
+        self.__fabio_reader = self.create_fabio_reader(
+            file_name, fabio_image, file_series,
+            frame_cache_size=frame_cache_size,
+            workers=workers,
+            read_ahead=read_ahead)
         if fabio_image is not None:
             file_name = fabio_image.filename
         scan = self.create_scan_group(self.__fabio_reader)
@@ -1003,9 +1377,12 @@ class File(commonh5.File):
 
         return scan
 
-    def create_fabio_reader(self, file_name, fabio_image, file_series):
+    def create_fabio_reader(self, file_name, fabio_image, file_series,
+                            **kwargs):
         """Factory to create fabio reader.
 
+        Extra keyword arguments are passed to the reader.
+
         :rtype: FabioReader"""
         use_edf_reader = False
         first_file_name = None
@@ -1036,9 +1413,9 @@ class File(commonh5.File):
             assert(False)
 
         if use_edf_reader:
-            reader = EdfFabioReader(file_name, fabio_image, file_series)
+            reader = EdfFabioReader(file_name, fabio_image, file_series, **kwargs)
         else:
-            reader = FabioReader(file_name, fabio_image, file_series)
+            reader = FabioReader(file_name, fabio_image, file_series, **kwargs)
         return reader
 
     def close(self):
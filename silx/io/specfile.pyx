@@ -64,6 +64,20 @@ an iterator::
     for scan in sf:
         print(scan.scan_header_dict['S'])
 
+Opening a large file requires parsing it completely to index its scans.
+This index can be stored in a cache file to be reused the next time the
+file is opened. If the file grew in between, only the new part of the file
+is parsed::
+
+    # index file stored next to test.dat
+    sf = SpecFile("test.dat", index_cache=True)
+
+    # index file stored in a given directory
+    sf = SpecFile("test.dat", index_cache="/tmp/spec_indexes")
+
+The default behavior is defined by
+:attr:`silx.config.DEFAULT_SPECFILE_INDEX_CACHE`.
+
 MCA spectra can be selectively loaded using an instance of :class:`MCA`
 provided by :class:`Scan`::
 
@@ -74,6 +88,13 @@ provided by :class:`Scan`::
     for mca_data in first_scan.mca:
         print(sum(mca_data))
 
+Many spectra are read much faster with :meth:`SpecFile.get_mca_block`,
+which parses them in a single pass into one array::
+
+    # spectra of the first of 2 analysers, for every other data line
+    spectra = sf.get_mca_block(0, step=2, number_of_analysers=2,
+                               analyser_index=0, dtype=numpy.float32)
+
 Classes
 =======
 
@@ -108,11 +129,14 @@ __license__ = "MIT"
 __date__ = "11/08/2017"
 
 import os.path
+import hashlib
 import logging
 import numpy
 import re
 import sys
 
+from silx import config
+
 _logger = logging.getLogger(__name__)
 
 cimport cython
@@ -125,6 +149,23 @@ SF_ERR_NO_ERRORS = 0
 SF_ERR_FILE_OPEN = 2
 SF_ERR_SCAN_NOT_FOUND = 7
 
+_MCA_TYPES = {
+    numpy.dtype(numpy.float64): 0,
+    numpy.dtype(numpy.float32): 1,
+    numpy.dtype(numpy.int32): 2,
+    numpy.dtype(numpy.uint32): 3,
+}
+"""Numpy dtypes directly filled by SfGetMcaBlock, with their type code"""
+
+INDEX_FILE_EXTENSION = ".sfidx"
+"""Extension of the index cache files"""
+
+INDEX_STATES = {
+    0: "built",
+    1: "reused",
+    2: "extended",
+}
+
 
 # custom errors
 class SfError(Exception):
@@ -626,10 +667,50 @@ def is_specfile(filename):
     return False
 
 
+def index_file_path(filename, index_cache=None):
+    """Returns the path of the index cache file of a SPEC file.
+
+    :param str filename: Path of the SPEC file
+    :param index_cache: Where to store the index file: ``True`` for next to
+        the SPEC file, the path of a directory, ``False`` for no index file
+        or ``None`` to use :attr:`silx.config.DEFAULT_SPECFILE_INDEX_CACHE`.
+    :return: Path of the index file or ``None`` if there is no index file
+    :rtype: Union[str,None]
+    """
+    if index_cache is None:
+        index_cache = config.DEFAULT_SPECFILE_INDEX_CACHE
+    if index_cache is None or index_cache is False:
+        return None
+
+    filename = os.fsdecode(filename)
+    if index_cache is True:
+        return filename + INDEX_FILE_EXTENSION
+
+    # Index files of files with the same name are stored in the same
+    # directory: disambiguate them with the absolute path
+    abspath = os.fsencode(os.path.abspath(filename))
+    digest = hashlib.sha1(abspath).hexdigest()[:16]
+    basename = "%s-%s%s" % (os.path.basename(filename), digest,
+                            INDEX_FILE_EXTENSION)
+    return os.path.join(os.fsdecode(index_cache), basename)
+
+
 cdef class SpecFile(object):
     """
 
     :param filename: Path of the SpecFile to read
+    :param index_cache: Where to store the index of the scans, to avoid
+        parsing the whole file each time it is opened. ``True`` to store
+        it next to the file, the path of a directory to store it there,
+        ``False`` to disable it. The index is also reused when the file
+        grew since it was written, in which case only the new part of the
+        file is parsed. If ``None`` (default),
+        :attr:`silx.config.DEFAULT_SPECFILE_INDEX_CACHE` is used.
+
+    :var index_file: Path of the index cache file or ``None``
+    :var index_state: How the index cache was used to open the file:
+        ``"built"`` (whole file parsed), ``"reused"``, ``"extended"``
+        (end of the file parsed) or ``None`` without index cache.
 
     This class wraps the main data and header access functions of the C
     SpecFile library.
@@ -638,14 +719,28 @@ cdef class SpecFile(object):
     cdef:
         specfile_wrapper.SpecFileHandle *handle
         str filename
+        readonly object index_file
+        readonly object index_state
 
-    def __cinit__(self, filename):
-        cdef int error = 0
+    def __cinit__(self, filename, index_cache=None):
+        cdef:
+            int error = 0
+            short idxstate = 0
         self.handle = NULL
+        self.index_file = None
+        self.index_state = None
 
         if is_specfile(filename):
+            index_file = index_file_path(filename, index_cache)
             filename = _string_to_char_star(filename)
-            self.handle = specfile_wrapper.SfOpen(filename, &error)
+            if index_file is None:
+                self.handle = specfile_wrapper.SfOpen(filename, &error)
+            else:
+                self.handle = specfile_wrapper.SfOpenIndexed(
+                    filename, os.fsencode(index_file), &idxstate, &error)
+                self.index_file = index_file
+                self.index_state = INDEX_STATES[idxstate]
+                _logger.debug("Index file %s %s", index_file, self.index_state)
             if error:
                 self._handle_error(error)
         else:
@@ -653,7 +748,7 @@ cdef class SpecFile(object):
             # this causes the destructor to be called
             self._handle_error(SF_ERR_FILE_OPEN)
 
-    def __init__(self, filename):
+    def __init__(self, filename, index_cache=None):
         if not isinstance(filename, str):
             # decode bytes to str in python 3, str to unicode in python 2
             self.filename = filename.decode()
@@ -664,6 +759,35 @@ cdef class SpecFile(object):
         """Destructor: Calls SfClose(self.handle)"""
         self.close()
 
+    def update(self):
+        """Update the scan index with what was appended to the file since it
+        was opened or last updated.
+
+        Only the part of the file beyond the previously parsed end is read.
+        Appended scans become available and the last scan is extended with
+        appended header, data and MCA lines. This makes it possible to
+        follow a file during its acquisition.
+
+        :class:`Scan` instances created before the update still hold the
+        previous content, get them again to access the updated content.
+
+        :return: True if something was appended to the file
+        :rtype: bool
+        :raise SfErrFileRead: If the file was truncated since it was parsed.
+            It has to be opened again.
+        """
+        cdef:
+            int error = SF_ERR_NO_ERRORS
+
+        updated = specfile_wrapper.SfUpdate(self.handle, &error)
+        self._handle_error(error)
+
+        if updated and self.index_file is not None:
+            if specfile_wrapper.SfWriteIndex(self.handle,
+                                             os.fsencode(self.index_file)):
+                _logger.debug("Cannot write index file %s", self.index_file)
+        return bool(updated)
+
     def close(self):
         """Close the file descriptor"""
         # handle is NULL if SfOpen failed
@@ -1266,3 +1390,101 @@ cdef class SpecFile(object):
 
         free(mca_data)
         return numpy.asarray(ret_array)
+
+    def get_mca_block(self, scan_index, start=0, stop=None, step=1,
+                      number_of_analysers=1, analyser_index=None,
+                      dtype=numpy.float64):
+        """Return the MCA spectra of several scan points, parsed in a
+        single pass over the scan.
+
+        The spectra of a scan are multiplexed: for each data line there is
+        one spectrum per analyser. ``start``, ``stop`` and ``step`` select
+        data lines as a slice would.
+
+        If ``analyser_index`` is provided or if there is a single analyser,
+        the spectra of this analyser are returned as a 2D array of shape
+        *(number of selected lines, number of channels)*. Else, all
+        analysers are returned as a 3D array of shape
+        *(number of selected lines, number_of_analysers, number of channels)*.
+
+        :param scan_index: Unique scan index between ``0`` and ``len(self)-1``.
+        :type scan_index: int
+        :param start: First data line (slice semantics)
+        :param stop: End data line (slice semantics)
+        :param step: Step between data lines (slice semantics)
+        :param int number_of_analysers: Number of spectra per data line
+        :param analyser_index: Index of the analyser to read, or None
+        :param dtype: dtype of the returned array. ``float64``,
+            ``float32``, ``int32`` and ``uint32`` are filled directly,
+            other dtypes are converted from ``float64``.
+        :return: MCA spectra
+        :rtype: numpy.ndarray
+        :raise ValueError: If the selected spectra do not all have
+            the same number of channels
+        """
+        cdef:
+            int error = SF_ERR_NO_ERRORS
+            short regular = 1
+            long first, c_step, group, count
+            unsigned char[::1] buffer
+
+        dtype = numpy.dtype(dtype)
+        if dtype not in _MCA_TYPES:
+            return self.get_mca_block(scan_index, start, stop, step,
+                                      number_of_analysers, analyser_index,
+                                      numpy.float64).astype(dtype)
+
+        if number_of_analysers < 1:
+            raise ValueError("number_of_analysers must be strictly positive")
+        if analyser_index is not None and \
+                not 0 <= analyser_index < number_of_analysers:
+            raise IndexError("Analyser index must be in range 0-%d" %
+                             (number_of_analysers - 1))
+
+        number_of_mca = self.number_of_mca(scan_index)
+        lines = range(*slice(start, stop, step).indices(
+            number_of_mca // number_of_analysers))
+        reverse = lines.step < 0
+        if reverse:
+            lines = lines[::-1]
+
+        if analyser_index is not None or number_of_analysers == 1:
+            group = 1
+            first = lines.start * number_of_analysers + (analyser_index or 0)
+            shape = (len(lines),)
+        else:
+            group = number_of_analysers
+            first = lines.start * number_of_analysers
+            shape = (len(lines), number_of_analysers)
+        count = len(lines) * group
+        c_step = lines.step * number_of_analysers
+
+        if number_of_mca == 0:
+            channels = 0
+        else:
+            channels = len(self.get_mca(scan_index,
+                                        first if count else first % number_of_analysers))
+
+        data = numpy.empty(shape + (channels,), dtype=dtype)
+        if count and channels:
+            buffer = data.reshape(-1).view(numpy.uint8)
+            specfile_wrapper.SfGetMcaBlock(self.handle,
+                                           scan_index + 1,
+                                           first + 1,
+                                           c_step,
+                                           group,
+                                           count,
+                                           channels,
+                                           &buffer[0],
+                                           _MCA_TYPES[dtype],
+                                           &regular,
+                                           &error)
+            self._handle_error(error)
+            if not regular:
+                raise ValueError(
+                    "MCA spectra of scan %d do not all have %d channels" %
+                    (scan_index, channels))
+
+        if reverse:
+            data = data[::-1]
+        return data
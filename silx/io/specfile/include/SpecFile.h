@@ -51,10 +51,12 @@
 #include <io.h>
 #define SF_OPENFLAG   O_RDONLY | O_BINARY
 #define SF_WRITEFLAG  O_CREAT | O_WRONLY
+#define SF_TRUNCFLAG  O_CREAT | O_WRONLY | O_TRUNC | O_BINARY
 #define SF_UMASK      0666
 #else   /* if not windows */
 #define SF_OPENFLAG   O_RDONLY
 #define SF_WRITEFLAG  O_CREAT | O_WRONLY
+#define SF_TRUNCFLAG  O_CREAT | O_WRONLY | O_TRUNC
 #define SF_UMASK      0666
 #endif
 
@@ -101,6 +103,21 @@
 #define  SF_ERR_COL_NOT_FOUND       14
 #define  SF_ERR_MCA_NOT_FOUND       15
 
+/*
+ * Index file states (see SfOpenIndexed)
+ */
+#define  SF_INDEX_NONE              0  /* no usable index, full scan        */
+#define  SF_INDEX_READY             1  /* index reused as is                */
+#define  SF_INDEX_EXTENDED          2  /* index reused, file end re-scanned */
+
+/*
+ * Output types of SfGetMcaBlock
+ */
+#define  SF_MCA_FLOAT64             0
+#define  SF_MCA_FLOAT32             1
+#define  SF_MCA_INT32               2
+#define  SF_MCA_UINT32              3
+
 typedef struct _SfCursor {
     long  int scanno;      /* nb of scans */
     long  int cursor;      /* beginning of current scan */
@@ -171,6 +188,9 @@ typedef struct _SpecScan {
  * init
  */
 DllExport extern    SpecFile  *SfOpen        ( char *name, int *error );
+DllExport extern    SpecFile  *SfOpenIndexed ( char *name, char *idxname,
+                                                short *idxstate, int *error );
+DllExport extern    int        SfWriteIndex  ( SpecFile *sf, char *idxname );
 DllExport extern    short      SfUpdate      ( SpecFile *sf,int *error );
 DllExport extern    int        SfClose       ( SpecFile *sf );
 
@@ -254,6 +274,10 @@ DllExport extern int  SfGetMca  ( SpecFile *sf, long index, long mcano,
                                           double **retdata, int *error );
 DllExport extern long SfMcaCalib ( SpecFile *sf, long index, double **calib,
                                           int *error );
+DllExport extern long SfGetMcaBlock ( SpecFile *sf, long index, long first,
+                                          long step, long group, long count,
+                                          long channels, void *data, int type,
+                                          short *regular, int *error );
 
   /*
    * Write and write related functions
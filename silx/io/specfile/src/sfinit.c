@@ -119,11 +119,9 @@
  * Defines
  */
 
-#define ANY          0
-#define NEWLINE      1
-#define COMMENT      2
 
 #define SF_ISFX      ".sfI"
+#define SF_IDX_TAIL  64
 
 #define SF_INIT      0
 #define SF_READY     1
@@ -146,23 +144,42 @@ char SF_SIGNATURE[] =  "Linux 2ruru Sf2.0";
 char SF_SIGNATURE[] =  "2ruru Sf2.0";
 #endif
 
+/*
+ * Index files are raw dumps of the in-memory structures, the key
+ * records the sizes of these structures so that an index written on
+ * another platform or by another version is rebuilt instead of misread.
+ */
+char SF_IDX_SIGNATURE[] =  "silx SfIndex 1.0";
+
+typedef struct _SfIndexKey {
+  long  sizes[3];           /* sizeof long, SfCursor and SpecScan      */
+  long  size;               /* number of bytes of the file indexed     */
+  long  m_time;             /* modification time of the file indexed   */
+  long  dev;                /* device and inode of the file indexed    */
+  long  ino;
+  long  no_scans;           /* number of SpecScan records following    */
+  long  tailsize;           /* last bytes of the indexed file content  */
+  char  tail[SF_IDX_TAIL];
+} SfIndexKey;
+
 /*
  * Internal functions
  */
-static short statusEnd     ( char c2, char c1);
-static void  sfStartBuffer ( SpecFile *sf, SfCursor *cursor, short status,char c0, char c1,int *error);
+static void  sfStartBuffer ( SpecFile *sf, SfCursor *cursor, char *last,
+                             char *buffer, long bytesread, int *error);
 static void  sfNewLine     ( SpecFile *sf, SfCursor *cursor, char c0,char c1,int *error);
 static void  sfHeaderLine  ( SpecFile *sf, SfCursor *cursor, char c,int *error);
 static void  sfNewBlock    ( SpecFile *sf, SfCursor *cursor, short how,int *error);
 static void  sfSaveScan    ( SpecFile *sf, SfCursor *cursor, int *error);
-static void  sfAssignScanNumbers (SpecFile *sf);
-static void  sfReadFile    ( SpecFile *sf, SfCursor *cursor, int *error);
-static void  sfResumeRead  ( SpecFile *sf, SfCursor *cursor, int *error);
-#ifdef SPECFILE_USE_INDEX_FILE
-static short sfOpenIndex   ( SpecFile *sf, SfCursor *cursor, int *error);
-static short sfReadIndex   ( int sfi, SpecFile *sf, SfCursor *cursor, int *error);
-static void  sfWriteIndex  ( SpecFile *sf, SfCursor *cursor, int *error);
-#endif
+static void  sfAssignScanNumbers (SpecFile *sf, long first);
+static void  sfReadFile    ( SpecFile *sf, SfCursor *cursor, char *last, int *error);
+static void  sfContinueRead ( SpecFile *sf, SfCursor *cursor, char *last, int *error);
+static SpecFile * sfOpenFd ( int fd, char *name, char *idxname,
+                             short *idxstate, int *error);
+static short sfReadIndex   ( SpecFile *sf, SfCursor *cursor, char *idxname,
+                             struct stat *mystat);
+static long  sfReadTail    ( int fd, long size, char *tail );
+static void  sfFreeScans   ( SpecFile *sf );
 
 /*
  * errors
@@ -252,11 +269,74 @@ SfOpen(char *name, int *error) {
 
 DllExport SpecFile *
 SfOpen2(int fd, char *name,int *error) {
+   short       idxstate;
+#ifdef SPECFILE_USE_INDEX_FILE
+   SpecFile   *sf;
+   char       *idxname;
+
+   idxname = (char *)malloc(sizeof(char) * (strlen(name) + strlen(SF_ISFX) + 1));
+   if ( idxname == (char *)NULL ) {
+      *error = SF_ERR_MEMORY_ALLOC;
+      return ( (SpecFile *) NULL );
+   }
+   sprintf(idxname,"%s%s",name,SF_ISFX);
+   sf = sfOpenFd(fd, name, idxname, &idxstate, error);
+   free(idxname);
+   return(sf);
+#else
+   return(sfOpenFd(fd, name, (char *)NULL, &idxstate, error));
+#endif
+}
+
+
+/*********************************************************************
+ *   Function:          SpecFile *SfOpenIndexed( name, idxname,
+ *                                               idxstate, error)
+ *
+ *   Description:       Opens connection to Spec data file.
+ *                      The index list is read from the index file
+ *                      'idxname' if it is valid for this file. If
+ *                      the file only grew since the index was written,
+ *                      only the end of the file is scanned. The index
+ *                      file is (re)written when it was not up to date.
+ *
+ *   Parameters:
+ *              Input :
+ *                      (1) Filename
+ *                      (2) Index filename
+ *              Output:
+ *                      (3) index state (SF_INDEX_NONE, SF_INDEX_READY
+ *                          or SF_INDEX_EXTENDED)
+ *                      (4) error number
+ *   Returns:
+ *                      SpecFile pointer.
+ *                      NULL if not successful.
+ *
+ *   Possible errors:
+ *                      SF_ERR_FILE_OPEN
+ *                      SF_ERR_MEMORY_ALLOC
+ *
+ *********************************************************************/
+DllExport SpecFile *
+SfOpenIndexed(char *name, char *idxname, short *idxstate, int *error) {
+
+   int         fd;
+   fd   = open(name,SF_OPENFLAG);
+   return (sfOpenFd(fd, name, idxname, idxstate, error));
+}
+
+
+static SpecFile *
+sfOpenFd(int fd, char *name, char *idxname, short *idxstate, int *error) {
    SpecFile   *sf;
    short       idxret;
+   char        last[2] = {'\n', '\n'};
+   long        first = 0;
    SfCursor      cursor;
    struct stat mystat;
 
+   *idxstate = SF_INDEX_NONE;
+
    if ( fd == -1 ) {
       *error = SF_ERR_FILE_OPEN;
       return ( (SpecFile *) NULL );
@@ -309,29 +389,36 @@ SfOpen2(int fd, char *name,int *error) {
    cursor.what         = 0;
    cursor.data         = 0;
    cursor.file_header  = 0;
+   cursor.fileh_size   = 0;
 
-
-#ifdef SPECFILE_USE_INDEX_FILE
   /*
    * Check if index file
    *   open it and continue from there
    */
-   idxret = sfOpenIndex(sf,&cursor,error);
-#else
-   idxret = SF_INIT;
-#endif
+   if (idxname != (char *)NULL) {
+      idxret = sfReadIndex(sf,&cursor,idxname,&mystat);
+   } else {
+      idxret = SF_INIT;
+   }
 
    switch(idxret) {
       case SF_MODIFIED:
-          sfResumeRead(sf,&cursor,error);
-          sfReadFile(sf,&cursor,error);
+         /*
+          * The #S line of the last scan may have been incomplete
+          */
+          first = (cursor.what == SCAN) ? sf->no_scans - 1 : sf->no_scans;
+          sfContinueRead(sf,&cursor,last,error);
+          sfReadFile(sf,&cursor,last,error);
+          *idxstate = SF_INDEX_EXTENDED;
           break;
 
       case SF_INIT:
-          sfReadFile(sf,&cursor,error);
+          lseek(fd,0,SEEK_SET);
+          sfReadFile(sf,&cursor,last,error);
           break;
 
       case SF_READY:
+          *idxstate = SF_INDEX_READY;
           break;
 
       default:
@@ -342,18 +429,18 @@ SfOpen2(int fd, char *name,int *error) {
 
   /*
    * Once is all done assign scan numbers and orders
+   * (the ones read from the index file are already known)
    */
-   sfAssignScanNumbers(sf);
-
-#ifdef SPECFILE_USE_INDEX_FILE
-   if (idxret != SF_READY) sfWriteIndex(sf,&cursor,error);
-#endif
+   if (idxret != SF_READY) {
+      sfAssignScanNumbers(sf, first);
+      if (idxname != (char *)NULL) SfWriteIndex(sf, idxname);
+   }
    return(sf);
 }
 
 
 
-
+
 /*********************************************************************
  *
  *   Function:		int SfClose( sf )
@@ -371,16 +458,8 @@ SfOpen2(int fd, char *name,int *error) {
 DllExport int
 SfClose( SpecFile *sf )
 {
-     register ObjectList  *ptr;
-     register ObjectList  *prevptr;
-
      freeAllData(sf);
-
-     for( ptr=sf->list.last ; ptr ; ptr=prevptr ) {
-          free( (SpecScan *)ptr->contents );
-          prevptr = ptr->prev;
-	  free( (ObjectList *)ptr );
-     }
+     sfFreeScans(sf);
 
      free ((char *)sf->sfname);
      if (sf->scanbuffer != NULL)
@@ -406,6 +485,9 @@ SfClose( SpecFile *sf )
  *
  *   Description:       Updates connection to Spec data file .
  *                      Appends to index list in memory.
+ *                      Only the bytes appended to the file since it
+ *                      was last read are parsed: new scans are added
+ *                      and the last scan is extended.
  *
  *   Parameters:
  *              Input :
@@ -417,7 +499,7 @@ SfClose( SpecFile *sf )
  *                      ( 1 ) => File was updated
  *
  *   Possible errors:
- *                      SF_ERR_FILE_OPEN
+ *                      SF_ERR_FILE_READ (file truncated)
  *                      SF_ERR_MEMORY_ALLOC
  *
  *********************************************************************/
@@ -426,28 +508,46 @@ SfUpdate ( SpecFile *sf, int *error )
 {
     struct stat mystat;
     long   mtime;
-   /*printf("In SfUpdate\n");
-   __asm("int3");*/
-    stat(sf->sfname,&mystat);
+    long   first;
+    long   bytecnt;
+    char   last[2];
+
+    if (fstat(sf->fd,&mystat)) {
+       *error = SF_ERR_FILE_READ;
+       return(0);
+    }
+
+    mtime   = mystat.st_mtime;
+    bytecnt = sf->cursor.bytecnt;
 
-    mtime = mystat.st_mtime;
+    if ((long) mystat.st_size < bytecnt) {
+      /*
+       * File truncated, it has to be opened again
+       */
+       *error = SF_ERR_FILE_READ;
+       return(0);
+    }
 
-    if (sf->m_time != mtime)  {
-       sfResumeRead (sf,&(sf->cursor),error);
-       sfReadFile   (sf,&(sf->cursor),error);
+    if (sf->m_time != mtime || (long) mystat.st_size != bytecnt)  {
+       first  = (sf->cursor.what == SCAN) ? sf->no_scans - 1 : sf->no_scans;
+       sfContinueRead (sf,&(sf->cursor),last,error);
+       sfReadFile   (sf,&(sf->cursor),last,error);
 
        sf->m_time = mtime;
-       sfAssignScanNumbers(sf);
-#ifdef SPECFILE_USE_INDEX_FILE
-       sfWriteIndex (sf,&(sf->cursor),error);
-#endif
-       return(1);
+       sfAssignScanNumbers(sf, first);
+
+      /*
+       * Data cached for the current scan may be outdated
+       */
+       freeAllData(sf);
+       sf->current = (ObjectList *)NULL;
+       return(sf->cursor.bytecnt != bytecnt);
     }else{
        return(0);
     }
 }
 
-
+
 /*********************************************************************
  *
  *   Function:		char *SfError( code )
@@ -469,16 +569,18 @@ SfError(int code ) {
 }
 
 
+/*
+ * Parses the file from the current position. 'last' holds the two bytes
+ * preceding this position and is updated with the two last bytes read.
+ */
 static void
-sfReadFile(SpecFile *sf,SfCursor *cursor,int *error) {
+sfReadFile(SpecFile *sf,SfCursor *cursor,char *last,int *error) {
 
    int         fd;
 
    char  *buffer,*ptr;
 
-   long  size,bytesread;
-
-   short  status;
+   long  size,bytesread,start;
 
    fd   = sf->fd;
 
@@ -502,10 +604,10 @@ sfReadFile(SpecFile *sf,SfCursor *cursor,int *error) {
          }
    }
 
-   status              = NEWLINE;
    while ((bytesread = read(fd,buffer,size)) > 0 ) {
 
-      sfStartBuffer(sf,cursor,status,buffer[0],buffer[1],error);
+      start = cursor->bytecnt;
+      sfStartBuffer(sf,cursor,last,buffer,bytesread,error);
 
       cursor->bytecnt++;
       for (ptr=buffer+1;ptr < buffer + bytesread -1; ptr++,cursor->bytecnt++) {
@@ -514,14 +616,19 @@ sfReadFile(SpecFile *sf,SfCursor *cursor,int *error) {
           }
       }
 
-      cursor->bytecnt++;
-      status = statusEnd(buffer[bytesread-2],buffer[bytesread-1]);
+      cursor->bytecnt = start + bytesread;
+      if (bytesread > 1) {
+         last[0] = buffer[bytesread-2];
+      } else {
+         last[0] = last[1];
+      }
+      last[1] = buffer[bytesread-1];
   }
 
   free(buffer);
 
   sf->no_scans = cursor->scanno;
-  if (sf->no_scans > 0) {
+  if (cursor->what == SCAN) {
      /*
       * Save last
       */
@@ -532,119 +639,180 @@ sfReadFile(SpecFile *sf,SfCursor *cursor,int *error) {
 }
 
 
+/*
+ * Prepares the cursor to go on reading the file after the part already
+ * read and gets the two last bytes of this part in 'last'. When the last
+ * block is a scan, its entry in the list is updated instead of
+ * appending a new one.
+ */
 static void
-sfResumeRead  ( SpecFile *sf, SfCursor *cursor, int *error) {
-    cursor->bytecnt      = cursor->cursor;
-    cursor->what         = 0;
-    cursor->hdafoffset   = -1;
-    cursor->dataoffset   = -1;
-    cursor->mcaspectra   = 0;
-    cursor->data         = 0;
-    cursor->scanno--;
-    sf->updating = 1;
+sfContinueRead ( SpecFile *sf, SfCursor *cursor, char *last, int *error) {
+    long  n;
+
+    last[0] = last[1] = '\n';
+
+    n = (cursor->bytecnt < 2) ? cursor->bytecnt : 2;
+    if (n > 0) {
+        lseek(sf->fd,cursor->bytecnt - n,SEEK_SET);
+        if (read(sf->fd,last + 2 - n,n) != n) {
+            *error = SF_ERR_FILE_READ;
+        }
+    }
+    if (cursor->what == SCAN) {
+        sf->updating = 1;
+    }
     lseek(sf->fd,cursor->bytecnt,SEEK_SET);
-    return;
 }
 
-
-#ifdef SPECFILE_USE_INDEX_FILE
-static short
-sfOpenIndex ( SpecFile *sf, SfCursor *cursor, int *error) {
-    char *idxname;
-    short namelength;
-    int   sfi;
 
-    namelength = strlen(sf->sfname) + strlen(SF_ISFX) + 1;
-
-    idxname = (char *)malloc(sizeof(char) * namelength);
+/*********************************************************************
+ *
+ *   Function:		int SfWriteIndex( sf, idxname )
+ *
+ *   Description:	Writes the index list of an opened file to the
+ *			index file 'idxname', to be reused by
+ *			SfOpenIndexed().
+ *   Parameters:
+ *		Input:
+ *			(1) SpecFile pointer
+ *			(2) Index filename
+ *   Returns:
+ *			0 :  index written
+ *		       -1 :  errors occured
+ *
+ *********************************************************************/
+DllExport int
+SfWriteIndex  ( SpecFile *sf, char *idxname ) {
 
-    sprintf(idxname,"%s%s",sf->sfname,SF_ISFX);
+    int         fdi;
+    int         ret = 0;
+    ObjectList *obj;
+    SfIndexKey  key;
+    struct stat mystat;
 
-    if ((sfi = open(idxname,SF_OPENFLAG)) == -1) {
-        free(idxname);
-        return(SF_INIT);
-    } else {
-        free(idxname);
-        return(sfReadIndex(sfi,sf,cursor,error));
+    if (fstat(sf->fd,&mystat)) return(-1);
+
+    memset(&key, 0, sizeof(SfIndexKey));
+    key.sizes[0] = sizeof(long);
+    key.sizes[1] = sizeof(SfCursor);
+    key.sizes[2] = sizeof(SpecScan);
+    key.size     = sf->cursor.bytecnt;
+    key.m_time   = sf->m_time;
+    key.dev      = (long) mystat.st_dev;
+    key.ino      = (long) mystat.st_ino;
+    key.no_scans = sf->no_scans;
+    key.tailsize = sfReadTail(sf->fd, key.size, key.tail);
+    if (key.tailsize < 0) return(-1);
+
+    if ((fdi = open(idxname,SF_TRUNCFLAG,SF_UMASK)) == -1) {
+        return(-1);
+    }
+    if (write(fdi,SF_IDX_SIGNATURE,sizeof(SF_IDX_SIGNATURE)) != sizeof(SF_IDX_SIGNATURE) ||
+        write(fdi,(void *) &key,sizeof(SfIndexKey)) != sizeof(SfIndexKey) ||
+        write(fdi,(void *) &(sf->cursor),sizeof(SfCursor)) != sizeof(SfCursor)) {
+        ret = -1;
+    }
+    for( obj = sf->list.first; obj && ret == 0; obj = obj->next) {
+        if (write(fdi,(void *) obj->contents, sizeof(SpecScan)) != sizeof(SpecScan))
+            ret = -1;
     }
+    close(fdi);
+    if (ret) unlink(idxname);
+    return(ret);
 }
 
-
+
+/*
+ * Reads the index file 'idxname' and fills the scan list if it was
+ * written for this very file ( same device and inode, not shorter, same
+ * content at the end of the indexed part ).
+ */
 static short
-sfReadIndex   ( int sfi, SpecFile *sf, SfCursor *cursor, int *error) {
-    SfCursor   filecurs;
-    char       buffer[200];
-    long       bytesread,i=0;
-    SpecScan   scan;
-    short      modif = 0;
-    long       mtime;
-
-   /*
-    * read signature
-    */
-    bytesread = read(sfi,buffer,sizeof(SF_SIGNATURE));
-    if (strcmp(buffer,SF_SIGNATURE) || bytesread == 0 ) {
+sfReadIndex   ( SpecFile *sf, SfCursor *cursor, char *idxname, struct stat *mystat) {
+    int         sfi;
+    char        signature[sizeof(SF_IDX_SIGNATURE)];
+    char        tail[SF_IDX_TAIL];
+    SfIndexKey  key;
+    SfCursor    filecurs;
+    SpecScan    scan;
+    long        i;
+
+    if ((sfi = open(idxname,SF_OPENFLAG)) == -1) {
         return(SF_INIT);
     }
 
-   /*
-    * read cursor and specfile structure
-    */
-    if ( read(sfi,&mtime,   sizeof(long)) == 0)   return(SF_INIT);
-    if ( read(sfi,&filecurs, sizeof(SfCursor)) == 0) return(SF_INIT);
+    if (read(sfi,signature,sizeof(signature)) != sizeof(signature) ||
+        memcmp(signature,SF_IDX_SIGNATURE,sizeof(signature)) ||
+        read(sfi,&key,sizeof(SfIndexKey)) != sizeof(SfIndexKey) ||
+        read(sfi,&filecurs,sizeof(SfCursor)) != sizeof(SfCursor)) {
+        close(sfi);
+        return(SF_INIT);
+    }
 
-    if (sf->m_time != mtime)  modif = 1;
+    if (key.sizes[0] != sizeof(long) ||
+        key.sizes[1] != sizeof(SfCursor) ||
+        key.sizes[2] != sizeof(SpecScan) ||
+        key.dev != (long) mystat->st_dev ||
+        key.ino != (long) mystat->st_ino ||
+        key.size > (long) mystat->st_size ||
+        key.tailsize != sfReadTail(sf->fd, key.size, tail) ||
+        memcmp(key.tail, tail, key.tailsize)) {
+        close(sfi);
+        return(SF_INIT);
+    }
 
-    while(read(sfi,&scan, sizeof(SpecScan))) {
-        addToList(&(sf->list), (void *)&scan, (long)sizeof(SpecScan));
-        i++;
+    for (i = 0; i < key.no_scans; i++) {
+        if (read(sfi,&scan,sizeof(SpecScan)) != sizeof(SpecScan) ||
+            addToList(&(sf->list), (void *)&scan, (long)sizeof(SpecScan))) {
+            sfFreeScans(sf);
+            close(sfi);
+            return(SF_INIT);
+        }
     }
-    sf->no_scans = i;
+    close(sfi);
 
+    sf->no_scans = key.no_scans;
     memcpy(cursor,&filecurs,sizeof(SfCursor));
 
-    if (modif) return(SF_MODIFIED);
-
+    if (key.size != (long) mystat->st_size || key.m_time != sf->m_time) {
+        return(SF_MODIFIED);
+    }
     return(SF_READY);
 }
 
-
-static void
-sfWriteIndex  ( SpecFile *sf, SfCursor *cursor, int *error) {
 
-    int         fdi;
-    char       *idxname;
-    short       namelength;
-    ObjectList *obj;
-    long        mtime;
-
-    namelength = strlen(sf->sfname) + strlen(SF_ISFX) + 1;
-
-    idxname = (char *)malloc(sizeof(char) * namelength);
-
-    sprintf(idxname,"%s%s",sf->sfname,SF_ISFX);
-
-    /* if ((fdi = open(idxname,SF_WRITEFLAG,SF_UMASK)) == -1) { */
-    if ((fdi = open(idxname,O_CREAT | O_WRONLY,SF_UMASK)) == -1) {
-        printf("    - cannot open. Error: (%d)\n",errno);
-        free(idxname);
-        return;
-    } else {
-        mtime = sf->m_time;
-        write(fdi,SF_SIGNATURE,sizeof(SF_SIGNATURE));
- /*
-  * Swap bytes for linux
-  */
-        write(fdi, (void *) &mtime, sizeof(long));
-        write(fdi, (void *) cursor, sizeof(SfCursor));
-        for( obj = sf->list.first; obj ; obj = obj->next)
-           write(fdi,(void *) obj->contents, sizeof(SpecScan));
-        close(fdi);
-        free(idxname);
-        return;
+/*
+ * Copies the last bytes ( at most SF_IDX_TAIL ) before 'size' into
+ * 'tail' and returns their number, or -1 on read error.
+ */
+static long
+sfReadTail    ( int fd, long size, char *tail ) {
+    long tailsize;
+
+    tailsize = (size < SF_IDX_TAIL) ? size : SF_IDX_TAIL;
+    if (tailsize == 0) return(0);
+    if (lseek(fd,size - tailsize,SEEK_SET) == -1 ||
+        read(fd,tail,tailsize) != tailsize) {
+        return(-1);
     }
+    return(tailsize);
+}
+
+
+static void
+sfFreeScans   ( SpecFile *sf ) {
+     ObjectList  *ptr;
+     ObjectList  *prevptr;
+
+     for( ptr=sf->list.last ; ptr ; ptr=prevptr ) {
+          free( (SpecScan *)ptr->contents );
+          prevptr = ptr->prev;
+          free( (ObjectList *)ptr );
+     }
+     sf->list.first = (ObjectList *)NULL;
+     sf->list.last  = (ObjectList *)NULL;
+     sf->no_scans   = 0;
 }
-#endif
 
 
 /*****************************************************************************
@@ -652,46 +820,29 @@ sfWriteIndex  ( SpecFile *sf, SfCursor *cursor, int *error) {
  *    Function:   static void sfStartBuffer()
  *
  *    Description:  start analyzing file buffer and takes into account the last
- *                  bytes of previous reading as defined in variable status
+ *                  bytes of previous reading: a line starting at one of the
+ *                  two bytes around the boundary is analyzed once the byte
+ *                  following its first one is known
  *
  *****************************************************************************/
 static void
-sfStartBuffer(SpecFile *sf,SfCursor *cursor,short status,char c0,char c1,int *error) {
+sfStartBuffer(SpecFile *sf,SfCursor *cursor,char *last,char *buffer,long bytesread,int *error) {
 
-    if ( status == ANY ) {
-        return;
-    } else if ( status == NEWLINE ) {
-        sfNewLine(sf,cursor,c0,c1,error);
-    } else if ( status == COMMENT ) {
+    if ( last[1] == '\n' ) {
+        /* line starting at the first byte of the buffer */
+        if ( bytesread > 1 ) {
+            sfNewLine(sf,cursor,buffer[0],buffer[1],error);
+        }
+    } else if ( last[0] == '\n' ) {
+        /* line starting at the last byte of previous reading */
         cursor->bytecnt--;
-        sfHeaderLine(sf,cursor,c0,error);
+        sfNewLine(sf,cursor,last[1],buffer[0],error);
         cursor->bytecnt++;
     }
 
 }
 
-
-/*******************************************************************************
- *
- *    Function:   static void statusEnd()
- *
- *    Description:  ends analysis of file buffer and returns a variable
- *                  indicating staus ( last character is COMMENT,NEWLINE of ANY )
- *
- *******************************************************************************/
-static short
-statusEnd(char c2,char c1) {
-
-      if (c2=='\n' && c1=='#') {
-            return(COMMENT);
-      } else if (c1=='\n') {
-            return(NEWLINE);
-      } else {
-            return(ANY);
-      }
-}
 
-
 static void
 sfNewLine(SpecFile *sf,SfCursor *cursor,char c0,char c1,int *error) {
      if (c0 == '#') {
@@ -788,8 +939,12 @@ sfSaveScan(SpecFile *sf, SfCursor *cursor,int *error) {
 }
 
 
+/*
+ * Assigns scan numbers and orders to the scans with an index
+ * greater than 'first'
+ */
 static void
-sfAssignScanNumbers(SpecFile *sf) {
+sfAssignScanNumbers(SpecFile *sf, long first) {
 
   int i;
   char *ptr;
@@ -803,12 +958,16 @@ sfAssignScanNumbers(SpecFile *sf) {
 
   for ( object = (sf->list).first; object; object=object->next) {
         scan = (SpecScan *) object->contents;
+        if (scan->index <= first) continue;
 
         lseek(sf->fd,scan->offset,SEEK_SET);
-        read(sf->fd,buffer,sizeof(buffer));
-        buffer[49] = '\0';
+        memset(buffer,0,sizeof(buffer));
+        read(sf->fd,buffer,sizeof(buffer) - 1);
 
-        for ( ptr = buffer+3,i=0; *ptr != ' ';ptr++,i++) buffer2[i] = *ptr;
+       /*
+        * The #S line may be incomplete in a file being written
+        */
+        for ( ptr = buffer+3,i=0; *ptr != ' ' && *ptr != '\n' && *ptr != '\0';ptr++,i++) buffer2[i] = *ptr;
 
         buffer2[i] = '\0';
 
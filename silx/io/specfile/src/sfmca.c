@@ -84,6 +84,13 @@ DllExport int  SfGetMca   ( SpecFile *sf, long index, long mcano,
                                           double **retdata, int *error );
 DllExport long SfMcaCalib ( SpecFile *sf, long index, double **calib,
                                           int *error );
+DllExport long SfGetMcaBlock ( SpecFile *sf, long index, long first,
+                                          long step, long group, long count,
+                                          long channels, void *data, int type,
+                                          short *regular, int *error );
+
+static double sfMcaAtof   ( char *strval, int len );
+static void   sfMcaStore  ( void *data, int type, long pos, double val );
 
 
 /*********************************************************************
@@ -339,3 +346,189 @@ SfMcaCalib ( SpecFile *sf, long index, double **calib, int *error )
      *calib = retdata;
      return(0);
 }
+
+
+/*********************************************************************
+ *   Function:        long SfGetMcaBlock(sf, index, first, step, group,
+ *                              count, channels, data, type, regular, error)
+ *
+ *   Description:    Gets several MCA spectra of a scan in a single pass
+ *                   over the scan buffer.
+ *
+ *                   Spectra are selected by groups of 'group' consecutive
+ *                   spectra, the first group starting at spectrum 'first'
+ *                   and the next ones every 'step' spectra, until 'count'
+ *                   spectra were read. With group = 1 this is a strided
+ *                   read, with group = step it reads whole scan points of
+ *                   multiplexed analysers.
+ *
+ *   Parameters:
+ *        Input :    (1) File pointer
+ *            (2) Index
+ *            (3) Number of the first spectrum (1 is the first one)
+ *            (4) Step between the beginning of two groups
+ *            (5) Number of spectra per group
+ *            (6) Number of spectra to read
+ *            (7) Number of channels of each spectrum
+ *            (8) Preallocated array of count * channels values
+ *            (9) Type of the array values (SF_MCA_FLOAT64, ...)
+ *        Output:
+ *            (10) 0 if some spectrum had not 'channels' values.
+ *                 Missing values are set to 0, extra values are dropped.
+ *            (11) error number
+ *   Returns:
+ *            Number of spectra read,
+ *            ( -1 ) => errors occured
+ *   Possible errors:
+ *            SF_ERR_FILE_READ
+ *            SF_ERR_SCAN_NOT_FOUND
+ *            SF_ERR_MCA_NOT_FOUND
+ *
+ *********************************************************************/
+DllExport long
+SfGetMcaBlock( SpecFile *sf, long index, long first, long step, long group,
+               long count, long channels, void *data, int type,
+               short *regular, int *error )
+{
+     SpecScan *scan;
+     char     *ptr,
+              *to;
+     char      strval[100];
+     int       i;
+     long      spect_no = 0,
+               row      = 0,
+               vals;
+#ifndef _GNU_SOURCE
+#ifdef PYMCA_POSIX
+	char *currentLocaleBuffer;
+	char localeBuffer[21];
+#endif
+#endif
+
+     if (first < 1 || step < 1 || group < 1 || group > step
+                   || count < 0 || channels < 0) {
+         *error = SF_ERR_MCA_NOT_FOUND;
+          return(-1);
+     }
+
+     if (sfSetCurrent(sf,index,error) == -1 )
+             return(-1);
+
+     scan = (SpecScan *)sf->current->contents;
+     ptr  = sf->scanbuffer + scan->data_offset - scan->offset;
+     to   = sf->scanbuffer + scan->size;
+
+    *regular = 1;
+
+#ifndef _GNU_SOURCE
+#ifdef PYMCA_POSIX
+	currentLocaleBuffer = setlocale(LC_NUMERIC, NULL);
+	strcpy(localeBuffer, currentLocaleBuffer);
+	setlocale(LC_NUMERIC, "C\0");
+#endif
+#endif
+     while ( row < count && ptr < to ) {
+         if (*ptr++ != '@')
+             continue;
+
+         spect_no++;
+         if (spect_no < first || (spect_no - first) % step >= group)
+             continue;
+
+         /*
+          * skip analyser letter and read values until the end of the
+          * line, following continuation characters
+          */
+         ptr++;
+         i    = 0;
+         vals = 0;
+         for ( ; ptr < to ; ptr++) {
+             if (*ptr == ' ' || *ptr == '\t' || *ptr == MCA_CONT || *ptr == '\n') {
+                 if ( i ) {
+                     strval[i] = '\0';
+                     if (vals < channels)
+                         sfMcaStore(data, type, row * channels + vals,
+                                    sfMcaAtof(strval, i));
+                     vals++;
+                     i = 0;
+                 }
+                 if (*ptr == '\n' && *(ptr-1) != MCA_CONT)
+                     break;
+             } else if (isnumber(*ptr) && i < 99) {
+                 strval[i] = *ptr;
+                 i++;
+             }
+         }
+         if ( i ) {
+             strval[i] = '\0';
+             if (vals < channels)
+                 sfMcaStore(data, type, row * channels + vals,
+                            sfMcaAtof(strval, i));
+             vals++;
+         }
+
+         if (vals != channels) {
+             *regular = 0;
+             for ( ; vals < channels ; vals++)
+                 sfMcaStore(data, type, row * channels + vals, 0.);
+         }
+         row++;
+     }
+#ifndef _GNU_SOURCE
+#ifdef PYMCA_POSIX
+	setlocale(LC_NUMERIC, localeBuffer);
+#endif
+#endif
+
+     if (row < count) {
+         *error = SF_ERR_MCA_NOT_FOUND;
+          return(-1);
+     }
+
+     return( row );
+}
+
+
+/*
+ * Most MCA values are integer counts: convert them without the
+ * locale independent (and much slower) PyMcaAtof.
+ */
+static double
+sfMcaAtof( char *strval, int len )
+{
+     char   *ptr = strval;
+     double  val = 0.;
+
+     if (*ptr == '-' || *ptr == '+')
+         ptr++;
+
+     if (*ptr == '\0' || len > 15)
+         return( PyMcaAtof(strval) );
+
+     for ( ; *ptr ; ptr++) {
+         if (!isdigit(*ptr))
+             return( PyMcaAtof(strval) );
+         val = val * 10. + (*ptr - '0');
+     }
+
+     return( *strval == '-' ? -val : val );
+}
+
+
+static void
+sfMcaStore( void *data, int type, long pos, double val )
+{
+     switch (type) {
+         case SF_MCA_FLOAT32:
+             ((float *)data)[pos] = (float)val;
+             break;
+         case SF_MCA_INT32:
+             ((int *)data)[pos] = (int)val;
+             break;
+         case SF_MCA_UINT32:
+             ((unsigned int *)data)[pos] = (val > 0.) ? (unsigned int)val : 0;
+             break;
+         default:
+             ((double *)data)[pos] = val;
+     }
+}
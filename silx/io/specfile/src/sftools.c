@@ -143,7 +143,11 @@ sfSetCurrent( SpecFile *sf, long index,int *error )
 
      if (sf->scanbuffer != ( char * ) NULL) free(sf->scanbuffer);
 
-     sf->scanbuffer = ( char *) malloc(scan->size);
+    /*
+     * One more byte for a newline sentinel: the last line of a file
+     * being written (or without final newline) may be incomplete
+     */
+     sf->scanbuffer = ( char *) malloc(scan->size + 1);
 
      if (sf->scanbuffer == (char *)NULL) {
          *error = SF_ERR_MEMORY_ALLOC;
@@ -156,6 +160,7 @@ sfSetCurrent( SpecFile *sf, long index,int *error )
          *error = SF_ERR_FILE_READ;
          return(-1);
      }
+     sf->scanbuffer[scan->size] = '\n';
      if ( sf->scanbuffer[0] != '#' || sf->scanbuffer[1] != 'S') {
          *error = SF_ERR_FILE_READ;
          return(-1);
@@ -181,7 +186,7 @@ sfSetCurrent( SpecFile *sf, long index,int *error )
         }
 
         if (fileheadsize > 0) {
-            sf->filebuffer = ( char *) malloc(fileheadsize);
+            sf->filebuffer = ( char *) malloc(fileheadsize + 1);
             if (sf->filebuffer == (char *)NULL) {
                *error = SF_ERR_MEMORY_ALLOC;
                 return(-1);
@@ -192,6 +197,7 @@ sfSetCurrent( SpecFile *sf, long index,int *error )
                *error = SF_ERR_FILE_READ;
                return(-1);
             }
+            sf->filebuffer[fileheadsize] = '\n';
             sf->filebuffersize = fileheadsize;
         }
      }
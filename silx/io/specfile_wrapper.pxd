@@ -37,6 +37,9 @@ ctypedef _SpecFile SpecFileHandle
 cdef extern from "SpecFileCython.h":
     # sfinit
     SpecFileHandle* SfOpen(char*, int*)
+    SpecFileHandle* SfOpenIndexed(char*, char*, short*, int*)
+    int SfWriteIndex(SpecFileHandle*, char*)
+    short SfUpdate(SpecFileHandle*, int*)
     int SfClose(SpecFileHandle*)
     char* SfError(int)
     
@@ -74,4 +77,6 @@ cdef extern from "SpecFileCython.h":
     long SfNoMca(SpecFileHandle*, long, int*)
     int  SfGetMca(SpecFileHandle*, long, long , double**, int*)
     long SfMcaCalib(SpecFileHandle*, long, double**, int*)
+    long SfGetMcaBlock(SpecFileHandle*, long, long, long, long, long, long,
+                       void*, int, short*, int*)
 
@@ -421,7 +421,7 @@ def spec_date_to_iso8601(date, zone=None):
     return full_date
 
 
-def _demultiplex_mca(scan, analyser_index):
+def _demultiplex_mca(scan, analyser_index, dtype=numpy.float64):
     """Return MCA data for a single analyser.
 
     Each MCA spectrum is a 1D array. For each analyser, there is one
@@ -433,19 +433,14 @@ def _demultiplex_mca(scan, analyser_index):
     :param scan: :class:`Scan` instance containing the MCA data
     :param analyser_index: 0-based index referencing the analyser
     :type analyser_index: int
+    :param dtype: dtype of the returned array
     :return: 2D numpy array containing all spectra for one analyser
     """
-    number_of_analysers = _get_number_of_mca_analysers(scan)
-    number_of_spectra = len(scan.mca)
-    number_of_spectra_per_analyser = number_of_spectra // number_of_analysers
-    len_spectrum = len(scan.mca[analyser_index])
-
-    mca_array = numpy.empty((number_of_spectra_per_analyser, len_spectrum))
-
-    for i in range(number_of_spectra_per_analyser):
-        mca_array[i, :] = scan.mca[analyser_index + i * number_of_analysers]
-
-    return mca_array
+    return scan._specfile.get_mca_block(
+        scan.index,
+        number_of_analysers=_get_number_of_mca_analysers(scan),
+        analyser_index=analyser_index,
+        dtype=dtype)
 
 
 # Node classes
@@ -551,16 +546,21 @@ class SpecH5(commonh5.File, SpecH5Group):
     which implements most of its API.
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, index_cache=None, mca_dtype=numpy.float64):
         """
         :param filename: Path to SpecFile in filesystem
         :type filename: str
+        :param index_cache: Where to store the index of the scans
+            (see :class:`silx.io.specfile.SpecFile`)
+        :param mca_dtype: dtype of the MCA datasets
+            (e.g. ``numpy.float32`` or ``numpy.uint32`` to save memory)
         """
         if isinstance(filename, io.IOBase):
             # see https://github.com/silx-kit/silx/issues/858
             filename = filename.name
 
-        self._sf = SpecFile(filename)
+        self._mca_dtype = numpy.dtype(mca_dtype)
+        self._sf = SpecFile(filename, index_cache=index_cache)
 
         attrs = {"NX_class": to_h5py_utf8("NXroot"),
                  "file_time": to_h5py_utf8(
@@ -574,6 +574,36 @@ class SpecH5(commonh5.File, SpecH5Group):
             scan_group = ScanGroup(scan_key, parent=self, scan=scan)
             self.add_node(scan_group)
 
+    def refresh(self):
+        """Update the tree with what was appended to the file since it was
+        opened or last refreshed.
+
+        Groups of appended scans are added, and the group of the last scan
+        previously available is updated in place with appended lines.
+        Only the appended part of the file is parsed
+        (see :meth:`silx.io.specfile.SpecFile.update`).
+
+        :return: Keys of the scans which were added or updated
+        :rtype: List[str]
+        """
+        number_of_scans = len(self._sf)
+        if not self._sf.update():
+            return []
+
+        scan_keys = self._sf.keys()[max(number_of_scans - 1, 0):]
+        for scan_key in scan_keys:
+            scan = self._sf[scan_key]
+            if scan_key in self:
+                self[scan_key]._update(scan)
+            else:
+                self.add_node(ScanGroup(scan_key, parent=self, scan=scan))
+        return scan_keys
+
+    @property
+    def mca_dtype(self):
+        """dtype of the MCA datasets"""
+        return self._mca_dtype
+
     def close(self):
         self._sf.close()
         self._sf = None
@@ -589,6 +619,15 @@ class ScanGroup(commonh5.Group, SpecH5Group):
         """
         commonh5.Group.__init__(self, scan_key, parent=parent,
                                 attrs={"NX_class": to_h5py_utf8("NXentry")})
+        self._update(scan)
+
+    def _update(self, scan):
+        """Fill the group or update it with a more recent version of the
+        same scan (e.g. with appended data lines).
+
+        :param scan: specfile.Scan object
+        """
+        scan_key = self.basename
 
         # take title in #S after stripping away scan number and spaces
         s_hdr_line = scan.scan_header_dict["S"]
@@ -624,8 +663,14 @@ class ScanGroup(commonh5.Group, SpecH5Group):
                                         data=to_h5py_utf8(start_time_str),
                                         parent=self))
 
-        self.add_node(InstrumentGroup(parent=self, scan=scan))
-        self.add_node(MeasurementGroup(parent=self, scan=scan))
+        if "instrument" in self:
+            self["instrument"]._update(scan)
+        else:
+            self.add_node(InstrumentGroup(parent=self, scan=scan))
+        if "measurement" in self:
+            self["measurement"]._update(scan)
+        else:
+            self.add_node(MeasurementGroup(parent=self, scan=scan))
         if _unit_cell_in_scan(scan) or _ub_matrix_in_scan(scan):
             self.add_node(SampleGroup(parent=self, scan=scan))
 
@@ -639,7 +684,14 @@ class InstrumentGroup(commonh5.Group, SpecH5Group):
         """
         commonh5.Group.__init__(self, name="instrument", parent=parent,
                                 attrs={"NX_class": to_h5py_utf8("NXinstrument")})
+        self._update(scan)
 
+    def _update(self, scan):
+        """Fill the group or update it with a more recent version of the
+        same scan.
+
+        :param scan: specfile.Scan object
+        """
         self.add_node(InstrumentSpecfileGroup(parent=self, scan=scan))
         self.add_node(PositionersGroup(parent=self, scan=scan))
 
@@ -750,9 +802,23 @@ class McaDataDataset(SpecH5LazyNodeDataset):
         self._analyser_index = analyser_index
         self._shape = None
         self._num_analysers = _get_number_of_mca_analysers(self._scan)
+        h5file = self.file
+        if h5file is not None and hasattr(h5file, "mca_dtype"):
+            self._dtype = h5file.mca_dtype
+        else:
+            self._dtype = numpy.dtype(numpy.float64)
 
     def _create_data(self):
-        return _demultiplex_mca(self._scan, self._analyser_index)
+        return _demultiplex_mca(self._scan, self._analyser_index, self._dtype)
+
+    def _get_block(self, lines):
+        """Read the spectra of the data lines selected by a slice in a single
+        pass over the scan"""
+        return self._scan._specfile.get_mca_block(
+            self._scan.index, lines.start, lines.stop, lines.step,
+            number_of_analysers=self._num_analysers,
+            analyser_index=self._analyser_index,
+            dtype=self._dtype)
 
     @property
     def shape(self):
@@ -769,33 +835,39 @@ class McaDataDataset(SpecH5LazyNodeDataset):
 
     @property
     def dtype(self):
-        # we initialize the data with numpy.empty() without specifying a dtype
-        # in _demultiplex_mca()
-        return numpy.empty((1, )).dtype
+        return self._dtype
 
     def __len__(self):
         return self.shape[0]
 
     def __getitem__(self, item):
-        # optimization for fetching a single spectrum if data not already loaded
+        # optimization for fetching a single spectrum or a slice of spectra
+        # if data not already loaded
         if not self._is_initialized:
             if isinstance(item, six.integer_types):
                 if item < 0:
                     # negative indexing
                     item += len(self)
-                return self._scan.mca[self._analyser_index +
-                                      item * self._num_analysers]
+                spectrum = self._scan.mca[self._analyser_index +
+                                          item * self._num_analysers]
+                return spectrum.astype(self._dtype, copy=False)
+            if isinstance(item, slice):
+                return self._get_block(item)
             # accessing a slice or element of a single spectrum [i, j:k]
+            # or of several spectra [i:j:k, l:m]
             try:
                 spectrum_idx, channel_idx_or_slice = item
-                assert isinstance(spectrum_idx, six.integer_types)
+                assert isinstance(spectrum_idx, six.integer_types + (slice,))
             except (ValueError, TypeError, AssertionError):
                 pass
             else:
+                if isinstance(spectrum_idx, slice):
+                    return self._get_block(spectrum_idx)[:, channel_idx_or_slice]
                 if spectrum_idx < 0:
-                    item += len(self)
+                    spectrum_idx += len(self)
                 idx = self._analyser_index + spectrum_idx * self._num_analysers
-                return self._scan.mca[idx][channel_idx_or_slice]
+                spectrum = self._scan.mca[idx][channel_idx_or_slice]
+                return numpy.asarray(spectrum, dtype=self._dtype)[()]
 
         return super(McaDataDataset, self).__getitem__(item)
 
@@ -809,6 +881,14 @@ class MeasurementGroup(commonh5.Group, SpecH5Group):
         """
         commonh5.Group.__init__(self, name="measurement", parent=parent,
                                 attrs={"NX_class": to_h5py_utf8("NXcollection"),})
+        self._update(scan)
+
+    def _update(self, scan):
+        """Fill the group or update it with a more recent version of the
+        same scan.
+
+        :param scan: specfile.Scan object
+        """
         for label in scan.labels:
             safe_label = label.replace("/", "%")
             self.add_node(SpecH5NodeDataset(name=safe_label,
@@ -229,6 +229,44 @@ class TestDictToH5(unittest.TestCase):
             self.assertEqual(h5file["links/absolute_softlink"][()], 10)
             self.assertEqual(h5file["links/external_link"][()], 10)
 
+    def testPackScalarsAttributes(self):
+        ddict = {"fit": {"area": 1.5, "chisq": 2, "name": "peak",
+                         "params": [1., 2.], ("params", "unit"): "eV"},
+                 "position": 3.}
+        plan = dicttoh5(ddict, self.h5_fname, pack_scalars="attributes")
+        self.assertEqual(plan.packed_scalars, 3)
+        with h5py.File(self.h5_fname, "r") as h5file:
+            self.assertEqual(h5file["fit"].attrs["area"], 1.5)
+            self.assertEqual(h5file["fit"].attrs["chisq"], 2)
+            self.assertEqual(h5file.attrs["position"], 3.)
+            self.assertNotIn("area", h5file["fit"])
+            self.assertEqual(h5py_read_dataset(h5file["fit/name"]), "peak")
+            self.assertEqual(h5file["fit/params"].attrs["unit"], "eV")
+
+    def testPackScalarsCompound(self):
+        ddict = {"fit": {"area": 1.5, "chisq": 2, "params": [1., 2.]}}
+        dicttoh5(ddict, self.h5_fname, pack_scalars="compound")
+        with h5py.File(self.h5_fname, "r") as h5file:
+            scalars = h5file["fit/scalars"][()]
+            self.assertEqual(scalars["area"], 1.5)
+            self.assertEqual(scalars["chisq"], 2)
+            self.assertEqual(set(h5file["fit"].keys()), {"scalars", "params"})
+
+        with self.assertRaises(ValueError):
+            dicttoh5({"a": 1, "scalars": 2}, self.h5_fname,
+                     pack_scalars="compound")
+
+    def testDatasetPolicy(self):
+        ddict = {"small": numpy.arange(10), "large": numpy.arange(1000)}
+        policy = [(1000, {"chunks": True}),
+                  (4000, {"chunks": True, "compression": "gzip"})]
+        plan = dicttoh5(ddict, self.h5_fname, dataset_policy=policy)
+        self.assertEqual(len(plan.datasets), 2)
+        self.assertIsInstance(plan.summary(), str)
+        with h5py.File(self.h5_fname, "r") as h5file:
+            self.assertIsNone(h5file["small"].chunks)
+            self.assertEqual(h5file["large"].compression, "gzip")
+
     def testDumpNumpyArray(self):
         ddict = {
             'darks': {
@@ -312,6 +350,70 @@ class TestH5ToDict(unittest.TestCase):
         numpy.testing.assert_array_equal(ddict[("", "attr_2bytes")], adict[("", "attr_2bytes")])
         numpy.testing.assert_array_equal(ddict[("", "attr_2utf8")], adict[("", "attr_2utf8")])
 
+    def testLazy(self):
+        ddict = h5todict(self.h5_fname, path="/Europe/France", lazy=True)
+        self.assertIsInstance(ddict, dictdump.LazyH5Dict)
+        grenoble = ddict["Grenoble"]
+        self.assertFalse(grenoble.is_loaded("inhabitants"))
+        self.assertEqual(grenoble["inhabitants"], inhabitants)
+        self.assertTrue(grenoble.is_loaded("inhabitants"))
+        self.assertFalse(grenoble.is_loaded("area"))
+
+        result = ddict.to_dict()
+        self.assertIs(type(result["Grenoble"]), dict)
+        numpy.testing.assert_array_equal(result["Grenoble"]["coordinates"],
+                                         [45.1830, 5.7196])
+
+    def testLazyOpenedFile(self):
+        with h5py.File(self.h5_fname, "r") as h5file:
+            ddict = h5todict(h5file, path="/Europe/France/Grenoble", lazy=True)
+            self.assertEqual(ddict["inhabitants"], inhabitants)
+
+    def testLazyMinSize(self):
+        ddict = h5todict(self.h5_fname, path="/Europe/France/Grenoble",
+                         lazy=True, lazy_min_size=2)
+        self.assertTrue(ddict.is_loaded("inhabitants"))
+        self.assertFalse(ddict.is_loaded("coordinates"))
+
+    def testLazyEmptyDataset(self):
+        with h5py.File(self.h5_fname, "a") as h5file:
+            h5file["empty"] = h5py.Empty("f")
+        ddict = h5todict(self.h5_fname, lazy=True, asarray=False)
+        self.assertTrue(ddict.is_loaded("empty"))
+        self.assertIsInstance(ddict["empty"], h5py.Empty)
+        self.assertFalse(ddict["Europe"]["France"]["Grenoble"].is_loaded("area"))
+
+    def testLazyToH5(self):
+        ddict = h5todict(self.h5_fname, path="/Europe/France", lazy=True)
+        h5_fname = os.path.join(self.tempdir, "lazy.h5")
+        dicttoh5(ddict, h5_fname, dataset_policy="auto",
+                 pack_scalars="attributes")
+        # datasets are read when written, without being kept in the dict
+        self.assertFalse(ddict["Grenoble"].is_loaded("coordinates"))
+        with h5py.File(h5_fname, "r") as h5file:
+            numpy.testing.assert_array_equal(
+                h5file["Grenoble/coordinates"][()], [45.1830, 5.7196])
+            self.assertEqual(h5file["Grenoble"].attrs["inhabitants"],
+                             inhabitants)
+        os.unlink(h5_fname)
+
+    def testMaxDepth(self):
+        ddict = h5todict(self.h5_fname, path="/Europe", max_depth=1)
+        self.assertEqual(ddict, {"France": {}})
+
+        ddict = h5todict(self.h5_fname, path="/Europe", max_depth=0)
+        self.assertEqual(ddict, {})
+
+    def testIncludePatterns(self):
+        ddict = h5todict(self.h5_fname, path="/Europe",
+                         include_patterns=["*/Gre*/coord*", "*/Tourcoing"])
+        self.assertEqual(set(ddict["France"].keys()), {"Grenoble", "Tourcoing"})
+        self.assertEqual(list(ddict["France"]["Grenoble"].keys()), ["coordinates"])
+
+        ddict = h5todict(self.h5_fname, path="/Europe",
+                         include_patterns="Asia/*")
+        self.assertEqual(ddict, {})
+
 
 class TestDictToNx(unittest.TestCase):
     def setUp(self):
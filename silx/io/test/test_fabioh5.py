@@ -613,6 +613,172 @@ class TestFabioH5WithFileSeries(unittest.TestCase):
         frameData = _TestableFrameData("foo", reader)
         self.assertEqual(frameData.dtype.kind, "i")
         self.assertEqual(frameData.shape, (10, 3, 2))
+        self.assertEqual(frameData[2:8:2, 0, 0].tolist(), [2, 4, 6])
+
+    def testParallelDecoding(self):
+        for workers, read_ahead in [(1, None), (3, 1), (4, None)]:
+            reader = fabioh5.FabioReader(file_series=self.edf_filenames,
+                                         workers=workers,
+                                         read_ahead=read_ahead)
+            data = reader.get_data()
+            self.assertEqual(data[:, 0, 0].tolist(), list(range(10)))
+            frames = [frame[0, 0] for frame in reader.iter_frame_data()]
+            self.assertEqual(frames, list(range(10)))
+            image_ids = reader.get_value(fabioh5.FabioReader.DEFAULT, "image_id")
+            self.assertEqual(image_ids.tolist(), list(range(10)))
+            # stop an iteration before its end
+            for frame in reader.iter_frame_data(range(9, -1, -1)):
+                self.assertEqual(frame[0, 0], 9)
+                break
+            reader.close()
+
+    def testParallelDecodingEarlyStop(self):
+        reader = fabioh5.FabioReader(file_series=self.edf_filenames,
+                                     workers=3, read_ahead=4)
+        opened, closed = [], []
+        open_file = reader._open_file
+
+        def _open_file(file_number):
+            fabio_image = open_file(file_number)
+            opened.append(file_number)
+            close = fabio_image.close
+
+            def _close():
+                closed.append(file_number)
+                close()
+            fabio_image.close = _close
+            return fabio_image
+
+        reader._open_file = _open_file
+        frames = reader.iter_frames()
+        next(frames)
+        frames.close()
+        reader.close()
+        # Files opened ahead and not consumed are closed
+        self.assertGreater(len(opened), 1)
+        self.assertEqual(sorted(closed), sorted(opened))
+
+
+class TestFabioH5LazyCube(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_directory = tempfile.mkdtemp()
+        cls.edf_filename = os.path.join(cls.tmp_directory, "cube.edf")
+        cls.data = numpy.arange(20 * 4 * 3, dtype=numpy.uint16)
+        cls.data.shape = 20, 4, 3
+        fabio_image = fabio.edfimage.edfimage(data=cls.data[0])
+        for frame in cls.data[1:]:
+            fabio_image.append_frame(data=frame)
+        fabio_image.write(cls.edf_filename)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_directory)
+
+    def setUp(self):
+        frame_size = self.data[0].nbytes
+        self.reader = fabioh5.EdfFabioReader(file_name=self.edf_filename,
+                                             frame_cache_size=5 * frame_size)
+        self.frame_data = _TestableFrameData("data", self.reader)
+
+    def tearDown(self):
+        self.reader.close()
+
+    def test_shape(self):
+        self.assertEqual(self.frame_data.shape, (20, 4, 3))
+        self.assertEqual(self.frame_data.dtype, numpy.uint16)
+        self.assertEqual(len(self.frame_data), 20)
+        self.assertEqual(self.frame_data.size, 20 * 4 * 3)
+
+    def test_slices(self):
+        items = [3, -1, slice(2, 15, 4), slice(None, None, -3),
+                 (slice(None), slice(1, 3), slice(0, 2)),
+                 (Ellipsis, 1), (5, 2), [0, 19, 4]]
+        for item in items:
+            result = self.frame_data[item]
+            self.assertTrue(numpy.array_equal(result, self.data[item]))
+            # results are not views on the cached frames
+            self.assertTrue(result.flags.writeable)
+        with self.assertRaises(IndexError):
+            self.frame_data[20]
+
+    def test_memmap(self):
+        frame = self.reader.get_frame(2)
+        self.assertIsInstance(frame, numpy.memmap)
+        self.assertFalse(frame.flags.writeable)
+        self.assertTrue(numpy.array_equal(frame, self.data[2]))
+
+    def test_memmap_without_private_attributes(self):
+        class _Frame(object):
+            """Frame of a fabio version without the expected private
+            attributes"""
+            data = self.data[2]
+            shape = self.data[2].shape
+
+        fabio_image = fabio.open(self.edf_filename)
+        fabio_image.get_frame = lambda frame_id: _Frame()
+        self.assertIsNone(fabioh5._edf_frame_memmap(fabio_image, 2))
+        fabio_image.close()
+
+    def test_scalar(self):
+        result = self.frame_data[5, 2, 1]
+        self.assertNotIsInstance(result, numpy.ndarray)
+        self.assertIsInstance(result, numpy.generic)
+        self.assertEqual(result, self.data[5, 2, 1])
+
+    def test_frame_cache(self):
+        for frame_id in range(10):
+            self.reader.get_frame(frame_id)
+        cached = self.reader.get_frame(9)
+        self.assertIs(self.reader.get_frame(9), cached)
+        for frame_id in range(5):
+            self.reader.get_frame(frame_id)
+        self.assertIsNot(self.reader.get_frame(9), cached)
+
+    def test_full_data(self):
+        reader = fabioh5.EdfFabioReader(file_name=self.edf_filename)
+        data = reader.get_data()
+        reader.close()
+        self.assertNotIsInstance(data, numpy.memmap)
+        self.assertTrue(numpy.array_equal(data, self.data))
+
+    def test_heterogeneous_frames(self):
+        data1 = numpy.arange(2 * 3).reshape(2, 3)
+        data2 = numpy.arange(2 * 5).reshape(2, 5)
+        fabio_image = fabio.edfimage.edfimage(data=data1)
+        fabio_image.append_frame(data=data2)
+        reader = fabioh5.FabioReader(fabio_image=fabio_image)
+        frame_data = _TestableFrameData("data", reader)
+        self.assertEqual(frame_data.shape, (2, 2, 5))
+        self.assertEqual(frame_data[0].tolist(), [[0, 1, 2, 0, 0], [3, 4, 5, 0, 0]])
+        self.assertEqual(frame_data[:, 1, 3].tolist(), [0, 8])
+
+    def test_geometry_from_first_frame(self):
+        frames = numpy.arange(5 * 2 * 3).reshape(5, 2, 3)
+        fabio_image = _DecodingCountImage(frames)
+        reader = fabioh5.FabioReader(fabio_image=fabio_image)
+        del fabio_image.decoded[:]
+        frame_data = _TestableFrameData("data", reader)
+        self.assertEqual(frame_data.shape, (5, 2, 3))
+        self.assertEqual(fabio_image.decoded, [0])
+        self.assertEqual(frame_data[3].tolist(), frames[3].tolist())
+        self.assertEqual(fabio_image.decoded, [0, 3])
+        reader.close()
+
+
+class _DecodingCountImage(fabio.fabioimage.FabioImage):
+    """Multi-frame image recording the frames it decodes"""
+
+    def __init__(self, frames):
+        super(_DecodingCountImage, self).__init__(data=frames[0])
+        self._frames = frames
+        self._nframes = len(frames)
+        self.decoded = []
+
+    def getframe(self, num):
+        self.decoded.append(num)
+        return fabio.fabioimage.FabioImage(data=self._frames[num])
 
 
 def suite():
@@ -622,6 +788,7 @@ def suite():
     test_suite.addTest(loadTests(TestFabioH5MultiFrames))
     test_suite.addTest(loadTests(TestFabioH5WithEdf))
     test_suite.addTest(loadTests(TestFabioH5WithFileSeries))
+    test_suite.addTest(loadTests(TestFabioH5LazyCube))
     return test_suite
 
 
@@ -32,6 +32,7 @@ import locale
 import logging
 import numpy
 import os
+import shutil
 import sys
 import tempfile
 import unittest
@@ -361,6 +362,42 @@ class TestSpecFile(unittest.TestCase):
         self.assertEqual(line_count, 3)
         self.assertAlmostEqual(total_sum, 36.8)
 
+    def test_mca_block(self):
+        # scan 1.2 has 3 data lines and a single analyser
+        block = self.sf.get_mca_block(self.scan1_2.index)
+        self.assertEqual(block.shape, (3, 3))
+        self.assertEqual(block.dtype, numpy.float64)
+        for i, mca_line in enumerate(self.scan1_2.mca):
+            self.assertTrue(numpy.array_equal(block[i], mca_line))
+
+        strided = self.sf.get_mca_block(self.scan1_2.index, start=-1, step=-2)
+        self.assertTrue(numpy.array_equal(strided, block[::-2]))
+
+        # 3 lines of 1 spectrum each, seen as a single line of 3 analysers
+        block3d = self.sf.get_mca_block(self.scan1_2.index,
+                                        number_of_analysers=3)
+        self.assertEqual(block3d.shape, (1, 3, 3))
+        self.assertTrue(numpy.array_equal(block3d[0], block))
+        analyser = self.sf.get_mca_block(self.scan1_2.index,
+                                         number_of_analysers=3,
+                                         analyser_index=2)
+        self.assertTrue(numpy.array_equal(analyser, block[2:3]))
+
+        as_float32 = self.sf.get_mca_block(self.scan1_2.index,
+                                           dtype=numpy.float32)
+        self.assertEqual(as_float32.dtype, numpy.float32)
+        self.assertTrue(numpy.array_equal(as_float32,
+                                          block.astype(numpy.float32)))
+        as_uint32 = self.sf.get_mca_block(self.scan1_2.index, stop=1,
+                                          dtype=numpy.uint32)
+        self.assertEqual(as_uint32.tolist(), [[0, 1, 2]])
+
+        self.assertEqual(self.sf.get_mca_block(self.scan1.index).shape,
+                         (0, 0))
+        with self.assertRaises(IndexError):
+            self.sf.get_mca_block(self.scan1_2.index, number_of_analysers=3,
+                                  analyser_index=3)
+
     def test_mca_header(self):
         self.assertEqual(self.scan1.mca_header_dict, {})
         self.assertEqual(len(self.scan1_2.mca_header_dict), 4)
@@ -420,12 +457,199 @@ class TestSFLocale(unittest.TestCase):
         self.crunch_data()
 
 
+def assertSameSpecFileContent(testcase, sf, ref):
+    """Check that two SpecFile have the same scans"""
+    testcase.assertEqual(sf.keys(), ref.keys())
+    for index in range(len(ref)):
+        testcase.assertEqual(sf.scan_header(index), ref.scan_header(index))
+        testcase.assertEqual(sf.number_of_mca(index), ref.number_of_mca(index))
+        numpy.testing.assert_array_equal(sf.data(index), ref.data(index))
+        for mca_index in range(ref.number_of_mca(index)):
+            numpy.testing.assert_array_equal(sf.get_mca(index, mca_index),
+                                             ref.get_mca(index, mca_index))
+
+
+class TestSpecFileIndexCache(unittest.TestCase):
+    """Test the index cache of SpecFile"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmpdir, "sf.dat")
+        # file cut in the middle of the data of the 2nd scan
+        self.cut1 = sftext.index("2.0 2.1 2.2 2.3")
+        self.cut2 = sftext.index("#S 26")
+        self._write(sftext[:self.cut1], "w")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, text, mode):
+        with open(self.fname, mode) as f:
+            f.write(text)
+
+    def _open(self, index_cache):
+        sf = SpecFile(self.fname, index_cache=index_cache)
+        self.addCleanup(sf.close)
+        return sf
+
+    def assertSameContent(self, sf):
+        assertSameSpecFileContent(self, sf, self._open(False))
+
+    def testDisabled(self):
+        sf = self._open(False)
+        self.assertIsNone(sf.index_file)
+        self.assertIsNone(sf.index_state)
+        self.assertEqual(os.listdir(self.tmpdir), ["sf.dat"])
+
+    def testSidecar(self):
+        sf = self._open(True)
+        self.assertEqual(sf.index_file, self.fname + ".sfidx")
+        self.assertEqual(sf.index_state, "built")
+        self.assertTrue(os.path.isfile(sf.index_file))
+
+        sf = self._open(True)
+        self.assertEqual(sf.index_state, "reused")
+        self.assertSameContent(sf)
+
+    def testDirectory(self):
+        cache_dir = os.path.join(self.tmpdir, "cache")
+        os.mkdir(cache_dir)
+        index_file = specfile.index_file_path(self.fname, cache_dir)
+
+        sf = self._open(cache_dir)
+        self.assertEqual(sf.index_file, index_file)
+        self.assertEqual(os.path.dirname(index_file), cache_dir)
+        self.assertEqual(sf.index_state, "built")
+
+        sf = self._open(cache_dir)
+        self.assertEqual(sf.index_state, "reused")
+        self.assertSameContent(sf)
+
+    def testGrownFile(self):
+        sf = self._open(True)
+        self.assertEqual(sf.keys(), ["1.1", "25.1"])
+        self.assertEqual(sf[1].data.shape, (4, 2))
+
+        # The last scan gets more data lines
+        self._write(sftext[self.cut1:self.cut2], "a")
+        sf = self._open(True)
+        self.assertEqual(sf.index_state, "extended")
+        self.assertEqual(sf[1].data.shape, (4, 4))
+        self.assertSameContent(sf)
+
+        # New scans are appended
+        self._write(sftext[self.cut2:], "a")
+        sf = self._open(True)
+        self.assertEqual(sf.index_state, "extended")
+        self.assertEqual(sf.keys(), ["1.1", "25.1", "26.1", "1.2"])
+        self.assertEqual(sf.number(3), 1)
+        self.assertEqual(sf.order(3), 2)
+        self.assertSameContent(sf)
+
+        self.assertEqual(self._open(True).index_state, "reused")
+
+    def testRewrittenFile(self):
+        self._open(True)
+        # Same size, different content
+        self._write(sftext[:self.cut1].replace("1.0 1.1", "9.0 9.1"), "w")
+        sf = self._open(True)
+        self.assertEqual(sf.index_state, "built")
+        self.assertSameContent(sf)
+
+        # Truncated
+        self._write(sftext[:self.cut1 - 20], "w")
+        sf = self._open(True)
+        self.assertEqual(sf.index_state, "built")
+        self.assertSameContent(sf)
+
+    def testInvalidIndexFile(self):
+        self._open(True)
+        with open(self.fname + ".sfidx", "wb") as f:
+            f.write(b"not an index")
+        sf = self._open(True)
+        self.assertEqual(sf.index_state, "built")
+        self.assertSameContent(sf)
+
+    def testConfig(self):
+        from silx import config
+        self.addCleanup(setattr, config, "DEFAULT_SPECFILE_INDEX_CACHE",
+                        config.DEFAULT_SPECFILE_INDEX_CACHE)
+        config.DEFAULT_SPECFILE_INDEX_CACHE = True
+        sf = self._open(None)
+        self.assertEqual(sf.index_file, self.fname + ".sfidx")
+
+
+class TestSpecFileUpdate(unittest.TestCase):
+    """Test SpecFile.update on a file being written"""
+
+    def setUp(self):
+        fd, self.fname = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.fname)
+
+    def _append(self, text):
+        with open(self.fname, "a") as f:
+            f.write(text)
+
+    def _open(self):
+        sf = SpecFile(self.fname)
+        self.addCleanup(sf.close)
+        return sf
+
+    def testGrowingFile(self):
+        start = sftext.index("#S 1 ")
+        self._append(sftext[:start])
+        sf = self._open()
+        self.assertEqual(len(sf), 0)
+        self.assertFalse(sf.update())
+
+        # Append the file by chunks of various sizes
+        pos = start
+        sizes = (1, 1, 2, 3, 5, 8, 13, 21, 34)
+        while pos < len(sftext):
+            size = sizes[pos % len(sizes)]
+            self._append(sftext[pos:pos + size])
+            pos += size
+            self.assertTrue(sf.update())
+            assertSameSpecFileContent(self, sf, self._open())
+
+        self.assertEqual(sf.keys(), ["1.1", "25.1", "26.1", "1.2"])
+        self.assertEqual(sf.number_of_mca(3), 3)
+
+    def testIndexCache(self):
+        self._append(sftext[:sftext.index("#S 26")])
+        sf = SpecFile(self.fname, index_cache=True)
+        self.addCleanup(os.unlink, sf.index_file)
+        self.addCleanup(sf.close)
+        self._append(sftext[sftext.index("#S 26"):])
+        self.assertTrue(sf.update())
+
+        sf2 = SpecFile(self.fname, index_cache=True)
+        self.addCleanup(sf2.close)
+        self.assertEqual(sf2.index_state, "reused")
+        self.assertEqual(sf2.keys(), ["1.1", "25.1", "26.1", "1.2"])
+
+    def testTruncatedFile(self):
+        self._append(sftext)
+        sf = self._open()
+        with open(self.fname, "w") as f:
+            f.write(sftext[:100])
+        with self.assertRaises(specfile.SfErrFileRead):
+            sf.update()
+
+
 def suite():
     test_suite = unittest.TestSuite()
     test_suite.addTest(
         unittest.defaultTestLoader.loadTestsFromTestCase(TestSpecFile))
     test_suite.addTest(
         unittest.defaultTestLoader.loadTestsFromTestCase(TestSFLocale))
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestSpecFileIndexCache))
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestSpecFileUpdate))
     return test_suite
 
 
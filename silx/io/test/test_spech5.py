@@ -23,6 +23,7 @@
 # ############################################################################*/
 """Tests for spech5"""
 from numpy import array_equal
+import numpy
 import os
 import io
 import sys
@@ -462,6 +463,25 @@ class TestSpecH5(unittest.TestCase):
         # attrs
         self.assertEqual(mca_0_data.attrs, {"interpretation": "spectrum"})
 
+    def testMcaDataSlice(self):
+        mca_1_data = self.sfh5["/1.2/measurement/mca_1/data"]
+        expected = [[10, 9, 8], [7, 6, 5], [4, 3, 2]]
+        self.assertEqual(mca_1_data[1:].tolist(), expected[1:])
+        self.assertEqual(mca_1_data[::-2].tolist(), expected[::-2])
+        self.assertEqual(mca_1_data[:2, 1].tolist(), [9, 6])
+        self.assertEqual(mca_1_data[-1, 0], 4)
+        self.assertEqual(mca_1_data[()].tolist(), expected)
+
+    def testMcaDtype(self):
+        self.assertEqual(self.sfh5.mca_dtype, numpy.float64)
+        with SpecH5(self.fname, mca_dtype=numpy.float32) as sfh5:
+            mca_0_data = sfh5["/1.2/instrument/mca_0/data"]
+            self.assertEqual(mca_0_data.dtype, numpy.float32)
+            self.assertEqual(mca_0_data[0].dtype, numpy.float32)
+            self.assertEqual(mca_0_data[1:].dtype, numpy.float32)
+            self.assertEqual(mca_0_data[()].dtype, numpy.float32)
+            self.assertAlmostEqual(mca_0_data[1, 0], 3.1, places=5)
+
     def testMotorPosition(self):
         positioners_group = self.sfh5["/1.1/instrument/positioners"]
         # MRTSlit DOWN position is defined in #P0 san header line
@@ -786,6 +806,13 @@ class TestSpecH5NoDataCols(unittest.TestCase):
         self.assertNotIn("mca_3",
                          self.sfh5["3.1/instrument/"])
 
+    def testMcaContinuationLines(self):
+        # 1.1: @A line split over several lines with "\\"
+        data = self.sfh5["1.1/instrument/mca_0/data"]
+        spectrum = self.sfh5._sf["1.1"].mca[0]
+        self.assertEqual(data[:].tolist(), [spectrum.tolist()])
+        self.assertEqual(data[0, -1], 55)
+
 
 sf_text_slash = r"""#F /data/id09/archive/logspecfiles/laue/2016/scan_231_laue_16-11-29.dat
 #D Sat Dec 10 22:20:59 2016
@@ -862,6 +889,49 @@ class TestSpecH5SlashInLabels(unittest.TestCase):
                       self.sfh5["1.1/instrument/positioners"])
 
 
+class TestSpecH5Refresh(unittest.TestCase):
+    """Test SpecH5.refresh on a file being written"""
+
+    def setUp(self):
+        fd, self.fname = tempfile.mkstemp()
+        os.close(fd)
+        # Cut in the middle of the data of the second scan
+        self.cut = sftext.index("2.0 2.1 2.2 2.3")
+        self._append(sftext[:self.cut])
+        self.sfh5 = SpecH5(self.fname)
+
+    def tearDown(self):
+        self.sfh5.close()
+        os.unlink(self.fname)
+
+    def _append(self, text):
+        with open(self.fname, "a") as f:
+            f.write(text)
+
+    def testNothingAppended(self):
+        self.assertEqual(self.sfh5.refresh(), [])
+
+    def testRefresh(self):
+        scan_group = self.sfh5["25.1"]
+        measurement = self.sfh5["25.1/measurement"]
+        self.assertEqual(list(self.sfh5.keys()), ["1.1", "25.1"])
+        self.assertEqual(len(measurement["col2"]), 2)
+
+        self._append(sftext[self.cut:])
+        self.assertEqual(self.sfh5.refresh(),
+                         ["25.1", "1.2", "1000.1", "1001.1"])
+        self.assertEqual(list(self.sfh5.keys()),
+                         ["1.1", "25.1", "1.2", "1000.1", "1001.1"])
+
+        # Updated in place
+        self.assertIs(self.sfh5["25.1"], scan_group)
+        self.assertIs(self.sfh5["25.1/measurement"], measurement)
+        numpy.testing.assert_array_almost_equal(measurement["col2"],
+                                                [0.2, 1.2, 2.2, 3.2])
+
+        self.assertEqual(self.sfh5["1.2/instrument/mca_1/data"].shape, (3, 3))
+
+
 def suite():
     test_suite = unittest.TestSuite()
     test_suite.addTest(
@@ -874,6 +944,8 @@ def suite():
         unittest.defaultTestLoader.loadTestsFromTestCase(TestSpecH5NoDataCols))
     test_suite.addTest(
         unittest.defaultTestLoader.loadTestsFromTestCase(TestSpecH5SlashInLabels))
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestSpecH5Refresh))
     return test_suite
 
 
@@ -23,6 +23,7 @@
 # ############################################################################*/
 """Tests for SpecFile to HDF5 converter"""
 
+import numpy
 from numpy import array_equal
 import os
 import sys
@@ -182,6 +183,44 @@ class TestConvertSpecHDF5(unittest.TestCase):
                         self.h5f["/1.2/measurement/mca_1/info/channels"])
         )
 
+    def testWriteByBlocks(self):
+        """Test copying datasets block by block with a tiny memory budget"""
+        progress = []
+
+        def callback(h5_name, written, total):
+            progress.append((h5_name, written, total))
+
+        write_to_h5(self.sfh5, self.h5f, h5path="/blocks",
+                    min_size=0, memory_budget=16,
+                    create_dataset_args={"chunks": True},
+                    progress_callback=callback)
+        for name in ["1.2/measurement/mca_0/data",
+                     "1.2/measurement/mca_1/data",
+                     "1.1/measurement/MRTSlit UP"]:
+            self.assertTrue(
+                array_equal(self.sfh5[name], self.h5f["/blocks/" + name]))
+
+        # one call per spectrum (16 bytes budget, 24 bytes per spectrum)
+        mca_progress = [p for p in progress
+                        if p[0] == "/blocks/1.2/instrument/mca_0/data"]
+        self.assertEqual(mca_progress,
+                         [("/blocks/1.2/instrument/mca_0/data", 24 * i, 72)
+                          for i in range(1, 4)])
+        written, total = progress[-1][1:]
+        self.assertEqual(written, total)
+
+    def testPreloadedData(self):
+        """Test writing datasets from data already read"""
+        data = numpy.arange(9.).reshape(3, 3)
+        write_to_h5(self.sfh5, self.h5f, h5path="/preloaded",
+                    preloaded_data={"1.2/instrument/mca_0/data": data})
+        self.assertTrue(
+            array_equal(self.h5f["/preloaded/1.2/instrument/mca_0/data"],
+                        data))
+        self.assertTrue(
+            array_equal(self.h5f["/preloaded/1.2/instrument/mca_1/data"],
+                        self.sfh5["1.2/instrument/mca_1/data"]))
+
 
 def suite():
     test_suite = unittest.TestSuite()
@@ -36,4 +36,4 @@ __date__ = "11/05/2017"
 
 from .histogram import Histogramnd  # noqa
 from .histogram import HistogramndLut  # noqa
-from .medianfilter import medfilt, medfilt1d, medfilt2d
+from .medianfilter import medfilt, medfilt1d, medfilt2d, medfilt3d
@@ -31,6 +31,22 @@ cimport cython
 import numpy as np
 
 cimport silx.math.histogramnd_c as histogramnd_c
+from ..utils._num_threads cimport get_max_num_threads
+
+
+cdef Py_ssize_t USE_OPENMP_THRESHOLD = 100000
+"""OpenMP is not used for samples with less elements than this threshold"""
+
+
+cdef int _get_num_threads(Py_ssize_t n_elem, Py_ssize_t n_histo_bins) except -1:
+    """Returns the number of threads to use to histogram n_elem samples
+
+    Each thread but the first one fills its own copy of the histograms,
+    so threads are only used when there are more samples than bins.
+    """
+    if n_elem < USE_OPENMP_THRESHOLD or n_elem < n_histo_bins:
+        return 1
+    return get_max_num_threads()
 
 
 def chistogramnd(sample,
@@ -324,6 +340,8 @@ def chistogramnd(sample,
     bin_edges_c = np.ascontiguousarray(bin_edges.reshape((bin_edges.size,)),
                                        dtype=bin_edges.dtype.newbyteorder('N'))
 
+    n_threads = _get_num_threads(n_elem, histo.size)
+
     rc = 0
 
     if weighted_histo is None or weighted_histo.dtype == np.double:
@@ -343,7 +361,8 @@ def chistogramnd(sample,
                                                        bin_edges_c,
                                                        option_flags,
                                                        weight_min=weight_min,
-                                                       weight_max=weight_max)
+                                                       weight_max=weight_max,
+                                                       n_threads=n_threads)
 
             elif weights_type == np.float32:
 
@@ -358,7 +377,8 @@ def chistogramnd(sample,
                                                       bin_edges_c,
                                                       option_flags,
                                                       weight_min=weight_min,
-                                                      weight_max=weight_max)
+                                                      weight_max=weight_max,
+                                                      n_threads=n_threads)
 
             elif weights_type == np.int32:
 
@@ -373,7 +393,8 @@ def chistogramnd(sample,
                                                         bin_edges_c,
                                                         option_flags,
                                                         weight_min=weight_min,
-                                                        weight_max=weight_max)
+                                                        weight_max=weight_max,
+                                                        n_threads=n_threads)
 
             else:
                 raise_unsupported_type()
@@ -394,7 +415,8 @@ def chistogramnd(sample,
                                                       bin_edges_c,
                                                       option_flags,
                                                       weight_min=weight_min,
-                                                      weight_max=weight_max)
+                                                      weight_max=weight_max,
+                                                      n_threads=n_threads)
 
             elif weights_type == np.float32:
 
@@ -409,7 +431,8 @@ def chistogramnd(sample,
                                                      bin_edges_c,
                                                      option_flags,
                                                      weight_min=weight_min,
-                                                     weight_max=weight_max)
+                                                     weight_max=weight_max,
+                                                     n_threads=n_threads)
 
             elif weights_type == np.int32:
 
@@ -424,7 +447,8 @@ def chistogramnd(sample,
                                                        bin_edges_c,
                                                        option_flags,
                                                        weight_min=weight_min,
-                                                       weight_max=weight_max)
+                                                       weight_max=weight_max,
+                                                       n_threads=n_threads)
 
             else:
                 raise_unsupported_type()
@@ -445,7 +469,8 @@ def chistogramnd(sample,
                                                         bin_edges_c,
                                                         option_flags,
                                                         weight_min=weight_min,
-                                                        weight_max=weight_max)
+                                                        weight_max=weight_max,
+                                                        n_threads=n_threads)
 
             elif weights_type == np.float32:
 
@@ -460,7 +485,8 @@ def chistogramnd(sample,
                                                        bin_edges_c,
                                                        option_flags,
                                                        weight_min=weight_min,
-                                                       weight_max=weight_max)
+                                                       weight_max=weight_max,
+                                                       n_threads=n_threads)
 
             elif weights_type == np.int32:
 
@@ -475,7 +501,8 @@ def chistogramnd(sample,
                                                          bin_edges_c,
                                                          option_flags,
                                                          weight_min=weight_min,
-                                                         weight_max=weight_max)
+                                                         weight_max=weight_max,
+                                                         n_threads=n_threads)
 
             else:
                 raise_unsupported_type()
@@ -502,7 +529,8 @@ def chistogramnd(sample,
                                                       bin_edges_c,
                                                       option_flags,
                                                       weight_min=weight_min,
-                                                      weight_max=weight_max)
+                                                      weight_max=weight_max,
+                                                      n_threads=n_threads)
 
             elif weights_type == np.float32:
 
@@ -517,7 +545,8 @@ def chistogramnd(sample,
                                                      bin_edges_c,
                                                      option_flags,
                                                      weight_min=weight_min,
-                                                     weight_max=weight_max)
+                                                     weight_max=weight_max,
+                                                     n_threads=n_threads)
 
             elif weights_type == np.int32:
 
@@ -532,7 +561,8 @@ def chistogramnd(sample,
                                                        bin_edges_c,
                                                        option_flags,
                                                        weight_min=weight_min,
-                                                       weight_max=weight_max)
+                                                       weight_max=weight_max,
+                                                       n_threads=n_threads)
 
             else:
                 raise_unsupported_type()
@@ -553,7 +583,8 @@ def chistogramnd(sample,
                                                      bin_edges_c,
                                                      option_flags,
                                                      weight_min=weight_min,
-                                                     weight_max=weight_max)
+                                                     weight_max=weight_max,
+                                                     n_threads=n_threads)
 
             elif weights_type == np.float32:
 
@@ -568,7 +599,8 @@ def chistogramnd(sample,
                                                     bin_edges_c,
                                                     option_flags,
                                                     weight_min=weight_min,
-                                                    weight_max=weight_max)
+                                                    weight_max=weight_max,
+                                                    n_threads=n_threads)
 
             elif weights_type == np.int32:
 
@@ -583,7 +615,8 @@ def chistogramnd(sample,
                                                       bin_edges_c,
                                                       option_flags,
                                                       weight_min=weight_min,
-                                                      weight_max=weight_max)
+                                                      weight_max=weight_max,
+                                                      n_threads=n_threads)
 
             else:
                 raise_unsupported_type()
@@ -604,7 +637,8 @@ def chistogramnd(sample,
                                                        bin_edges_c,
                                                        option_flags,
                                                        weight_min=weight_min,
-                                                       weight_max=weight_max)
+                                                       weight_max=weight_max,
+                                                       n_threads=n_threads)
 
             elif weights_type == np.float32:
 
@@ -619,7 +653,8 @@ def chistogramnd(sample,
                                                       bin_edges_c,
                                                       option_flags,
                                                       weight_min=weight_min,
-                                                      weight_max=weight_max)
+                                                      weight_max=weight_max,
+                                                      n_threads=n_threads)
 
             elif weights_type == np.int32:
 
@@ -634,7 +669,8 @@ def chistogramnd(sample,
                                                         bin_edges_c,
                                                         option_flags,
                                                         weight_min=weight_min,
-                                                        weight_max=weight_max)
+                                                        weight_max=weight_max,
+                                                        n_threads=n_threads)
 
             else:
                 raise_unsupported_type()
@@ -683,7 +719,8 @@ cdef int _histogramnd_double_double_double(double[:] sample,
                                            double[:] bin_edges,
                                            int option_flags,
                                            double weight_min,
-                                           double weight_max) nogil:
+                                           double weight_max,
+                                           int n_threads) nogil:
 
     return histogramnd_c.histogramnd_double_double_double(&sample[0],
                                                           &weights[0],
@@ -696,7 +733,8 @@ cdef int _histogramnd_double_double_double(double[:] sample,
                                                           &bin_edges[0],
                                                           option_flags,
                                                           weight_min,
-                                                          weight_max)
+                                                          weight_max,
+                                                          n_threads)
 
 
 @cython.wraparound(False)
@@ -714,7 +752,8 @@ cdef int _histogramnd_double_float_double(double[:] sample,
                                           double[:] bin_edges,
                                           int option_flags,
                                           float weight_min,
-                                          float weight_max) nogil:
+                                          float weight_max,
+                                          int n_threads) nogil:
 
     return histogramnd_c.histogramnd_double_float_double(&sample[0],
                                                          &weights[0],
@@ -727,7 +766,8 @@ cdef int _histogramnd_double_float_double(double[:] sample,
                                                          &bin_edges[0],
                                                          option_flags,
                                                          weight_min,
-                                                         weight_max)
+                                                         weight_max,
+                                                         n_threads)
 
 
 @cython.wraparound(False)
@@ -745,7 +785,8 @@ cdef int _histogramnd_double_int32_t_double(double[:] sample,
                                             double[:] bin_edges,
                                             int option_flags,
                                             cnumpy.int32_t weight_min,
-                                            cnumpy.int32_t weight_max) nogil:
+                                            cnumpy.int32_t weight_max,
+                                            int n_threads) nogil:
 
     return histogramnd_c.histogramnd_double_int32_t_double(&sample[0],
                                                            &weights[0],
@@ -758,7 +799,8 @@ cdef int _histogramnd_double_int32_t_double(double[:] sample,
                                                            &bin_edges[0],
                                                            option_flags,
                                                            weight_min,
-                                                           weight_max)
+                                                           weight_max,
+                                                           n_threads)
 
 
 # =====================
@@ -781,7 +823,8 @@ cdef int _histogramnd_float_double_double(float[:] sample,
                                           double[:] bin_edges,
                                           int option_flags,
                                           double weight_min,
-                                          double weight_max) nogil:
+                                          double weight_max,
+                                          int n_threads) nogil:
 
     return histogramnd_c.histogramnd_float_double_double(&sample[0],
                                                          &weights[0],
@@ -794,7 +837,8 @@ cdef int _histogramnd_float_double_double(float[:] sample,
                                                          &bin_edges[0],
                                                          option_flags,
                                                          weight_min,
-                                                         weight_max)
+                                                         weight_max,
+                                                         n_threads)
 
 
 @cython.wraparound(False)
@@ -812,7 +856,8 @@ cdef int _histogramnd_float_float_double(float[:] sample,
                                          double[:] bin_edges,
                                          int option_flags,
                                          float weight_min,
-                                         float weight_max) nogil:
+                                         float weight_max,
+                                         int n_threads) nogil:
 
     return histogramnd_c.histogramnd_float_float_double(&sample[0],
                                                         &weights[0],
@@ -825,7 +870,8 @@ cdef int _histogramnd_float_float_double(float[:] sample,
                                                         &bin_edges[0],
                                                         option_flags,
                                                         weight_min,
-                                                        weight_max)
+                                                        weight_max,
+                                                        n_threads)
 
 
 @cython.wraparound(False)
@@ -843,7 +889,8 @@ cdef int _histogramnd_float_int32_t_double(float[:] sample,
                                            double[:] bin_edges,
                                            int option_flags,
                                            cnumpy.int32_t weight_min,
-                                           cnumpy.int32_t weight_max) nogil:
+                                           cnumpy.int32_t weight_max,
+                                           int n_threads) nogil:
 
     return histogramnd_c.histogramnd_float_int32_t_double(&sample[0],
                                                           &weights[0],
@@ -856,7 +903,8 @@ cdef int _histogramnd_float_int32_t_double(float[:] sample,
                                                           &bin_edges[0],
                                                           option_flags,
                                                           weight_min,
-                                                          weight_max)
+                                                          weight_max,
+                                                          n_threads)
 
 
 # =====================
@@ -879,7 +927,8 @@ cdef int _histogramnd_int32_t_double_double(cnumpy.int32_t[:] sample,
                                             double[:] bin_edges,
                                             int option_flags,
                                             double weight_min,
-                                            double weight_max) nogil:
+                                            double weight_max,
+                                            int n_threads) nogil:
 
     return histogramnd_c.histogramnd_int32_t_double_double(&sample[0],
                                                            &weights[0],
@@ -892,7 +941,8 @@ cdef int _histogramnd_int32_t_double_double(cnumpy.int32_t[:] sample,
                                                            &bin_edges[0],
                                                            option_flags,
                                                            weight_min,
-                                                           weight_max)
+                                                           weight_max,
+                                                           n_threads)
 
 
 @cython.wraparound(False)
@@ -910,7 +960,8 @@ cdef int _histogramnd_int32_t_float_double(cnumpy.int32_t[:] sample,
                                            double[:] bin_edges,
                                            int option_flags,
                                            float weight_min,
-                                           float weight_max) nogil:
+                                           float weight_max,
+                                           int n_threads) nogil:
 
     return histogramnd_c.histogramnd_int32_t_float_double(&sample[0],
                                                           &weights[0],
@@ -923,7 +974,8 @@ cdef int _histogramnd_int32_t_float_double(cnumpy.int32_t[:] sample,
                                                           &bin_edges[0],
                                                           option_flags,
                                                           weight_min,
-                                                          weight_max)
+                                                          weight_max,
+                                                          n_threads)
 
 
 @cython.wraparound(False)
@@ -941,7 +993,8 @@ cdef int _histogramnd_int32_t_int32_t_double(cnumpy.int32_t[:] sample,
                                              double[:] bin_edges,
                                              int option_flags,
                                              cnumpy.int32_t weight_min,
-                                             cnumpy.int32_t weight_max) nogil:
+                                             cnumpy.int32_t weight_max,
+                                             int n_threads) nogil:
 
     return histogramnd_c.histogramnd_int32_t_int32_t_double(&sample[0],
                                                             &weights[0],
@@ -954,7 +1007,8 @@ cdef int _histogramnd_int32_t_int32_t_double(cnumpy.int32_t[:] sample,
                                                             &bin_edges[0],
                                                             option_flags,
                                                             weight_min,
-                                                            weight_max)
+                                                            weight_max,
+                                                            n_threads)
 
 
 # =====================
@@ -977,7 +1031,8 @@ cdef int _histogramnd_double_double_float(double[:] sample,
                                           double[:] bin_edges,
                                           int option_flags,
                                           double weight_min,
-                                          double weight_max) nogil:
+                                          double weight_max,
+                                          int n_threads) nogil:
 
     return histogramnd_c.histogramnd_double_double_float(&sample[0],
                                                          &weights[0],
@@ -990,7 +1045,8 @@ cdef int _histogramnd_double_double_float(double[:] sample,
                                                          &bin_edges[0],
                                                          option_flags,
                                                          weight_min,
-                                                         weight_max)
+                                                         weight_max,
+                                                         n_threads)
 
 
 @cython.wraparound(False)
@@ -1008,7 +1064,8 @@ cdef int _histogramnd_double_float_float(double[:] sample,
                                          double[:] bin_edges,
                                          int option_flags,
                                          float weight_min,
-                                         float weight_max) nogil:
+                                         float weight_max,
+                                         int n_threads) nogil:
 
     return histogramnd_c.histogramnd_double_float_float(&sample[0],
                                                         &weights[0],
@@ -1021,7 +1078,8 @@ cdef int _histogramnd_double_float_float(double[:] sample,
                                                         &bin_edges[0],
                                                         option_flags,
                                                         weight_min,
-                                                        weight_max)
+                                                        weight_max,
+                                                        n_threads)
 
 
 @cython.wraparound(False)
@@ -1039,7 +1097,8 @@ cdef int _histogramnd_double_int32_t_float(double[:] sample,
                                            double[:] bin_edges,
                                            int option_flags,
                                            cnumpy.int32_t weight_min,
-                                           cnumpy.int32_t weight_max) nogil:
+                                           cnumpy.int32_t weight_max,
+                                           int n_threads) nogil:
 
     return histogramnd_c.histogramnd_double_int32_t_float(&sample[0],
                                                           &weights[0],
@@ -1052,7 +1111,8 @@ cdef int _histogramnd_double_int32_t_float(double[:] sample,
                                                           &bin_edges[0],
                                                           option_flags,
                                                           weight_min,
-                                                          weight_max)
+                                                          weight_max,
+                                                          n_threads)
 
 
 # =====================
@@ -1075,7 +1135,8 @@ cdef int _histogramnd_float_double_float(float[:] sample,
                                          double[:] bin_edges,
                                          int option_flags,
                                          double weight_min,
-                                         double weight_max) nogil:
+                                         double weight_max,
+                                         int n_threads) nogil:
 
     return histogramnd_c.histogramnd_float_double_float(&sample[0],
                                                         &weights[0],
@@ -1088,7 +1149,8 @@ cdef int _histogramnd_float_double_float(float[:] sample,
                                                         &bin_edges[0],
                                                         option_flags,
                                                         weight_min,
-                                                        weight_max)
+                                                        weight_max,
+                                                        n_threads)
 
 
 @cython.wraparound(False)
@@ -1106,7 +1168,8 @@ cdef int _histogramnd_float_float_float(float[:] sample,
                                         double[:] bin_edges,
                                         int option_flags,
                                         float weight_min,
-                                        float weight_max) nogil:
+                                        float weight_max,
+                                        int n_threads) nogil:
 
     return histogramnd_c.histogramnd_float_float_float(&sample[0],
                                                        &weights[0],
@@ -1119,7 +1182,8 @@ cdef int _histogramnd_float_float_float(float[:] sample,
                                                        &bin_edges[0],
                                                        option_flags,
                                                        weight_min,
-                                                       weight_max)
+                                                       weight_max,
+                                                       n_threads)
 
 
 @cython.wraparound(False)
@@ -1137,7 +1201,8 @@ cdef int _histogramnd_float_int32_t_float(float[:] sample,
                                           double[:] bin_edges,
                                           int option_flags,
                                           cnumpy.int32_t weight_min,
-                                          cnumpy.int32_t weight_max) nogil:
+                                          cnumpy.int32_t weight_max,
+                                          int n_threads) nogil:
 
     return histogramnd_c.histogramnd_float_int32_t_float(&sample[0],
                                                          &weights[0],
@@ -1150,7 +1215,8 @@ cdef int _histogramnd_float_int32_t_float(float[:] sample,
                                                          &bin_edges[0],
                                                          option_flags,
                                                          weight_min,
-                                                         weight_max)
+                                                         weight_max,
+                                                         n_threads)
 
 
 # =====================
@@ -1173,7 +1239,8 @@ cdef int _histogramnd_int32_t_double_float(cnumpy.int32_t[:] sample,
                                            double[:] bin_edges,
                                            int option_flags,
                                            double weight_min,
-                                           double weight_max) nogil:
+                                           double weight_max,
+                                           int n_threads) nogil:
 
     return histogramnd_c.histogramnd_int32_t_double_float(&sample[0],
                                                           &weights[0],
@@ -1186,7 +1253,8 @@ cdef int _histogramnd_int32_t_double_float(cnumpy.int32_t[:] sample,
                                                           &bin_edges[0],
                                                           option_flags,
                                                           weight_min,
-                                                          weight_max)
+                                                          weight_max,
+                                                          n_threads)
 
 
 @cython.wraparound(False)
@@ -1204,7 +1272,8 @@ cdef int _histogramnd_int32_t_float_float(cnumpy.int32_t[:] sample,
                                           double[:] bin_edges,
                                           int option_flags,
                                           float weight_min,
-                                          float weight_max) nogil:
+                                          float weight_max,
+                                          int n_threads) nogil:
 
     return histogramnd_c.histogramnd_int32_t_float_float(&sample[0],
                                                          &weights[0],
@@ -1217,7 +1286,8 @@ cdef int _histogramnd_int32_t_float_float(cnumpy.int32_t[:] sample,
                                                          &bin_edges[0],
                                                          option_flags,
                                                          weight_min,
-                                                         weight_max)
+                                                         weight_max,
+                                                         n_threads)
 
 
 @cython.wraparound(False)
@@ -1235,7 +1305,8 @@ cdef int _histogramnd_int32_t_int32_t_float(cnumpy.int32_t[:] sample,
                                             double[:] bin_edges,
                                             int option_flags,
                                             cnumpy.int32_t weight_min,
-                                            cnumpy.int32_t weight_max) nogil:
+                                            cnumpy.int32_t weight_max,
+                                            int n_threads) nogil:
 
     return histogramnd_c.histogramnd_int32_t_int32_t_float(&sample[0],
                                                            &weights[0],
@@ -1248,4 +1319,5 @@ cdef int _histogramnd_int32_t_int32_t_float(cnumpy.int32_t[:] sample,
                                                            &bin_edges[0],
                                                            option_flags,
                                                            weight_min,
-                                                           weight_max)
+                                                           weight_max,
+                                                           n_threads)
@@ -29,6 +29,8 @@ __date__ = "15/05/2016"
 
 cimport numpy as cnumpy  # noqa
 cimport cython
+from ..utils._num_threads cimport get_max_num_threads
+from cython.parallel import prange
 import numpy as np
 
 ctypedef fused sample_t:
@@ -54,6 +56,21 @@ ctypedef fused lut_t:
     cnumpy.int32_t
     cnumpy.int16_t
 
+ctypedef fused index_t:
+    cnumpy.uint32_t
+    cnumpy.int64_t
+
+
+cdef Py_ssize_t USE_OPENMP_THRESHOLD = 100000
+"""OpenMP is not used for LUTs with less elements than this threshold"""
+
+
+cdef int _get_num_threads(Py_ssize_t length) except -1:
+    """Returns the number of threads to use to process length elements"""
+    if length < USE_OPENMP_THRESHOLD:
+        return 1
+    return get_max_num_threads()
+
 
 def histogramnd_get_lut(sample,
                         histo_range,
@@ -433,3 +450,336 @@ def _histogramnd_get_lut_fused(sample_t[:] i_sample,
                 o_histo[bin_idx] += 1
 
     return 0
+
+
+# =====================
+# =====================
+
+
+def histogramnd_get_csr(histo_lut,
+                        n_histo_bins,
+                        sample_indices=None,
+                        coefficients=None):
+    """Converts a LUT to a compressed sparse row (CSR) LUT sorted by bin.
+
+    The weights of the samples falling into the bin ``i`` are
+    ``weights[indices[indptr[i]:indptr[i+1]]]``.
+    Indices are stored as :class:`numpy.uint32` when possible,
+    as :class:`numpy.int64` otherwise.
+
+    :param histo_lut:
+        Bin index of each sample as returned by :func:`histogramnd_get_lut`,
+        -1 for samples out of the histogram.
+    :param int n_histo_bins: Total number of bins of the histogram.
+    :param sample_indices:
+        Index in the weights array of each sample.
+        Several samples can share the same weight, e.g., for pixel splitting.
+        Default: the index of the sample.
+    :param coefficients:
+        Fraction of the weight of each sample added to its bin.
+        Default: None (1 for all samples).
+    :return: (indptr, indices, coefficients) arrays, coefficients is None if
+        not provided.
+    :rtype: tuple
+    """
+    histo_lut = np.asarray(histo_lut).reshape(-1)
+
+    in_range = np.nonzero(histo_lut >= 0)[0]
+    bins = histo_lut[in_range]
+    order = np.argsort(bins, kind='stable')
+
+    if sample_indices is None:
+        n_weights = histo_lut.size
+        sample_indices = in_range
+    else:
+        sample_indices = np.asarray(sample_indices).reshape(-1)
+        if sample_indices.size != histo_lut.size:
+            raise ValueError('<sample_indices> must have the same number '
+                             'of elements as the LUT.')
+        if sample_indices.size > 0 and sample_indices.min() < 0:
+            raise ValueError('<sample_indices> must be positive.')
+        n_weights = sample_indices.max() + 1 if sample_indices.size else 0
+        sample_indices = sample_indices[in_range]
+
+    if max(n_weights, in_range.size) < 2**32:
+        index_dtype = np.uint32
+    else:
+        index_dtype = np.int64
+
+    indices = np.ascontiguousarray(sample_indices[order], dtype=index_dtype)
+
+    indptr = np.zeros(n_histo_bins + 1, dtype=index_dtype)
+    indptr[1:] = np.cumsum(np.bincount(bins, minlength=n_histo_bins))
+
+    if coefficients is not None:
+        coefficients = np.asarray(coefficients).reshape(-1)
+        if coefficients.size != histo_lut.size:
+            raise ValueError('<coefficients> must have the same number '
+                             'of elements as the LUT.')
+        coefficients = np.ascontiguousarray(coefficients[in_range][order],
+                                            dtype=np.float64)
+
+    return indptr, indices, coefficients
+
+
+def histogramnd_from_csr(weights,
+                         indptr,
+                         indices,
+                         coefficients=None,
+                         histo=None,
+                         weighted_histo=None,
+                         dtype=None,
+                         weight_min=None,
+                         weight_max=None):
+    """Computes the histograms of a batch of weights with a CSR LUT.
+
+    Bins are processed in parallel with OpenMP.
+
+    :param weights: (n_frames, n_weights) array of weights.
+    :param indptr: See :func:`histogramnd_get_csr`
+    :param indices: See :func:`histogramnd_get_csr`
+    :param coefficients: See :func:`histogramnd_get_csr`
+    :param histo:
+        (n_frames, n_histo_bins) :class:`numpy.uint32` array to which the
+        counts are added. Default: a new array.
+    :param weighted_histo:
+        (n_frames, n_histo_bins) array to which the weighted histograms are
+        added. Default: a new array.
+    :param dtype: Type of the weighted histograms, ignored if weighted_histo
+        is provided. Default: the type of weights.
+    :param weight_min: Samples with a lower weight are not counted.
+    :param weight_max: Samples with a higher weight are not counted.
+    :return: The histograms (counts) and the weighted histograms
+    :rtype: tuple : (:class:`numpy.array`, :class:`numpy.array`)
+    """
+    weights = np.asarray(weights)
+    if weights.ndim != 2:
+        raise ValueError('<weights> must be a 2D array.')
+    n_frames = weights.shape[0]
+
+    if indptr.dtype != indices.dtype:
+        raise ValueError('<indptr> and <indices> must have the same dtype.')
+    shape = n_frames, indptr.size - 1
+
+    if len(indices) > 0 and weights.shape[1] <= indices.max():
+        raise ValueError('<weights> has less elements than indexed by '
+                         'the LUT.')
+
+    if histo is None:
+        histo = np.zeros(shape, dtype=np.uint32)
+    elif histo.shape != shape or histo.dtype != np.uint32:
+        raise ValueError('Provided <histo> array must be a {0} array of '
+                         'shape {1}.'.format(np.uint32, shape))
+
+    if weighted_histo is None:
+        if dtype is None:
+            dtype = weights.dtype
+        weighted_histo = np.zeros(shape, dtype=dtype)
+    elif weighted_histo.shape != shape:
+        raise ValueError('Provided <weighted_histo> array must have '
+                         'shape {0}.'.format(shape))
+
+    if (not histo.flags['C_CONTIGUOUS'] or
+            not weighted_histo.flags['C_CONTIGUOUS']):
+        raise ValueError('<histo> and <weighted_histo> must be '
+                         'C_CONTIGUOUS numpy arrays.')
+
+    w_dtype = weights.dtype.newbyteorder('N')
+    w_c = np.ascontiguousarray(weights, dtype=w_dtype)
+
+    if coefficients is None:
+        has_coefficients = False
+        coefficients_c = np.zeros(1, dtype=np.float64)
+    else:
+        has_coefficients = True
+        coefficients_c = np.ascontiguousarray(coefficients, dtype=np.float64)
+        if coefficients_c.shape != indices.shape:
+            raise ValueError('<coefficients> must have the same shape '
+                             'as <indices>.')
+
+    if weight_min is None:
+        weight_min = 0
+        filt_min_weights = False
+    else:
+        filt_min_weights = True
+
+    if weight_max is None:
+        weight_max = 0
+        filt_max_weights = False
+    else:
+        filt_max_weights = True
+
+    num_threads = _get_num_threads(n_frames * len(indices))
+
+    try:
+        _histogramnd_from_csr_fused(w_c,
+                                    np.ascontiguousarray(indptr),
+                                    np.ascontiguousarray(indices),
+                                    coefficients_c,
+                                    has_coefficients,
+                                    histo,
+                                    weighted_histo,
+                                    filt_min_weights,
+                                    w_dtype.type(weight_min),
+                                    filt_max_weights,
+                                    w_dtype.type(weight_max),
+                                    num_threads)
+    except TypeError:
+        raise TypeError('Case not supported - weights:{0}, '
+                        'indices:{1} and histo:{2}.'
+                        ''.format(weights.dtype,
+                                  indices.dtype,
+                                  weighted_histo.dtype))
+
+    return histo, weighted_histo
+
+
+def histogramnd_from_lut_batch(weights,
+                               histo_lut,
+                               n_histo_bins,
+                               dtype=None,
+                               weight_min=None,
+                               weight_max=None):
+    """Computes the histograms of a batch of weights with a LUT.
+
+    Frames are processed in parallel with OpenMP.
+
+    :param weights: (n_frames, n_samples) array of weights.
+    :param histo_lut: Bin index of each sample as returned by
+        :func:`histogramnd_get_lut`.
+    :param int n_histo_bins: Total number of bins of the histogram.
+    :param dtype: Type of the weighted histograms.
+        Default: the type of weights.
+    :param weight_min: Samples with a lower weight are not counted.
+    :param weight_max: Samples with a higher weight are not counted.
+    :return: The (n_frames, n_histo_bins) histograms (counts) and weighted
+        histograms
+    :rtype: tuple : (:class:`numpy.array`, :class:`numpy.array`)
+    """
+    weights = np.asarray(weights)
+    if weights.ndim != 2:
+        raise ValueError('<weights> must be a 2D array.')
+    if histo_lut.size != weights.shape[1]:
+        raise ValueError('The LUT and each frame of weights must have the '
+                         'same number of elements.')
+    n_frames = weights.shape[0]
+
+    histo = np.zeros((n_frames, n_histo_bins), dtype=np.uint32)
+    weighted_histo = np.zeros((n_frames, n_histo_bins),
+                              dtype=weights.dtype if dtype is None else dtype)
+
+    w_dtype = weights.dtype.newbyteorder('N')
+    w_c = np.ascontiguousarray(weights, dtype=w_dtype)
+    h_lut_c = np.ascontiguousarray(histo_lut.reshape((histo_lut.size,)),
+                                   histo_lut.dtype.newbyteorder('N'))
+
+    if weight_min is None:
+        weight_min = 0
+        filt_min_weights = False
+    else:
+        filt_min_weights = True
+
+    if weight_max is None:
+        weight_max = 0
+        filt_max_weights = False
+    else:
+        filt_max_weights = True
+
+    num_threads = min(n_frames, _get_num_threads(weights.size))
+
+    try:
+        _histogramnd_from_lut_batch_fused(w_c,
+                                          h_lut_c,
+                                          histo,
+                                          weighted_histo,
+                                          filt_min_weights,
+                                          w_dtype.type(weight_min),
+                                          filt_max_weights,
+                                          w_dtype.type(weight_max),
+                                          max(1, num_threads))
+    except TypeError:
+        raise TypeError('Case not supported - weights:{0} '
+                        'and histo:{1}.'
+                        ''.format(weights.dtype, weighted_histo.dtype))
+
+    return histo, weighted_histo
+
+
+@cython.wraparound(False)
+@cython.boundscheck(False)
+@cython.initializedcheck(False)
+@cython.nonecheck(False)
+@cython.cdivision(True)
+def _histogramnd_from_lut_batch_fused(weights_t[:, ::1] i_weights,
+                                      lut_t[::1] i_lut,
+                                      cnumpy.uint32_t[:, ::1] o_histo,
+                                      cumul_t[:, ::1] o_weighted_histo,
+                                      bint i_filt_min_weights,
+                                      weights_t i_weight_min,
+                                      bint i_filt_max_weights,
+                                      weights_t i_weight_max,
+                                      int num_threads):
+    cdef:
+        Py_ssize_t n_elems = i_weights.shape[1]
+        Py_ssize_t n_frames = i_weights.shape[0]
+        Py_ssize_t frame, i
+        weights_t value
+
+    # Each frame is filled by a single thread
+    for frame in prange(n_frames, nogil=True, num_threads=num_threads):
+        for i in range(n_elems):
+            if i_lut[i] < 0:
+                continue
+            value = i_weights[frame, i]
+            if i_filt_min_weights and value < i_weight_min:
+                continue
+            if i_filt_max_weights and value > i_weight_max:
+                continue
+            o_histo[frame, i_lut[i]] += 1
+            o_weighted_histo[frame, i_lut[i]] += <cumul_t> value
+
+
+@cython.wraparound(False)
+@cython.boundscheck(False)
+@cython.initializedcheck(False)
+@cython.nonecheck(False)
+@cython.cdivision(True)
+def _histogramnd_from_csr_fused(weights_t[:, ::1] i_weights,
+                                index_t[::1] i_indptr,
+                                index_t[::1] i_indices,
+                                double[::1] i_coefficients,
+                                bint i_has_coefficients,
+                                cnumpy.uint32_t[:, ::1] o_histo,
+                                cumul_t[:, ::1] o_weighted_histo,
+                                bint i_filt_min_weights,
+                                weights_t i_weight_min,
+                                bint i_filt_max_weights,
+                                weights_t i_weight_max,
+                                int num_threads):
+    cdef:
+        Py_ssize_t n_bins = i_indptr.shape[0] - 1
+        Py_ssize_t n_frames = i_weights.shape[0]
+        Py_ssize_t bin_idx, frame, index
+        cnumpy.uint32_t count
+        cumul_t cumul
+        weights_t value
+
+    # Each bin is filled by a single thread
+    for bin_idx in prange(n_bins, nogil=True, num_threads=num_threads):
+        for frame in range(n_frames):
+            count = 0
+            cumul = 0
+            for index in range(<Py_ssize_t> i_indptr[bin_idx],
+                               <Py_ssize_t> i_indptr[bin_idx + 1]):
+                value = i_weights[frame, i_indices[index]]
+                if i_filt_min_weights and value < i_weight_min:
+                    continue
+                if i_filt_max_weights and value > i_weight_max:
+                    continue
+                count = count + 1
+                if i_has_coefficients:
+                    cumul = cumul + <cumul_t> (i_coefficients[index] * value)
+                else:
+                    cumul = cumul + <cumul_t> value
+            o_histo[frame, bin_idx] += count
+            o_weighted_histo[frame, bin_idx] += cumul
@@ -22,7 +22,8 @@
 # THE SOFTWARE.
 #
 # ############################################################################*/
-"""This module provides :func:`cmap` which applies a colormap to a dataset.
+"""This module provides :func:`cmap` which applies a colormap to a dataset,
+and :class:`Colormapper` which does the same with cached look-up tables.
 """
 
 __authors__ = ["T. Vincent"]
@@ -30,32 +31,24 @@ __license__ = "MIT"
 __date__ = "16/05/2018"
 
 
-import os
 cimport cython
 from cython.parallel import prange
 cimport numpy as cnumpy
 from libc.math cimport frexp, sinh, sqrt
 from .math_compatibility cimport asinh, isnan, isfinite, lrint, INFINITY, NAN
+from ..utils._num_threads cimport get_max_num_threads
 
+import collections
 import logging
 import numbers
 
 import numpy
 
-__all__ = ['cmap']
+__all__ = ['cmap', 'Colormapper']
 
 _logger = logging.getLogger(__name__)
 
 
-cdef int DEFAULT_NUM_THREADS
-if hasattr(os, 'sched_getaffinity'):
-    DEFAULT_NUM_THREADS = min(4, len(os.sched_getaffinity(0)))
-elif os.cpu_count() is not None:
-    DEFAULT_NUM_THREADS = min(4, os.cpu_count())
-else:  # Fallback
-    DEFAULT_NUM_THREADS = 1
-# Number of threads to use for the computation (initialized to up to 4)
-
 cdef int USE_OPENMP_THRESHOLD = 1000
 """OpenMP is not used for arrays with less elements than this threshold"""
 
@@ -99,6 +92,13 @@ ctypedef fused image_types:
     float
 
 
+# Colors types supported when applying a LUT
+ctypedef fused lut_image_types:
+    cnumpy.uint8_t
+    cnumpy.uint32_t  # 4 uint8 channels copied at once
+    float
+
+
 # Normalization
 
 ctypedef double (*NormalizationFunction)(double) nogil
@@ -290,6 +290,13 @@ cdef class PowerNormalization(Normalization):
 
 # Colormap
 
+cdef int _get_num_threads(int length):
+    """Returns the number of threads to use to process length elements"""
+    if length < USE_OPENMP_THRESHOLD:
+        return 1
+    return get_max_num_threads()
+
+
 @cython.wraparound(False)
 @cython.boundscheck(False)
 @cython.nonecheck(False)
@@ -300,7 +307,8 @@ cdef image_types[:, ::1] compute_cmap(
            Normalization normalization,
            double vmin,
            double vmax,
-           image_types[::1] nan_color):
+           image_types[::1] nan_color,
+           image_types[:, ::1] output=None):
     """Apply colormap to data.
 
     :param data: Input data
@@ -309,9 +317,9 @@ cdef image_types[:, ::1] compute_cmap(
     :param vmax: Upper bound of the colormap range
     :param nan_color: Color to use for NaN value
     :param normalization: Normalization to apply
+    :param output: Array where to store the result (default: a new array)
     :return: Data converted to colors
     """
-    cdef image_types[:, ::1] output
     cdef double scale, value, normalized_vmin, normalized_vmax
     cdef int length, nb_channels, nb_colors
     cdef int channel, index, lut_index, num_threads
@@ -320,8 +328,9 @@ cdef image_types[:, ::1] compute_cmap(
     nb_channels = <int> colors.shape[1]
     length = <int> data.size
 
-    output = numpy.empty((length, nb_channels),
-                         dtype=numpy.array(colors, copy=False).dtype)
+    if output is None:
+        output = numpy.empty((length, nb_channels),
+                             dtype=numpy.array(colors, copy=False).dtype)
 
     normalized_vmin = normalization.apply_double(vmin, vmin, vmax)
     normalized_vmax = normalization.apply_double(vmax, vmin, vmax)
@@ -334,12 +343,7 @@ cdef image_types[:, ::1] compute_cmap(
     else:
         scale = nb_colors / (normalized_vmax - normalized_vmin)
 
-    if length < USE_OPENMP_THRESHOLD:
-        num_threads = 1
-    else:
-        num_threads = min(
-            DEFAULT_NUM_THREADS,
-            int(os.environ.get("OMP_NUM_THREADS", DEFAULT_NUM_THREADS)))
+    num_threads = _get_num_threads(length)
 
     with nogil:
         for index in prange(length, num_threads=num_threads):
@@ -367,6 +371,64 @@ cdef image_types[:, ::1] compute_cmap(
 
     return output
 
+
+def _get_type_range(dtype):
+    """Returns the (min, max) values of the 8 and 16 bits integer types
+
+    :param numpy.dtype dtype:
+    :rtype: List[int]
+    """
+    info = numpy.iinfo(dtype)
+    return int(info.min), int(info.max)
+
+
+@cython.wraparound(False)
+@cython.boundscheck(False)
+@cython.nonecheck(False)
+@cython.cdivision(True)
+def _apply_lut(lut_types[:] data,
+               lut_image_types[:, ::1] lut,
+               lut_image_types[:, ::1] output=None):
+    """Convert data to colors with a LUT covering all values of its type.
+
+    Only supports data of types: uint8, uint16, int8, int16.
+
+    :param data: Input data
+    :param lut: Colors of all values of the type of data, starting with
+        the minimum value
+    :param output: Array where to store the result (default: a new array)
+    :return: The generated image
+    """
+    cdef int type_min
+    cdef int nb_channels, length
+    cdef int channel, index, lut_index, num_threads
+
+    length = <int> data.shape[0]
+    nb_channels = <int> lut.shape[1]
+
+    if lut_types is cnumpy.int8_t:
+        type_min = -128
+    elif lut_types is cnumpy.int16_t:
+        type_min = -32768
+    else:  # unsigned types
+        type_min = 0
+
+    if output is None:
+        output = numpy.empty((length, nb_channels),
+                             dtype=numpy.array(lut, copy=False).dtype)
+
+    num_threads = _get_num_threads(length)
+
+    with nogil:
+        # Apply LUT
+        for index in prange(length, num_threads=num_threads):
+            lut_index = data[index] - type_min
+            for channel in range(nb_channels):
+                output[index, channel] = lut[lut_index, channel]
+
+    return numpy.array(output, copy=False)
+
+
 @cython.wraparound(False)
 @cython.boundscheck(False)
 @cython.nonecheck(False)
@@ -377,7 +439,8 @@ cdef image_types[:, ::1] compute_cmap_with_lut(
                Normalization normalization,
                double vmin,
                double vmax,
-               image_types[::1] nan_color):
+               image_types[::1] nan_color,
+               image_types[:, ::1] output=None):
     """Convert data to colors using look-up table to speed the process.
 
     Only supports data of types: uint8, uint16, int8, int16.
@@ -388,54 +451,64 @@ cdef image_types[:, ::1] compute_cmap_with_lut(
     :param vmax: Upper bound of the colormap range
     :param nan_color: Color to use for NaN values
     :param normalization: Normalization to apply
+    :param output: Array where to store the result (default: a new array)
     :return: The generated image
     """
-    cdef image_types[:, ::1] output
     cdef double[:] values
     cdef image_types[:, ::1] lut
-    cdef int type_min, type_max
-    cdef int nb_channels, length
-    cdef int channel, index, lut_index, num_threads
-
-    length = <int> data.size
-    nb_channels = <int> colors.shape[1]
-
-    if lut_types is cnumpy.int8_t:
-        type_min = -128
-        type_max = 127
-    elif lut_types is cnumpy.uint8_t:
-        type_min = 0
-        type_max = 255
-    elif lut_types is cnumpy.int16_t:
-        type_min = -32768
-        type_max = 32767
-    else:  # uint16_t
-        type_min = 0
-        type_max = 65535
-
-    colors_dtype = numpy.array(colors).dtype
 
+    type_min, type_max = _get_type_range(numpy.array(data, copy=False).dtype)
     values = numpy.arange(type_min, type_max + 1, dtype=numpy.float64)
     lut = compute_cmap(
         values, colors, normalization, vmin, vmax, nan_color)
 
-    output = numpy.empty((length, nb_channels), dtype=colors_dtype)
+    return _apply_lut(data, lut, output)
 
-    if length < USE_OPENMP_THRESHOLD:
-        num_threads = 1
-    else:
-        num_threads = min(
-            DEFAULT_NUM_THREADS,
-            int(os.environ.get("OMP_NUM_THREADS", DEFAULT_NUM_THREADS)))
+
+@cython.wraparound(False)
+@cython.boundscheck(False)
+@cython.nonecheck(False)
+@cython.cdivision(True)
+def _apply_float32_lut(cnumpy.uint32_t[:] data,
+                       lut_image_types[:, ::1] lut,
+                       lut_image_types[::1] nan_color,
+                       lut_image_types[:, ::1] output=None):
+    """Convert float32 data to colors with a LUT indexed by the 16 most
+    significant bits of the values.
+
+    :param data: Input float32 data viewed as uint32
+    :param lut: Colors of the 65536 ranges of float32 values
+    :param nan_color: Color to use for NaN values
+    :param output: Array where to store the result (default: a new array)
+    :return: The generated image
+    """
+    cdef int nb_channels, length
+    cdef int channel, index, num_threads
+    cdef cnumpy.uint32_t value
+
+    length = <int> data.shape[0]
+    nb_channels = <int> lut.shape[1]
+
+    if output is None:
+        output = numpy.empty((length, nb_channels),
+                             dtype=numpy.array(lut, copy=False).dtype)
+
+    num_threads = _get_num_threads(length)
 
     with nogil:
-        # Apply LUT
         for index in prange(length, num_threads=num_threads):
-            lut_index = data[index] - type_min
-            for channel in range(nb_channels):
-                output[index, channel] = lut[lut_index, channel]
+            value = data[index]
+            if (value & 0x7fffffff) > 0x7f800000:  # NaN
+                for channel in range(nb_channels):
+                    output[index, channel] = nan_color[channel]
+            elif (value & 0x7fffffff) == 0:  # -0.0 uses the range of +0.0
+                for channel in range(nb_channels):
+                    output[index, channel] = lut[0, channel]
+            else:
+                for channel in range(nb_channels):
+                    output[index, channel] = lut[value >> 16, channel]
 
-    return output
+    return numpy.array(output, copy=False)
 
 
 # Normalizations without parameters
@@ -456,7 +529,8 @@ def _cmap(data_types[:] data,
           Normalization normalization,
           double vmin,
           double vmax,
-          image_types[::1] nan_color):
+          image_types[::1] nan_color,
+          image_types[:, ::1] output=None):
     """Implementation of colormap.
 
     Use :func:`cmap`.
@@ -467,18 +541,17 @@ def _cmap(data_types[:] data,
     :param vmin: Lower bound of the colormap range
     :param vmax: Upper bound of the colormap range
     :param nan_color: Color to use for NaN value.
+    :param output: Array where to store the result (default: a new array)
     :return: The generated image
     """
-    cdef image_types[:, ::1] output
-
     # Proxy for calling the right implementation depending on data type
     if data_types in lut_types:  # Use LUT implementation
         output = compute_cmap_with_lut(
-            data, colors, normalization, vmin, vmax, nan_color)
+            data, colors, normalization, vmin, vmax, nan_color, output)
 
     elif data_types in default_types:  # Use default implementation
         output = compute_cmap(
-            data, colors, normalization, vmin, vmax, nan_color)
+            data, colors, normalization, vmin, vmax, nan_color, output)
 
     else:
         raise ValueError('Unsupported data type')
@@ -486,6 +559,59 @@ def _cmap(data_types[:] data,
     return numpy.array(output, copy=False)
 
 
+def _prepare_data(data):
+    """Returns data as a numpy array of native endian type.
+
+    float16 is converted to float32.
+
+    :param data: The input data
+    :rtype: numpy.ndarray
+    """
+    # No need for contiguity
+    data = numpy.array(data, copy=False)
+    native_endian_dtype = data.dtype.newbyteorder('N')
+    if native_endian_dtype.kind == 'f' and native_endian_dtype.itemsize == 2:
+        native_endian_dtype = "=f4"  # Use native float32 instead of float16
+    return numpy.array(data, copy=False, dtype=native_endian_dtype)
+
+
+def _prepare_colors(colors, nan_color):
+    """Returns colors and nan_color as contiguous arrays of native endian type
+
+    :param numpy.ndarray colors: Color look-up table
+    :param nan_color: Color to use for NaN value or None for zeros
+    :return: (colors with shape (nb_colors, nb_channels), nan_color)
+    :rtype: List[numpy.ndarray]
+    """
+    colors = numpy.array(colors, copy=False)
+    nb_channels = colors.shape[colors.ndim - 1]
+    colors = numpy.ascontiguousarray(colors,
+                                     dtype=colors.dtype.newbyteorder('N'))
+
+    if nan_color is None:
+        nan_color = numpy.zeros((nb_channels,), dtype=colors.dtype)
+    else:
+        nan_color = numpy.ascontiguousarray(
+            nan_color, dtype=colors.dtype).reshape(-1)
+    assert nan_color.shape == (nb_channels,)
+
+    return colors.reshape(-1, nb_channels), nan_color
+
+
+def _get_normalization(normalization):
+    """Returns a Normalization object
+
+    :param Union[str,Normalization] normalization:
+    :rtype: Normalization
+    """
+    if isinstance(normalization, str):
+        norm = _BASIC_NORMALIZATIONS.get(normalization, None)
+        if norm is None:
+            raise ValueError('Unsupported normalization %s' % normalization)
+        return norm
+    return normalization
+
+
 def cmap(data,
          colors,
          double vmin,
@@ -515,45 +641,189 @@ def cmap(data,
         The dtype of the returned array is that of the colors array.
     :rtype: numpy.ndarray
     """
-    cdef int nb_channels
-    cdef Normalization norm
-
-    # Make data a numpy array of native endian type (no need for contiguity)
-    data = numpy.array(data, copy=False)
-    native_endian_dtype = data.dtype.newbyteorder('N')
-    if native_endian_dtype.kind == 'f' and native_endian_dtype.itemsize == 2:
-        native_endian_dtype = "=f4"  # Use native float32 instead of float16
-    data = numpy.array(data, copy=False, dtype=native_endian_dtype)
-
-    # Make colors a contiguous array of native endian type
-    colors = numpy.array(colors, copy=False)
-    nb_channels = colors.shape[colors.ndim - 1]
-    colors = numpy.ascontiguousarray(colors,
-                                     dtype=colors.dtype.newbyteorder('N'))
-
-    # Make normalization a Normalization object
-    if isinstance(normalization, str):
-        norm = _BASIC_NORMALIZATIONS.get(normalization, None)
-        if norm is None:
-            raise ValueError('Unsupported normalization %s' % normalization)
-    else:
-        norm = normalization
-
-    # Check nan_color
-    if nan_color is None:
-        nan_color = numpy.zeros((nb_channels,), dtype=colors.dtype)
-    else:
-        nan_color = numpy.ascontiguousarray(
-            nan_color, dtype=colors.dtype).reshape(-1)
-    assert nan_color.shape == (nb_channels,)
+    data = _prepare_data(data)
+    colors, nan_color = _prepare_colors(colors, nan_color)
+    norm = _get_normalization(normalization)
 
     image = _cmap(
         data.reshape(-1),
-        colors.reshape(-1, nb_channels),
+        colors,
         norm,
         vmin,
         vmax,
         nan_color)
-    image.shape = data.shape + (nb_channels,)
+    image.shape = data.shape + (colors.shape[1],)
 
     return image
+
+
+class Colormapper(object):
+    """Convert data to colors, reusing look-up tables between calls.
+
+    Data of types uint8, int8, uint16 and int16 is converted with a LUT of
+    the colors of all the values of its type.
+    float32 data is converted with a LUT of the colors of the 65536 ranges
+    of values sharing the same 16 most significant bits, provided this
+    changes the color of any value by at most one step of the colormap.
+    Otherwise, and for other types, each value is normalized as in
+    :func:`cmap`.
+
+    LUTs are computed once per (dtype, vmin, vmax, normalization), and
+    the most recently used ones are kept.
+
+    :param numpy.ndarray colors: Color look-up table as a 2D array.
+       It MUST be of type uint8 or float32
+    :param nan_color: Color to use for NaN value.
+        Default: A color with all channels set to 0
+    :param int cache_size: Maximum number of LUTs to keep
+    """
+
+    FLOAT32_LUT_MAX_ERROR = 1
+    """Maximum difference of color index allowed for the float32 LUT"""
+
+    def __init__(self, colors, nan_color=None, cache_size=8):
+        self._colors, self._nanColor = _prepare_colors(colors, nan_color)
+        self._cacheSize = max(0, int(cache_size))
+        self._luts = collections.OrderedDict()
+
+    @property
+    def colors(self):
+        """Color look-up table (nb_colors, nb_channels) (a copy of it)"""
+        return self._colors.copy()
+
+    @property
+    def nan_color(self):
+        """Color used for NaN values (a copy of it)"""
+        return self._nanColor.copy()
+
+    def clear_cache(self):
+        """Forget all the LUTs"""
+        self._luts.clear()
+
+    def _getLut(self, dtype, vmin, vmax, norm):
+        """Returns the LUT to use for a dtype, a range and a normalization.
+
+        :return: The LUT or None if no LUT is used
+        :rtype: Union[numpy.ndarray,None]
+        """
+        if dtype.kind in 'iu' and dtype.itemsize <= 2:
+            kind = 'integer'
+        elif dtype == numpy.float32:
+            kind = 'float32'
+        else:
+            return None
+
+        key = dtype.str, vmin, vmax, norm
+        if key in self._luts:
+            self._luts.move_to_end(key)
+            return self._luts[key]
+
+        if kind == 'integer':
+            type_min, type_max = _get_type_range(dtype)
+            values = numpy.arange(type_min, type_max + 1, dtype=numpy.float64)
+            lut = _cmap(
+                values, self._colors, norm, vmin, vmax, self._nanColor)
+        else:
+            lut = self._computeFloat32Lut(vmin, vmax, norm)
+
+        if self._cacheSize > 0:
+            self._luts[key] = lut
+            while len(self._luts) > self._cacheSize:
+                self._luts.popitem(last=False)
+        return lut
+
+    def _computeFloat32Lut(self, vmin, vmax, norm):
+        """Returns the LUT of float32 indexed by their 16 most significant
+        bits, or None if it induces too large errors.
+
+        -0.0 uses the color of the range of +0.0, and NaNs are handled
+        separately, so that infinities are the only values of their ranges.
+        """
+        msb = numpy.arange(2**16, dtype=numpy.uint32) << 16
+        lower_bits = msb.copy()
+        lower_bits[0x8000] = 0x80000001  # -0.0 is checked with +0.0
+        upper_bits = msb | 0xffff
+        is_infinity = (msb & 0x7fffffff) == 0x7f800000
+        upper_bits[is_infinity] = msb[is_infinity]
+        with numpy.errstate(invalid='ignore'):  # Casting NaNs with payloads
+            lower = lower_bits.view(numpy.float32).astype(numpy.float64)
+            upper = upper_bits.view(numpy.float32).astype(numpy.float64)
+            middle = (msb | 0x8000).view(numpy.float32).astype(numpy.float64)
+        zeros = numpy.array((0., -0.), dtype=numpy.float64)
+
+        # Check the color index of the bounds of each range
+        indices = numpy.arange(len(self._colors),
+                               dtype=numpy.float32).reshape(-1, 1)
+        nan_index = numpy.array((numpy.nan,), dtype=numpy.float32)
+        lower_indices = _cmap(lower, indices, norm, vmin, vmax, nan_index)
+        upper_indices = _cmap(upper, indices, norm, vmin, vmax, nan_index)
+        middle_indices = _cmap(middle, indices, norm, vmin, vmax, nan_index)
+        zero_indices = _cmap(zeros, indices, norm, vmin, vmax, nan_index)
+
+        # Values of a range must all be NaN colors or none of them
+        is_nan = numpy.isnan(lower_indices)
+        is_finite = numpy.isfinite(lower)
+        if (numpy.any(is_nan != numpy.isnan(upper_indices)) or
+                numpy.any(is_nan[is_finite] !=
+                          numpy.isnan(middle_indices[is_finite])) or
+                numpy.isnan(zero_indices[0]) != numpy.isnan(zero_indices[1])):
+            return None
+        with numpy.errstate(invalid='ignore'):
+            error = max(numpy.nanmax(numpy.abs(lower_indices - upper_indices)),
+                        numpy.nan_to_num(abs(zero_indices[0] - zero_indices[1])))
+        if error > self.FLOAT32_LUT_MAX_ERROR:
+            return None
+
+        # Use the middle of each range, but the bound for infinities
+        values = numpy.where(is_finite, middle, lower)
+        return _cmap(values, self._colors, norm, vmin, vmax, self._nanColor)
+
+    def apply(self, data, double vmin, double vmax,
+              normalization='linear', out=None):
+        """Convert data to colors.
+
+        :param numpy.ndarray data: The input data
+        :param vmin: Data value to map to the beginning of colormap.
+        :param vmax: Data value to map to the end of the colormap.
+        :param Union[str,Normalization] normalization:
+            See :func:`cmap`.
+        :param numpy.ndarray out:
+            C-contiguous array where to write the colors, with the shape of
+            data + the last dimension of colors and the dtype of colors.
+            Default: a new array.
+        :return: Array of colors, out if provided.
+        :rtype: numpy.ndarray
+        """
+        data = _prepare_data(data)
+        norm = _get_normalization(normalization)
+        nb_channels = self._colors.shape[1]
+
+        shape = data.shape + (nb_channels,)
+        if out is None:
+            out = numpy.empty(shape, dtype=self._colors.dtype)
+        elif (out.shape != shape or out.dtype != self._colors.dtype or
+                not out.flags['C_CONTIGUOUS']):
+            raise ValueError(
+                'out must be a C-contiguous %s array of shape %s' %
+                (self._colors.dtype, shape))
+        output = out.reshape(-1, nb_channels)
+
+        lut = self._getLut(data.dtype, vmin, vmax, norm)
+        if lut is None:
+            _cmap(data.reshape(-1), self._colors, norm,
+                  vmin, vmax, self._nanColor, output)
+            return out
+
+        nan_color = self._nanColor
+        if self._colors.dtype == numpy.uint8 and nb_channels == 4:
+            # Copy the 4 channels of each pixel at once
+            lut = lut.view(numpy.uint32)
+            output = output.view(numpy.uint32)
+            nan_color = nan_color.view(numpy.uint32)
+
+        if data.dtype == numpy.float32:
+            _apply_float32_lut(data.reshape(-1).view(numpy.uint32),
+                               lut, nan_color, output)
+        else:
+            _apply_lut(data.reshape(-1), lut, output)
+        return out
@@ -33,7 +33,10 @@ __license__ = "MIT"
 __date__ = "24/04/2018"
 
 cimport cython
+from cython.parallel import prange
+from libc.stdlib cimport malloc, free
 from .math_compatibility cimport isnan, isfinite, INFINITY
+from ..utils._num_threads cimport get_max_num_threads
 
 
 import numpy
@@ -63,6 +66,10 @@ ctypedef fused _floating:
     long double
 
 
+cdef Py_ssize_t USE_OPENMP_THRESHOLD = 100000
+"""OpenMP is not used for arrays with less elements than this threshold"""
+
+
 class _MinMaxResult(object):
     """Object storing result from :func:`min_max`"""
 
@@ -115,152 +122,346 @@ class _MinMaxResult(object):
 @cython.initializedcheck(False)
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def _min_max(_number[::1] data, bint min_positive=False):
-    """:func:`min_max` implementation including infinite values
-
-    See :func:`min_max` for documentation.
+cdef void _min_max_range(const _number[:] data,
+                         Py_ssize_t start,
+                         Py_ssize_t end,
+                         bint min_positive,
+                         _number *minimum,
+                         _number *min_pos,
+                         _number *maximum,
+                         Py_ssize_t *argmin,
+                         Py_ssize_t *argmin_pos,
+                         Py_ssize_t *argmax) nogil:
+    """Compute min/max of data[start:end] ignoring NaNs.
+
+    Indices are set to -1 when there is no value (resp. no strictly
+    positive value) in this range.
     """
     cdef:
-        _number value, minimum, min_pos, maximum
-        unsigned int length
-        unsigned int index = 0
-        unsigned int min_index = 0
-        unsigned int min_pos_index = 0
-        unsigned int max_index = 0
-
-    length = len(data)
-
-    if length == 0:
-        raise ValueError('Zero-size array')
-
-    with nogil:
+        _number value, min_value, min_pos_value, max_value
+        Py_ssize_t index = start
+        Py_ssize_t min_index = -1
+        Py_ssize_t min_pos_index = -1
+        Py_ssize_t max_index = -1
+
+    if _number in _floating:
+        # For floating, loop until first not NaN value
+        while index < end and isnan(data[index]):
+            index += 1
+
+    if index < end:
         # Init starting values
-        value = data[0]
-        minimum = value
-        maximum = value
+        value = data[index]
+        min_value = value
+        min_index = index
+        max_value = value
+        max_index = index
+        min_pos_value = value
         if min_positive and value > 0:
-            min_pos = value
-        else:
-            min_pos = 0
-
-        if _number in _floating:
-            # For floating, loop until first not NaN value
-            for index in range(length):
-                value = data[index]
-                if not isnan(value):
-                    minimum = value
-                    min_index = index
-                    maximum = value
-                    max_index = index
-                    break
+            min_pos_index = index
 
         if not min_positive:
-            for index in range(index, length):
+            for index in range(index + 1, end):
                 value = data[index]
-                if value > maximum:
-                    maximum = value
+                if value > max_value:
+                    max_value = value
                     max_index = index
-                elif value < minimum:
-                    minimum = value
+                elif value < min_value:
+                    min_value = value
                     min_index = index
 
         else:
-            # Loop until min_pos is defined
-            for index in range(index, length):
-                value = data[index]
-                if value > maximum:
-                    maximum = value
-                    max_index = index
-                elif value < minimum:
-                    minimum = value
-                    min_index = index
+            if min_pos_index == -1:
+                # Loop until min_pos is defined
+                for index in range(index + 1, end):
+                    value = data[index]
+                    if value > max_value:
+                        max_value = value
+                        max_index = index
+                    elif value < min_value:
+                        min_value = value
+                        min_index = index
 
-                if value > 0:
-                    min_pos = value
-                    min_pos_index = index
-                    break
+                    if value > 0:
+                        min_pos_value = value
+                        min_pos_index = index
+                        break
 
             # Loop until the end
-            for index in range(index + 1, length):
+            for index in range(index + 1, end):
                 value = data[index]
-                if value > maximum:
-                    maximum = value
+                if value > max_value:
+                    max_value = value
                     max_index = index
                 else:
-                    if value < minimum:
-                        minimum = value
+                    if value < min_value:
+                        min_value = value
                         min_index = index
 
-                    if 0 < value < min_pos:
-                        min_pos = value
+                    if 0 < value < min_pos_value:
+                        min_pos_value = value
                         min_pos_index = index
 
-    return _MinMaxResult(minimum,
-                         min_pos if min_pos > 0 else None,
-                         maximum,
-                         min_index,
-                         min_pos_index if min_pos > 0 else None,
-                         max_index)
+        minimum[0] = min_value
+        min_pos[0] = min_pos_value
+        maximum[0] = max_value
+
+    argmin[0] = min_index
+    argmin_pos[0] = min_pos_index
+    argmax[0] = max_index
 
 
 @cython.initializedcheck(False)
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def _finite_min_max(_floating[::1] data, bint min_positive=False):
-    """:func:`min_max` implementation for floats skipping infinite values
+cdef void _finite_min_max_range(const _floating[:] data,
+                                Py_ssize_t start,
+                                Py_ssize_t end,
+                                bint min_positive,
+                                _floating *minimum,
+                                _floating *min_pos,
+                                _floating *maximum,
+                                Py_ssize_t *argmin,
+                                Py_ssize_t *argmin_pos,
+                                Py_ssize_t *argmax) nogil:
+    """Compute min/max of data[start:end] skipping infinite values and NaNs.
+
+    Indices are set to -1 when there is no finite value (resp. no strictly
+    positive finite value) in this range.
+    """
+    cdef:
+        _floating value, min_value, min_pos_value, max_value
+        Py_ssize_t index
+        Py_ssize_t min_index = -1
+        Py_ssize_t min_pos_index = -1
+        Py_ssize_t max_index = -1
+
+    min_value = INFINITY
+    max_value = -INFINITY
+    min_pos_value = INFINITY
+
+    if not min_positive:
+        for index in range(start, end):
+            value = data[index]
+            if isfinite(value):
+                if value > max_value:
+                    max_value = value
+                    max_index = index
+                if value < min_value:
+                    min_value = value
+                    min_index = index
+
+    else:
+        for index in range(start, end):
+            value = data[index]
+            if isfinite(value):
+                if value > max_value:
+                    max_value = value
+                    max_index = index
+                if value < min_value:
+                    min_value = value
+                    min_index = index
+
+                if 0. < value < min_pos_value:
+                    min_pos_value = value
+                    min_pos_index = index
+
+    minimum[0] = min_value
+    min_pos[0] = min_pos_value
+    maximum[0] = max_value
+    argmin[0] = min_index
+    argmin_pos[0] = min_pos_index
+    argmax[0] = max_index
+
+
+cdef void _merge_ranges(int count,
+                        _number *minima,
+                        _number *min_positives,
+                        _number *maxima,
+                        Py_ssize_t *argmins,
+                        Py_ssize_t *argmin_positives,
+                        Py_ssize_t *argmaxs) nogil:
+    """Merge the results of consecutive ranges into the first one.
+
+    Ranges are processed in order and only strictly lower/greater values
+    are retained, so indices remain those of the first occurrence.
+    """
+    cdef int chunk
+
+    for chunk in range(1, count):
+        if argmins[chunk] >= 0 and (
+                argmins[0] < 0 or minima[chunk] < minima[0]):
+            minima[0] = minima[chunk]
+            argmins[0] = argmins[chunk]
+
+        if argmaxs[chunk] >= 0 and (
+                argmaxs[0] < 0 or maxima[chunk] > maxima[0]):
+            maxima[0] = maxima[chunk]
+            argmaxs[0] = argmaxs[chunk]
+
+        if argmin_positives[chunk] >= 0 and (
+                argmin_positives[0] < 0 or
+                min_positives[chunk] < min_positives[0]):
+            min_positives[0] = min_positives[chunk]
+            argmin_positives[0] = argmin_positives[chunk]
+
+
+cdef int _get_num_threads(Py_ssize_t length) except -1:
+    """Returns the number of threads to use to process length elements"""
+    if length < USE_OPENMP_THRESHOLD:
+        return 1
+    return get_max_num_threads()
+
+
+@cython.initializedcheck(False)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _min_max(const _number[:] data, bint min_positive=False):
+    """:func:`min_max` implementation including infinite values
 
     See :func:`min_max` for documentation.
     """
     cdef:
-        _floating value, minimum, min_pos, maximum
-        unsigned int length
-        unsigned int index = 0
-        unsigned int min_index = 0
-        unsigned int min_pos_index = 0
-        unsigned int max_index = 0
+        Py_ssize_t length, chunk_size
+        int num_threads, chunk
+        _number *minima
+        _number *min_positives
+        _number *maxima
+        Py_ssize_t *argmins
+        Py_ssize_t *argmin_positives
+        Py_ssize_t *argmaxs
 
     length = len(data)
 
     if length == 0:
         raise ValueError('Zero-size array')
 
-    with nogil:
-        minimum = INFINITY
-        maximum = -INFINITY
-        min_pos = INFINITY
+    num_threads = _get_num_threads(length)
+    chunk_size = (length + num_threads - 1) // num_threads
+
+    # Results of each thread, merged at the end
+    minima = <_number *> malloc(3 * num_threads * sizeof(_number))
+    argmins = <Py_ssize_t *> malloc(3 * num_threads * sizeof(Py_ssize_t))
+    if minima == NULL or argmins == NULL:
+        free(minima)
+        free(argmins)
+        raise MemoryError()
+    min_positives = minima + num_threads
+    maxima = minima + 2 * num_threads
+    argmin_positives = argmins + num_threads
+    argmaxs = argmins + 2 * num_threads
+
+    try:
+        with nogil:
+            if num_threads == 1:
+                _min_max_range(data, 0, length, min_positive,
+                               minima, min_positives, maxima,
+                               argmins, argmin_positives, argmaxs)
+            else:
+                for chunk in prange(num_threads,
+                                    num_threads=num_threads,
+                                    schedule='static'):
+                    _min_max_range(
+                        data,
+                        chunk * chunk_size,
+                        min(length, (chunk + 1) * chunk_size),
+                        min_positive,
+                        minima + chunk,
+                        min_positives + chunk,
+                        maxima + chunk,
+                        argmins + chunk,
+                        argmin_positives + chunk,
+                        argmaxs + chunk)
+                _merge_ranges(num_threads, minima, min_positives, maxima,
+                              argmins, argmin_positives, argmaxs)
+
+        if argmins[0] < 0:  # All NaNs
+            return _MinMaxResult(data[0], None, data[0], 0, None, 0)
+
+        return _MinMaxResult(
+            minima[0],
+            min_positives[0] if argmin_positives[0] >= 0 else None,
+            maxima[0],
+            argmins[0],
+            argmin_positives[0] if argmin_positives[0] >= 0 else None,
+            argmaxs[0])
+    finally:
+        free(minima)
+        free(argmins)
 
-        if not min_positive:
-            for index in range(length):
-                value = data[index]
-                if isfinite(value):
-                    if value > maximum:
-                        maximum = value
-                        max_index = index
-                    if value < minimum:
-                        minimum = value
-                        min_index = index
 
-        else:
-            for index in range(index, length):
-                value = data[index]
-                if isfinite(value):
-                    if value > maximum:
-                        maximum = value
-                        max_index = index
-                    if value < minimum:
-                        minimum = value
-                        min_index = index
+@cython.initializedcheck(False)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _finite_min_max(const _floating[:] data, bint min_positive=False):
+    """:func:`min_max` implementation for floats skipping infinite values
 
-                    if 0. < value < min_pos:
-                        min_pos = value
-                        min_pos_index = index
+    See :func:`min_max` for documentation.
+    """
+    cdef:
+        Py_ssize_t length, chunk_size
+        int num_threads, chunk
+        _floating *minima
+        _floating *min_positives
+        _floating *maxima
+        Py_ssize_t *argmins
+        Py_ssize_t *argmin_positives
+        Py_ssize_t *argmaxs
+
+    length = len(data)
+
+    if length == 0:
+        raise ValueError('Zero-size array')
 
-    return _MinMaxResult(minimum if isfinite(minimum) else None,
-                         min_pos if isfinite(min_pos) else None,
-                         maximum if isfinite(maximum) else None,
-                         min_index if isfinite(minimum) else None,
-                         min_pos_index if isfinite(min_pos) else None,
-                         max_index if isfinite(maximum) else None)
+    num_threads = _get_num_threads(length)
+    chunk_size = (length + num_threads - 1) // num_threads
+
+    # Results of each thread, merged at the end
+    minima = <_floating *> malloc(3 * num_threads * sizeof(_floating))
+    argmins = <Py_ssize_t *> malloc(3 * num_threads * sizeof(Py_ssize_t))
+    if minima == NULL or argmins == NULL:
+        free(minima)
+        free(argmins)
+        raise MemoryError()
+    min_positives = minima + num_threads
+    maxima = minima + 2 * num_threads
+    argmin_positives = argmins + num_threads
+    argmaxs = argmins + 2 * num_threads
+
+    try:
+        with nogil:
+            if num_threads == 1:
+                _finite_min_max_range(data, 0, length, min_positive,
+                                      minima, min_positives, maxima,
+                                      argmins, argmin_positives, argmaxs)
+            else:
+                for chunk in prange(num_threads,
+                                    num_threads=num_threads,
+                                    schedule='static'):
+                    _finite_min_max_range(
+                        data,
+                        chunk * chunk_size,
+                        min(length, (chunk + 1) * chunk_size),
+                        min_positive,
+                        minima + chunk,
+                        min_positives + chunk,
+                        maxima + chunk,
+                        argmins + chunk,
+                        argmin_positives + chunk,
+                        argmaxs + chunk)
+                _merge_ranges(num_threads, minima, min_positives, maxima,
+                              argmins, argmin_positives, argmaxs)
+
+        return _MinMaxResult(
+            minima[0] if argmins[0] >= 0 else None,
+            min_positives[0] if argmin_positives[0] >= 0 else None,
+            maxima[0] if argmaxs[0] >= 0 else None,
+            argmins[0] if argmins[0] >= 0 else None,
+            argmin_positives[0] if argmin_positives[0] >= 0 else None,
+            argmaxs[0] if argmaxs[0] >= 0 else None)
+    finally:
+        free(minima)
+        free(argmins)
 
 
 def min_max(data not None, bint min_positive=False, bint finite=False):
@@ -322,7 +523,9 @@ def min_max(data not None, bint min_positive=False, bint finite=False):
     if native_endian_dtype.kind == 'f' and native_endian_dtype.itemsize == 2:
         # Use native float32 instead of float16
         native_endian_dtype = "=f4"
-    data = numpy.ascontiguousarray(data, dtype=native_endian_dtype).ravel()
+    # Strided 1D arrays are processed in place, other arrays are only
+    # copied if they cannot be viewed as 1D
+    data = data.astype(native_endian_dtype, copy=False).reshape(-1)
     if finite and data.dtype.kind == 'f':
         return _finite_min_max(data, min_positive)
     else:
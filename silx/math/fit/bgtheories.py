@@ -301,6 +301,26 @@ def estimate_snip(x, y):
     return estimated_par, constraints
 
 
+def no_background(x, y0):
+    """No background: returns zeros"""
+    return numpy.zeros_like(x)
+
+
+def constant(x, y0, c):
+    """Constant background"""
+    return c * numpy.ones_like(x)
+
+
+def estimate_constant(x, y):
+    """Estimate the constant background as the minimum of y"""
+    return [min(y)], [[0, 0, 0]]
+
+
+def linear(x, y0, a, b):
+    """Linear background"""
+    return a + b * x
+
+
 def poly(x, y, *pars):
     """Order n polynomial.
     The order of the polynomial is defined by the number of
@@ -364,21 +384,21 @@ THEORY = OrderedDict(
         (('No Background',
           FitTheory(
                 description="No background function",
-                function=lambda x, y0: numpy.zeros_like(x),
+                function=no_background,
                 parameters=[],
                 is_background=True)),
          ('Constant',
           FitTheory(
                 description='Constant background',
-                function=lambda x, y0, c: c * numpy.ones_like(x),
+                function=constant,
                 parameters=['Constant', ],
-                estimate=lambda x, y: ([min(y)], [[0, 0, 0]]),
+                estimate=estimate_constant,
                 is_background=True)),
          ('Linear',
           FitTheory(
                 description="Linear background, parameters 'Constant' and"
                             " 'Slope'",
-                function=lambda x, y0, a, b: a + b * x,
+                function=linear,
                 parameters=['Constant', 'Slope'],
                 estimate=estimate_linear,
                 configure=configure,
@@ -32,6 +32,13 @@ Index of background extraction functions:
     - :func:`snip2d`
     - :func:`snip3d`
 
+Background extraction of stacks of spectra or images:
+-----------------------------------------------------
+
+    - :func:`strip_batch`
+    - :func:`snip1d_batch`
+    - :func:`snip2d_batch`
+
 Smoothing functions:
 --------------------
 
@@ -68,7 +75,16 @@ import numpy
 _logger = logging.getLogger(__name__)
 
 cimport cython
+from cython.parallel import prange, parallel
+from libc.stdlib cimport malloc, free
+from libc.string cimport memcpy
 cimport silx.math.fit.filters_wrapper as filters_wrapper
+from ...utils._num_threads cimport get_max_num_threads
+
+
+ctypedef fused _floating:
+    float
+    double
 
 
 def strip(data, w=1, niterations=1000, factor=1.0, anchors=None):
@@ -414,3 +430,367 @@ def smooth3d(data):
     filters_wrapper.smooth3d(&data_c[0], nx, ny, nz)
 
     return numpy.asarray(data_c).reshape(data_shape)
+
+
+cdef int _get_num_threads(Py_ssize_t n_items) except -1:
+    """Returns the number of threads to use to process n_items"""
+    return max(1, min(n_items, get_max_num_threads()))
+
+
+def _prepare_batch(data, output, int ndim):
+    """Returns the output array of a batch function filled with data.
+
+    :param data: Stack of spectra or images
+    :param output: None or preallocated output array
+    :param int ndim: Number of dimensions of the stack
+    :rtype: numpy.ndarray
+    """
+    data = numpy.asarray(data)
+    if data.ndim != ndim:
+        raise ValueError("data must be %d-dimensional" % ndim)
+
+    if output is None:
+        dtype = data.dtype if data.dtype in (numpy.float32, numpy.float64) \
+            else numpy.float64
+        return numpy.array(data, copy=True, dtype=dtype, order='C')
+
+    if not isinstance(output, numpy.ndarray):
+        raise TypeError("output must be a numpy.ndarray")
+    if output.dtype not in (numpy.float32, numpy.float64):
+        raise ValueError("output must be of type float32 or float64")
+    if output.shape != data.shape:
+        raise ValueError("output must have the same shape as data")
+    if not output.flags.c_contiguous or not output.flags.writeable:
+        raise ValueError("output must be a writable C-contiguous array")
+    if output is not data:
+        output[...] = data
+    return output
+
+
+cdef void _strip_item(_floating *data,
+                      Py_ssize_t size,
+                      double factor,
+                      long niterations,
+                      Py_ssize_t deltai,
+                      const char *frozen,
+                      _floating *work) nogil:
+    """Apply strip in place to one spectrum, see :func:`strip`
+
+    :param data: The spectrum
+    :param size: Number of channels
+    :param factor: Scaling factor of the mean of the neighbours
+    :param niterations: Number of iterations
+    :param deltai: Width of the strip operator
+    :param frozen: Non-zero for channels close to an anchor or NULL
+    :param work: Buffer of size channels
+    """
+    cdef:
+        long iteration
+        Py_ssize_t index
+        _floating t_mean
+
+    if size < 2 * deltai + 1:
+        return
+
+    for iteration in range(niterations):
+        memcpy(work, data, size * sizeof(_floating))
+        if frozen == NULL:
+            for index in range(deltai, size - deltai):
+                t_mean = 0.5 * (work[index - deltai] + work[index + deltai])
+                if work[index] > t_mean * factor:
+                    data[index] = t_mean
+        else:
+            for index in range(deltai, size - deltai):
+                if frozen[index]:
+                    continue
+                t_mean = 0.5 * (work[index - deltai] + work[index + deltai])
+                if work[index] > t_mean * factor:
+                    data[index] = t_mean
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _strip_batch(_floating[:, ::1] data,
+                      double factor,
+                      long niterations,
+                      Py_ssize_t deltai,
+                      const char *frozen,
+                      int num_threads) nogil:
+    """Apply strip in place to each spectrum
+
+    :return: 0 on success, -1 if a work buffer could not be allocated
+    """
+    cdef:
+        Py_ssize_t index
+        Py_ssize_t size = data.shape[1]
+        _floating *work
+        int failed = 0
+        # Shared flag: assigning failed in the parallel block would make it
+        # thread private
+        int *failed_ptr = &failed
+
+    with parallel(num_threads=num_threads):
+        work = <_floating *> malloc(size * sizeof(_floating))
+        for index in prange(data.shape[0], schedule='dynamic'):
+            if work == NULL:
+                failed_ptr[0] = 1
+            else:
+                _strip_item(&data[index, 0], size, factor, niterations,
+                            deltai, frozen, work)
+        free(work)
+
+    return -1 if failed else 0
+
+
+def strip_batch(data, w=1, niterations=1000, factor=1.0, anchors=None,
+                output=None):
+    """Extract the background of a stack of spectra with the strip algorithm.
+
+    Each row of ``data`` is processed as with :func:`strip`, the rows being
+    distributed over threads.
+
+    float32 and float64 data are processed without conversion, other types
+    are converted to float64.
+
+    :param data: 2D array of spectra of shape (n_spectra, n_channels)
+    :type data: numpy.ndarray
+    :param w: Strip width
+    :param niterations: number of iterations
+    :param factor: scaling factor applied to the average of ``y(i-w)`` and
+        ``y(i+w)`` before comparing to ``y(i)``
+    :param anchors: Array of anchors, indices of channels that will not be
+        modified during the stripping procedure.
+    :param output: Optional preallocated float32 or float64 C-contiguous
+        array of the same shape as data to store the result.
+        It can be data itself to process it in place.
+    :return: Background of each spectrum in a new array or in output
+    :rtype: numpy.ndarray
+    """
+    cdef:
+        char[::1] frozen
+        const char *frozen_ptr = NULL
+        Py_ssize_t deltai, n_channels, anchor, index
+        int num_threads
+
+    output = _prepare_batch(data, output, 2)
+    n_spectra, n_channels = output.shape
+    deltai = w if w > 0 else 1
+
+    if anchors is not None and len(anchors):
+        # Channels within +- deltai of an anchor are not modified
+        frozen = numpy.zeros(n_channels, dtype=numpy.int8)
+        for anchor in anchors:
+            for index in range(max(0, anchor - deltai + 1),
+                               min(n_channels, anchor + deltai)):
+                frozen[index] = 1
+        frozen_ptr = &frozen[0]
+
+    if n_spectra == 0 or n_channels == 0:
+        return output
+
+    num_threads = _get_num_threads(n_spectra)
+    if output.dtype == numpy.float32:
+        status = _strip_batch[float](output, factor, niterations, deltai,
+                                     frozen_ptr, num_threads)
+    else:
+        status = _strip_batch[double](output, factor, niterations, deltai,
+                                      frozen_ptr, num_threads)
+    if status != 0:
+        raise MemoryError("Cannot allocate strip work buffers")
+    return output
+
+
+cdef void _snip1d_item(_floating *data,
+                       Py_ssize_t size,
+                       int snip_width,
+                       _floating *work) nogil:
+    """Apply snip in place to one spectrum, see :func:`snip1d`
+
+    :param data: The spectrum
+    :param size: Number of channels
+    :param snip_width: Width of the snip operator
+    :param work: Buffer of size channels
+    """
+    cdef:
+        Py_ssize_t index, p
+        _floating mean
+
+    for p in range(snip_width, 0, -1):
+        for index in range(p, size - p):
+            mean = 0.5 * (data[index - p] + data[index + p])
+            work[index] = data[index] if data[index] < mean else mean
+        for index in range(p, size - p):
+            data[index] = work[index]
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _snip1d_batch(_floating[:, ::1] data,
+                       int snip_width,
+                       int num_threads) nogil:
+    """Apply snip in place to each spectrum
+
+    :return: 0 on success, -1 if a work buffer could not be allocated
+    """
+    cdef:
+        Py_ssize_t index
+        Py_ssize_t size = data.shape[1]
+        _floating *work
+        int failed = 0
+        # Shared flag: assigning failed in the parallel block would make it
+        # thread private
+        int *failed_ptr = &failed
+
+    with parallel(num_threads=num_threads):
+        work = <_floating *> malloc(size * sizeof(_floating))
+        for index in prange(data.shape[0], schedule='dynamic'):
+            if work == NULL:
+                failed_ptr[0] = 1
+            else:
+                _snip1d_item(&data[index, 0], size, snip_width, work)
+        free(work)
+
+    return -1 if failed else 0
+
+
+def snip1d_batch(data, snip_width, output=None):
+    """Estimate the baseline of a stack of spectra by clipping peaks.
+
+    Each row of ``data`` is processed as with :func:`snip1d`, the rows being
+    distributed over threads.
+
+    float32 and float64 data are processed without conversion, other types
+    are converted to float64.
+
+    :param data: 2D array of spectra of shape (n_spectra, n_channels)
+    :type data: numpy.ndarray
+    :param int snip_width: Width of the snip operator, in number of samples.
+    :param output: Optional preallocated float32 or float64 C-contiguous
+        array of the same shape as data to store the result.
+        It can be data itself to process it in place.
+    :return: Baseline of each spectrum in a new array or in output
+    :rtype: numpy.ndarray
+    """
+    output = _prepare_batch(data, output, 2)
+    if output.size == 0:
+        return output
+
+    num_threads = _get_num_threads(output.shape[0])
+    if output.dtype == numpy.float32:
+        status = _snip1d_batch[float](output, snip_width, num_threads)
+    else:
+        status = _snip1d_batch[double](output, snip_width, num_threads)
+    if status != 0:
+        raise MemoryError("Cannot allocate snip work buffers")
+    return output
+
+
+cdef void _snip2d_item(_floating *data,
+                       Py_ssize_t nrows,
+                       Py_ssize_t ncolumns,
+                       int width,
+                       _floating *work) nogil:
+    """Apply snip in place to one image, see :func:`snip2d`
+
+    :param data: The image
+    :param nrows: Number of rows
+    :param ncolumns: Number of columns
+    :param width: Width of the snip operator
+    :param work: Buffer of size nrows * ncolumns
+    """
+    cdef:
+        Py_ssize_t i, j, p
+        Py_ssize_t previous_row, row, next_row
+        _floating P1, P2, P3, P4, S1, S2, S3, S4, dhelp, value
+
+    for p in range(width, 0, -1):
+        for i in range(p, nrows - p):
+            previous_row = (i - p) * ncolumns
+            row = i * ncolumns
+            next_row = (i + p) * ncolumns
+            for j in range(p, ncolumns - p):
+                P4 = data[previous_row + (j - p)]
+                S4 = data[previous_row + j]
+                P2 = data[previous_row + (j + p)]
+                S3 = data[row + (j - p)]
+                S2 = data[row + (j + p)]
+                P3 = data[next_row + (j - p)]
+                S1 = data[next_row + j]
+                P1 = data[next_row + (j + p)]
+                dhelp = 0.5 * (P1 + P3)
+                S1 = (S1 if S1 > dhelp else dhelp) - dhelp
+                dhelp = 0.5 * (P1 + P2)
+                S2 = (S2 if S2 > dhelp else dhelp) - dhelp
+                dhelp = 0.5 * (P3 + P4)
+                S3 = (S3 if S3 > dhelp else dhelp) - dhelp
+                dhelp = 0.5 * (P2 + P4)
+                S4 = (S4 if S4 > dhelp else dhelp) - dhelp
+                value = 0.5 * (S1 + S2 + S3 + S4) + 0.25 * (P1 + P2 + P3 + P4)
+                work[row + j] = data[row + j] if data[row + j] < value else value
+        for i in range(p, nrows - p):
+            row = i * ncolumns
+            for j in range(p, ncolumns - p):
+                data[row + j] = work[row + j]
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _snip2d_batch(_floating[:, :, ::1] data,
+                       int width,
+                       int num_threads) nogil:
+    """Apply snip in place to each image
+
+    :return: 0 on success, -1 if a work buffer could not be allocated
+    """
+    cdef:
+        Py_ssize_t index
+        Py_ssize_t nrows = data.shape[1]
+        Py_ssize_t ncolumns = data.shape[2]
+        _floating *work
+        int failed = 0
+        # Shared flag: assigning failed in the parallel block would make it
+        # thread private
+        int *failed_ptr = &failed
+
+    with parallel(num_threads=num_threads):
+        work = <_floating *> malloc(nrows * ncolumns * sizeof(_floating))
+        for index in prange(data.shape[0], schedule='dynamic'):
+            if work == NULL:
+                failed_ptr[0] = 1
+            else:
+                _snip2d_item(&data[index, 0, 0], nrows, ncolumns, width, work)
+        free(work)
+
+    return -1 if failed else 0
+
+
+def snip2d_batch(data, snip_width, output=None):
+    """Estimate the baseline of a stack of images by clipping peaks.
+
+    Each image of ``data`` is processed as with :func:`snip2d`, the images
+    being distributed over threads.
+
+    float32 and float64 data are processed without conversion, other types
+    are converted to float64.
+
+    :param data: 3D array of images of shape (n_images, height, width)
+    :type data: numpy.ndarray
+    :param int snip_width: Width of the snip operator, in number of samples.
+    :param output: Optional preallocated float32 or float64 C-contiguous
+        array of the same shape as data to store the result.
+        It can be data itself to process it in place.
+    :return: Baseline of each image in a new array or in output
+    :rtype: numpy.ndarray
+    """
+    output = _prepare_batch(data, output, 3)
+    if output.size == 0:
+        return output
+
+    num_threads = _get_num_threads(output.shape[0])
+    if output.dtype == numpy.float32:
+        status = _snip2d_batch[float](output, snip_width, num_threads)
+    else:
+        status = _snip2d_batch[double](output, snip_width, num_threads)
+    if status != 0:
+        raise MemoryError("Cannot allocate snip work buffers")
+    return output
@@ -38,9 +38,12 @@ This module deals with:
     - handling of custom  derivative functions that can be passed as a
       parameter to  :func:`silx.math.fit.leastsq`
     - providing different background models
+    - fitting series of spectra, starting each fit from the previous one
 
 """
 from collections import OrderedDict
+import concurrent.futures
+import copy
 import logging
 import numpy
 from numpy.linalg.linalg import LinAlgError
@@ -207,6 +210,10 @@ class FitManager(object):
         to fit an individual peak.
         """
 
+        self._dependent_parameters = []
+        """List of (free parameter index, dependent parameter index, factor)
+        used by :meth:`fitderivative`. It is filled in :meth:`runfit`."""
+
         self.setdata(x, y, sigmay)
 
     ##################
@@ -499,6 +506,100 @@ class FitManager(object):
         self.estimate()
         return self.runfit()
 
+    def fitseries(self, y, x=None, sigmay=None, xmin=None, xmax=None,
+                  warm_start=True, divergence_factor=10.,
+                  chunk_size=None, nproc=1):
+        """Fit a series of spectra sharing the same abscissa, e.g., the
+        spectra of a scan, with the current theory, background and
+        configuration.
+
+        The first spectrum is estimated and fitted as with :meth:`fit`.
+        If ``warm_start`` is True, the next spectra are fitted starting from
+        the last successful fit, keeping its constraints, and are only
+        estimated again if this fit fails or diverges. The data derived from
+        the abscissa is computed once for the whole series.
+
+        The spectra can be split in chunks fitted by a pool of processes,
+        all of them starting from the fit of the first spectrum.
+        In this case, the theories must be picklable (e.g., module level
+        functions).
+
+        After the call, the fit manager holds the data and the fit of the
+        last spectrum it processed.
+
+        :param y: 2D array of spectra of shape (n_spectra, n_points)
+        :param x: Abscissa of the spectra. If ``None``, use
+            ``numpy.arange(n_points)``
+        :param sigmay: None, 1D array of uncertainties shared by all spectra
+            or 2D array of uncertainties for each spectrum
+        :param xmin: Lower value of x values to use for fitting
+        :param xmax: Upper value of x values to use for fitting
+        :param bool warm_start: Whether to start from the previous fit (the
+            default) or to estimate each spectrum
+        :param float divergence_factor: A warm started fit is considered
+            diverging if its reduced chi square is larger than the one of
+            the previous fit multiplied by this factor
+        :param int chunk_size: Number of spectra fitted by a process.
+            Default: all spectra in one chunk if nproc is 1, else split
+            evenly between the processes.
+        :param int nproc: Number of processes used to fit the chunks.
+            If None, the number of CPUs is used. Default: 1, no process pool.
+        :return: Structured array with one record per spectrum, with one
+            field per fitted parameter named from :attr:`parameter_names`,
+            one ``"sigma_<name>"`` field per uncertainty and fields
+            ``"chisq"`` (reduced chi square), ``"niter"``, ``"estimated"``
+            (whether the parameters were estimated rather than warm started)
+            and ``"success"``. Parameters of failed fits are NaN.
+        :rtype: numpy.ndarray
+        :raise: LinAlgError if the first spectrum cannot be fitted
+        """
+        y = numpy.array(y, copy=False, ndmin=2)
+        n_spectra = len(y)
+        if sigmay is not None:
+            sigmay = numpy.broadcast_to(numpy.array(sigmay, copy=False),
+                                        y.shape)
+
+        # Fit the first spectrum to define the parameters of the series
+        self.setdata(x, y[0],
+                     sigmay=None if sigmay is None else sigmay[0],
+                     xmin=xmin, xmax=xmax)
+        self.estimate()
+        self.runfit()
+
+        result = numpy.zeros(n_spectra,
+                             dtype=self._series_dtype(self.parameter_names))
+        self._set_series_record(result[0], estimated=True)
+        if n_spectra == 1:
+            return result
+
+        if nproc is None:
+            nproc = os.cpu_count() or 1
+        if chunk_size is None:
+            chunk_size = max(1, -(-(n_spectra - 1) // nproc))
+        kwargs = dict(x=x, xmin=xmin, xmax=xmax,
+                      warm_start=warm_start,
+                      divergence_factor=divergence_factor)
+        chunks = [(start, y[start:start + chunk_size],
+                   None if sigmay is None else sigmay[start:start + chunk_size])
+                  for start in range(1, n_spectra, chunk_size)]
+
+        if nproc > 1 and len(chunks) > 1:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=min(nproc, len(chunks))) as executor:
+                futures = [executor.submit(self._fitseries_chunk, start,
+                                           chunk_y, chunk_sigmay, **kwargs)
+                           for start, chunk_y, chunk_sigmay in chunks]
+                records = [future.result() for future in futures]
+        else:
+            records = []
+            for start, chunk_y, chunk_sigmay in chunks:
+                records.append(self._fitseries_chunk(
+                    start, chunk_y, chunk_sigmay, **kwargs))
+
+        for (start, chunk_y, _), chunk_records in zip(chunks, records):
+            result[start:start + len(chunk_y)] = chunk_records
+        return result
+
     def gendata(self, x=None, paramlist=None, estimated=False):
         """Return a data array using the currently selected fit function
         and the fitted parameters.
@@ -736,7 +837,6 @@ class FitManager(object):
 
         else:
             self.ydata0 = numpy.array(y)
-            self.ydata = numpy.array(y)
             if x is None:
                 self.xdata0 = numpy.arange(len(self.ydata0))
                 self.xdata = numpy.arange(len(self.ydata0))
@@ -744,27 +844,55 @@ class FitManager(object):
                 self.xdata0 = numpy.array(x)
                 self.xdata = numpy.array(x)
 
-            # default weight
-            if sigmay is None:
-                self.sigmay0 = None
-                self.sigmay = numpy.sqrt(self.ydata) if self.fitconfig["WeightFlag"] else None
-            else:
-                self.sigmay0 = numpy.array(sigmay)
-                self.sigmay = numpy.array(sigmay) if self.fitconfig["WeightFlag"] else None
-
-            # take the data between limits, using boolean array indexing
-            if (xmin is not None or xmax is not None) and len(self.xdata):
-                xmin = xmin if xmin is not None else min(self.xdata)
-                xmax = xmax if xmax is not None else max(self.xdata)
-                bool_array = (self.xdata >= xmin) & (self.xdata <= xmax)
-                self.xdata = self.xdata[bool_array]
-                self.ydata = self.ydata[bool_array]
-                self.sigmay = self.sigmay[bool_array] if sigmay is not None else None
+            self.sigmay0 = None if sigmay is None else numpy.array(sigmay)
+
+            # take the data between limits, using boolean array indexing,
+            # the default weight is computed from the data in the range
+            range_mask = self._get_range_mask(xmin, xmax)
+            if range_mask is not None:
+                self.xdata = self.xdata[range_mask]
+            self._set_range_ydata(range_mask)
 
         self._finite_mask = numpy.logical_and(
             numpy.all(numpy.isfinite(self.xdata), axis=tuple(range(1, self.xdata.ndim))),
             numpy.isfinite(self.ydata))
 
+    def _get_range_mask(self, xmin, xmax):
+        """Returns the mask of the values of :attr:`xdata0` between limits.
+
+        :param xmin: Lower value of x values to use for fitting
+        :param xmax: Upper value of x values to use for fitting
+        :return: Boolean array, or None if there is no limit
+        """
+        if (xmin is None and xmax is None) or not len(self.xdata0):
+            return None
+        xmin = xmin if xmin is not None else min(self.xdata0)
+        xmax = xmax if xmax is not None else max(self.xdata0)
+        return (self.xdata0 >= xmin) & (self.xdata0 <= xmax)
+
+    def _set_range_ydata(self, range_mask):
+        """Set :attr:`ydata` and :attr:`sigmay` from :attr:`ydata0` and
+        :attr:`sigmay0`, keeping the values in the fitting range.
+
+        If :attr:`sigmay0` is None, the default weight ``sqrt(ydata)`` is
+        used.
+
+        :param range_mask: Mask returned by :meth:`_get_range_mask`
+        """
+        if range_mask is None:
+            self.ydata = numpy.array(self.ydata0)
+        else:
+            self.ydata = self.ydata0[range_mask]
+
+        if not self.fitconfig["WeightFlag"]:
+            self.sigmay = None
+        elif self.sigmay0 is None:
+            self.sigmay = numpy.sqrt(self.ydata)
+        elif range_mask is None:
+            self.sigmay = numpy.array(self.sigmay0)
+        else:
+            self.sigmay = self.sigmay0[range_mask]
+
     def enableweight(self):
         """This method can be called to set :attr:`sigmay`. If :attr:`sigmay0` was filled with
         actual uncertainties in :meth:`setdata`, use these values.
@@ -841,17 +969,44 @@ class FitManager(object):
         ywork = self.ydata[self._finite_mask]
         xwork = self.xdata[self._finite_mask]
 
+        # Use the derivative of the theory, if any. Derivatives of the
+        # theory alone are combined with the background by fitderivative.
+        # Ignored parameters are removed from the fit function parameters by
+        # leastsq, which would shift the indices passed to such derivatives.
+        theory = self.theories[self.selectedtheory]
+        model_deriv = None
+        if not theory.derivative_without_background:
+            model_deriv = theory.derivative
+        elif (theory.derivative is not None and
+                "IGNORE" not in [param['code'] for param in self.fit_results]):
+            model_deriv = self.fitderivative
+            # Derivatives of the parameters depending on a free parameter
+            # add up to its derivative
+            self._dependent_parameters = []
+            for i, param in enumerate(self.fit_results):
+                if param['code'] == "FACTOR":
+                    factor = param['cons2']
+                elif param['code'] == "DELTA":
+                    factor = 1.
+                elif param['code'] == "SUM":
+                    factor = -1.
+                else:
+                    continue
+                self._dependent_parameters.append(
+                        (int(param['cons1']), i, factor))
+
         try:
             params, covariance_matrix, infodict = leastsq(
                     self.fitfunction,  # bg + actual model function
                     xwork, ywork, param_val,
                     sigma=self.sigmay,
                     constraints=param_constraints,
-                    model_deriv=self.theories[self.selectedtheory].derivative,
+                    model_deriv=model_deriv,
                     full_output=True, left_derivative=True)
         except LinAlgError:
             self.state = 'Fit failed'
-            callback(data={'status': self.state})
+            if callback is not None:
+                callback(data={'status': self.state})
             raise
 
         sigmas = infodict['uncertainties']
@@ -902,6 +1057,176 @@ class FitManager(object):
 
         return result
 
+    def fitderivative(self, x, pars, index):
+        """Derivative of :meth:`fitfunction` with respect to the parameter
+        *index*.
+
+        The derivative of the selected fit model function, which must only
+        take the parameters of the model (see
+        :attr:`silx.math.fit.fittheory.FitTheory.derivative_without_background`),
+        is used for the peak function parameters and the background function
+        is derived
+        numerically. Parameters constrained to be a factor of, a delta to or
+        a sum with the parameter *index* are taken into account.
+
+        :param x: Independent variable where the derivative is calculated.
+        :param pars: Sequence of all fit parameters.
+        :param int index: Index of the parameter in pars
+        :return: Derivative of the fit function at each ``x``
+        """
+        result = self._parameter_derivative(x, pars, index)
+        for free_index, dependent_index, factor in self._dependent_parameters:
+            if free_index == index:
+                result = result + factor * self._parameter_derivative(
+                    x, pars, dependent_index)
+        return result
+
+    def _parameter_derivative(self, x, pars, index):
+        """Derivative of :meth:`fitfunction` with respect to the parameter
+        *index*, other parameters being kept constant.
+
+        :param x: Independent variable where the derivative is calculated.
+        :param pars: Sequence of all fit parameters.
+        :param int index: Index of the parameter in pars
+        :return: Derivative of the fit function at each ``x``
+        """
+        if self.selectedbg is not None:
+            nb_bg_pars = len(self.bgtheories[self.selectedbg].parameters)
+        else:
+            nb_bg_pars = 0
+
+        if index >= nb_bg_pars:
+            derivative = self.theories[self.selectedtheory].derivative
+            return derivative(x, pars[nb_bg_pars:], index - nb_bg_pars)
+
+        # Centered finite difference on the background function only
+        bgfun = self.bgtheories[self.selectedbg].function
+        bg_pars = numpy.array(pars[0:nb_bg_pars], dtype=numpy.float64)
+        delta = (bg_pars[index] + (bg_pars[index] == 0)) * \
+            numpy.sqrt(numpy.finfo(numpy.float64).eps)
+        bg_pars[index] += delta
+        f1 = bgfun(x, self.ydata, *bg_pars)
+        bg_pars[index] -= 2 * delta
+        f2 = bgfun(x, self.ydata, *bg_pars)
+        return (f1 - f2) / (2.0 * delta)
+
+    def _fitseries_chunk(self, start, y, sigmay, x, xmin, xmax,
+                         warm_start, divergence_factor):
+        """Fit successive spectra starting from the current fit.
+
+        See :meth:`fitseries`.
+
+        :param int start: Index of the first spectrum in the series
+        :return: Structured array of the results of each spectrum
+        """
+        names = list(self.parameter_names)
+        reference = copy.deepcopy(self.fit_results)
+        reference_chisq = self.chisq
+
+        result = numpy.zeros(len(y), dtype=self._series_dtype(names))
+
+        # Data derived from the abscissa is the same for all spectra
+        self.setdata(x, y[0], xmin=xmin, xmax=xmax)
+        range_mask = self._get_range_mask(xmin, xmax)
+        x_finite = numpy.all(numpy.isfinite(self.xdata),
+                             axis=tuple(range(1, self.xdata.ndim)))
+
+        for index, spectrum in enumerate(y):
+            self.ydata0 = numpy.array(spectrum)
+            self.sigmay0 = None if sigmay is None else numpy.array(sigmay[index])
+            self._set_range_ydata(range_mask)
+            self._finite_mask = numpy.logical_and(
+                x_finite, numpy.isfinite(self.ydata))
+
+            record = result[index]
+            if not numpy.any(self._finite_mask):
+                _logger.warning("Spectrum %d of the series has no finite data",
+                                start + index)
+                self._set_series_record(record, estimated=False, success=False)
+                continue
+
+            if warm_start and self._warm_start_fit(
+                    reference, reference_chisq, divergence_factor):
+                self._set_series_record(record, estimated=False)
+            else:
+                try:
+                    self.estimate()
+                    self.runfit()
+                except LinAlgError:
+                    success = False
+                else:
+                    success = self.parameter_names == names
+                if not success:
+                    _logger.warning("Fit of spectrum %d of the series failed",
+                                    start + index)
+                    self._set_series_record(record, estimated=True,
+                                            success=False)
+                    continue
+                self._set_series_record(record, estimated=True)
+
+            reference = copy.deepcopy(self.fit_results)
+            reference_chisq = self.chisq
+        return result
+
+    def _warm_start_fit(self, reference, reference_chisq, divergence_factor):
+        """Fit the current data starting from the reference fit results.
+
+        :param list reference: :attr:`fit_results` of the previous fit
+        :param float reference_chisq: Reduced chi square of the previous fit
+        :param float divergence_factor: See :meth:`fitseries`
+        :return: True if the fit converged
+        :rtype: bool
+        """
+        self.fit_results = copy.deepcopy(reference)
+        for param in self.fit_results:
+            param['estimation'] = param['fitresult']
+        self.parameter_names = [param['name'] for param in reference]
+        try:
+            params, _sigmas, _infodict = self.runfit()
+        except LinAlgError:
+            return False
+        if not numpy.all(numpy.isfinite(params)):
+            return False
+        if reference_chisq is None or not numpy.isfinite(reference_chisq):
+            return numpy.isfinite(self.chisq)
+        return self.chisq <= divergence_factor * max(
+            reference_chisq, numpy.finfo(numpy.float64).eps)
+
+    @staticmethod
+    def _series_dtype(names):
+        """Returns the dtype of the results of :meth:`fitseries`
+
+        :param List[str] names: Names of the fit parameters
+        """
+        dtype = [(name, numpy.float64) for name in names]
+        dtype += [("sigma_" + name, numpy.float64) for name in names]
+        dtype += [("chisq", numpy.float64),
+                  ("niter", numpy.int32),
+                  ("estimated", numpy.bool_),
+                  ("success", numpy.bool_)]
+        return numpy.dtype(dtype)
+
+    def _set_series_record(self, record, estimated, success=True):
+        """Store the current fit results in a record of :meth:`fitseries`
+
+        :param numpy.void record: The record to fill
+        :param bool estimated: Whether the parameters were estimated
+        :param bool success: Whether the fit succeeded
+        """
+        if success:
+            for param in self.fit_results:
+                record[param['name']] = param['fitresult']
+                record["sigma_" + param['name']] = param['sigma']
+            record["chisq"] = self.chisq
+            record["niter"] = self.niter
+        else:
+            for name in record.dtype.names:
+                if record.dtype.fields[name][0] == numpy.float64:
+                    record[name] = numpy.nan
+            record["niter"] = 0
+        record["estimated"] = estimated
+        record["success"] = success
+
     def estimate_bkg(self, x, y):
         """Estimate background parameters using the function defined in
         the current fit configuration.
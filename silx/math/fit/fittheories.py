@@ -198,6 +198,23 @@ class FitTheories(object):
                                        gaussian_term=g_term, st_term=st_term,
                                        lt_term=lt_term, step_term=step_term)
 
+    def ahypermet_deriv(self, x, pars, index):
+        """
+        Derivative of :meth:`ahypermet` with respect to the parameter
+        *index*, using the same tail flags.
+
+        :param x: Independent variable
+        :param pars: Hypermet parameters
+        :param int index: Index of the parameter in pars
+        """
+        g_term = self.config['HypermetTails'] & 1
+        st_term = (self.config['HypermetTails'] >> 1) & 1
+        lt_term = (self.config['HypermetTails'] >> 2) & 1
+        step_term = (self.config['HypermetTails'] >> 3) & 1
+        return functions.sum_ahypermet_deriv(x, pars, index,
+                                             gaussian_term=g_term, st_term=st_term,
+                                             lt_term=lt_term, step_term=step_term)
+
     def poly(self, x, *pars):
         """Order n polynomial.
         The order of the polynomial is defined by the number of
@@ -1215,36 +1232,48 @@ THEORY = OrderedDict((
     ('Gaussians',
         FitTheory(description='Gaussian functions',
                   function=functions.sum_gauss,
+                  derivative=functions.sum_gauss_deriv,
+                  derivative_without_background=True,
                   parameters=('Height', 'Position', 'FWHM'),
                   estimate=fitfuns.estimate_height_position_fwhm,
                   configure=fitfuns.configure)),
     ('Lorentz',
         FitTheory(description='Lorentzian functions',
                   function=functions.sum_lorentz,
+                  derivative=functions.sum_lorentz_deriv,
+                  derivative_without_background=True,
                   parameters=('Height', 'Position', 'FWHM'),
                   estimate=fitfuns.estimate_height_position_fwhm,
                   configure=fitfuns.configure)),
     ('Area Gaussians',
         FitTheory(description='Gaussian functions (area)',
                   function=functions.sum_agauss,
+                  derivative=functions.sum_agauss_deriv,
+                  derivative_without_background=True,
                   parameters=('Area', 'Position', 'FWHM'),
                   estimate=fitfuns.estimate_agauss,
                   configure=fitfuns.configure)),
     ('Area Lorentz',
         FitTheory(description='Lorentzian functions (area)',
                   function=functions.sum_alorentz,
+                  derivative=functions.sum_alorentz_deriv,
+                  derivative_without_background=True,
                   parameters=('Area', 'Position', 'FWHM'),
                   estimate=fitfuns.estimate_alorentz,
                   configure=fitfuns.configure)),
     ('Pseudo-Voigt Line',
         FitTheory(description='Pseudo-Voigt functions',
                   function=functions.sum_pvoigt,
+                  derivative=functions.sum_pvoigt_deriv,
+                  derivative_without_background=True,
                   parameters=('Height', 'Position', 'FWHM', 'Eta'),
                   estimate=fitfuns.estimate_pvoigt,
                   configure=fitfuns.configure)),
     ('Area Pseudo-Voigt',
         FitTheory(description='Pseudo-Voigt functions (area)',
                   function=functions.sum_apvoigt,
+                  derivative=functions.sum_apvoigt_deriv,
+                  derivative_without_background=True,
                   parameters=('Area', 'Position', 'FWHM', 'Eta'),
                   estimate=fitfuns.estimate_apvoigt,
                   configure=fitfuns.configure)),
@@ -1295,6 +1324,8 @@ THEORY = OrderedDict((
     ('Hypermet',
         FitTheory(description='Hypermet functions',
                   function=fitfuns.ahypermet,     # customized version of functions.sum_ahypermet
+                  derivative=fitfuns.ahypermet_deriv,
+                  derivative_without_background=True,
                   parameters=('G_Area', 'Position', 'FWHM', 'ST_Area',
                               'ST_Slope', 'LT_Area', 'LT_Slope', 'Step_H'),
                   estimate=fitfuns.estimate_ahypermet,
@@ -48,7 +48,8 @@ class FitTheory(object):
     """
     def __init__(self, function, parameters,
                  estimate=None, configure=None, derivative=None,
-                 description=None, pymca_legacy=False, is_background=False):
+                 description=None, pymca_legacy=False, is_background=False,
+                 derivative_without_background=False):
         """
         :param function function: Actual function. See documentation for
             :attr:`function`.
@@ -67,6 +68,9 @@ class FitTheory(object):
         :param bool is_background: Flag to indicate that the theory is a
             background theory. This has implications regarding the function's
             signature, as explained in the documentation for :attr:`function`.
+        :param bool derivative_without_background: Flag to indicate that
+            :attr:`derivative` only takes the parameters of this theory.
+            See documentation for :attr:`derivative_without_background`
         """
         self.function = function
         """Regular fit functions must have the signature ``f(x, *params) -> y``,
@@ -128,7 +132,11 @@ class FitTheory(object):
         ``model_deriv(xdata, parameters, index)``, where parameters is a
         sequence with the current values of the fitting parameters, index is
         the fitting parameter index for which the the derivative has to be
-        provided in the supplied array of xdata points."""
+        provided in the supplied array of xdata points.
+
+        :class:`silx.math.fit.fitmanager.FitManager` calls it with all the
+        fitting parameters, background parameters first, unless
+        :attr:`derivative_without_background` is set."""
 
         self.description = description
         """Optional description string for this particular fit theory."""
@@ -152,6 +160,16 @@ class FitTheory(object):
         that :attr:`function` has the signature ``f(x, y0, *params) -> bg``,
         instead of the usual fit function signature."""
 
+        self.derivative_without_background = derivative_without_background
+        """Flag to indicate that :attr:`derivative` is the derivative of
+        :attr:`function` alone, e.g.
+        :func:`silx.math.fit.functions.sum_gauss_deriv`.
+
+        If this flag is set to *True*,
+        :class:`silx.math.fit.fitmanager.FitManager` calls :attr:`derivative`
+        with the parameters of this theory only, and handles the background
+        and the parameters constrained by other ones itself."""
+
     def default_estimate(self, x=None, y=None, bg=None):
         """Default estimate function. Return an array of *ones* as the
         initial estimated parameters, and set all constraints to zero
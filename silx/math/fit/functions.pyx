@@ -46,6 +46,17 @@ List of fit functions:
     - :func:`sum_ahypermet`
     - :func:`sum_fastahypermet`
 
+List of derivatives of fit functions with respect to one parameter:
+-------------------------------------------------------------------
+
+    - :func:`sum_gauss_deriv`
+    - :func:`sum_agauss_deriv`
+    - :func:`sum_pvoigt_deriv`
+    - :func:`sum_apvoigt_deriv`
+    - :func:`sum_lorentz_deriv`
+    - :func:`sum_alorentz_deriv`
+    - :func:`sum_ahypermet_deriv`
+
 Full documentation:
 -------------------
 
@@ -938,6 +949,209 @@ def sum_fastahypermet(x, *params,
     return numpy.asarray(y_c).reshape(x.shape)
 
 
+# Derivatives
+
+ctypedef int (*sum_deriv_function)(double*, int, double*, int, int, double*)
+
+
+cdef _sum_deriv(sum_deriv_function function, x, params, index):
+    """Call a C derivative function and returns its result.
+
+    :param function: Derivative function of a sum of functions
+    :param x: Independent variable where the derivative is calculated
+    :param params: Parameters of the sum of functions
+    :param int index: Index of the parameter in params
+    :rtype: numpy.ndarray
+    """
+    cdef:
+        double[::1] x_c
+        double[::1] params_c
+        double[::1] y_c
+
+    x = numpy.asarray(x)
+    x_c = numpy.array(x,
+                      copy=False,
+                      dtype=numpy.float64,
+                      order='C').reshape(-1)
+    params_c = numpy.array(params,
+                           copy=False,
+                           dtype=numpy.float64,
+                           order='C').reshape(-1)
+    y_c = numpy.empty(shape=(x.size,),
+                      dtype=numpy.float64)
+
+    status = function(&x_c[0], x.size,
+                      &params_c[0], params_c.size,
+                      <int> index, &y_c[0])
+
+    if status:
+        raise IndexError("Wrong number of parameters or index for function")
+
+    return numpy.asarray(y_c).reshape(x.shape)
+
+
+def sum_gauss_deriv(x, params, index):
+    """Return the derivative of :func:`sum_gauss` with respect to
+    the parameter *index* of *params*.
+
+    This function can be used as ``model_deriv`` of
+    :func:`silx.math.fit.leastsq`.
+
+    :param x: Independent variable where the derivative is calculated
+    :type x: numpy.ndarray
+    :param params: Array of gaussian parameters (length must be a multiple
+        of 3): *(height1, centroid1, fwhm1, height2, centroid2, fwhm2,...)*
+    :param int index: Index of the parameter in params
+    :return: Array of the derivative at each ``x`` coordinate.
+    """
+    return _sum_deriv(functions_wrapper.sum_gauss_deriv, x, params, index)
+
+
+def sum_agauss_deriv(x, params, index):
+    """Return the derivative of :func:`sum_agauss` with respect to
+    the parameter *index* of *params*.
+
+    This function can be used as ``model_deriv`` of
+    :func:`silx.math.fit.leastsq`.
+
+    :param x: Independent variable where the derivative is calculated
+    :type x: numpy.ndarray
+    :param params: Array of gaussian parameters (length must be a multiple
+        of 3): *(area1, centroid1, fwhm1, area2, centroid2, fwhm2,...)*
+    :param int index: Index of the parameter in params
+    :return: Array of the derivative at each ``x`` coordinate.
+    """
+    return _sum_deriv(functions_wrapper.sum_agauss_deriv, x, params, index)
+
+
+def sum_pvoigt_deriv(x, params, index):
+    """Return the derivative of :func:`sum_pvoigt` with respect to
+    the parameter *index* of *params*.
+
+    This function can be used as ``model_deriv`` of
+    :func:`silx.math.fit.leastsq`.
+
+    :param x: Independent variable where the derivative is calculated
+    :type x: numpy.ndarray
+    :param params: Array of pseudo-Voigt parameters (length must be a
+        multiple of 4):
+        *(height1, centroid1, fwhm1, eta1, height2, centroid2, fwhm2, eta2,...)*
+    :param int index: Index of the parameter in params
+    :return: Array of the derivative at each ``x`` coordinate.
+    """
+    return _sum_deriv(functions_wrapper.sum_pvoigt_deriv, x, params, index)
+
+
+def sum_apvoigt_deriv(x, params, index):
+    """Return the derivative of :func:`sum_apvoigt` with respect to
+    the parameter *index* of *params*.
+
+    This function can be used as ``model_deriv`` of
+    :func:`silx.math.fit.leastsq`.
+
+    :param x: Independent variable where the derivative is calculated
+    :type x: numpy.ndarray
+    :param params: Array of pseudo-Voigt parameters (length must be a
+        multiple of 4):
+        *(area1, centroid1, fwhm1, eta1, area2, centroid2, fwhm2, eta2,...)*
+    :param int index: Index of the parameter in params
+    :return: Array of the derivative at each ``x`` coordinate.
+    """
+    return _sum_deriv(functions_wrapper.sum_apvoigt_deriv, x, params, index)
+
+
+def sum_lorentz_deriv(x, params, index):
+    """Return the derivative of :func:`sum_lorentz` with respect to
+    the parameter *index* of *params*.
+
+    This function can be used as ``model_deriv`` of
+    :func:`silx.math.fit.leastsq`.
+
+    :param x: Independent variable where the derivative is calculated
+    :type x: numpy.ndarray
+    :param params: Array of lorentzian parameters (length must be a multiple
+        of 3): *(height1, centroid1, fwhm1, height2, centroid2, fwhm2,...)*
+    :param int index: Index of the parameter in params
+    :return: Array of the derivative at each ``x`` coordinate.
+    """
+    return _sum_deriv(functions_wrapper.sum_lorentz_deriv, x, params, index)
+
+
+def sum_alorentz_deriv(x, params, index):
+    """Return the derivative of :func:`sum_alorentz` with respect to
+    the parameter *index* of *params*.
+
+    This function can be used as ``model_deriv`` of
+    :func:`silx.math.fit.leastsq`.
+
+    :param x: Independent variable where the derivative is calculated
+    :type x: numpy.ndarray
+    :param params: Array of lorentzian parameters (length must be a multiple
+        of 3): *(area1, centroid1, fwhm1, area2, centroid2, fwhm2,...)*
+    :param int index: Index of the parameter in params
+    :return: Array of the derivative at each ``x`` coordinate.
+    """
+    return _sum_deriv(functions_wrapper.sum_alorentz_deriv, x, params, index)
+
+
+def sum_ahypermet_deriv(x, params, index,
+                        gaussian_term=True, st_term=True, lt_term=True, step_term=True):
+    """Return the derivative of :func:`sum_ahypermet` with respect to
+    the parameter *index* of *params*.
+
+    :param x: Independent variable where the derivative is calculated
+    :type x: numpy.ndarray
+    :param params: Array of hypermet parameters (length must be a multiple
+        of 8):
+        *(area1, position1, fwhm1, st_area_r1, st_slope_r1, lt_area_r1,
+        lt_slope_r1, step_height_r1...)*
+    :param int index: Index of the parameter in params
+    :param gaussian_term: If ``True``, enable gaussian term. Default ``True``
+    :param st_term: If ``True``, enable short tail term. Default ``True``
+    :param lt_term: If ``True``, enable long tail term. Default ``True``
+    :param step_term: If ``True``, enable step term. Default ``True``
+    :return: Array of the derivative at each ``x`` coordinate.
+    """
+    cdef:
+        double[::1] x_c
+        double[::1] params_c
+        double[::1] y_c
+
+    # Sum binary flags to activate various terms of the equation
+    tail_flags = 1 if gaussian_term else 0
+    if st_term:
+        tail_flags += 2
+    if lt_term:
+        tail_flags += 4
+    if step_term:
+        tail_flags += 8
+
+    x = numpy.asarray(x)
+    x_c = numpy.array(x,
+                      copy=False,
+                      dtype=numpy.float64,
+                      order='C').reshape(-1)
+    params_c = numpy.array(params,
+                           copy=False,
+                           dtype=numpy.float64,
+                           order='C').reshape(-1)
+    y_c = numpy.empty(shape=(x.size,),
+                      dtype=numpy.float64)
+
+    status = functions_wrapper.sum_ahypermet_deriv(&x_c[0],
+                               x.size,
+                               &params_c[0],
+                               params_c.size,
+                               <int> index,
+                               &y_c[0],
+                               tail_flags)
+
+    if status:
+        raise IndexError("Wrong number of parameters or index for function")
+
+    return numpy.asarray(y_c).reshape(x.shape)
+
+
 def atan_stepup(x, a, b, c):
     """
     Step up function using an inverse tangent.
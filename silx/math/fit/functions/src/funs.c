@@ -1234,6 +1234,472 @@ int sum_fastahypermet(double* x, int len_x, double* phypermet, int len_phypermet
     return(0);
 }
 
+/* Derivatives of fit functions
+
+    The following functions return the derivative of a sum of functions
+    with respect to the parameter at position *index* in the parameters
+    array. Only the function this parameter belongs to is evaluated, all
+    other functions of the sum do not depend on it.
+
+    Parameters are the same as for the function itself, plus:
+
+        - index: Index of the parameter in the parameters array.
+
+    They return 1 if the number of parameters or the index is wrong.
+*/
+
+int test_index(int len_params, int index, char* fun_name)
+{
+    if (index < 0 || index >= len_params) {
+        printf("[%s]Error: Parameter index %d out of range [0, %d).\n",
+               fun_name, index, len_params);
+        return(1);
+    }
+    return(0);
+}
+
+/*  sum_gauss_deriv
+    Derivative of sum_gauss with respect to parameter index.
+*/
+int sum_gauss_deriv(double* x, int len_x, double* pgauss, int len_pgauss, int index, double* y)
+{
+    int i, j, param;
+    double dhelp, expterm, inv_two_sqrt_two_log2, sigma;
+    double fwhm, centroid, height;
+
+    if (test_params(len_pgauss, 3, "sum_gauss_deriv", "height, centroid, fwhm") ||
+            test_index(len_pgauss, index, "sum_gauss_deriv")) {
+        return(1);
+    }
+
+    inv_two_sqrt_two_log2 = 1.0 / (2.0 * sqrt(2.0 * LOG2));
+
+    i = index / 3;
+    param = index % 3;
+    height = pgauss[3*i];
+    centroid = pgauss[3*i+1];
+    fwhm = pgauss[3*i+2];
+
+    sigma = fwhm * inv_two_sqrt_two_log2;
+
+    for (j=0; j<len_x;  j++) {
+        dhelp = (x[j] - centroid) / sigma;
+        if (dhelp <= 20) {
+            expterm = exp (-0.5 * dhelp * dhelp);
+            if (param == 0) {
+                y[j] = expterm;
+            }
+            else if (param == 1) {
+                y[j] = height * expterm * dhelp / sigma;
+            }
+            else {
+                y[j] = height * expterm * dhelp * dhelp / fwhm;
+            }
+        }
+        else {
+            y[j] = 0.;
+        }
+    }
+    return(0);
+}
+
+/*  sum_agauss_deriv
+    Derivative of sum_agauss with respect to parameter index.
+*/
+int sum_agauss_deriv(double* x, int len_x, double* pgauss, int len_pgauss, int index, double* y)
+{
+    int i, j, param;
+    double dhelp, expterm, sqrt2PI, sigma, inv_two_sqrt_two_log2;
+    double fwhm, centroid, area;
+
+    if (test_params(len_pgauss, 3, "sum_agauss_deriv", "area, centroid, fwhm") ||
+            test_index(len_pgauss, index, "sum_agauss_deriv")) {
+        return(1);
+    }
+
+    inv_two_sqrt_two_log2 = 1.0 / (2.0 * sqrt(2.0 * LOG2));
+    sqrt2PI = sqrt(2.0*M_PI);
+
+    i = index / 3;
+    param = index % 3;
+    area = pgauss[3*i];
+    centroid = pgauss[3*i+1];
+    fwhm = pgauss[3*i+2];
+
+    sigma = fwhm * inv_two_sqrt_two_log2;
+
+    for (j=0; j<len_x;  j++) {
+        dhelp = (x[j] - centroid)/sigma;
+        if (dhelp <= 35) {
+            /* gaussian of unit area */
+            expterm = exp (-0.5 * dhelp * dhelp) / (sigma * sqrt2PI);
+            if (param == 0) {
+                y[j] = expterm;
+            }
+            else if (param == 1) {
+                y[j] = area * expterm * dhelp / sigma;
+            }
+            else {
+                y[j] = area * expterm * (dhelp * dhelp - 1.0) / fwhm;
+            }
+        }
+        else {
+            y[j] = 0.;
+        }
+    }
+    return(0);
+}
+
+/* Value of a lorentzian of unit height and its derivatives with respect to
+   its centroid and fwhm */
+static void lorentz_deriv(double x_minus_centroid, double fwhm,
+                          double* value, double* d_centroid, double* d_fwhm)
+{
+    double dhelp, lorentz;
+
+    dhelp = x_minus_centroid / (0.5 * fwhm);
+    lorentz = 1.0 / (1.0 + (dhelp * dhelp));
+    *value = lorentz;
+    *d_centroid = 2.0 * dhelp * lorentz * lorentz / (0.5 * fwhm);
+    *d_fwhm = 2.0 * dhelp * dhelp * lorentz * lorentz / fwhm;
+}
+
+/*  sum_lorentz_deriv
+    Derivative of sum_lorentz with respect to parameter index.
+*/
+int sum_lorentz_deriv(double* x, int len_x, double* plorentz, int len_plorentz, int index, double* y)
+{
+    int i, j, param;
+    double lorentz, d_centroid, d_fwhm;
+    double height, centroid, fwhm;
+
+    if (test_params(len_plorentz, 3, "sum_lorentz_deriv", "height, centroid, fwhm") ||
+            test_index(len_plorentz, index, "sum_lorentz_deriv")) {
+        return(1);
+    }
+
+    i = index / 3;
+    param = index % 3;
+    height = plorentz[3*i];
+    centroid = plorentz[3*i+1];
+    fwhm = plorentz[3*i+2];
+
+    for (j=0; j<len_x;  j++) {
+        lorentz_deriv(x[j] - centroid, fwhm, &lorentz, &d_centroid, &d_fwhm);
+        if (param == 0) {
+            y[j] = lorentz;
+        }
+        else if (param == 1) {
+            y[j] = height * d_centroid;
+        }
+        else {
+            y[j] = height * d_fwhm;
+        }
+    }
+    return(0);
+}
+
+/*  sum_alorentz_deriv
+    Derivative of sum_alorentz with respect to parameter index.
+*/
+int sum_alorentz_deriv(double* x, int len_x, double* plorentz, int len_plorentz, int index, double* y)
+{
+    int i, j, param;
+    double lorentz, d_centroid, d_fwhm, factor;
+    double area, centroid, fwhm;
+
+    if (test_params(len_plorentz, 3, "sum_alorentz_deriv", "area, centroid, fwhm") ||
+            test_index(len_plorentz, index, "sum_alorentz_deriv")) {
+        return(1);
+    }
+
+    i = index / 3;
+    param = index % 3;
+    area = plorentz[3*i];
+    centroid = plorentz[3*i+1];
+    fwhm = plorentz[3*i+2];
+
+    /* height of a lorentzian of unit area */
+    factor = 1.0 / (0.5 * M_PI * fwhm);
+
+    for (j=0; j<len_x;  j++) {
+        lorentz_deriv(x[j] - centroid, fwhm, &lorentz, &d_centroid, &d_fwhm);
+        if (param == 0) {
+            y[j] = factor * lorentz;
+        }
+        else if (param == 1) {
+            y[j] = area * factor * d_centroid;
+        }
+        else {
+            y[j] = area * factor * (d_fwhm - lorentz / fwhm);
+        }
+    }
+    return(0);
+}
+
+/*  sum_pvoigt_deriv
+    Derivative of sum_pvoigt with respect to parameter index.
+*/
+int sum_pvoigt_deriv(double* x, int len_x, double* pvoigt, int len_pvoigt, int index, double* y)
+{
+    int i, j, param;
+    double dhelp, expterm, inv_two_sqrt_two_log2, sigma;
+    double lorentz, d_centroid, d_fwhm;
+    double height, centroid, fwhm, eta;
+
+    if (test_params(len_pvoigt, 4, "sum_pvoigt_deriv", "height, centroid, fwhm, eta") ||
+            test_index(len_pvoigt, index, "sum_pvoigt_deriv")) {
+        return(1);
+    }
+
+    inv_two_sqrt_two_log2 = 1.0 / (2.0 * sqrt(2.0 * LOG2));
+
+    i = index / 4;
+    param = index % 4;
+    height = pvoigt[4*i];
+    centroid = pvoigt[4*i+1];
+    fwhm = pvoigt[4*i+2];
+    eta = pvoigt[4*i+3];
+
+    sigma = fwhm * inv_two_sqrt_two_log2;
+
+    for (j=0; j<len_x;  j++) {
+        /*  Lorentzian term */
+        lorentz_deriv(x[j] - centroid, fwhm, &lorentz, &d_centroid, &d_fwhm);
+
+        /* Gaussian term */
+        dhelp = (x[j] - centroid) / sigma;
+        expterm = (dhelp <= 35) ? exp (-0.5 * dhelp * dhelp) : 0.;
+
+        if (param == 0) {
+            y[j] = eta * lorentz + (1.0 - eta) * expterm;
+        }
+        else if (param == 1) {
+            y[j] = height * (eta * d_centroid +
+                             (1.0 - eta) * expterm * dhelp / sigma);
+        }
+        else if (param == 2) {
+            y[j] = height * (eta * d_fwhm +
+                             (1.0 - eta) * expterm * dhelp * dhelp / fwhm);
+        }
+        else {
+            y[j] = height * (lorentz - expterm);
+        }
+    }
+    return(0);
+}
+
+/*  sum_apvoigt_deriv
+    Derivative of sum_apvoigt with respect to parameter index.
+*/
+int sum_apvoigt_deriv(double* x, int len_x, double* pvoigt, int len_pvoigt, int index, double* y)
+{
+    int i, j, param;
+    double dhelp, expterm, inv_two_sqrt_two_log2, sqrt2PI, sigma, factor;
+    double lorentz, d_centroid, d_fwhm;
+    double area, centroid, fwhm, eta;
+
+    if (test_params(len_pvoigt, 4, "sum_apvoigt_deriv", "area, centroid, fwhm, eta") ||
+            test_index(len_pvoigt, index, "sum_apvoigt_deriv")) {
+        return(1);
+    }
+
+    inv_two_sqrt_two_log2 = 1.0 / (2.0 * sqrt(2.0 * LOG2));
+    sqrt2PI = sqrt(2.0*M_PI);
+
+    i = index / 4;
+    param = index % 4;
+    area = pvoigt[4*i];
+    centroid = pvoigt[4*i+1];
+    fwhm = pvoigt[4*i+2];
+    eta = pvoigt[4*i+3];
+
+    sigma = fwhm * inv_two_sqrt_two_log2;
+    /* height of a lorentzian of unit area */
+    factor = 1.0 / (0.5 * M_PI * fwhm);
+
+    for (j=0; j<len_x;  j++) {
+        /*  Lorentzian term of unit area */
+        lorentz_deriv(x[j] - centroid, fwhm, &lorentz, &d_centroid, &d_fwhm);
+        lorentz *= factor;
+        d_centroid *= factor;
+        d_fwhm = factor * d_fwhm - lorentz / fwhm;
+
+        /* Gaussian term of unit area */
+        dhelp = (x[j] - centroid) / sigma;
+        expterm = (dhelp <= 35) ? exp (-0.5 * dhelp * dhelp) / (sigma * sqrt2PI) : 0.;
+
+        if (param == 0) {
+            y[j] = eta * lorentz + (1.0 - eta) * expterm;
+        }
+        else if (param == 1) {
+            y[j] = area * (eta * d_centroid +
+                           (1.0 - eta) * expterm * dhelp / sigma);
+        }
+        else if (param == 2) {
+            y[j] = area * (eta * d_fwhm +
+                           (1.0 - eta) * expterm * (dhelp * dhelp - 1.0) / fwhm);
+        }
+        else {
+            y[j] = area * (lorentz - expterm);
+        }
+    }
+    return(0);
+}
+
+/* Derivatives of a hypermet tail term with respect to area, position,
+   sigma, area ratio and slope ratio.
+
+   tail = area * area_r / (2 slope_r) * erfc(z) * exp(e)
+   with z = x_minus_position / (sigma sqrt2) + sigma / (sqrt2 slope_r)
+   and e = 0.5 (sigma / slope_r)^2 + x_minus_position / slope_r
+
+   gauss is exp(-0.5 (x_minus_position / sigma)^2) = exp(e - z^2)
+*/
+static double tail_deriv(int param, double x_minus_position, double gauss,
+                         double area, double sigma, double area_r, double slope_r)
+{
+    double sqrt2, inv_sqrtPI, z, e, erfc_exp, dz, de;
+
+    sqrt2 = 1.4142135623730950488;
+    inv_sqrtPI = 1.0 / sqrt(M_PI);
+    z = x_minus_position / (sigma * sqrt2) + sigma / (sqrt2 * slope_r);
+    e = 0.5 * (sigma / slope_r) * (sigma / slope_r) + x_minus_position / slope_r;
+    erfc_exp = erfc(z) * exp(e);
+
+    switch (param) {
+        case 0: /* area */
+            return area_r * 0.5 * erfc_exp / slope_r;
+        case 3: /* area ratio */
+            return area * 0.5 * erfc_exp / slope_r;
+        case 1: /* position */
+            dz = - 1.0 / (sigma * sqrt2);
+            de = - 1.0 / slope_r;
+            break;
+        case 2: /* sigma */
+            dz = - x_minus_position / (sigma * sigma * sqrt2) + 1.0 / (sqrt2 * slope_r);
+            de = sigma / (slope_r * slope_r);
+            break;
+        default: /* slope ratio */
+            dz = - sigma / (sqrt2 * slope_r * slope_r);
+            de = - sigma * sigma / (slope_r * slope_r * slope_r) -
+                 x_minus_position / (slope_r * slope_r);
+            return area * area_r * 0.5 / slope_r * (
+                erfc_exp * (de - 1.0 / slope_r) -
+                2.0 * inv_sqrtPI * gauss * dz);
+    }
+    return area * area_r * 0.5 / slope_r * (
+        erfc_exp * de - 2.0 * inv_sqrtPI * gauss * dz);
+}
+
+/*  sum_ahypermet_deriv
+    Derivative of sum_ahypermet with respect to parameter index.
+*/
+int sum_ahypermet_deriv(double* x, int len_x, double* phypermet, int len_phypermet, int index, double* y, int tail_flags)
+{
+    int i, j, param, tail_param;
+    int g_term_flag, st_term_flag, lt_term_flag, step_term_flag;
+    double c2, gauss, sigma, height, sigma_sqrt2, sqrt2PI, inv_2_sqrt_2_log2, x_minus_position, epsilon;
+    double area, position, fwhm, st_area_r, st_slope_r, lt_area_r, lt_slope_r, step_height_r;
+    double inv_sqrtPI, d_step;
+
+    if (test_params(len_phypermet, 8, "sum_ahypermet_deriv",
+                    "height, centroid, fwhm, st_area_r, st_slope_r, lt_area_r, lt_slope_r, step_height_r") ||
+            test_index(len_phypermet, index, "sum_ahypermet_deriv")) {
+        return(1);
+    }
+
+    g_term_flag    = tail_flags & 1;
+    st_term_flag   = (tail_flags>>1) & 1;
+    lt_term_flag   = (tail_flags>>2) & 1;
+    step_term_flag = (tail_flags>>3) & 1;
+
+    /* define epsilon to compare floating point values with 0. */
+    epsilon = 0.00000000001;
+
+    sqrt2PI= sqrt(2.0 * M_PI);
+    inv_sqrtPI = 1.0 / sqrt(M_PI);
+    inv_2_sqrt_2_log2 = 1.0 / (2.0 * sqrt(2.0 * LOG2));
+
+    i = index / 8;
+    param = index % 8;
+    area = phypermet[8*i];
+    position = phypermet[8*i+1];
+    fwhm = phypermet[8*i+2];
+    st_area_r = phypermet[8*i+3];
+    st_slope_r =  phypermet[8*i+4];
+    lt_area_r = phypermet[8*i+5];
+    lt_slope_r = phypermet[8*i+6];
+    step_height_r = phypermet[8*i+7];
+
+    sigma = fwhm * inv_2_sqrt_2_log2;
+
+    /* Prevent division by 0 */
+    if (sigma == 0) {
+        printf("fwhm must not be equal to 0");
+        return(1);
+    }
+    height = area / (sigma * sqrt2PI);
+    sigma_sqrt2 = sigma * 1.4142135623730950488;
+
+    for (j=0; j<len_x;  j++) {
+        y[j] = 0.;
+        x_minus_position = x[j] - position;
+        c2 = (0.5 * x_minus_position * x_minus_position) / (sigma * sigma);
+        gauss = exp(-c2);
+
+        /* gaussian term */
+        if (g_term_flag) {
+            if (param == 0) {
+                y[j] += gauss / (sigma * sqrt2PI);
+            }
+            else if (param == 1) {
+                y[j] += height * gauss * x_minus_position / (sigma * sigma);
+            }
+            else if (param == 2) {
+                y[j] += height * gauss * (2.0 * c2 - 1.0) / fwhm;
+            }
+        }
+
+        /* st term */
+        if (st_term_flag && fabs(st_slope_r) > epsilon && param <= 4) {
+            y[j] += tail_deriv(param, x_minus_position, gauss,
+                               area, sigma, st_area_r, st_slope_r) *
+                    ((param == 2) ? inv_2_sqrt_2_log2 : 1.0);
+        }
+
+        /* lt term */
+        if (lt_term_flag && fabs(lt_slope_r) > epsilon &&
+                (param <= 2 || param == 5 || param == 6)) {
+            /* Same parameters as the st term, shifted by 2 */
+            tail_param = (param <= 2) ? param : param - 2;
+            y[j] += tail_deriv(tail_param, x_minus_position, gauss,
+                               area, sigma, lt_area_r, lt_slope_r) *
+                    ((param == 2) ? inv_2_sqrt_2_log2 : 1.0);
+        }
+
+        /* step term */
+        if (step_term_flag) {
+            if (param == 0) {
+                y[j] += step_height_r / (sigma * sqrt2PI) * \
+                        0.5 * erfc(x_minus_position / sigma_sqrt2);
+            }
+            else if (param == 1) {
+                y[j] += step_height_r * height * inv_sqrtPI * gauss / sigma_sqrt2;
+            }
+            else if (param == 2) {
+                d_step = - 0.5 * erfc(x_minus_position / sigma_sqrt2) / sigma + \
+                         inv_sqrtPI * gauss * x_minus_position / (sigma * sigma_sqrt2);
+                y[j] += step_height_r * height * d_step * inv_2_sqrt_2_log2;
+            }
+            else if (param == 7) {
+                y[j] += height * 0.5 * erfc(x_minus_position / sigma_sqrt2);
+            }
+        }
+    }
+    return(0);
+}
+
 void pileup(double* x, long len_x, double* ret, int input2, double zero, double gain)
 {
     //int    input2=0;
@@ -153,6 +153,56 @@ cdef extern from "functions.h":
                           double* y,
                           int tail_flags)
 
+    int sum_gauss_deriv(double* x,
+                        int len_x,
+                        double* pgauss,
+                        int len_pgauss,
+                        int index,
+                        double* y)
+
+    int sum_agauss_deriv(double* x,
+                         int len_x,
+                         double* pgauss,
+                         int len_pgauss,
+                         int index,
+                         double* y)
+
+    int sum_pvoigt_deriv(double* x,
+                         int len_x,
+                         double* pvoigt,
+                         int len_pvoigt,
+                         int index,
+                         double* y)
+
+    int sum_apvoigt_deriv(double* x,
+                          int len_x,
+                          double* pvoigt,
+                          int len_pvoigt,
+                          int index,
+                          double* y)
+
+    int sum_lorentz_deriv(double* x,
+                          int len_x,
+                          double* plorentz,
+                          int len_plorentz,
+                          int index,
+                          double* y)
+
+    int sum_alorentz_deriv(double* x,
+                           int len_x,
+                           double* plorentz,
+                           int len_plorentz,
+                           int index,
+                           double* y)
+
+    int sum_ahypermet_deriv(double* x,
+                            int len_x,
+                            double* phypermet,
+                            int len_phypermet,
+                            int index,
+                            double* y,
+                            int tail_flags)
+
     long seek(long begin_index,
               long end_index,
               long nsamples,
@@ -40,9 +40,11 @@ __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
 import numpy
 from numpy.linalg import inv
 from numpy.linalg.linalg import LinAlgError
+import concurrent.futures
 import time
 import logging
 import copy
+import os
 
 _logger = logging.getLogger(__name__)
 
@@ -294,41 +296,9 @@ def leastsq(model, xdata, ydata, p0, sigma=None,
         epsfcn = max(epsfcn, numpy.finfo(numpy.float64).eps)
 
     # check if constraints have been passed as text
-    constrained_fit = False
-    if constraints is not None:
-        # make sure we work with a list of lists
-        input_constraints = constraints
-        tmp_constraints = [None] * len(input_constraints)
-        for i in range(nparameters):
-            tmp_constraints[i] = list(input_constraints[i])
-        constraints = tmp_constraints
-        for i in range(nparameters):
-            if hasattr(constraints[i][0], "upper"):
-                txt = constraints[i][0].upper()
-                if txt == "FREE":
-                    constraints[i][0] = CFREE
-                elif txt == "POSITIVE":
-                    constraints[i][0] = CPOSITIVE
-                elif txt == "QUOTED":
-                    constraints[i][0] = CQUOTED
-                elif txt == "FIXED":
-                    constraints[i][0] = CFIXED
-                elif txt == "FACTOR":
-                    constraints[i][0] = CFACTOR
-                    constraints[i][1] = int(constraints[i][1])
-                elif txt == "DELTA":
-                    constraints[i][0] = CDELTA
-                    constraints[i][1] = int(constraints[i][1])
-                elif txt == "SUM":
-                    constraints[i][0] = CSUM
-                    constraints[i][1] = int(constraints[i][1])
-                elif txt in ["IGNORED", "IGNORE"]:
-                    constraints[i][0] = CIGNORED
-                else:
-                    #I should raise an exception
-                    raise ValueError("Unknown constraint %s" % constraints[i][0])
-            if constraints[i][0] > 0:
-                constrained_fit = True
+    constraints = _get_constraints(constraints, nparameters)
+    constrained_fit = constraints is not None and \
+        any(constraint[0] > 0 for constraint in constraints)
     if constrained_fit:
         if full_output is None:
             _logger.info("Recommended to set full_output to True when using constraints")
@@ -497,6 +467,384 @@ def leastsq(model, xdata, ydata, p0, sigma=None,
         ddict["niter"] = iteration_counter
         return fittedpar, cov, ddict #, chisq/(len(yfit)-len(sigma0)), sigmapar,niter,lastdeltachi
 
+def leastsq_batch(model, xdata, ydata, p0, sigma=None,
+                  constraints=None, model_deriv=None, vectorized=True,
+                  epsfcn=None, deltachi=None, full_output=False,
+                  max_iter=100, chunk_size=256, nproc=1):
+    """
+    Fit the same model to many spectra sharing the same x values
+    with the Levenberg-Marquardt algorithm of :func:`leastsq`.
+
+    The spectra are processed by chunks. Within a chunk, the model and its
+    derivatives are evaluated for all the spectra at once and the
+    Levenberg-Marquardt iterations are run together, spectra being left out
+    once their fit has converged.
+    Chunks can be processed by a pool of processes.
+
+    Non-finite values of ydata and sigma are ignored by giving them a
+    weight of 0.
+
+    :param model: callable
+        The model function, f(x, ...).
+        If vectorized is True, it is called as ``model(xdata, *parameters)``
+        where each parameter is an array of shape (n, 1) and must return an
+        array of shape (n, M) (e.g., any function written with numpy
+        operations). If vectorized is False, it is called for each spectrum
+        as in :func:`leastsq`.
+        When nproc > 1, it must be picklable (i.e., a module level function).
+
+    :param xdata: An M-length sequence.
+        The independent variable shared by all spectra.
+
+    :param ydata: A (n_spectra, M) array of spectra to fit
+
+    :param p0: Initial guess of the parameters either shared by all spectra
+        as a N-length sequence or per spectrum as a (n_spectra, N) array.
+
+    :param sigma: None, M-length sequence or (n_spectra, M) array of
+        uncertainties of ydata. If None, the uncertainties are assumed to be 1.
+
+    :param constraints: None or 2D sequence of dimension (n_parameters, 3)
+        shared by all spectra, see :func:`leastsq`.
+        IGNORED constraints are not supported.
+
+    :param model_deriv:
+        None (default) or function providing the derivatives of the model
+        with respect to the fitted parameters, called as
+        ``model_deriv(xdata, parameters, index)`` with the same parameters
+        as model (a sequence of (n, 1) arrays if vectorized is True).
+        If None, derivatives are computed with forward differences.
+    :type model_deriv: *optional*, None or callable
+
+    :param bool vectorized: Whether model and model_deriv can process many
+        spectra at once (the default) or only one.
+
+    :param epsfcn: float, see :func:`leastsq`
+    :param deltachi: float, see :func:`leastsq`
+    :param bool full_output: True to also return a dictionary of outputs
+    :param int max_iter: Maximum number of iterations (default is 100)
+    :param int chunk_size: Number of spectra fitted together
+    :param int nproc: Number of processes used to fit the chunks.
+        If None, the number of CPUs is used. Default: 1, no process pool.
+
+    :return: Returns a tuple of length 2 (or 3 if full_ouput is True) with the content:
+
+         ``popt``: (n_spectra, N) array
+           Optimal values of the parameters of each spectrum
+         ``pcov``: (n_spectra, N, N) array
+           The estimated covariance of the fitted parameters of each spectrum.
+           Rows and columns of parameters which are not fitted
+           (e.g., FIXED) are zero.
+         ``infodict``: dict
+           a dictionary of optional outputs with the keys, all of them
+           being arrays with the spectra as first dimension:
+
+            ``uncertainties``
+                The uncertainty on the optimized parameters.
+            ``nfev``
+                The number of function evaluations of each spectrum
+            ``fvec``
+                The function evaluated at the output
+            ``niter``
+                The number of iterations performed
+            ``chisq``
+                The chi square
+            ``reduced_chisq``
+                The chi square divided by the number of degrees of freedom
+    """
+    xdata = numpy.asarray(xdata, dtype=numpy.float64)
+    ydata = numpy.array(ydata, dtype=numpy.float64, ndmin=2)
+    n_spectra, n_points = ydata.shape
+    if xdata.size != n_points:
+        raise ValueError("xdata and ydata must have the same number of points")
+
+    if numpy.isscalar(p0):
+        p0 = [p0]
+    p0 = numpy.array(p0, dtype=numpy.float64, ndmin=2)
+    if p0.shape[0] == 1:
+        p0 = numpy.repeat(p0, n_spectra, axis=0)
+    if p0.shape[0] != n_spectra:
+        raise ValueError("p0 must be shared or given for each spectrum")
+
+    if sigma is None:
+        weight = numpy.ones(ydata.shape, dtype=numpy.float64)
+    else:
+        sigma = numpy.broadcast_to(
+            numpy.asarray(sigma, dtype=numpy.float64), ydata.shape)
+        weight = 1.0 / (sigma + numpy.equal(sigma, 0))
+        weight *= weight
+    # Ignore non-finite data points
+    invalid = numpy.logical_not(
+        numpy.logical_and(numpy.isfinite(ydata), numpy.isfinite(weight)))
+    if numpy.any(invalid):
+        ydata[invalid] = 0.
+        weight[invalid] = 0.
+
+    constraints = _get_constraints(constraints, p0.shape[1])
+    if constraints is not None:
+        for constraint in constraints:
+            if constraint[0] == CIGNORED:
+                raise ValueError("IGNORED constraints are not supported")
+            if constraint[0] == CQUOTED and constraint[1] == constraint[2]:
+                raise ValueError("Invalid parameter limits")
+
+    if epsfcn is None:
+        epsfcn = numpy.finfo(numpy.float64).eps
+    else:
+        epsfcn = max(epsfcn, numpy.finfo(numpy.float64).eps)
+    if deltachi is None:
+        deltachi = 0.001
+
+    kwargs = dict(constraints=constraints,
+                  model_deriv=model_deriv,
+                  vectorized=vectorized,
+                  epsfcn=epsfcn,
+                  deltachi=deltachi,
+                  max_iter=max_iter)
+    chunks = [(model, xdata, ydata[start:start + chunk_size],
+               p0[start:start + chunk_size], weight[start:start + chunk_size])
+              for start in range(0, n_spectra, chunk_size)]
+
+    if nproc is None:
+        nproc = os.cpu_count() or 1
+    if nproc > 1 and len(chunks) > 1:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=min(nproc, len(chunks))) as executor:
+            futures = [executor.submit(_leastsq_batch_chunk, *args, **kwargs)
+                       for args in chunks]
+            results = [future.result() for future in futures]
+    else:
+        results = [_leastsq_batch_chunk(*args, **kwargs) for args in chunks]
+
+    ddict = {}
+    for key in results[0]:
+        ddict[key] = numpy.concatenate([result[key] for result in results])
+    fittedpar = ddict.pop("parameters")
+    cov = ddict["covariance"]
+    if not full_output:
+        return fittedpar, cov
+    else:
+        return fittedpar, cov, ddict
+
+
+def _get_parameters_batch(parameters, constraints):
+    """
+    Apply constraints to input parameters of many spectra.
+
+    Vectorized version of :func:`_get_parameters`.
+
+    :param numpy.ndarray parameters: (n, N) parameters
+    :param constraints: Constraints as returned by :func:`_get_constraints`
+    :rtype: numpy.ndarray
+    """
+    if constraints is None:
+        return parameters
+    newparam = numpy.array(parameters, copy=True)
+    for i, constraint in enumerate(constraints):
+        if constraint[0] == CPOSITIVE:
+            newparam[:, i] = abs(newparam[:, i])
+    for i, constraint in enumerate(constraints):
+        if constraint[0] == CFACTOR:
+            newparam[:, i] = constraint[2] * newparam[:, int(constraint[1])]
+        elif constraint[0] == CDELTA:
+            newparam[:, i] = constraint[2] + newparam[:, int(constraint[1])]
+        elif constraint[0] == CSUM:
+            newparam[:, i] = constraint[2] - newparam[:, int(constraint[1])]
+    return newparam
+
+
+def _evaluate_batch(model, x, parameters, vectorized):
+    """Evaluate model for many sets of parameters
+
+    :param callable model:
+    :param numpy.ndarray x: M-length array
+    :param numpy.ndarray parameters: (n, N) parameters
+    :param bool vectorized: Whether model can process many spectra at once
+    :return: (n, M) array
+    """
+    if vectorized:
+        result = model(x, *numpy.hsplit(parameters, parameters.shape[1]))
+        result = numpy.broadcast_to(result, (len(parameters), x.size))
+        return numpy.array(result, dtype=numpy.float64)
+    else:
+        return numpy.array([numpy.ravel(model(x, *p)) for p in parameters],
+                           dtype=numpy.float64).reshape(len(parameters), -1)
+
+
+def _leastsq_batch_chunk(model, x, y, parameters, weight, constraints,
+                         model_deriv, vectorized, epsfcn, deltachi, max_iter):
+    """Fit a chunk of spectra, see :func:`leastsq_batch`
+
+    :return: dict of arrays
+    """
+    n_spectra, n_param = parameters.shape
+
+    # free_index: indices of fitted parameters, others depend on them
+    if constraints is None:
+        free_index = list(range(n_param))
+    else:
+        free_index = [i for i, constraint in enumerate(constraints)
+                      if constraint[0] in (CFREE, CPOSITIVE, CQUOTED)]
+    n_free = len(free_index)
+    if n_free == 0:
+        raise ValueError("No free parameters to fit")
+
+    # Quoted parameters: A + B * sin(theta)
+    quoted = []
+    for i, index in enumerate(free_index):
+        if constraints is not None and constraints[index][0] == CQUOTED:
+            pmax = max(constraints[index][1], constraints[index][2])
+            pmin = min(constraints[index][1], constraints[index][2])
+            quoted.append((i, 0.5 * (pmax + pmin), 0.5 * (pmax - pmin)))
+
+    parameters = _get_parameters_batch(parameters, constraints)
+    for i, A, B in quoted:
+        index = free_index[i]
+        parameters[:, index] = numpy.clip(parameters[:, index], A - B, A + B)
+
+    identity = numpy.identity(n_free)
+    flambda = numpy.full((n_spectra,), 0.001)
+    chisq = numpy.zeros((n_spectra,))
+    alpha = numpy.zeros((n_spectra, n_free, n_free))
+    beta = numpy.zeros((n_spectra, n_free))
+    niter = numpy.zeros((n_spectra,), dtype=numpy.int64)
+    nfev = numpy.zeros((n_spectra,), dtype=numpy.int64)
+    remaining_iter = numpy.full((n_spectra,), max_iter, dtype=numpy.int64)
+    active = numpy.ones((n_spectra,), dtype=bool)
+    update = numpy.ones((n_spectra,), dtype=bool)  # Derivatives to compute
+
+    yfit = _evaluate_batch(model, x, parameters, vectorized)
+    nfev += 1
+
+    while numpy.any(active):
+        # Compute chisq, alpha and beta of spectra with new parameters
+        indices = numpy.nonzero(numpy.logical_and(active, update))[0]
+        if len(indices) > 0:
+            params = parameters[indices]
+            fitparam = params[:, free_index]
+            f0 = yfit[indices]
+            derivfactor = numpy.ones((len(indices), n_free))
+            for i, A, B in quoted:
+                derivfactor[:, i] = B * numpy.cos(numpy.arcsin(
+                    numpy.clip((fitparam[:, i] - A) / B, -1., 1.)))
+
+            deriv = numpy.empty((len(indices), n_free, x.size))
+            if model_deriv is None:
+                delta = (fitparam + numpy.equal(fitparam, 0.0)) * numpy.sqrt(epsfcn)
+                for i, index in enumerate(free_index):
+                    pwork = numpy.array(params, copy=True)
+                    pwork[:, index] += delta[:, i]
+                    f1 = _evaluate_batch(
+                        model, x, _get_parameters_batch(pwork, constraints),
+                        vectorized)
+                    deriv[:, i] = (f1 - f0) / delta[:, i, numpy.newaxis]
+                nfev[indices] += n_free
+            elif vectorized:
+                columns = numpy.hsplit(params, n_param)
+                for i, index in enumerate(free_index):
+                    deriv[:, i] = model_deriv(x, columns, index)
+            else:
+                for n, p in enumerate(params):
+                    for i, index in enumerate(free_index):
+                        deriv[n, i] = model_deriv(x, p, index)
+            deriv *= derivfactor[:, :, numpy.newaxis]
+
+            w = weight[indices]
+            deltay = y[indices] - f0
+            chisq[indices] = numpy.sum(w * deltay * deltay, axis=1)
+            beta[indices] = numpy.einsum('nim,nm->ni', deriv, w * deltay)
+            alpha[indices] = numpy.einsum('nim,njm->nij', deriv * w[:, numpy.newaxis], deriv)
+            niter[indices] += 1
+            update[indices] = False
+
+        # Try a step for all active spectra
+        indices = numpy.nonzero(active)[0]
+        alpha_lm = alpha[indices] * (1.0 + flambda[indices, numpy.newaxis, numpy.newaxis] * identity)
+        try:
+            deltapar = numpy.linalg.solve(alpha_lm, beta[indices])
+        except LinAlgError:
+            deltapar = numpy.einsum('nij,nj->ni',
+                                    numpy.linalg.pinv(alpha_lm), beta[indices])
+
+        newpar = numpy.array(parameters[indices], copy=True)
+        fitparam = newpar[:, free_index]
+        newfree = fitparam + deltapar
+        for i, A, B in quoted:
+            newfree[:, i] = A + B * numpy.sin(numpy.arcsin(
+                numpy.clip((fitparam[:, i] - A) / B, -1., 1.)) + deltapar[:, i])
+        newpar[:, free_index] = newfree
+        newpar = _get_parameters_batch(newpar, constraints)
+
+        newfit = _evaluate_batch(model, x, newpar, vectorized)
+        nfev[indices] += 1
+        deltay = y[indices] - newfit
+        newchisq = numpy.sum(weight[indices] * deltay * deltay, axis=1)
+        absdeltachi = chisq[indices] - newchisq
+        remaining_iter[indices] -= 1
+
+        # Rejected steps: increase lambda
+        rejected = numpy.logical_not(absdeltachi >= 0)
+        flambda[indices[rejected]] *= 10.0
+        stopped = rejected & (flambda[indices] > 1000)
+
+        # Accepted steps: keep new parameters and decrease lambda
+        accepted = numpy.logical_not(rejected)
+        acc_indices = indices[accepted]
+        parameters[acc_indices] = newpar[accepted]
+        yfit[acc_indices] = newfit[accepted]
+        chisq[acc_indices] = newchisq[accepted]
+        flambda[acc_indices] /= 10.0
+        update[acc_indices] = True
+
+        newchisq = newchisq[accepted]
+        lastdeltachi = 100 * (absdeltachi[accepted] / (newchisq + (newchisq == 0)))
+        converged = numpy.logical_and(
+            niter[acc_indices] >= 2,
+            numpy.logical_or(lastdeltachi < deltachi,
+                             absdeltachi[accepted] < numpy.sqrt(epsfcn)))
+
+        active[indices[stopped]] = False
+        active[acc_indices[converged]] = False
+        active[remaining_iter <= 0] = False
+
+    # Covariance of the fitted parameters
+    try:
+        cov0 = numpy.linalg.inv(alpha)
+    except LinAlgError:
+        cov0 = numpy.linalg.pinv(alpha)
+    # Quoted parameters are fitted through their angle
+    derivfactor = numpy.ones((n_spectra, n_free))
+    for i, A, B in quoted:
+        derivfactor[:, i] = B * numpy.cos(numpy.arcsin(
+            numpy.clip((parameters[:, free_index[i]] - A) / B, -1., 1.)))
+    cov0 *= derivfactor[:, :, numpy.newaxis] * derivfactor[:, numpy.newaxis, :]
+    cov = numpy.zeros((n_spectra, n_param, n_param))
+    cov[:, numpy.array(free_index)[:, numpy.newaxis], free_index] = cov0
+
+    uncertainties = numpy.zeros((n_spectra, n_param))
+    uncertainties[:, free_index] = numpy.sqrt(
+        abs(numpy.diagonal(cov0, axis1=1, axis2=2)))
+    if constraints is not None:
+        for i, constraint in enumerate(constraints):
+            if constraint[0] == CFIXED:
+                uncertainties[:, i] = parameters[:, i]
+        for i, constraint in enumerate(constraints):
+            if constraint[0] == CFACTOR:
+                uncertainties[:, i] = constraint[2] * uncertainties[:, int(constraint[1])]
+            elif constraint[0] in (CDELTA, CSUM):
+                uncertainties[:, i] = uncertainties[:, int(constraint[1])]
+
+    n_points = numpy.count_nonzero(weight, axis=1)
+    return {"parameters": parameters,
+            "covariance": cov,
+            "uncertainties": uncertainties,
+            "chisq": chisq,
+            "reduced_chisq": chisq / numpy.maximum(n_points - n_free, 1),
+            "fvec": yfit,
+            "nfev": nfev,
+            "niter": niter}
+
+
 def chisq_alpha_beta(model, parameters, x, y, weight, constraints=None,
                    model_deriv=None, epsfcn=None, left_derivative=False,
                    last_evaluation=None, full_output=False):
@@ -739,6 +1087,46 @@ def chisq_alpha_beta(model, parameters, x, y, weight, constraints=None,
         return chisq, alpha, beta
 
 
+
+def _get_constraints(constraints, nparameters):
+    """Returns a copy of constraints as a list of lists with numeric codes.
+
+    :param constraints: None or 2D sequence of constraints, see :func:`leastsq`
+    :param int nparameters: Number of parameters
+    :rtype: Union[None,List[List]]
+    :raises ValueError: For unknown constraints
+    """
+    if constraints is None:
+        return None
+    # make sure we work with a list of lists
+    constraints = [list(constraints[i]) for i in range(nparameters)]
+    for constraint in constraints:
+        if hasattr(constraint[0], "upper"):
+            txt = constraint[0].upper()
+            if txt == "FREE":
+                constraint[0] = CFREE
+            elif txt == "POSITIVE":
+                constraint[0] = CPOSITIVE
+            elif txt == "QUOTED":
+                constraint[0] = CQUOTED
+            elif txt == "FIXED":
+                constraint[0] = CFIXED
+            elif txt == "FACTOR":
+                constraint[0] = CFACTOR
+                constraint[1] = int(constraint[1])
+            elif txt == "DELTA":
+                constraint[0] = CDELTA
+                constraint[1] = int(constraint[1])
+            elif txt == "SUM":
+                constraint[0] = CSUM
+                constraint[1] = int(constraint[1])
+            elif txt in ["IGNORED", "IGNORE"]:
+                constraint[0] = CIGNORED
+            else:
+                #I should raise an exception
+                raise ValueError("Unknown constraint %s" % constraint[0])
+    return constraints
+
 def _get_parameters(parameters, constraints):
     """
     Apply constraints to input parameters.
@@ -122,7 +122,86 @@ class TestSmooth(unittest.TestCase):
                                        expected_smooth[i, j])
 
 
-test_cases = (TestSmooth,)
+class TestBackgroundBatch(unittest.TestCase):
+    """
+    Unit tests of the background extraction of stacks, compared to the
+    background extraction of each item.
+    """
+    def setUp(self):
+        x = numpy.arange(1000)
+        self.spectra = numpy.array(
+            [functions.sum_gauss(x, 1000, 300 + 10 * i, 30, 500, 700, 50) +
+             50 + 0.01 * x for i in range(12)])
+        self.spectra = add_relative_noise(self.spectra, 5.)
+
+        image = numpy.outer(numpy.arange(60), numpy.ones(50))
+        image[20:30, 10:15] += 100
+        self.images = numpy.array([image * (i + 1) for i in range(5)])
+        self.images = add_relative_noise(self.images, 5.)
+
+    def testStripBatch(self):
+        """Test strip_batch with and without anchors"""
+        for anchors in (None, [100, 503, 950]):
+            result = filters.strip_batch(self.spectra, w=2, niterations=500,
+                                         factor=1.0, anchors=anchors)
+            for spectrum, background in zip(self.spectra, result):
+                expected = filters.strip(spectrum, w=2, niterations=500,
+                                         factor=1.0, anchors=anchors)
+                self.assertTrue(numpy.array_equal(background, expected))
+
+    def testSnip1dBatch(self):
+        """Test snip1d_batch with float64 and float32 data"""
+        result = filters.snip1d_batch(self.spectra, 40)
+        self.assertEqual(result.dtype, numpy.float64)
+        for spectrum, background in zip(self.spectra, result):
+            self.assertTrue(numpy.array_equal(background,
+                                              filters.snip1d(spectrum, 40)))
+
+        data = self.spectra.astype(numpy.float32)
+        result = filters.snip1d_batch(data, 40)
+        self.assertEqual(result.dtype, numpy.float32)
+        for spectrum, background in zip(data, result):
+            self.assertTrue(numpy.allclose(background,
+                                           filters.snip1d(spectrum, 40),
+                                           rtol=1e-5))
+
+    def testSnip2dBatch(self):
+        """Test snip2d_batch"""
+        result = filters.snip2d_batch(self.images, 5)
+        for image, background in zip(self.images, result):
+            self.assertTrue(numpy.array_equal(background,
+                                              filters.snip2d(image, 5)))
+
+    def testOutput(self):
+        """Test batch functions with a preallocated output"""
+        data = self.spectra.astype(numpy.float32)
+        expected = filters.snip1d_batch(data, 20)
+
+        output = numpy.empty_like(data)
+        result = filters.snip1d_batch(data, 20, output=output)
+        self.assertIs(result, output)
+        self.assertTrue(numpy.array_equal(output, expected))
+
+        # In place
+        result = filters.snip1d_batch(data, 20, output=data)
+        self.assertIs(result, data)
+        self.assertTrue(numpy.array_equal(data, expected))
+
+        # Non-contiguous data
+        data = numpy.asfortranarray(self.spectra)
+        result = filters.strip_batch(data, niterations=100)
+        self.assertTrue(numpy.array_equal(
+            result, filters.strip_batch(self.spectra, niterations=100)))
+
+        with self.assertRaises(ValueError):
+            filters.snip1d_batch(data, 20, output=numpy.empty((2, 3)))
+        with self.assertRaises(ValueError):
+            filters.snip1d_batch(data, 20, output=numpy.empty_like(data))
+        with self.assertRaises(ValueError):
+            filters.snip2d_batch(self.spectra, 20)
+
+
+test_cases = (TestSmooth, TestBackgroundBatch)
 
 
 def suite():
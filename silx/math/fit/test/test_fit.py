@@ -372,7 +372,90 @@ class Test_leastsq(unittest.TestCase):
                                        parameters_estimate[i])
 
 
-test_cases = (Test_leastsq,)
+def _batch_gauss(x, *params):
+    """Linear background and a gaussian, usable with many spectra"""
+    dummy = 2.3548200450309493 * (x - params[3]) / params[4]
+    return params[0] + params[1] * x + params[2] * numpy.exp(-0.5 * dummy * dummy)
+
+
+class Test_leastsq_batch(unittest.TestCase):
+    """
+    Unit tests of the leastsq_batch function.
+    """
+
+    def setUp(self):
+        self.x = numpy.arange(500.)
+        random = numpy.random.RandomState(0)
+        self.parameters = numpy.array([10.5, 2, 1000.0, 250., 30.]) * \
+            (1. + 0.1 * random.random_sample((20, 5)))
+        self.estimates = self.parameters * \
+            (1. + 0.01 * random.standard_normal(self.parameters.shape))
+        self.y = numpy.array(
+            [_batch_gauss(self.x, *p) for p in self.parameters])
+        self.y += random.standard_normal(self.y.shape) * numpy.sqrt(self.y)
+        self.sigma = numpy.sqrt(self.y)
+
+    def assertSameAsLeastsq(self, fittedpar, infodict, estimates,
+                            constraints=None):
+        """Compare results with leastsq fit of each spectrum"""
+        from silx.math.fit import leastsq
+        for index, y in enumerate(self.y):
+            expected, cov, expected_info = leastsq(
+                _batch_gauss, self.x, y, estimates[index],
+                sigma=self.sigma[index], constraints=constraints,
+                full_output=True)
+            self.assertTrue(numpy.allclose(fittedpar[index], expected))
+            self.assertAlmostEqual(infodict["chisq"][index] / expected_info["chisq"], 1.)
+            self.assertEqual(infodict["niter"][index], expected_info["niter"])
+
+    def testFit(self):
+        from silx.math.fit import leastsq_batch
+        for vectorized in (True, False):
+            with self.subTest(vectorized=vectorized):
+                fittedpar, cov, infodict = leastsq_batch(
+                    _batch_gauss, self.x, self.y, self.estimates,
+                    sigma=self.sigma, vectorized=vectorized, chunk_size=8,
+                    full_output=True)
+                self.assertEqual(fittedpar.shape, self.parameters.shape)
+                self.assertEqual(cov.shape, (20, 5, 5))
+                self.assertSameAsLeastsq(fittedpar, infodict, self.estimates)
+
+    def testFitSharedEstimates(self):
+        from silx.math.fit import leastsq_batch
+        y = numpy.array([_batch_gauss(self.x, *self.parameters[0])] * 3)
+        y[1, 100] = numpy.nan
+        fittedpar, cov = leastsq_batch(
+            _batch_gauss, self.x, y, self.estimates[0])
+        for parameters in fittedpar:
+            self.assertTrue(numpy.allclose(parameters, self.parameters[0]))
+
+    def testConstrainedFit(self):
+        from silx.math.fit import leastsq_batch
+        from silx.math.fit import CFREE, CPOSITIVE, CFIXED
+        constraints = [[CFREE, 0, 0],
+                       [CFIXED, 0, 0],
+                       [CPOSITIVE, 0, 0],
+                       ["QUOTED", 200., 300.],
+                       [CFREE, 0, 0]]
+        fittedpar, cov, infodict = leastsq_batch(
+            _batch_gauss, self.x, self.y, self.estimates, sigma=self.sigma,
+            constraints=constraints, full_output=True)
+        self.assertTrue(numpy.array_equal(fittedpar[:, 1], self.estimates[:, 1]))
+        self.assertTrue(numpy.array_equal(infodict["uncertainties"][:, 1],
+                                          self.estimates[:, 1]))
+        self.assertSameAsLeastsq(fittedpar, infodict, self.estimates,
+                                 constraints=constraints)
+
+    def testProcessPool(self):
+        from silx.math.fit import leastsq_batch
+        expected = leastsq_batch(_batch_gauss, self.x, self.y, self.estimates,
+                                 sigma=self.sigma)[0]
+        fittedpar = leastsq_batch(_batch_gauss, self.x, self.y, self.estimates,
+                                  sigma=self.sigma, chunk_size=5, nproc=2)[0]
+        self.assertTrue(numpy.array_equal(fittedpar, expected))
+
+
+test_cases = (Test_leastsq, Test_leastsq_batch)
 
 def suite():
     loader = unittest.defaultTestLoader
@@ -363,6 +363,211 @@ class TestFitmanager(ParametricTestCase):
         is used."""
         self.testAddTheory(estimate=False)
 
+    def testTheoryDerivative(self):
+        """Test that fits using the derivatives of the default theories
+        give the same results as with numerical derivatives"""
+        x = numpy.arange(1000).astype(numpy.float64)
+        for theory_name in ('Gaussians', 'Area Gaussians', 'Pseudo-Voigt Line'):
+            for same_fwhm in (False, True):
+                # FACTOR constraints are used with the same FWHM
+                fwhm = (95, 95, 95) if same_fwhm else (250, 45, 95)
+                p = [1000, 100., fwhm[0],
+                     255, 650., fwhm[1],
+                     1500, 800.5, fwhm[2]]
+                y = 2.65 * x + 13 + sum_gauss(x, *p)
+
+                with self.subTest(theory=theory_name, same_fwhm=same_fwhm):
+                    results = []
+                    for use_derivative in (True, False):
+                        fit = fitmanager.FitManager()
+                        fit.setdata(x=x, y=y)
+                        fit.loadtheories(fittheories)
+                        theory = fit.theories[theory_name]
+                        self.assertIsNotNone(theory.derivative)
+                        if not use_derivative:
+                            fit.addtheory(theory_name,
+                                          FitTheory(function=theory.function,
+                                                    parameters=theory.parameters,
+                                                    estimate=theory.estimate,
+                                                    configure=theory.configure))
+                        fit.settheory(theory_name)
+                        fit.setbackground('Linear')
+                        fit.configure(SameFwhmFlag=same_fwhm)
+                        fit.estimate()
+                        params, sigmas, infodict = fit.runfit()
+                        results.append((fit.gendata(), infodict["nfev"]))
+
+                    (fitted, nfev), (ref_fitted, ref_nfev) = results
+                    # Both fits stop on the same relative chi-square decrease
+                    self.assertTrue(numpy.allclose(fitted, ref_fitted,
+                                                   rtol=1e-3))
+                    self.assertLess(nfev, ref_nfev)
+
+    def testFitSeries(self):
+        """Test fitting a series of spectra with warm start"""
+        x = numpy.arange(1000).astype(numpy.float64)
+        series = []
+        for i in range(8):
+            p = [1000 + 10 * i, 100. + 0.5 * i, 250,
+                 255, 650., 45,
+                 1500, 800.5 - 0.5 * i, 95]
+            series.append(2.65 * x + 13 + sum_gauss(x, *p))
+        series = numpy.array(series)
+
+        fit = fitmanager.FitManager()
+        fit.loadtheories(fittheories)
+        fit.settheory('Gaussians')
+        fit.setbackground('Linear')
+        result = fit.fitseries(series, x=x)
+
+        self.assertEqual(len(result), len(series))
+        self.assertEqual(result.dtype.names[:3],
+                         ("Constant", "Slope", "Height1"))
+        self.assertTrue(numpy.all(result["success"]))
+        self.assertTrue(result["estimated"][0])
+        self.assertFalse(numpy.any(result["estimated"][1:]))
+        self.assertTrue(numpy.allclose(result["Position1"],
+                                       100. + 0.5 * numpy.arange(8)))
+        self.assertTrue(numpy.allclose(result["Height3"], 1500))
+        self.assertTrue(numpy.allclose(result["Slope"], 2.65))
+
+        # The fit manager holds the fit of the last spectrum
+        self.assertTrue(numpy.array_equal(fit.ydata, series[-1]))
+
+        # Fit each spectrum of the series
+        for i, y in enumerate(series):
+            fit.setdata(x=x, y=y)
+            fit.estimate()
+            params, sigmas, infodict = fit.runfit()
+            for param, value in zip(fit.fit_results, params):
+                self.assertAlmostEqual(result[param['name']][i], value,
+                                       places=5)
+
+    def testFitSeriesFallback(self):
+        """Test fitting a series with spectra that cannot be warm started"""
+        x = numpy.arange(1000).astype(numpy.float64)
+        p = [1000, 100., 250,
+             255, 650., 45,
+             1500, 800.5, 95]
+        y = 2.65 * x + 13 + sum_gauss(x, *p)
+        shifted_p = [1000, 200., 250,
+                     255, 700., 45,
+                     1500, 880.5, 95]
+        shifted_y = 2.65 * x + 13 + sum_gauss(x, *shifted_p)
+        series = numpy.array((y, y, shifted_y, shifted_y, y))
+        series[3] = numpy.nan
+
+        fit = fitmanager.FitManager()
+        fit.loadtheories(fittheories)
+        fit.settheory('Gaussians')
+        fit.setbackground('Linear')
+        result = fit.fitseries(series)
+
+        self.assertTrue(numpy.array_equal(result["success"],
+                                          (True, True, True, False, True)))
+        self.assertTrue(numpy.isnan(result["Height1"][3]))
+        # The shifted spectrum is estimated again
+        self.assertTrue(result["estimated"][2])
+        self.assertAlmostEqual(result["Position1"][2], 200.)
+        self.assertAlmostEqual(result["Position1"][4], 100.)
+
+    def testFitSeriesWeightsAndRange(self):
+        """Test that spectra of a series are weighted as with setdata"""
+        x = numpy.arange(1000).astype(numpy.float64)
+        series = []
+        for i in range(4):
+            p = [1000 + 10 * i, 100. + 0.5 * i, 250,
+                 255, 650., 45,
+                 1500, 800.5 - 0.5 * i, 95]
+            # quadratic background not fitted by the linear one
+            series.append(2.65 * x + 13 + sum_gauss(x, *p) +
+                          2e-5 * (i + 1) * (x - 500) ** 2)
+        series = numpy.array(series)
+
+        fit = fitmanager.FitManager()
+        fit.loadtheories(fittheories)
+        fit.settheory('Gaussians')
+        fit.setbackground('Linear')
+        fit.setdata(x=x, y=series[0])
+        fit.configure(WeightFlag=True)
+        for sigmay in (None, numpy.sqrt(series + 1)):
+            result = fit.fitseries(series, x=x, sigmay=sigmay,
+                                   xmin=100, xmax=900, warm_start=False)
+            self.assertTrue(numpy.all(result["success"]))
+            for i, spectrum in enumerate(series):
+                with self.subTest(sigmay=sigmay is not None, spectrum=i):
+                    fit.setdata(x=x, y=spectrum, xmin=100, xmax=900,
+                                sigmay=None if sigmay is None else sigmay[i])
+                    self.assertEqual(len(fit.sigmay), len(fit.ydata))
+                    fit.estimate()
+                    fit.runfit()
+                    self.assertTrue(numpy.isclose(result["chisq"][i],
+                                                  fit.chisq, rtol=1e-5))
+
+    def testFitSeriesProcessPool(self):
+        """Test fitting a series by chunks in a process pool"""
+        x = numpy.arange(1000).astype(numpy.float64)
+        series = []
+        for i in range(6):
+            p = [1000 + 10 * i, 100. + 0.5 * i, 250,
+                 255, 650., 45,
+                 1500, 800.5, 95]
+            series.append(2.65 * x + 13 + sum_gauss(x, *p))
+
+        fit = fitmanager.FitManager()
+        fit.loadtheories(fittheories)
+        fit.settheory('Gaussians')
+        fit.setbackground('Linear')
+        ref_result = fit.fitseries(series)
+        result = fit.fitseries(series, nproc=2, chunk_size=2)
+
+        self.assertTrue(numpy.all(result["success"]))
+        for name in fit.parameter_names:
+            self.assertTrue(numpy.allclose(result[name], ref_result[name]))
+
+    def testCustomDerivativeWithBackground(self):
+        """Test that a user derivative gets all the fit parameters,
+        background ones included"""
+        x = numpy.arange(1000).astype(numpy.float64)
+        p = [1000, 100., 30, 1500, 600., 70]
+        y = 2.65 * x + 13 + sum_gauss(x, *p)
+
+        fit = fitmanager.FitManager()
+        fit.setdata(x=x, y=y)
+        fit.loadtheories(fittheories)
+        calls = []
+
+        def derivative(x, pars, index):
+            # Derivative of the background + gaussians
+            calls.append((len(pars), index))
+            pars = numpy.array(pars, dtype=numpy.float64)
+            delta = (pars[index] + (pars[index] == 0)) * 1e-6
+            pars[index] += delta
+            f1 = fit.fitfunction(x, *pars)
+            pars[index] -= 2 * delta
+            f2 = fit.fitfunction(x, *pars)
+            return (f1 - f2) / (2 * delta)
+
+        def estimate(x, y):
+            # Free parameters, so that the derivative gets them unchanged
+            return [900, 110., 25, 1400, 590., 60], numpy.zeros((6, 3))
+
+        fit.addtheory("custom", function=sum_gauss,
+                      parameters=('Height', 'Position', 'FWHM'),
+                      estimate=estimate,
+                      derivative=derivative)
+        fit.settheory("custom")
+        fit.setbackground('Linear')
+        fit.estimate()
+        fit.runfit()
+
+        nb_params = len(fit.fit_results)
+        self.assertEqual(nb_params, 2 + len(p))
+        self.assertTrue(calls)
+        self.assertEqual(set(nb for nb, _ in calls), set([nb_params]))
+        self.assertIn(0, [index for _, index in calls])
+        self.assertTrue(numpy.allclose(fit.gendata(), y, atol=1e-2))
+
     def testStep(self):
         """Test fit manager on a step function with a more complex estimate
         function than the gaussian (convolution filter)"""
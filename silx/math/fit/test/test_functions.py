@@ -243,6 +243,68 @@ class Test_functions(unittest.TestCase):
         self.assertLess(abs(index_min_deriv - (center + fwhm/2)),
                         1)
 
+    def testParameterDerivatives(self):
+        """Compare derivatives with respect to parameters with
+        centered finite differences"""
+        x0 = numpy.linspace(-10, 30, 401)
+        params3 = [5., 3., 2.5, 2., 12., 4.]
+        params4 = [5., 3., 2.5, 0.3, 2., 12., 4., 0.7]
+        tests = [
+            (functions.sum_gauss, functions.sum_gauss_deriv, params3),
+            (functions.sum_agauss, functions.sum_agauss_deriv, params3),
+            (functions.sum_lorentz, functions.sum_lorentz_deriv, params3),
+            (functions.sum_alorentz, functions.sum_alorentz_deriv, params3),
+            (functions.sum_pvoigt, functions.sum_pvoigt_deriv, params4),
+            (functions.sum_apvoigt, functions.sum_apvoigt_deriv, params4),
+            (functions.sum_ahypermet, functions.sum_ahypermet_deriv,
+             [50., 3., 2.5, 0.05, 0.5, 0.02, 3., 0.002,
+              30., 12., 3., 0.1, 1., 0.03, 5., 0.003]),
+        ]
+        for function, derivative, params in tests:
+            for index in range(len(params)):
+                delta = 1e-6 * max(1., abs(params[index]))
+                params_plus = numpy.array(params)
+                params_plus[index] += delta
+                params_minus = numpy.array(params)
+                params_minus[index] -= delta
+                expected = (function(x0, *params_plus) -
+                            function(x0, *params_minus)) / (2 * delta)
+
+                result = derivative(x0, params, index)
+                self.assertTrue(
+                    numpy.allclose(result, expected,
+                                   atol=1e-6 * numpy.abs(expected).max()),
+                    "%s, index %d" % (derivative.__name__, index))
+
+        with self.assertRaises(IndexError):
+            functions.sum_gauss_deriv(x0, params3, len(params3))
+        with self.assertRaises(IndexError):
+            functions.sum_gauss_deriv(x0, params4[:5], 0)
+
+    def testHypermetTermsDerivatives(self):
+        """Check derivatives of sum_ahypermet with some terms disabled"""
+        x0 = numpy.linspace(-10, 30, 401)
+        params = [50., 3., 2.5, 0.05, 0.5, 0.02, 3., 0.002]
+        for flags in range(16):
+            terms = {'gaussian_term': bool(flags & 1),
+                     'st_term': bool(flags & 2),
+                     'lt_term': bool(flags & 4),
+                     'step_term': bool(flags & 8)}
+            for index in range(len(params)):
+                delta = 1e-6 * max(1., abs(params[index]))
+                params_plus = numpy.array(params)
+                params_plus[index] += delta
+                params_minus = numpy.array(params)
+                params_minus[index] -= delta
+                expected = (functions.sum_ahypermet(x0, *params_plus, **terms) -
+                            functions.sum_ahypermet(x0, *params_minus, **terms)) / (2 * delta)
+
+                result = functions.sum_ahypermet_deriv(x0, params, index, **terms)
+                self.assertTrue(
+                    numpy.allclose(result, expected,
+                                   atol=1e-6 * max(1., numpy.abs(expected).max())),
+                    "flags %d, index %d" % (flags, index))
+
 
 def _numerical_derivative(f, x, params=[], delta_factor=0.0001):
     """Compute the numerical derivative of ``f`` for all values of ``x``.
@@ -72,6 +72,14 @@ or even:
 
 >>> histo, w_histo, edges = histo_obj
 
+Samples which do not fit in memory can be histogrammed by blocks, e.g., from
+HDF5 datasets of shape (N, 3) and (N,) read in slabs with :func:`iter_blocks`:
+
+>>> from silx.math.histogram import iter_blocks
+>>> histo_obj = Histogramnd.from_iterable(
+...     iter_blocks(h5file["sample"], h5file["weights"]),
+...     n_bins=n_bins, histo_range=ranges)
+
 Accumulating histograms (LUT)
 -----------------------------
 In some situations we need to compute the weighted histogram of several
@@ -119,6 +127,14 @@ Second call with weights_2
 
 >>> histo, w_histo = histo_lut.apply_lut(weights_2, histo=histo, weighted_histo=w_histo)
 
+Several sets of weights can also be histogrammed in a single call, giving
+arrays of shape (2, 35, 35, 35):
+
+>>> histo, w_histo = histo_lut.apply_lut_batch(np.array((weights_1, weights_2)))
+
+With ``lut_format='csr'``, the LUT is stored sorted by bin, which allows
+to split a sample over several bins with *sample_indices* and *coefficients*.
+
 Bin edges
 ---------
 When computing an histogram the caller is asked to provide the histogram
@@ -146,11 +162,41 @@ import numpy as np
 from .chistogramnd import chistogramnd as _chistogramnd  # noqa
 from .chistogramnd_lut import histogramnd_get_lut as _histo_get_lut
 from .chistogramnd_lut import histogramnd_from_lut as _histo_from_lut
+from .chistogramnd_lut import histogramnd_get_csr as _histo_get_csr
+from .chistogramnd_lut import histogramnd_from_csr as _histo_from_csr
+from .chistogramnd_lut import histogramnd_from_lut_batch as _histo_from_lut_batch
+
+
+def iter_blocks(sample, weights=None, block_size=1024**2):
+    """Yields consecutive blocks of sample and weights.
+
+    Only one block is read at a time, so this can be used to histogram
+    datasets (e.g., :class:`h5py.Dataset`) which do not fit in memory with
+    :meth:`Histogramnd.from_iterable`.
+
+    :param sample: Array-like of shape (N,) or (N, D)
+    :param weights: Array-like of shape (N,) or None
+    :param int block_size: Number of samples per block
+    :return: Iterator of (sample, weights) blocks as :class:`numpy.ndarray`
+        (weights is None if not provided)
+    """
+    if block_size <= 0:
+        raise ValueError('<block_size> must be strictly positive.')
+    n_elem = len(sample)
+    if weights is not None and len(weights) != n_elem:
+        raise ValueError('<weights> must be an array whose length '
+                         'is equal to the number of samples.')
+    for start in range(0, n_elem, block_size):
+        end = min(start + block_size, n_elem)
+        yield (np.asarray(sample[start:end]),
+               None if weights is None else np.asarray(weights[start:end]))
 
 
 class Histogramnd(object):
     """
     Computes the multidimensional histogram of some data.
+
+    Large samples are processed by several threads when OpenMP is available.
     """
 
     def __init__(self,
@@ -331,6 +377,68 @@ class Histogramnd(object):
         elif self.__data[1] is None and result[1] is not None:
             self.__data = result
 
+    def accumulate_iterable(self,
+                            iterable,
+                            weight_min=None,
+                            weight_max=None):
+        """
+        Computes the multidimensional histogram of blocks of data and
+        accumulates them into the histogram held by this instance of
+        Histogramnd.
+
+        Only one block is held in memory at a time.
+
+        :param iterable:
+            Iterable of either samples or (sample, weights) pairs, as accepted
+            by :meth:`accumulate`. See :func:`iter_blocks`.
+
+        :param weight_min:
+            Use this parameter to filter out all samples whose
+            weights are lower than this value.
+        :type weight_min: *optional*, scalar
+
+        :param weight_max:
+            Use this parameter to filter out all samples whose
+            weights are higher than this value.
+        :type weight_max: *optional*, scalar
+        """
+        for block in iterable:
+            if isinstance(block, tuple):
+                sample, weights = block
+            else:
+                sample, weights = block, None
+            self.accumulate(sample,
+                            weights=weights,
+                            weight_min=weight_min,
+                            weight_max=weight_max)
+
+    @classmethod
+    def from_iterable(cls,
+                      iterable,
+                      histo_range,
+                      n_bins,
+                      weight_min=None,
+                      weight_max=None,
+                      last_bin_closed=False,
+                      wh_dtype=None):
+        """
+        Computes the multidimensional histogram of blocks of data.
+
+        See :meth:`__init__` for the parameters and
+        :meth:`accumulate_iterable` for *iterable*.
+
+        :rtype: Histogramnd
+        """
+        histogram = cls(None,
+                        histo_range,
+                        n_bins,
+                        last_bin_closed=last_bin_closed,
+                        wh_dtype=wh_dtype)
+        histogram.accumulate_iterable(iterable,
+                                      weight_min=weight_min,
+                                      weight_max=weight_max)
+        return histogram
+
     histo = property(lambda self: self[0])
     """ Histogram array, or None if this instance was initialized without
         <sample> and accumulate has not been called yet.
@@ -363,7 +471,10 @@ class HistogramndLut(object):
                  histo_range,
                  n_bins,
                  last_bin_closed=False,
-                 dtype=None):
+                 dtype=None,
+                 lut_format='dense',
+                 sample_indices=None,
+                 coefficients=None):
         """
         :param sample:
             The coordinates of the data to be histogrammed.
@@ -397,7 +508,33 @@ class HistogramndLut(object):
             Set this parameter to true if you want
             the LAST bin to be closed.
         :type last_bin_closed: *optional*, :class:`python.boolean`
+
+        :param lut_format:
+            How the LUT is stored:
+                * 'dense': the bin index of each sample
+                * 'csr': the indices of the samples sorted by bin.
+                  The weights are then histogrammed in parallel.
+        :type lut_format: *optional*, str
+
+        :param sample_indices:
+            Index in the weights of each sample (default: index of the
+            sample). Several samples can share the same weight, e.g.,
+            the sub-pixels of a pixel for pixel splitting.
+            Only for the 'csr' LUT format.
+        :type sample_indices: *optional*, :class:`numpy.array`
+
+        :param coefficients:
+            Fraction of the weight added to the bin of each sample
+            (default: 1). Only for the 'csr' LUT format.
+        :type coefficients: *optional*, :class:`numpy.array`
         """
+        if lut_format not in ('dense', 'csr'):
+            raise ValueError('Unsupported LUT format: {0}'.format(lut_format))
+        if lut_format != 'csr' and (sample_indices is not None or
+                                    coefficients is not None):
+            raise ValueError('<sample_indices> and <coefficients> require '
+                             'the csr LUT format.')
+
         lut, histo, edges = _histo_get_lut(sample,
                                            histo_range,
                                            n_bins,
@@ -405,7 +542,19 @@ class HistogramndLut(object):
 
         self.__n_bins = np.array(histo.shape)
         self.__histo_range = histo_range
-        self.__lut = lut
+        self.__lut_format = lut_format
+        self.__csr = None
+        if lut_format == 'csr':
+            self.__csr = _histo_get_csr(lut,
+                                        histo.size,
+                                        sample_indices=sample_indices,
+                                        coefficients=coefficients)
+            self.__lut = lut if sample_indices is None else None
+            self.__n_weights = (lut.size if sample_indices is None
+                                else np.max(sample_indices) + 1)
+        else:
+            self.__lut = lut
+            self.__n_weights = lut.size
         self.__histo = None
         self.__weighted_histo = None
         self.__edges = edges
@@ -424,9 +573,32 @@ class HistogramndLut(object):
     @property
     def lut(self):
         """
-        Copy of the Lut
+        Copy of the Lut, or None if the samples were mapped to weights with
+        *sample_indices*.
+        """
+        return None if self.__lut is None else self.__lut.copy()
+
+    @property
+    def lut_format(self):
+        """
+        Format of the LUT: 'dense' or 'csr'.
         """
-        return self.__lut.copy()
+        return self.__lut_format
+
+    @property
+    def csr_lut(self):
+        """
+        (indptr, indices, coefficients) CSR LUT, see
+        :func:`silx.math.chistogramnd_lut.histogramnd_get_csr`.
+
+        For the 'dense' LUT format, it is computed on first access.
+
+        .. note:: those are **references** to the arrays stored in this
+            instance, use with caution.
+        """
+        if self.__csr is None:
+            self.__csr = _histo_get_csr(self.__lut, int(np.prod(self.__shape)))
+        return self.__csr
 
     def histo(self, copy=True):
         """
@@ -514,14 +686,11 @@ class HistogramndLut(object):
         if self.__dtype is None:
             self.__dtype = weights.dtype
 
-        histo, w_histo = _histo_from_lut(weights,
-                                         self.__lut,
-                                         histo=self.__histo,
-                                         weighted_histo=self.__weighted_histo,
-                                         shape=self.__shape,
-                                         dtype=self.__dtype,
-                                         weight_min=weight_min,
-                                         weight_max=weight_max)
+        histo, w_histo = self.__apply(weights,
+                                      histo=self.__histo,
+                                      weighted_histo=self.__weighted_histo,
+                                      weight_min=weight_min,
+                                      weight_max=weight_max)
 
         if self.__histo is None:
             self.__histo = histo
@@ -578,16 +747,112 @@ class HistogramndLut(object):
                 as *weights*.
         :type weight_max: *optional*, scalar
         """
-        histo, w_histo = _histo_from_lut(weights,
-                                         self.__lut,
-                                         histo=histo,
-                                         weighted_histo=weighted_histo,
-                                         shape=self.__shape,
-                                         dtype=self.__dtype,
-                                         weight_min=weight_min,
-                                         weight_max=weight_max)
+        histo, w_histo = self.__apply(weights,
+                                      histo=histo,
+                                      weighted_histo=weighted_histo,
+                                      weight_min=weight_min,
+                                      weight_max=weight_max)
         self.__dtype = w_histo.dtype
         return histo, w_histo
 
+    def apply_lut_batch(self,
+                        weights,
+                        weight_min=None,
+                        weight_max=None):
+        """
+        Computes the multidimensional histograms of a batch of weights in a
+        single call and returns the result (it is NOT added to the current
+        histogram stored by this instance).
+
+        With the 'dense' LUT format, the frames are processed in parallel.
+        With the 'csr' LUT format, the bins are processed in parallel.
+
+        :param weights:
+            A (n_frames, ...) numpy array, each frame containing the values
+            associated with each sample.
+        :type weights: :class:`numpy.array`
+
+        :param weight_min:
+            Use this parameter to filter out all samples whose
+            weights are lower than this value.
+        :type weight_min: *optional*, scalar
+
+        :param weight_max:
+            Use this parameter to filter out all samples whose
+            weights are higher than this value.
+        :type weight_max: *optional*, scalar
+
+        :return: The histograms and weighted histograms of shape
+            (n_frames, *n_bins)
+        :rtype: tuple : (:class:`numpy.array`, :class:`numpy.array`)
+        """
+        weights = np.asarray(weights)
+        n_frames = len(weights)
+        weights = weights.reshape(n_frames, -1)
+        if weights.shape[1] != self.__n_weights:
+            raise ValueError('Each frame of <weights> must have {0} '
+                             'elements.'.format(self.__n_weights))
+
+        if self.__lut_format == 'dense':
+            histo, w_histo = _histo_from_lut_batch(weights,
+                                                   self.__lut,
+                                                   int(np.prod(self.__shape)),
+                                                   dtype=self.__dtype,
+                                                   weight_min=weight_min,
+                                                   weight_max=weight_max)
+        else:
+            indptr, indices, coefficients = self.__csr
+            histo, w_histo = _histo_from_csr(weights,
+                                             indptr,
+                                             indices,
+                                             coefficients,
+                                             dtype=self.__dtype,
+                                             weight_min=weight_min,
+                                             weight_max=weight_max)
+        shape = (n_frames,) + tuple(self.__shape)
+        return histo.reshape(shape), w_histo.reshape(shape)
+
+    def __apply(self, weights, histo, weighted_histo, weight_min, weight_max):
+        """Computes the histograms of weights with the LUT in its format"""
+        if self.__lut_format == 'dense':
+            return _histo_from_lut(weights,
+                                   self.__lut,
+                                   histo=histo,
+                                   weighted_histo=weighted_histo,
+                                   shape=self.__shape,
+                                   dtype=self.__dtype,
+                                   weight_min=weight_min,
+                                   weight_max=weight_max)
+
+        if weights.size != self.__n_weights:
+            raise ValueError('The LUT and weights arrays must have the same '
+                             'number of elements.')
+        for array in (histo, weighted_histo):
+            if array is not None and (
+                    tuple(array.shape) != tuple(self.__shape) or
+                    not array.flags['C_CONTIGUOUS']):
+                raise ValueError('Provided histogram arrays must be '
+                                 'C_CONTIGUOUS arrays of shape '
+                                 '{0}.'.format(self.__shape))
+
+        indptr, indices, coefficients = self.__csr
+        result = _histo_from_csr(
+            weights.reshape(1, -1),
+            indptr,
+            indices,
+            coefficients,
+            histo=None if histo is None else histo.reshape(1, -1),
+            weighted_histo=(None if weighted_histo is None
+                            else weighted_histo.reshape(1, -1)),
+            dtype=self.__dtype,
+            weight_min=weight_min,
+            weight_max=weight_max)
+        # Returns the provided arrays rather than the 2D views
+        if histo is None:
+            histo = result[0].reshape(self.__shape)
+        if weighted_histo is None:
+            weighted_histo = result[1].reshape(self.__shape)
+        return histo, weighted_histo
+
 if __name__ == '__main__':
     pass
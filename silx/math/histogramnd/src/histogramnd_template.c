@@ -28,126 +28,60 @@
 #include <math.h>
 #include <stdarg.h>
 
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
 #ifdef HISTO_SAMPLE_T
 #ifdef HISTO_WEIGHT_T
 #ifdef HISTO_CUMUL_T
 
-int TEMPLATE(histogramnd, HISTO_SAMPLE_T, HISTO_WEIGHT_T, HISTO_CUMUL_T)
+/* Fills o_histo and o_cumul with the elements [i_elem_start, i_elem_end[
+ * of i_sample.
+ * o_histo and o_cumul may be null, o_cumul must be null if i_weights is.
+ */
+static void TEMPLATE(histogramnd_range, HISTO_SAMPLE_T, HISTO_WEIGHT_T, HISTO_CUMUL_T)
                         (HISTO_SAMPLE_T *i_sample,
                          HISTO_WEIGHT_T *i_weights,
                          int i_n_dim,
-                         int i_n_elem,
-                         double *i_bin_ranges,
+                         long i_elem_start,
+                         long i_elem_end,
+                         double *g_min,
+                         double *g_max,
+                         double *range,
                          int *i_n_bins,
                          uint32_t *o_histo,
                          HISTO_CUMUL_T *o_cumul,
-                         double *o_bin_edges,
-                         int i_opt_flags,
+                         int filt_min_weight,
+                         int filt_max_weight,
+                         int last_bin_closed,
                          HISTO_WEIGHT_T i_weight_min,
                          HISTO_WEIGHT_T i_weight_max)
 {
-    /* some counters */
-    int i = 0, j = 0;
+    int i = 0;
     long elem_idx = 0;
-    
+    long elem_end = i_elem_end * i_n_dim;
+
     HISTO_WEIGHT_T * weight_ptr = 0;
     HISTO_SAMPLE_T elem_coord = 0.;
-    
+
     /* computed bin index (i_sample -> grid) */
     long bin_idx = 0;
-    
-    double * g_min = 0;
-    double * g_max = 0;
-    double * range = 0;
-    
-    /* ================================
-     * Parsing options, if any.
-     * ================================
-     */
-    
-    int filt_min_weight = 0;
-    int filt_max_weight = 0;
-    int last_bin_closed = 0;
-    
-    /* Testing the option flags */
-    if(i_opt_flags & HISTO_WEIGHT_MIN)
-    {
-        filt_min_weight = 1;
-    }
-        
-    if(i_opt_flags & HISTO_WEIGHT_MAX)
-    {
-        filt_max_weight = 1;
-    }
-        
-    if(i_opt_flags & HISTO_LAST_BIN_CLOSED)
-    {
-        last_bin_closed = 1;
-    }
-    
-    /* storing the min & max bin coordinates in their own arrays because
-     * i_bin_ranges = [[min0, max0], [min1, max1], ...]
-     * (mostly for the sake of clarity)
-     * (maybe faster access too?)
-     */
-    g_min = (double *) malloc(i_n_dim *sizeof(double));
-    g_max = (double *) malloc(i_n_dim * sizeof(double));
-    /* range used to convert from i_coords to bin indices in the grid */
-    range = (double *) malloc(i_n_dim * sizeof(double));
-            
-    if(!g_min || !g_max || !range)
-    {
-        free(g_min);
-        free(g_max);
-        free(range);
-        return HISTO_ERR_ALLOC;
-    }
-    
-    j = 0;
-    for(i=0; i<i_n_dim; i++)
-    {
-        g_min[i] = i_bin_ranges[i*2];
-        g_max[i] = i_bin_ranges[i*2+1];
-        range[i] = g_max[i]-g_min[i];
-        
-        for(bin_idx=0; bin_idx<i_n_bins[i]; j++, bin_idx++)
-        {
-            o_bin_edges[j] = g_min[i] +
-                            bin_idx * (range[i] / i_n_bins[i]);
-        }
-        o_bin_edges[j++] = g_max[i];
-    }
-    
-    weight_ptr = i_weights;
-    
-    if(!i_weights)
-    {
-        /* if weights are not provided there no point in trying to filter them
-         * (!! careful if you change this, some code below relies on it !!)
-         */
-        filt_min_weight = 0;
-        filt_max_weight = 0;
-        
-        /* If the weights array is not provided then there is no point
-         * updating the weighted histogram, only the bin counts (o_histo)
-         * will be filled.
-         * (!! careful if you change this, some code below relies on it !!)
-         */
-        o_cumul = 0;
-    }
-    
+
+    weight_ptr = i_weights ? i_weights + i_elem_start : 0;
+
     /* tried to use pointers instead of indices here, but it didn't
      * seem any faster (probably because the compiler 
      * optimizes stuff anyway),
      * so i'm keeping the "indices" version, for the sake of clarity
     */
-    for(elem_idx=0;
-        elem_idx<i_n_elem*i_n_dim;
+    for(elem_idx=i_elem_start*i_n_dim;
+        elem_idx<elem_end;
         elem_idx+=i_n_dim, weight_ptr++)
     {
         /* no testing the validity of weight_ptr here, because if it is NULL
          * then filt_min_weight/filt_max_weight will be 0.
-         * (see code above)
+         * (see histogramnd)
          */
         if(filt_min_weight && *weight_ptr<i_weight_min)
         {
@@ -242,7 +176,195 @@ int TEMPLATE(histogramnd, HISTO_SAMPLE_T, HISTO_WEIGHT_T, HISTO_CUMUL_T)
             o_cumul[bin_idx] += (HISTO_CUMUL_T) *weight_ptr;
         }
         
-    } /* for(elem_idx=0; elem_idx<i_n_elem*i_n_dim; elem_idx+=i_n_dim) */
+    } /* for(elem_idx=...; elem_idx<elem_end; elem_idx+=i_n_dim) */
+}
+
+int TEMPLATE(histogramnd, HISTO_SAMPLE_T, HISTO_WEIGHT_T, HISTO_CUMUL_T)
+                        (HISTO_SAMPLE_T *i_sample,
+                         HISTO_WEIGHT_T *i_weights,
+                         int i_n_dim,
+                         int i_n_elem,
+                         double *i_bin_ranges,
+                         int *i_n_bins,
+                         uint32_t *o_histo,
+                         HISTO_CUMUL_T *o_cumul,
+                         double *o_bin_edges,
+                         int i_opt_flags,
+                         HISTO_WEIGHT_T i_weight_min,
+                         HISTO_WEIGHT_T i_weight_max,
+                         int i_n_threads)
+{
+    /* some counters */
+    int i = 0, j = 0;
+    
+    /* computed bin index (i_sample -> grid) */
+    long bin_idx = 0;
+    
+    double * g_min = 0;
+    double * g_max = 0;
+    double * range = 0;
+
+    /* per-thread histograms, for all threads but the first one */
+    long n_histo_bins = 1;
+    uint32_t * thread_histo = 0;
+    HISTO_CUMUL_T * thread_cumul = 0;
+    
+    /* ================================
+     * Parsing options, if any.
+     * ================================
+     */
+    
+    int filt_min_weight = 0;
+    int filt_max_weight = 0;
+    int last_bin_closed = 0;
+    
+    /* Testing the option flags */
+    if(i_opt_flags & HISTO_WEIGHT_MIN)
+    {
+        filt_min_weight = 1;
+    }
+        
+    if(i_opt_flags & HISTO_WEIGHT_MAX)
+    {
+        filt_max_weight = 1;
+    }
+        
+    if(i_opt_flags & HISTO_LAST_BIN_CLOSED)
+    {
+        last_bin_closed = 1;
+    }
+    
+    /* storing the min & max bin coordinates in their own arrays because
+     * i_bin_ranges = [[min0, max0], [min1, max1], ...]
+     * (mostly for the sake of clarity)
+     * (maybe faster access too?)
+     */
+    g_min = (double *) malloc(i_n_dim *sizeof(double));
+    g_max = (double *) malloc(i_n_dim * sizeof(double));
+    /* range used to convert from i_coords to bin indices in the grid */
+    range = (double *) malloc(i_n_dim * sizeof(double));
+            
+    if(!g_min || !g_max || !range)
+    {
+        free(g_min);
+        free(g_max);
+        free(range);
+        return HISTO_ERR_ALLOC;
+    }
+    
+    j = 0;
+    for(i=0; i<i_n_dim; i++)
+    {
+        g_min[i] = i_bin_ranges[i*2];
+        g_max[i] = i_bin_ranges[i*2+1];
+        range[i] = g_max[i]-g_min[i];
+        n_histo_bins *= i_n_bins[i];
+        
+        for(bin_idx=0; bin_idx<i_n_bins[i]; j++, bin_idx++)
+        {
+            o_bin_edges[j] = g_min[i] +
+                            bin_idx * (range[i] / i_n_bins[i]);
+        }
+        o_bin_edges[j++] = g_max[i];
+    }
+    
+    if(!i_weights)
+    {
+        /* if weights are not provided there no point in trying to filter them
+         * (!! careful if you change this, some code below relies on it !!)
+         */
+        filt_min_weight = 0;
+        filt_max_weight = 0;
+        
+        /* If the weights array is not provided then there is no point
+         * updating the weighted histogram, only the bin counts (o_histo)
+         * will be filled.
+         * (!! careful if you change this, some code below relies on it !!)
+         */
+        o_cumul = 0;
+    }
+
+#ifdef _OPENMP
+    if(i_n_threads > 1)
+    {
+        /* Each thread but the first one fills its own histograms,
+         * they are summed into the output ones at the end.
+         * Falls back to a single thread if they can't be allocated.
+         */
+        thread_histo = (uint32_t *) calloc((i_n_threads - 1) * n_histo_bins,
+                                           sizeof(uint32_t));
+        if(o_cumul)
+        {
+            thread_cumul = (HISTO_CUMUL_T *) calloc(
+                (i_n_threads - 1) * n_histo_bins, sizeof(HISTO_CUMUL_T));
+        }
+        if(!thread_histo || (o_cumul && !thread_cumul))
+        {
+            free(thread_histo);
+            free(thread_cumul);
+            thread_histo = 0;
+            thread_cumul = 0;
+        }
+    }
+
+    if(thread_histo)
+    {
+        #pragma omp parallel num_threads(i_n_threads)
+        {
+            int thread_id = omp_get_thread_num();
+            int n_threads = omp_get_num_threads();
+            long chunk_size = ((long) i_n_elem + n_threads - 1) / n_threads;
+            long elem_start = thread_id * chunk_size;
+            long elem_end = elem_start + chunk_size;
+            long idx = 0;
+            int t = 0;
+
+            if(elem_end > i_n_elem)
+            {
+                elem_end = i_n_elem;
+            }
+            if(elem_start < elem_end)
+            {
+                TEMPLATE(histogramnd_range, HISTO_SAMPLE_T, HISTO_WEIGHT_T, HISTO_CUMUL_T)
+                    (i_sample, i_weights, i_n_dim, elem_start, elem_end,
+                     g_min, g_max, range, i_n_bins,
+                     thread_id ? thread_histo + (thread_id - 1) * n_histo_bins : o_histo,
+                     o_cumul && thread_id ? thread_cumul + (thread_id - 1) * n_histo_bins : o_cumul,
+                     filt_min_weight, filt_max_weight, last_bin_closed,
+                     i_weight_min, i_weight_max);
+            }
+
+            #pragma omp barrier
+
+            /* reduction, in the same thread order for all bins */
+            #pragma omp for
+            for(idx=0; idx<n_histo_bins; idx++)
+            {
+                for(t=0; t<n_threads-1; t++)
+                {
+                    if(o_histo)
+                    {
+                        o_histo[idx] += thread_histo[t * n_histo_bins + idx];
+                    }
+                    if(o_cumul)
+                    {
+                        o_cumul[idx] += thread_cumul[t * n_histo_bins + idx];
+                    }
+                }
+            }
+        }
+        free(thread_histo);
+        free(thread_cumul);
+    }
+    else
+#endif
+    {
+        TEMPLATE(histogramnd_range, HISTO_SAMPLE_T, HISTO_WEIGHT_T, HISTO_CUMUL_T)
+            (i_sample, i_weights, i_n_dim, 0, i_n_elem,
+             g_min, g_max, range, i_n_bins, o_histo, o_cumul,
+             filt_min_weight, filt_max_weight, last_bin_closed,
+             i_weight_min, i_weight_max);
+    }
     
     free(g_min);
     free(g_max);
@@ -55,7 +55,8 @@ cdef extern from "histogramnd_c.h":
                                          double * bin_edges,
                                          int i_opt_flags,
                                          double i_weight_min,
-                                         double i_weight_max) nogil
+                                         double i_weight_max,
+                                         int i_n_threads) nogil
 
     int histogramnd_double_float_double(double *i_sample,
                                         float *i_weigths,
@@ -68,7 +69,8 @@ cdef extern from "histogramnd_c.h":
                                         double * bin_edges,
                                         int i_opt_flags,
                                         float i_weight_min,
-                                        float i_weight_max) nogil
+                                        float i_weight_max,
+                                        int i_n_threads) nogil
 
     int histogramnd_double_int32_t_double(double *i_sample,
                                           cnumpy.int32_t *i_weigths,
@@ -81,7 +83,8 @@ cdef extern from "histogramnd_c.h":
                                           double * bin_edges,
                                           int i_opt_flags,
                                           cnumpy.int32_t i_weight_min,
-                                          cnumpy.int32_t i_weight_max) nogil
+                                          cnumpy.int32_t i_weight_max,
+                                          int i_n_threads) nogil
 
     # =====================
     # float sample, double cumul
@@ -98,7 +101,8 @@ cdef extern from "histogramnd_c.h":
                                         double * bin_edges,
                                         int i_opt_flags,
                                         double i_weight_min,
-                                        double i_weight_max) nogil
+                                        double i_weight_max,
+                                        int i_n_threads) nogil
 
     int histogramnd_float_float_double(float *i_sample,
                                        float *i_weigths,
@@ -111,7 +115,8 @@ cdef extern from "histogramnd_c.h":
                                        double * bin_edges,
                                        int i_opt_flags,
                                        float i_weight_min,
-                                       float i_weight_max) nogil
+                                       float i_weight_max,
+                                       int i_n_threads) nogil
 
     int histogramnd_float_int32_t_double(float *i_sample,
                                          cnumpy.int32_t *i_weigths,
@@ -124,7 +129,8 @@ cdef extern from "histogramnd_c.h":
                                          double * bin_edges,
                                          int i_opt_flags,
                                          cnumpy.int32_t i_weight_min,
-                                         cnumpy.int32_t i_weight_max) nogil
+                                         cnumpy.int32_t i_weight_max,
+                                         int i_n_threads) nogil
 
     # =====================
     # numpy.int32_t sample, double cumul
@@ -141,7 +147,8 @@ cdef extern from "histogramnd_c.h":
                                           double * bin_edges,
                                           int i_opt_flags,
                                           double i_weight_min,
-                                          double i_weight_max) nogil
+                                          double i_weight_max,
+                                          int i_n_threads) nogil
 
     int histogramnd_int32_t_float_double(cnumpy.int32_t *i_sample,
                                          float *i_weigths,
@@ -154,7 +161,8 @@ cdef extern from "histogramnd_c.h":
                                          double * bin_edges,
                                          int i_opt_flags,
                                          float i_weight_min,
-                                         float i_weight_max) nogil
+                                         float i_weight_max,
+                                         int i_n_threads) nogil
 
     int histogramnd_int32_t_int32_t_double(cnumpy.int32_t *i_sample,
                                            cnumpy.int32_t *i_weigths,
@@ -167,7 +175,8 @@ cdef extern from "histogramnd_c.h":
                                            double * bin_edges,
                                            int i_opt_flags,
                                            cnumpy.int32_t i_weight_min,
-                                           cnumpy.int32_t i_weight_max) nogil
+                                           cnumpy.int32_t i_weight_max,
+                                           int i_n_threads) nogil
 
     # =====================
     # double sample, float cumul
@@ -184,7 +193,8 @@ cdef extern from "histogramnd_c.h":
                                         double * bin_edges,
                                         int i_opt_flags,
                                         double i_weight_min,
-                                        double i_weight_max) nogil
+                                        double i_weight_max,
+                                        int i_n_threads) nogil
 
     int histogramnd_double_float_float(double *i_sample,
                                        float *i_weigths,
@@ -197,7 +207,8 @@ cdef extern from "histogramnd_c.h":
                                        double * bin_edges,
                                        int i_opt_flags,
                                        float i_weight_min,
-                                       float i_weight_max) nogil
+                                       float i_weight_max,
+                                       int i_n_threads) nogil
 
     int histogramnd_double_int32_t_float(double *i_sample,
                                          cnumpy.int32_t *i_weigths,
@@ -210,7 +221,8 @@ cdef extern from "histogramnd_c.h":
                                          double * bin_edges,
                                          int i_opt_flags,
                                          cnumpy.int32_t i_weight_min,
-                                         cnumpy.int32_t i_weight_max) nogil
+                                         cnumpy.int32_t i_weight_max,
+                                         int i_n_threads) nogil
 
     # =====================
     # float sample, float cumul
@@ -227,7 +239,8 @@ cdef extern from "histogramnd_c.h":
                                        double * bin_edges,
                                        int i_opt_flags,
                                        double i_weight_min,
-                                       double i_weight_max) nogil
+                                       double i_weight_max,
+                                       int i_n_threads) nogil
 
     int histogramnd_float_float_float(float *i_sample,
                                       float *i_weigths,
@@ -240,7 +253,8 @@ cdef extern from "histogramnd_c.h":
                                       double * bin_edges,
                                       int i_opt_flags,
                                       float i_weight_min,
-                                      float i_weight_max) nogil
+                                      float i_weight_max,
+                                      int i_n_threads) nogil
 
     int histogramnd_float_int32_t_float(float *i_sample,
                                         cnumpy.int32_t *i_weigths,
@@ -253,7 +267,8 @@ cdef extern from "histogramnd_c.h":
                                         double * bin_edges,
                                         int i_opt_flags,
                                         cnumpy.int32_t i_weight_min,
-                                        cnumpy.int32_t i_weight_max) nogil
+                                        cnumpy.int32_t i_weight_max,
+                                        int i_n_threads) nogil
 
     # =====================
     # numpy.int32_t sample, float cumul
@@ -270,7 +285,8 @@ cdef extern from "histogramnd_c.h":
                                          double * bin_edges,
                                          int i_opt_flags,
                                          double i_weight_min,
-                                         double i_weight_max) nogil
+                                         double i_weight_max,
+                                         int i_n_threads) nogil
 
     int histogramnd_int32_t_float_float(cnumpy.int32_t *i_sample,
                                         float *i_weigths,
@@ -283,7 +299,8 @@ cdef extern from "histogramnd_c.h":
                                         double * bin_edges,
                                         int i_opt_flags,
                                         float i_weight_min,
-                                        float i_weight_max) nogil
+                                        float i_weight_max,
+                                        int i_n_threads) nogil
 
     int histogramnd_int32_t_int32_t_float(cnumpy.int32_t *i_sample,
                                           cnumpy.int32_t *i_weigths,
@@ -296,4 +313,5 @@ cdef extern from "histogramnd_c.h":
                                           double * bin_edges,
                                           int i_opt_flags,
                                           cnumpy.int32_t i_weight_min,
-                                          cnumpy.int32_t i_weight_max) nogil
+                                          cnumpy.int32_t i_weight_max,
+                                          int i_n_threads) nogil
@@ -35,6 +35,8 @@
 #include <iostream>
 #include <cmath>
 #include <cfloat>
+#include <limits>
+#include <cstddef>
 
 /* Needed for pytohn2.7 on Windows... */
 #ifndef INFINITY
@@ -93,8 +95,8 @@ inline T median(std::vector<T>& v, int window_size) {
 
 
 // return the index into 0, (length_max - 1) in reflect mode
-inline int reflect(int index, int length_max){
-    int res = index;
+inline std::ptrdiff_t reflect(std::ptrdiff_t index, std::ptrdiff_t length_max){
+    std::ptrdiff_t res = index;
     // if the index is negative get the positive symmetrical value
     if(res < 0){
         res += 1;
@@ -110,17 +112,17 @@ inline int reflect(int index, int length_max){
 }
 
 // return the index into 0, (length_max - 1) in mirror mode
-inline int mirror(int index, int length_max){
-    int res = index;
+inline std::ptrdiff_t mirror(std::ptrdiff_t index, std::ptrdiff_t length_max){
+    std::ptrdiff_t res = index;
     // if the index is negative get the positive symmetrical value
     if(res < 0){
         res = -res;
     }
-    int rightLimit = length_max -1;
+    std::ptrdiff_t rightLimit = length_max -1;
     // apply the redundancy each two right limit
     res = res % (2*rightLimit);
     if(res >= length_max){
-        int distToRedundancy = (2*rightLimit) - res;
+        std::ptrdiff_t distToRedundancy = (2*rightLimit) - res;
         res = distToRedundancy;
     }
     return res;
@@ -141,114 +143,132 @@ template<>
 inline double NotANumber<double>(void) { return NAN; }
 
 
-// Browse the column of pixel_x
+// return the index into [0, length-1] of a window index depending on the
+// mode, or -1 if it is outside of the data (shrink and constant modes)
+inline std::ptrdiff_t map_index(std::ptrdiff_t index, std::ptrdiff_t length, MODE mode){
+    if(index >= 0 && index < length){
+        return index;
+    }
+    switch(mode){
+        case NEAREST:
+            return std::min(std::max(index, static_cast<std::ptrdiff_t>(0)), length - 1);
+        case REFLECT:
+            return reflect(index, length);
+        case MIRROR:
+            // deal with dimensions of length 1
+            return (length == 1) ? 0 : mirror(index, length);
+        default:
+            return -1;
+    }
+}
+
+// Read the value of a window element, handling borders depending on the mode.
+// Returns false if the element must be ignored (shrink mode).
+template<typename T>
+inline bool get_value(
+    const T* input,
+    std::ptrdiff_t* image_dim,
+    std::ptrdiff_t win_z,
+    std::ptrdiff_t win_y,
+    std::ptrdiff_t win_x,
+    MODE mode,
+    T cval,
+    T& value) {
+
+    std::ptrdiff_t index_z = map_index(win_z, image_dim[0], mode);
+    std::ptrdiff_t index_y = map_index(win_y, image_dim[1], mode);
+    std::ptrdiff_t index_x = map_index(win_x, image_dim[2], mode);
+    if (index_z < 0 || index_y < 0 || index_x < 0) {
+        if (mode == CONSTANT) {
+            value = cval;
+            return true;
+        }
+        return false;
+    }
+    value = input[(index_z*image_dim[1] + index_y)*image_dim[2] + index_x];
+    return true;
+}
+
+
+// Browse the row y_pixel of the frame z_pixel
 template<typename T>
 void median_filter(
     const T* input,
     T* output,
-    int* kernel_dim,        // two values : 0:width, 1:height
-    int* image_dim,         // two values : 0:width, 1:height
-    int y_pixel,            // the x pixel to process
-    int x_pixel_range_min,
-    int x_pixel_range_max,
+    int* kernel_dim,        // three values : 0:depth, 1:height, 2:width
+    std::ptrdiff_t* image_dim,  // three values : 0:depth, 1:height, 2:width
+    std::ptrdiff_t z_pixel,     // the frame to process
+    std::ptrdiff_t y_pixel,     // the row to process
+    std::ptrdiff_t x_pixel_range_min,
+    std::ptrdiff_t x_pixel_range_max,
     bool conditional,
     int pMode,
     T cval) {
-    
+
     assert(kernel_dim[0] > 0);
     assert(kernel_dim[1] > 0);
-    assert(y_pixel >= 0);
+    assert(kernel_dim[2] > 0);
     assert(image_dim[0] > 0);
     assert(image_dim[1] > 0);
+    assert(image_dim[2] > 0);
+    assert(z_pixel >= 0);
+    assert(z_pixel < image_dim[0]);
     assert(y_pixel >= 0);
-    assert(y_pixel < image_dim[0]);
-    assert(x_pixel_range_max < image_dim[1]);
+    assert(y_pixel < image_dim[1]);
+    assert(x_pixel_range_max < image_dim[2]);
     assert(x_pixel_range_min <= x_pixel_range_max);
     // kernel odd assertion
     assert((kernel_dim[0] - 1)%2 == 0);
     assert((kernel_dim[1] - 1)%2 == 0);
+    assert((kernel_dim[2] - 1)%2 == 0);
 
     // # this should be move up to avoid calculation each time
-    int halfKernel_x = (kernel_dim[1] - 1) / 2;
-    int halfKernel_y = (kernel_dim[0] - 1) / 2;
+    int halfKernel_x = (kernel_dim[2] - 1) / 2;
+    int halfKernel_y = (kernel_dim[1] - 1) / 2;
+    int halfKernel_z = (kernel_dim[0] - 1) / 2;
 
     MODE mode = static_cast<MODE>(pMode);
 
     // init buffer
-    std::vector<T> window_values(kernel_dim[0]*kernel_dim[1]);
+    std::vector<T> window_values(kernel_dim[0]*kernel_dim[1]*kernel_dim[2]);
+
+    bool not_border_row = (
+        y_pixel >= halfKernel_y && y_pixel < image_dim[1] - halfKernel_y &&
+        z_pixel >= halfKernel_z && z_pixel < image_dim[0] - halfKernel_z);
 
-    bool not_horizontal_border = (y_pixel >= halfKernel_y && y_pixel < image_dim[0] - halfKernel_y);
+    const std::ptrdiff_t row_offset = (z_pixel*image_dim[1] + y_pixel)*image_dim[2];
 
-    for(int x_pixel=x_pixel_range_min; x_pixel <= x_pixel_range_max; x_pixel ++ ){
+    for(std::ptrdiff_t x_pixel=x_pixel_range_min; x_pixel <= x_pixel_range_max; x_pixel ++ ){
         typename std::vector<T>::iterator it = window_values.begin();
         // fill the vector
 
-        if (not_horizontal_border &&
-            x_pixel >= halfKernel_x && x_pixel < image_dim[1] - halfKernel_x) {
+        if (not_border_row &&
+            x_pixel >= halfKernel_x && x_pixel < image_dim[2] - halfKernel_x) {
             //This is not a border, just fill it
-            for(int win_y=y_pixel-halfKernel_y; win_y<= y_pixel+halfKernel_y; win_y++) {
-                for(int win_x = x_pixel-halfKernel_x; win_x <= x_pixel+halfKernel_x; win_x++){
-                    T value = input[win_y*image_dim[1] + win_x];
-                    if (value == value) {  // Ignore NaNs
-                        *it = value;
-                        ++it;
+            for(std::ptrdiff_t win_z=z_pixel-halfKernel_z; win_z<= z_pixel+halfKernel_z; win_z++) {
+                for(std::ptrdiff_t win_y=y_pixel-halfKernel_y; win_y<= y_pixel+halfKernel_y; win_y++) {
+                    const T* line = input + (win_z*image_dim[1] + win_y)*image_dim[2];
+                    for(std::ptrdiff_t win_x = x_pixel-halfKernel_x; win_x <= x_pixel+halfKernel_x; win_x++){
+                        T value = line[win_x];
+                        if (value == value) {  // Ignore NaNs
+                            *it = value;
+                            ++it;
+                        }
                     }
                 }
             }
 
         } else { // This is a border, handle the special case
-            for(int win_y=y_pixel-halfKernel_y; win_y<= y_pixel+halfKernel_y; win_y++)
-            {
-                for(int win_x = x_pixel-halfKernel_x; win_x <= x_pixel+halfKernel_x; win_x++)
-                {
-                    T value = 0;
-                    int index_x = win_x;
-                    int index_y = win_y;
-
-                    switch(mode){
-                        case NEAREST:
-                            index_x = std::min(std::max(win_x, 0), image_dim[1] - 1);
-                            index_y = std::min(std::max(win_y, 0), image_dim[0] - 1);
-                            value = input[index_y*image_dim[1] + index_x];
-                            break;
-
-                        case REFLECT:
-                            index_x = reflect(win_x, image_dim[1]);
-                            index_y = reflect(win_y, image_dim[0]);
-                            value = input[index_y*image_dim[1] + index_x];
-                            break;
-
-                        case MIRROR:
-                            index_x = mirror(win_x, image_dim[1]);
-                            // deal with 1d case
-                            if(win_y == 0 && image_dim[0] == 1){
-                                index_y = 0;
-                            }else{
-                                index_y = mirror(win_y, image_dim[0]);
-                            }
-                            value = input[index_y*image_dim[1] + index_x];
-                            break;
-
-                        case SHRINK:
-                            if ((index_x < 0) || (index_x > image_dim[1] -1) ||
-                                (index_y < 0) || (index_y > image_dim[0] -1)) {
-                                continue;
-                            }
-                            value = input[index_y*image_dim[1] + index_x];
-                            break;
-                        case CONSTANT:
-                            if ((index_x < 0) || (index_x > image_dim[1] -1) ||
-                                (index_y < 0) || (index_y > image_dim[0] -1)) {
-                                value = cval;
-                            } else {
-                                value = input[index_y*image_dim[1] + index_x];
-                            }
-                            break;
-                    }
-
-                    if (value == value) {  // Ignore NaNs
-                        *it = value;
-                        ++it;
+            for(std::ptrdiff_t win_z=z_pixel-halfKernel_z; win_z<= z_pixel+halfKernel_z; win_z++) {
+                for(std::ptrdiff_t win_y=y_pixel-halfKernel_y; win_y<= y_pixel+halfKernel_y; win_y++) {
+                    for(std::ptrdiff_t win_x = x_pixel-halfKernel_x; win_x <= x_pixel+halfKernel_x; win_x++){
+                        T value = 0;
+                        if (get_value(input, image_dim, win_z, win_y, win_x,
+                                      mode, cval, value) &&
+                                value == value) {  // Ignore NaNs
+                            *it = value;
+                            ++it;
+                        }
                     }
                 }
             }
@@ -259,10 +279,10 @@ void median_filter(
 
         if (window_size == 0) {
             // Window is empty, this is the case when all values are NaNs
-            output[image_dim[1]*y_pixel + x_pixel] = NotANumber<T>();
+            output[row_offset + x_pixel] = NotANumber<T>();
         } else {
             // apply the median value if needed for this pixel
-            const T currentPixelValue = input[image_dim[1]*y_pixel + x_pixel];
+            const T currentPixelValue = input[row_offset + x_pixel];
             if (conditional == true){
                 typename std::vector<T>::iterator window_end = window_values.begin() + window_size;
                 T min = 0;
@@ -270,12 +290,245 @@ void median_filter(
                 getMinMax(window_values, min, max, window_end);
                 // NaNs are propagated through unchanged
                 if ((currentPixelValue == max) || (currentPixelValue == min)){
-                    output[image_dim[1]*y_pixel + x_pixel] = median<T>(window_values, window_size);
+                    output[row_offset + x_pixel] = median<T>(window_values, window_size);
                 }else{
-                    output[image_dim[1]*y_pixel + x_pixel] = currentPixelValue;
+                    output[row_offset + x_pixel] = currentPixelValue;
+                }
+            }else{
+                output[row_offset + x_pixel] = median<T>(window_values, window_size);
+            }
+        }
+    }
+}
+
+
+// Add (weight=1) or remove (weight=-1) a column of the window to the
+// histogram used by median_filter_histogram.
+template<typename T>
+inline void update_histogram(
+    const T* input,
+    std::ptrdiff_t* image_dim,
+    int* half_kernel,       // three values : 0:depth, 1:height, 2:width
+    std::ptrdiff_t z_pixel,
+    std::ptrdiff_t y_pixel,
+    std::ptrdiff_t win_x,
+    MODE mode,
+    T cval,
+    int weight,
+    std::vector<int>& histogram,
+    int& count,
+    int median_bin,
+    int& lower) {
+
+    const int offset = static_cast<int>(std::numeric_limits<T>::min());
+    for(std::ptrdiff_t win_z=z_pixel-half_kernel[0]; win_z<= z_pixel+half_kernel[0]; win_z++) {
+        for(std::ptrdiff_t win_y=y_pixel-half_kernel[1]; win_y<= y_pixel+half_kernel[1]; win_y++) {
+            T value = 0;
+            if (get_value(input, image_dim, win_z, win_y, win_x,
+                          mode, cval, value)) {
+                const int bin = static_cast<int>(value) - offset;
+                histogram[bin] += weight;
+                count += weight;
+                if (bin < median_bin) {
+                    lower += weight;
+                }
+            }
+        }
+    }
+}
+
+
+// Same as median_filter for 8 and 16 bits integers, but the median is
+// retrieved from a histogram of the window updated while sliding along the
+// row (Huang's algorithm): the cost per pixel is proportional to the height
+// and depth of the kernel instead of its number of elements.
+// Conditional filtering is not supported.
+template<typename T>
+void median_filter_histogram(
+    const T* input,
+    T* output,
+    int* kernel_dim,        // three values : 0:depth, 1:height, 2:width
+    std::ptrdiff_t* image_dim,  // three values : 0:depth, 1:height, 2:width
+    std::ptrdiff_t z_pixel,     // the frame to process
+    std::ptrdiff_t y_pixel,     // the row to process
+    std::ptrdiff_t x_pixel_range_min,
+    std::ptrdiff_t x_pixel_range_max,
+    int pMode,
+    T cval) {
+
+    assert(sizeof(T) <= 2);
+    assert(z_pixel >= 0);
+    assert(z_pixel < image_dim[0]);
+    assert(y_pixel >= 0);
+    assert(y_pixel < image_dim[1]);
+    assert(x_pixel_range_max < image_dim[2]);
+    assert(x_pixel_range_min <= x_pixel_range_max);
+
+    int half_kernel[3];
+    for(int dim = 0; dim < 3; dim++) {
+        assert((kernel_dim[dim] - 1)%2 == 0);
+        half_kernel[dim] = (kernel_dim[dim] - 1) / 2;
+    }
+
+    MODE mode = static_cast<MODE>(pMode);
+
+    const int offset = static_cast<int>(std::numeric_limits<T>::min());
+    std::vector<int> histogram(1 << (8 * sizeof(T)), 0);
+    int count = 0;  // Number of values in the window
+    int median_bin = 0;
+    int lower = 0;  // Number of values in bins lower than median_bin
+
+    const std::ptrdiff_t row_offset = (z_pixel*image_dim[1] + y_pixel)*image_dim[2];
+
+    // Fill the window of the first pixel except its last column
+    for(std::ptrdiff_t win_x = x_pixel_range_min - half_kernel[2];
+            win_x < x_pixel_range_min + half_kernel[2]; win_x++) {
+        update_histogram(input, image_dim, half_kernel, z_pixel, y_pixel,
+                         win_x, mode, cval, 1,
+                         histogram, count, median_bin, lower);
+    }
+
+    for(std::ptrdiff_t x_pixel=x_pixel_range_min; x_pixel <= x_pixel_range_max; x_pixel ++ ){
+        // Slide the window
+        if (x_pixel > x_pixel_range_min) {
+            update_histogram(input, image_dim, half_kernel, z_pixel, y_pixel,
+                             x_pixel - half_kernel[2] - 1, mode, cval, -1,
+                             histogram, count, median_bin, lower);
+        }
+        update_histogram(input, image_dim, half_kernel, z_pixel, y_pixel,
+                         x_pixel + half_kernel[2], mode, cval, 1,
+                         histogram, count, median_bin, lower);
+
+        // Move to the bin of the value of rank count/2, as median() does
+        const int pivot = count / 2;
+        while (lower > pivot) {
+            median_bin--;
+            lower -= histogram[median_bin];
+        }
+        while (lower + histogram[median_bin] <= pivot) {
+            lower += histogram[median_bin];
+            median_bin++;
+        }
+        output[row_offset + x_pixel] = static_cast<T>(median_bin + offset);
+    }
+}
+
+// Replace a value of a sorted window by another one, only moving the
+// values in between
+template<typename T>
+inline void sorted_replace(std::vector<T>& window, T old_value, T new_value){
+    typename std::vector<T>::iterator old_it = std::lower_bound(
+        window.begin(), window.end(), old_value);
+    if (new_value > old_value) {
+        typename std::vector<T>::iterator new_it = std::lower_bound(
+            old_it + 1, window.end(), new_value);
+        std::copy(old_it + 1, new_it, old_it);
+        *(new_it - 1) = new_value;
+    } else if (new_value < old_value) {
+        typename std::vector<T>::iterator new_it = std::upper_bound(
+            window.begin(), old_it, new_value);
+        std::copy_backward(new_it, old_it, old_it + 1);
+        *new_it = new_value;
+    }
+}
+
+
+// Same as median_filter, but the window values are kept sorted while sliding
+// along the row: for each row of the kernel, the value leaving the window is
+// replaced by the entering one.
+// This is faster than sorting each window for wide kernels.
+template<typename T>
+void median_filter_sliding(
+    const T* input,
+    T* output,
+    int* kernel_dim,        // three values : 0:depth, 1:height, 2:width
+    std::ptrdiff_t* image_dim,  // three values : 0:depth, 1:height, 2:width
+    std::ptrdiff_t z_pixel,     // the frame to process
+    std::ptrdiff_t y_pixel,     // the row to process
+    std::ptrdiff_t x_pixel_range_min,
+    std::ptrdiff_t x_pixel_range_max,
+    bool conditional,
+    int pMode,
+    T cval) {
+
+    assert(z_pixel >= 0);
+    assert(z_pixel < image_dim[0]);
+    assert(y_pixel >= 0);
+    assert(y_pixel < image_dim[1]);
+    assert(x_pixel_range_max < image_dim[2]);
+    assert(x_pixel_range_min <= x_pixel_range_max);
+    // kernel odd assertion
+    assert((kernel_dim[0] - 1)%2 == 0);
+    assert((kernel_dim[1] - 1)%2 == 0);
+    assert((kernel_dim[2] - 1)%2 == 0);
+
+    int halfKernel_x = (kernel_dim[2] - 1) / 2;
+    int halfKernel_y = (kernel_dim[1] - 1) / 2;
+    int halfKernel_z = (kernel_dim[0] - 1) / 2;
+
+    MODE mode = static_cast<MODE>(pMode);
+
+    // Sorted values of the window, without NaNs
+    std::vector<T> window;
+    window.reserve(kernel_dim[0]*kernel_dim[1]*kernel_dim[2]);
+
+    const std::ptrdiff_t row_offset = (z_pixel*image_dim[1] + y_pixel)*image_dim[2];
+
+    for(std::ptrdiff_t win_z=z_pixel-halfKernel_z; win_z<= z_pixel+halfKernel_z; win_z++) {
+        for(std::ptrdiff_t win_y=y_pixel-halfKernel_y; win_y<= y_pixel+halfKernel_y; win_y++) {
+            for(std::ptrdiff_t win_x = x_pixel_range_min-halfKernel_x;
+                    win_x <= x_pixel_range_min+halfKernel_x; win_x++){
+                T value = 0;
+                if (get_value(input, image_dim, win_z, win_y, win_x,
+                              mode, cval, value) &&
+                        value == value) {  // Ignore NaNs
+                    window.push_back(value);
                 }
+            }
+        }
+    }
+    std::sort(window.begin(), window.end());
+
+    for(std::ptrdiff_t x_pixel=x_pixel_range_min; x_pixel <= x_pixel_range_max; x_pixel ++ ){
+        if (x_pixel > x_pixel_range_min) {
+            // Slide the window
+            for(std::ptrdiff_t win_z=z_pixel-halfKernel_z; win_z<= z_pixel+halfKernel_z; win_z++) {
+                for(std::ptrdiff_t win_y=y_pixel-halfKernel_y; win_y<= y_pixel+halfKernel_y; win_y++) {
+                    T old_value = 0;
+                    T new_value = 0;
+                    bool has_old = get_value(
+                        input, image_dim, win_z, win_y, x_pixel - halfKernel_x - 1,
+                        mode, cval, old_value) && old_value == old_value;
+                    bool has_new = get_value(
+                        input, image_dim, win_z, win_y, x_pixel + halfKernel_x,
+                        mode, cval, new_value) && new_value == new_value;
+
+                    if (has_old && has_new) {
+                        sorted_replace(window, old_value, new_value);
+                    } else if (has_old) {
+                        window.erase(std::lower_bound(
+                            window.begin(), window.end(), old_value));
+                    } else if (has_new) {
+                        window.insert(std::upper_bound(
+                            window.begin(), window.end(), new_value), new_value);
+                    }
+                }
+            }
+        }
+
+        if (window.empty()) {
+            // Window is empty, this is the case when all values are NaNs
+            output[row_offset + x_pixel] = NotANumber<T>();
+        } else {
+            const T median_value = window[window.size() / 2];
+            const T currentPixelValue = input[row_offset + x_pixel];
+            if (conditional == true &&
+                    currentPixelValue != window.front() &&
+                    currentPixelValue != window.back()){
+                // NaNs are propagated through unchanged
+                output[row_offset + x_pixel] = currentPixelValue;
             }else{
-                output[image_dim[1]*y_pixel + x_pixel] = median<T>(window_values, window_size);
+                output[row_offset + x_pixel] = median_value;
             }
         }
     }
@@ -24,19 +24,44 @@
 # ###########################################################################*/
 
 from libcpp cimport bool
+from libc.stddef cimport ptrdiff_t
 
 # pyx
 cdef extern from "median_filter.hpp":
-    cdef extern void median_filter[T](const T* image, 
+    cdef extern void median_filter[T](const T* image,
                                       T* output,
                                       int* kernel_dim,
-                                      int* image_dim,
-                                      int x_pixel_range_min,
-                                      int x_pixel_range_max,
-                                      int y_pixel_range_min,
-                                      int y_pixel_range_max,
+                                      ptrdiff_t* image_dim,
+                                      ptrdiff_t z_pixel,
+                                      ptrdiff_t y_pixel,
+                                      ptrdiff_t x_pixel_range_min,
+                                      ptrdiff_t x_pixel_range_max,
                                       bool conditional,
+                                      int mode,
                                       T cval) nogil;
 
-    cdef extern int reflect(int index, int length_max);
-    cdef extern int mirror(int index, int length_max);
+    cdef extern void median_filter_histogram[T](const T* image,
+                                                T* output,
+                                                int* kernel_dim,
+                                                ptrdiff_t* image_dim,
+                                                ptrdiff_t z_pixel,
+                                                ptrdiff_t y_pixel,
+                                                ptrdiff_t x_pixel_range_min,
+                                                ptrdiff_t x_pixel_range_max,
+                                                int mode,
+                                                T cval) nogil;
+
+    cdef extern void median_filter_sliding[T](const T* image,
+                                              T* output,
+                                              int* kernel_dim,
+                                              ptrdiff_t* image_dim,
+                                              ptrdiff_t z_pixel,
+                                              ptrdiff_t y_pixel,
+                                              ptrdiff_t x_pixel_range_min,
+                                              ptrdiff_t x_pixel_range_max,
+                                              bool conditional,
+                                              int mode,
+                                              T cval) nogil;
+
+    cdef extern ptrdiff_t reflect(ptrdiff_t index, ptrdiff_t length_max);
+    cdef extern ptrdiff_t mirror(ptrdiff_t index, ptrdiff_t length_max);
@@ -22,7 +22,7 @@
 # THE SOFTWARE.
 #
 # ###########################################################################*/
-"""This module provides median filter function for 1D and 2D arrays.
+"""This module provides median filter function for 1D, 2D and 3D arrays.
 """
 
 __authors__ = ["H. Payno", "J. Kieffer"]
@@ -36,22 +36,48 @@ cimport silx.math.medianfilter.median_filter as median_filter
 import numpy
 cimport numpy as cnumpy
 from libcpp cimport bool
+from libc.stddef cimport ptrdiff_t
+from ...utils._num_threads cimport get_max_num_threads
 
 import numbers
 
-ctypedef unsigned long uint64
-ctypedef unsigned int uint32
-ctypedef unsigned short uint16
+ctypedef fused _number:
+    float
+    double
+    cnumpy.int64_t
+    cnumpy.uint64_t
+    cnumpy.int32_t
+    cnumpy.uint32_t
+    cnumpy.int16_t
+    cnumpy.uint16_t
+    cnumpy.int8_t
+    cnumpy.uint8_t
 
 
 MODES = {'nearest': 0, 'reflect': 1, 'mirror': 2, 'shrink': 3, 'constant': 4}
 
+ALGORITHMS = {'sort': 0, 'histogram': 1, 'sliding': 2}
+
+_HISTOGRAM_MIN_KERNEL_SIZE = {1: 9, 2: 81}
+"""Minimum number of elements of the kernel from which the median of 8 and
+16 bits integers is computed from a sliding histogram, by data item size."""
+
+_SLIDING_MIN_KERNEL_WIDTH = 5
+"""The 'sliding' algorithm is used in 'auto' mode for kernels at least as
+wide as this value + sqrt(kernel depth * kernel height).
+
+Sliding costs a sorted insertion per row of the kernel, so the width
+from which it is faster than sorting each window grows with the height
+of the kernel (see benchmark.py)."""
+
 
 def medfilt1d(data,
               kernel_size=3,
               bool conditional=False,
               mode='nearest',
-              cval=0):
+              cval=0,
+              out=None,
+              algorithm='auto'):
     """Function computing the median filter of the given input.
 
     Behavior at boundaries: the algorithm is reducing the size of the
@@ -73,17 +99,29 @@ def medfilt1d(data,
     :param str mode: the algorithm used to determine how values at borders
         are determined: 'nearest', 'reflect', 'mirror', 'shrink', 'constant'
     :param cval: Value used outside borders in 'constant' mode
+    :param numpy.ndarray out: C-contiguous array of the same shape and type
+        as data where to store the result. Default: a new array.
+    :param str algorithm: How the median of each window is computed:
+
+        - 'auto' (default): Depending on the data type and kernel size
+        - 'sort': Partially sort the values of each window
+        - 'histogram': Slide a histogram of the window along rows.
+          Only for 8 and 16 bits integers without conditional filtering.
+        - 'sliding': Slide a sorted window along rows,
+          faster than 'sort' for wide kernels
 
     :returns: the array with the median value for each pixel.
     """
-    return medfilt(data, kernel_size, conditional, mode, cval)
+    return medfilt(data, kernel_size, conditional, mode, cval, out, algorithm)
 
 
 def medfilt2d(image,
               kernel_size=3,
               bool conditional=False,
               mode='nearest',
-              cval=0):
+              cval=0,
+              out=None,
+              algorithm='auto'):
     """Function computing the median filter of the given input.
     Behavior at boundaries: the algorithm is reducing the size of the
     window/kernel for pixels at boundaries (there is no mirroring).
@@ -105,17 +143,78 @@ def medfilt2d(image,
     :param str mode: the algorithm used to determine how values at borders
         are determined: 'nearest', 'reflect', 'mirror', 'shrink', 'constant'
     :param cval: Value used outside borders in 'constant' mode
+    :param numpy.ndarray out: C-contiguous array of the same shape and type
+        as image where to store the result. Default: a new array.
+    :param str algorithm: How the median of each window is computed:
+
+        - 'auto' (default): Depending on the data type and kernel size
+        - 'sort': Partially sort the values of each window
+        - 'histogram': Slide a histogram of the window along rows.
+          Only for 8 and 16 bits integers without conditional filtering.
+        - 'sliding': Slide a sorted window along rows,
+          faster than 'sort' for wide kernels
 
     :returns: the array with the median value for each pixel.
     """
-    return medfilt(image, kernel_size, conditional, mode, cval)
+    return medfilt(image, kernel_size, conditional, mode, cval, out, algorithm)
+
+
+def medfilt3d(data,
+              kernel_size=3,
+              bool conditional=False,
+              mode='nearest',
+              cval=0,
+              out=None,
+              algorithm='auto'):
+    """Function computing the median filter of the given input.
+    Behavior at boundaries: the algorithm is reducing the size of the
+    window/kernel for pixels at boundaries (there is no mirroring).
+
+    Not-a-Number (NaN) float values are ignored.
+    If the window only contains NaNs, it evaluates to NaN.
+
+    In event of an even number of valid values in the window (either
+    because of NaN values or on image border in shrink mode),
+    the highest of the 2 central sorted values is taken.
+
+    To filter each frame of a stack of images independently, use a kernel of
+    depth 1, e.g. ``kernel_size=(1, 5, 5)``.
+    All frames are filtered in a single call, rows being processed in
+    parallel.
+
+    :param numpy.ndarray data: the array for which we want to apply
+        the median filter. Should be 3d.
+    :param kernel_size: the dimension of the kernel.
+    :type kernel_size: An int or a tuple or a list of
+        (kernel_depth, kernel_height, kernel_width)
+    :param bool conditional: True if we want to apply a conditional median
+        filtering.
+    :param str mode: the algorithm used to determine how values at borders
+        are determined: 'nearest', 'reflect', 'mirror', 'shrink', 'constant'
+    :param cval: Value used outside borders in 'constant' mode
+    :param numpy.ndarray out: C-contiguous array of the same shape and type
+        as data where to store the result. Default: a new array.
+    :param str algorithm: How the median of each window is computed:
+
+        - 'auto' (default): Depending on the data type and kernel size
+        - 'sort': Partially sort the values of each window
+        - 'histogram': Slide a histogram of the window along rows.
+          Only for 8 and 16 bits integers without conditional filtering.
+        - 'sliding': Slide a sorted window along rows,
+          faster than 'sort' for wide kernels
+
+    :returns: the array with the median value for each pixel.
+    """
+    return medfilt(data, kernel_size, conditional, mode, cval, out, algorithm)
 
 
 def medfilt(data,
             kernel_size=3,
             bool conditional=False,
             mode='nearest',
-            cval=0):
+            cval=0,
+            out=None,
+            algorithm='auto'):
     """Function computing the median filter of the given input.
     Behavior at boundaries: the algorithm is reducing the size of the
     window/kernel for pixels at boundaries (there is no mirroring).
@@ -127,16 +226,32 @@ def medfilt(data,
     because of NaN values or on image border in shrink mode),
     the highest of the 2 central sorted values is taken.
 
+    By default, the median of 8 and 16 bits integers is computed from a
+    histogram of the window updated while moving along each row for large
+    kernels, and the values of the window are kept sorted while moving
+    along each row for other types and kernels wide compared to their
+    height.
+
     :param numpy.ndarray data: the array for which we want to apply
-        the median filter. Should be 1d or 2d.
+        the median filter. Should be 1d, 2d or 3d.
     :param kernel_size: the dimension of the kernel.
-    :type kernel_size: For 1D should be an int for 2D should be a tuple or
-        a list of (kernel_height, kernel_width)
+    :type kernel_size: For 1D should be an int for 2D and 3D should be a
+        tuple or a list of the kernel size for each dimension
     :param bool conditional: True if we want to apply a conditional median
         filtering.
     :param str mode: the algorithm used to determine how values at borders
         are determined: 'nearest', 'reflect', 'mirror', 'shrink', 'constant'
     :param cval: Value used outside borders in 'constant' mode
+    :param numpy.ndarray out: C-contiguous array of the same shape and type
+        as data where to store the result. Default: a new array.
+    :param str algorithm: How the median of each window is computed:
+
+        - 'auto' (default): Depending on the data type and kernel size
+        - 'sort': Partially sort the values of each window
+        - 'histogram': Slide a histogram of the window along rows.
+          Only for 8 and 16 bits integers without conditional filtering.
+        - 'sliding': Slide a sorted window along rows,
+          faster than 'sort' for wide kernels
 
     :returns: the array with the median value for each pixel.
     """
@@ -144,9 +259,9 @@ def medfilt(data,
         err = 'Requested mode %s is unknown.' % mode
         raise ValueError(err)
 
-    if data.ndim > 2:
+    if data.ndim > 3:
         raise ValueError(
-            "Invalid data shape. Dimension of the array should be 1 or 2")
+            "Invalid data shape. Dimension of the array should be 1, 2 or 3")
 
     # Handle case of scalar kernel size
     if isinstance(kernel_size, numbers.Integral):
@@ -154,47 +269,51 @@ def medfilt(data,
 
     assert len(kernel_size) == data.ndim
 
-    # Convert 1D arrays to 2D
-    reshaped = False
-    if len(data.shape) == 1:
-        data = data.reshape(1, data.shape[0])
-        kernel_size = [1, kernel_size[0]]
-        reshaped = True
-
-    # simple median filter apply into a 2D buffer
-    output_buffer = numpy.zeros_like(data)
-    check(data, output_buffer)
+    if (data.dtype.kind not in 'fiu' or data.dtype.itemsize not in (1, 2, 4, 8) or
+            (data.dtype.kind == 'f' and data.dtype.itemsize < 4)):
+        raise ValueError("%s type is not managed by the median filter" % data.dtype)
 
-    ker_dim = numpy.array(kernel_size, dtype=numpy.int32)
-
-    if data.dtype == numpy.float64:
-        medfilterfc = _median_filter_float64
-    elif data.dtype == numpy.float32:
-        medfilterfc = _median_filter_float32
-    elif data.dtype == numpy.int64:
-        medfilterfc = _median_filter_int64
-    elif data.dtype == numpy.uint64:
-        medfilterfc = _median_filter_uint64
-    elif data.dtype == numpy.int32:
-        medfilterfc = _median_filter_int32
-    elif data.dtype == numpy.uint32:
-        medfilterfc = _median_filter_uint32
-    elif data.dtype == numpy.int16:
-        medfilterfc = _median_filter_int16
-    elif data.dtype == numpy.uint16:
-        medfilterfc = _median_filter_uint16
+    if out is None:
+        output_buffer = numpy.zeros_like(data)
     else:
-        raise ValueError("%s type is not managed by the median filter" % data.dtype)
+        if numpy.may_share_memory(data, out):
+            raise ValueError('<out> must not share memory with <data>')
+        output_buffer = out
+    check(data, output_buffer)
 
-    medfilterfc(input_buffer=data,
-                output_buffer=output_buffer,
-                kernel_size=ker_dim,
-                conditional=conditional,
-                mode=MODES[mode],
-                cval=cval)
+    # Convert 1D and 2D arrays to 3D
+    shape = (1,) * (3 - data.ndim) + data.shape
+    ker_dim = numpy.array((1,) * (3 - data.ndim) + tuple(kernel_size),
+                          dtype=numpy.int32)
+
+    histogram_available = (
+        not conditional and
+        data.dtype.kind in 'iu' and
+        data.dtype.itemsize in _HISTOGRAM_MIN_KERNEL_SIZE)
+
+    if algorithm == 'auto':
+        if (histogram_available and numpy.prod(ker_dim) >=
+                _HISTOGRAM_MIN_KERNEL_SIZE[data.dtype.itemsize]):
+            algorithm = 'histogram'
+        elif ker_dim[2] >= (_SLIDING_MIN_KERNEL_WIDTH +
+                            numpy.sqrt(ker_dim[0] * ker_dim[1])):
+            algorithm = 'sliding'
+        else:
+            algorithm = 'sort'
+    elif algorithm not in ALGORITHMS:
+        raise ValueError('Requested algorithm %s is unknown.' % algorithm)
+    elif algorithm == 'histogram' and not histogram_available:
+        raise ValueError(
+            "'histogram' algorithm is only available for 8 and 16 bits "
+            "integers without conditional filtering")
 
-    if reshaped:
-        output_buffer.shape = -1  # Convert to 1D array
+    _median_filter(input_buffer=data.reshape(shape),
+                   output_buffer=output_buffer.reshape(shape),
+                   kernel_size=ker_dim,
+                   conditional=conditional,
+                   mode=MODES[mode],
+                   cval=cval,
+                   algorithm=ALGORITHMS[algorithm])
 
     return output_buffer
 
@@ -208,11 +327,11 @@ def check(input_buffer, output_buffer):
     if (output_buffer.flags['C_CONTIGUOUS'] is False):
         raise ValueError('<output_buffer> must be a C_CONTIGUOUS numpy array.')
 
-    if not (len(input_buffer.shape) <= 2):
-        raise ValueError('<input_buffer> dimension must mo higher than 2.')
+    if not (len(input_buffer.shape) <= 3):
+        raise ValueError('<input_buffer> dimension must mo higher than 3.')
 
-    if not (len(output_buffer.shape) <= 2):
-        raise ValueError('<output_buffer> dimension must mo higher than 2.')
+    if not (len(output_buffer.shape) <= 3):
+        raise ValueError('<output_buffer> dimension must mo higher than 3.')
 
     if not(input_buffer.dtype == output_buffer.dtype):
         raise ValueError('input buffer and output_buffer must be of the same type')
@@ -226,7 +345,7 @@ def check(input_buffer, output_buffer):
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.initializedcheck(False)
-def reflect(int index, int length_max):
+def reflect(ptrdiff_t index, ptrdiff_t length_max):
     """find the correct index into [0, length_max-1] for index in reflect mode
 
     :param int index: the index to move into [0, length_max-1] in reflect mode
@@ -239,7 +358,7 @@ def reflect(int index, int length_max):
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.initializedcheck(False)
-def mirror(int index, int length_max):
+def mirror(ptrdiff_t index, ptrdiff_t length_max):
     """find the correct index into [0, length_max-1] for index in mirror mode
 
     :param int index: the index to move into [0, length_max-1] in mirror mode
@@ -252,245 +371,83 @@ def mirror(int index, int length_max):
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.initializedcheck(False)
-def _median_filter_float32(float[:, ::1] input_buffer not None,
-                           float[:, ::1] output_buffer not None,
-                           cnumpy.int32_t[::1] kernel_size not None,
-                           bool conditional,
-                           int mode,
-                           float cval):
-
-    cdef:
-        int y = 0
-        int image_dim = input_buffer.shape[1] - 1
-        int[2] buffer_shape
-    buffer_shape[0] = input_buffer.shape[0]
-    buffer_shape[1] = input_buffer.shape[1]
-
-    for y in prange(input_buffer.shape[0], nogil=True):
-            median_filter.median_filter[float](<float*> & input_buffer[0,0], 
-                                               <float*> & output_buffer[0,0], 
-                                               <int*>& kernel_size[0],
-                                               <int*>buffer_shape,
-                                               y,
-                                               0,
-                                               image_dim,
-                                               conditional,
-                                               mode,
-                                               cval)
-
-
-@cython.cdivision(True)
-@cython.boundscheck(False)
-@cython.wraparound(False)
-@cython.initializedcheck(False)
-def _median_filter_float64(double[:, ::1] input_buffer not None,
-                           double[:, ::1] output_buffer not None,
-                           cnumpy.int32_t[::1] kernel_size not None,
-                           bool conditional,
-                           int mode,
-                           double cval):
-
-    cdef:
-        int y = 0
-        int image_dim = input_buffer.shape[1] - 1
-        int[2] buffer_shape
-    buffer_shape[0] = input_buffer.shape[0]
-    buffer_shape[1] = input_buffer.shape[1]
-
-    for y in prange(input_buffer.shape[0], nogil=True):
-            median_filter.median_filter[double](<double*> & input_buffer[0, 0], 
-                                                <double*> & output_buffer[0, 0], 
-                                                <int*>&kernel_size[0],
-                                                <int*>buffer_shape,
-                                                y,
-                                                0,
-                                                image_dim,
-                                                conditional,
-                                                mode,
-                                                cval)
-
-
-@cython.cdivision(True)
-@cython.boundscheck(False)
-@cython.wraparound(False)
-@cython.initializedcheck(False)
-def _median_filter_int64(cnumpy.int64_t[:, ::1] input_buffer not None,
-                         cnumpy.int64_t[:, ::1] output_buffer not None,
-                         cnumpy.int32_t[::1] kernel_size not None,
-                         bool conditional,
-                         int mode,
-                         cnumpy.int64_t cval):
-
-    cdef:
-        int y = 0
-        int image_dim = input_buffer.shape[1] - 1
-        int[2] buffer_shape
-    buffer_shape[0] = input_buffer.shape[0]
-    buffer_shape[1] = input_buffer.shape[1]
-
-    for y in prange(input_buffer.shape[0], nogil=True):
-            median_filter.median_filter[long](<long*> & input_buffer[0,0], 
-                                              <long*>  & output_buffer[0, 0], 
-                                              <int*>&kernel_size[0],
-                                              <int*>buffer_shape,
-                                              y,
-                                              0,
-                                              image_dim,
-                                              conditional,
-                                              mode,
-                                              cval)
-
-@cython.cdivision(True)
-@cython.boundscheck(False)
-@cython.wraparound(False)
-@cython.initializedcheck(False)
-def _median_filter_uint64(cnumpy.uint64_t[:, ::1] input_buffer not None,
-                          cnumpy.uint64_t[:, ::1] output_buffer not None,
-                          cnumpy.int32_t[::1] kernel_size not None,
-                          bool conditional,
-                          int mode,
-                          cnumpy.uint64_t cval):
-
-    cdef: 
-        int y = 0
-        int image_dim = input_buffer.shape[1] - 1
-        int[2] buffer_shape
-    buffer_shape[0] = input_buffer.shape[0]
-    buffer_shape[1] = input_buffer.shape[1]
-
-    for y in prange(input_buffer.shape[0], nogil=True):
-            median_filter.median_filter[uint64](<uint64*> & input_buffer[0,0], 
-                                                <uint64*> & output_buffer[0, 0],
-                                                <int*>&kernel_size[0],
-                                                <int*>buffer_shape,
-                                                y,
-                                                0,
-                                                image_dim,
-                                                conditional,
-                                                mode,
-                                                cval)
-
-
-@cython.cdivision(True)
-@cython.boundscheck(False)
-@cython.wraparound(False)
-@cython.initializedcheck(False)
-def _median_filter_int32(cnumpy.int32_t[:, ::1] input_buffer not None,
-                         cnumpy.int32_t[:, ::1] output_buffer not None,
-                         cnumpy.int32_t[::1] kernel_size not None,
-                         bool conditional,
-                         int mode,
-                         cnumpy.int32_t cval):
-
-    cdef:
-        int y = 0
-        int image_dim = input_buffer.shape[1] - 1
-        int[2] buffer_shape
-    buffer_shape[0] = input_buffer.shape[0]
-    buffer_shape[1] = input_buffer.shape[1]
-
-    for y in prange(input_buffer.shape[0], nogil=True):
-            median_filter.median_filter[int](<int*> & input_buffer[0,0], 
-                                             <int*>  & output_buffer[0, 0],
-                                             <int*>&kernel_size[0],
-                                             <int*>buffer_shape,
-                                             y,
-                                             0,
-                                             image_dim,
-                                             conditional,
-                                             mode,
-                                             cval)
-
-
-@cython.cdivision(True)
-@cython.boundscheck(False)
-@cython.wraparound(False)
-@cython.initializedcheck(False)
-def _median_filter_uint32(cnumpy.uint32_t[:, ::1] input_buffer not None,
-                          cnumpy.uint32_t[:, ::1] output_buffer not None,
-                          cnumpy.int32_t[::1] kernel_size not None,
-                          bool conditional,
-                          int mode,
-                          cnumpy.uint32_t cval):
-
-    cdef:
-        int y = 0
-        int image_dim = input_buffer.shape[1] - 1
-        int[2] buffer_shape
-    buffer_shape[0] = input_buffer.shape[0]
-    buffer_shape[1] = input_buffer.shape[1]
-
-    for y in prange(input_buffer.shape[0], nogil=True):
-            median_filter.median_filter[uint32](<uint32*> & input_buffer[0,0], 
-                                                <uint32*>  & output_buffer[0, 0],
-                                                <int*>&kernel_size[0],
-                                                <int*>buffer_shape,
-                                                y,
-                                                0,
-                                                image_dim,
-                                                conditional,
-                                                mode,
-                                                cval)
-
-
-@cython.cdivision(True)
-@cython.boundscheck(False)
-@cython.wraparound(False)
-@cython.initializedcheck(False)
-def _median_filter_int16(cnumpy.int16_t[:, ::1] input_buffer not None,
-                         cnumpy.int16_t[:, ::1] output_buffer not None,
-                         cnumpy.int32_t[::1] kernel_size not None,
-                         bool conditional,
-                         int mode,
-                         cnumpy.int16_t cval):
-
-    cdef:
-        int y = 0
-        int image_dim = input_buffer.shape[1] - 1
-        int[2] buffer_shape
-    buffer_shape[0] = input_buffer.shape[0]
-    buffer_shape[1] = input_buffer.shape[1]
-
-    for y in prange(input_buffer.shape[0], nogil=True):
-            median_filter.median_filter[short](<short*> & input_buffer[0,0], 
-                                               <short*>  & output_buffer[0, 0],
-                                               <int*>&kernel_size[0],
-                                               <int*>buffer_shape,
-                                               y,
-                                               0,
-                                               image_dim,
-                                               conditional,
-                                               mode,
-                                               cval)
-
-
-@cython.cdivision(True)
-@cython.boundscheck(False)
-@cython.wraparound(False)
-@cython.initializedcheck(False)
-def _median_filter_uint16(
-      cnumpy.uint16_t[:, ::1] input_buffer not None,
-      cnumpy.uint16_t[:, ::1] output_buffer not None,
-      cnumpy.int32_t[::1] kernel_size not None,
-      bool conditional,
-      int mode,
-      cnumpy.uint16_t cval):
-
+def _median_filter(_number[:, :, ::1] input_buffer not None,
+                   _number[:, :, ::1] output_buffer not None,
+                   cnumpy.int32_t[::1] kernel_size not None,
+                   bool conditional,
+                   int mode,
+                   _number cval,
+                   int algorithm=0):
+    """Apply the median filter to each row of each frame in parallel.
+
+    The histogram algorithm is only available for 8 and 16 bits
+    integers and without conditional filtering, otherwise values are sorted.
+    """
     cdef:
-        int y = 0
-        int image_dim = input_buffer.shape[1] - 1
-        int[2] buffer_shape, 
+        ptrdiff_t row, y, z
+        ptrdiff_t height = input_buffer.shape[1]
+        ptrdiff_t image_dim = input_buffer.shape[2] - 1
+        ptrdiff_t nrows = input_buffer.shape[0] * input_buffer.shape[1]
+        ptrdiff_t[3] buffer_shape
+        int num_threads
     buffer_shape[0] = input_buffer.shape[0]
     buffer_shape[1] = input_buffer.shape[1]
-
-    for y in prange(input_buffer.shape[0], nogil=True):
-            median_filter.median_filter[uint16](<uint16*> & input_buffer[0, 0],
-                                                <uint16*> & output_buffer[0, 0],
-                                                <int*>&kernel_size[0],
-                                                <int*>buffer_shape,
-                                                y,
-                                                0,
-                                                image_dim,
-                                                conditional,
-                                                mode,
-                                                cval)
+    buffer_shape[2] = input_buffer.shape[2]
+
+    if input_buffer.size == 0:
+        return
+
+    # Each thread filters whole rows
+    num_threads = min(nrows, get_max_num_threads())
+
+    if (_number is cnumpy.int16_t or _number is cnumpy.uint16_t or
+            _number is cnumpy.int8_t or _number is cnumpy.uint8_t):
+        if algorithm == ALGORITHMS['histogram'] and not conditional:
+            for row in prange(nrows, nogil=True, num_threads=num_threads):
+                z = row // height
+                y = row % height
+                median_filter.median_filter_histogram(
+                    <_number*> & input_buffer[0, 0, 0],
+                    <_number*> & output_buffer[0, 0, 0],
+                    <int*> & kernel_size[0],
+                    <ptrdiff_t*> buffer_shape,
+                    z,
+                    y,
+                    0,
+                    image_dim,
+                    mode,
+                    cval)
+            return
+
+    if algorithm == ALGORITHMS['sliding']:
+        for row in prange(nrows, nogil=True, num_threads=num_threads):
+            z = row // height
+            y = row % height
+            median_filter.median_filter_sliding(
+                <_number*> & input_buffer[0, 0, 0],
+                <_number*> & output_buffer[0, 0, 0],
+                <int*> & kernel_size[0],
+                <ptrdiff_t*> buffer_shape,
+                z,
+                y,
+                0,
+                image_dim,
+                conditional,
+                mode,
+                cval)
+        return
+
+    for row in prange(nrows, nogil=True, num_threads=num_threads):
+        z = row // height
+        y = row % height
+        median_filter.median_filter(<_number*> & input_buffer[0, 0, 0],
+                                    <_number*> & output_buffer[0, 0, 0],
+                                    <int*> & kernel_size[0],
+                                    <ptrdiff_t*> buffer_shape,
+                                    z,
+                                    y,
+                                    0,
+                                    image_dim,
+                                    conditional,
+                                    mode,
+                                    cval)
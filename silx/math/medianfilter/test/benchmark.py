@@ -54,14 +54,19 @@ logger.setLevel(logging.INFO)
 
 
 class BenchmarkMedianFilter(object):
-    """Simple benchmark of the median fiter silx vs scipy"""
+    """Simple benchmark of the median fiter silx vs scipy, and of the
+    algorithms of silx"""
 
     NB_ITER = 3
 
-    def __init__(self, imageWidth, kernels):
-        self.img = numpy.random.rand(imageWidth, imageWidth)
+    def __init__(self, imageWidth, kernels, dtype=numpy.float64):
+        self.img = (numpy.random.rand(imageWidth, imageWidth) * 1000).astype(dtype)
         self.kernels = kernels
 
+        self.algorithms = ['sort', 'sliding']
+        if self.img.dtype.kind in 'iu' and self.img.dtype.itemsize <= 2:
+            self.algorithms.append('histogram')
+
         self.run()
 
     def run(self):
@@ -70,8 +75,8 @@ class BenchmarkMedianFilter(object):
             self.execTime[kernel] = self.bench(kernel)
 
     def bench(self, width):
-        def execSilx():
-            medfilt2d_silx(self.img, width)
+        def execSilx(algorithm='auto'):
+            medfilt2d_silx(self.img, width, algorithm=algorithm)
 
         def execScipy():
             scipy.ndimage.median_filter(input=self.img,
@@ -88,6 +93,13 @@ class BenchmarkMedianFilter(object):
         logger.info(
             'exec time silx (kernel size = %s) is %s' % (width, execTime["silx"]))
 
+        for algorithm in self.algorithms:
+            t = Timer(lambda: execSilx(algorithm))
+            execTime[algorithm] = t.timeit(BenchmarkMedianFilter.NB_ITER)
+            logger.info(
+                'exec time silx %s (kernel size = %s) is %s' % (
+                    algorithm, width, execTime[algorithm]))
+
         if scipy is not None:
             t = Timer(execScipy)
             execTime["scipy"] = t.timeit(BenchmarkMedianFilter.NB_ITER)
@@ -101,6 +113,9 @@ class BenchmarkMedianFilter(object):
 
         return execTime
 
+    def getKernelWidths(self):
+        return [k if isinstance(k, int) else k[-1] for k in self.kernels]
+
     def getExecTimeFor(self, id):
         res = []
         for k in self.kernels:
@@ -109,14 +124,33 @@ class BenchmarkMedianFilter(object):
 
 
 app = qt.QApplication([])
-kernels = [3, 5, 7, 11, 15]
-benchmark = BenchmarkMedianFilter(imageWidth=1000, kernels=kernels)
-plot = Plot1D()
-plot.addCurve(x=kernels, y=benchmark.getExecTimeFor("silx"), legend='silx')
-if scipy is not None:
-    plot.addCurve(x=kernels, y=benchmark.getExecTimeFor("scipy"), legend='scipy')
-if pymca is not None:
-    plot.addCurve(x=kernels, y=benchmark.getExecTimeFor("pymca"), legend='pymca')
-plot.show()
+square_kernels = [3, 5, 7, 11, 15, 31]
+# Tall kernels: the 'auto' choice between 'sort' and 'sliding' depends on
+# the width of the kernel compared to its height
+tall_kernels = [(31, 3), (31, 5), (31, 7), (31, 11), (31, 15), (31, 31)]
+plots = []
+for dtype, kernels in ((numpy.float64, square_kernels),
+                       (numpy.uint16, square_kernels),
+                       (numpy.float64, tall_kernels)):
+    benchmark = BenchmarkMedianFilter(imageWidth=1000, kernels=kernels,
+                                      dtype=dtype)
+    widths = benchmark.getKernelWidths()
+    plot = Plot1D()
+    title = numpy.dtype(dtype).name
+    if kernels is tall_kernels:
+        title += ', kernel height = 31'
+    plot.setGraphTitle(title)
+    plot.setGraphXLabel('Kernel width')
+    plot.setGraphYLabel('Time (s)')
+    plot.addCurve(x=widths, y=benchmark.getExecTimeFor("silx"), legend='silx')
+    for algorithm in benchmark.algorithms:
+        plot.addCurve(x=widths, y=benchmark.getExecTimeFor(algorithm),
+                      legend='silx %s' % algorithm)
+    if scipy is not None:
+        plot.addCurve(x=widths, y=benchmark.getExecTimeFor("scipy"), legend='scipy')
+    if pymca is not None:
+        plot.addCurve(x=widths, y=benchmark.getExecTimeFor("pymca"), legend='pymca')
+    plot.show()
+    plots.append(plot)
 app.exec_()
 del app
@@ -29,7 +29,7 @@ __date__ = "17/01/2018"
 
 import unittest
 import numpy
-from silx.math.medianfilter import medfilt2d, medfilt1d
+from silx.math.medianfilter import medfilt2d, medfilt1d, medfilt3d
 from silx.math.medianfilter.medianfilter import reflect, mirror
 from silx.math.medianfilter.medianfilter import MODES as silx_mf_modes
 from silx.utils.testutils import ParametricTestCase
@@ -585,8 +585,9 @@ class TestGeneralExecution(ParametricTestCase):
         filter
         """
         for mode in silx_mf_modes:
-            for testType in [numpy.float32, numpy.float64, numpy.int16,
-                             numpy.uint16, numpy.int32, numpy.int64,
+            for testType in [numpy.float32, numpy.float64, numpy.int8,
+                             numpy.uint8, numpy.int16, numpy.uint16,
+                             numpy.int32, numpy.uint32, numpy.int64,
                              numpy.uint64]:
                 with self.subTest(mode=mode, type=testType):
                     data = (numpy.random.rand(10, 10) * 65000).astype(testType)
@@ -647,6 +648,106 @@ class TestGeneralExecution(ParametricTestCase):
                     numpy.any(out_isnan[numpy.logical_not(nan_mask)]))
 
 
+class TestMedianFilter3D(ParametricTestCase):
+    """Tests of the median filter of 3D arrays"""
+
+    def testStack(self):
+        """Test that a kernel of depth 1 filters each frame"""
+        stack = numpy.random.random((4, 20, 30)).astype(numpy.float32)
+        for mode in silx_mf_modes:
+            with self.subTest(mode=mode):
+                result = medfilt3d(stack, kernel_size=(1, 5, 3), mode=mode)
+                for frame, filtered in zip(stack, result):
+                    self.assertTrue(numpy.array_equal(
+                        filtered, medfilt2d(frame.copy(), (5, 3), mode=mode)))
+
+    def testKernel3D(self):
+        """Test a 3x3x3 window against numpy"""
+        data = numpy.random.random((4, 6, 7))
+        padded = numpy.pad(data, 1, mode='edge')
+        expected = numpy.empty_like(data)
+        for index in numpy.ndindex(*data.shape):
+            z, y, x = index
+            expected[index] = numpy.median(padded[z:z+3, y:y+3, x:x+3])
+        result = medfilt3d(data, kernel_size=3, mode='nearest')
+        self.assertTrue(numpy.allclose(result, expected))
+
+    def testOut(self):
+        """Test the result is written to out"""
+        data = numpy.arange(60, dtype=numpy.float64).reshape(3, 4, 5)
+        out = numpy.empty_like(data)
+        result = medfilt3d(data, kernel_size=(1, 3, 3), out=out)
+        self.assertIs(result, out)
+        self.assertTrue(numpy.array_equal(
+            out, medfilt3d(data, kernel_size=(1, 3, 3))))
+
+        with self.assertRaises(ValueError):
+            medfilt3d(data, kernel_size=3, out=data)
+        with self.assertRaises(ValueError):
+            medfilt3d(data, kernel_size=3, out=numpy.empty_like(data.T))
+
+    def testHistogram(self):
+        """Test the histogram median of 8 and 16 bits integers"""
+        for dtype in (numpy.uint8, numpy.int8, numpy.uint16, numpy.int16):
+            info = numpy.iinfo(dtype)
+            data = numpy.random.randint(
+                info.min, info.max, size=(3, 15, 40)).astype(dtype)
+            for mode in silx_mf_modes:
+                for kernel in ((1, 9, 9), (3, 5, 9), (1, 1, 81)):
+                    with self.subTest(dtype=dtype, mode=mode, kernel=kernel):
+                        result = medfilt3d(data, kernel, mode=mode, cval=3)
+                        # Reference using the default implementation
+                        expected = medfilt3d(data.astype(numpy.int32), kernel,
+                                             mode=mode, cval=3)
+                        self.assertTrue(numpy.array_equal(result, expected))
+
+
+class TestAlgorithms(ParametricTestCase):
+    """Test that all algorithms give the same result"""
+
+    def testSliding(self):
+        """Test 'sliding' against 'sort'"""
+        for dtype in (numpy.float32, numpy.float64, numpy.int32, numpy.uint16):
+            data = (numpy.random.random((2, 13, 29)) * 100).astype(dtype)
+            if data.dtype.kind == 'f':
+                data[numpy.random.random(data.shape) < 0.2] = numpy.nan
+            else:
+                data[numpy.random.random(data.shape) < 0.2] = 5  # Duplicates
+            for mode in silx_mf_modes:
+                for conditional in (False, True):
+                    for kernel in ((1, 3, 3), (1, 5, 9), (3, 3, 3), (1, 9, 31)):
+                        with self.subTest(dtype=dtype, mode=mode,
+                                          conditional=conditional,
+                                          kernel=kernel):
+                            expected = medfilt3d(data, kernel, conditional,
+                                                 mode, cval=7, algorithm='sort')
+                            result = medfilt3d(data, kernel, conditional,
+                                               mode, cval=7, algorithm='sliding')
+                            self.assertTrue(numpy.array_equal(
+                                result, expected, equal_nan=True))
+
+    def testHistogram(self):
+        """Test 'histogram' against 'sort'"""
+        data = numpy.random.randint(0, 1000, size=(20, 30)).astype(numpy.uint16)
+        for mode in silx_mf_modes:
+            for kernel in ((3, 3), (5, 11)):
+                with self.subTest(mode=mode, kernel=kernel):
+                    expected = medfilt2d(data, kernel, mode=mode, algorithm='sort')
+                    result = medfilt2d(data, kernel, mode=mode, algorithm='histogram')
+                    self.assertTrue(numpy.array_equal(result, expected))
+
+    def testErrors(self):
+        """Test unsupported algorithms"""
+        data = numpy.arange(100, dtype=numpy.float32).reshape(10, 10)
+        with self.assertRaises(ValueError):
+            medfilt2d(data, 3, algorithm='unknown')
+        with self.assertRaises(ValueError):
+            medfilt2d(data, 3, algorithm='histogram')
+        with self.assertRaises(ValueError):
+            medfilt2d(data.astype(numpy.uint8), 3, conditional=True,
+                      algorithm='histogram')
+
+
 def _getScipyAndSilxCommonModes():
     """return the mode which are comparable between silx and scipy"""
     modes = silx_mf_modes.copy()
@@ -725,6 +826,8 @@ class TestVsScipy(ParametricTestCase):
 def suite():
     test_suite = unittest.TestSuite()
     for test in [TestGeneralExecution,
+                 TestMedianFilter3D,
+                 TestAlgorithms,
                  TestVsScipy,
                  TestMedianFilterNearest,
                  TestMedianFilterReflect,
@@ -537,6 +537,96 @@ class _TestHistogramndLut_nominal(unittest.TestCase):
         self.assertTrue(np.array_equal(histo, expected_h))
         self.assertTrue(np.array_equal(w_histo, expected_c))
 
+    def test_csr_accumulate_weight_min_max(self):
+        """
+        csr LUT format
+        """
+        weight_min = -299.9
+        weight_max = 499.9
+
+        expected_h_tpl = np.array([0, 1, 1, 1, 0])
+        expected_c_tpl = np.array([0., -0.5, 0.01, 300.3, 0.])
+
+        expected_h = np.zeros(shape=self.n_bins, dtype=np.double)
+        expected_c = np.zeros(shape=self.n_bins, dtype=np.double)
+
+        self.fill_histo(expected_h, expected_h_tpl, self.ndims-1)
+        self.fill_histo(expected_c, expected_c_tpl, self.ndims-1)
+
+        instance = HistogramndLut(self.sample,
+                                  self.histo_range,
+                                  self.n_bins,
+                                  lut_format='csr')
+        self.assertEqual(instance.lut_format, 'csr')
+
+        instance.accumulate(self.weights,
+                            weight_min=weight_min,
+                            weight_max=weight_max)
+
+        histo = instance.histo()
+        w_histo = instance.weighted_histo()
+
+        self.assertEqual(w_histo.dtype, np.float64)
+        self.assertEqual(histo.dtype, np.uint32)
+        self.assertTrue(np.array_equal(histo, expected_h))
+        self.assertTrue(np.array_equal(w_histo, expected_c))
+
+        dense = HistogramndLut(self.sample,
+                               self.histo_range,
+                               self.n_bins)
+        self.assertTrue(np.array_equal(instance.lut, dense.lut))
+
+    def test_csr_coefficients(self):
+        """
+        csr LUT format with samples split in halves
+        """
+        expected_h_tpl = np.array([4, 2, 2, 2, 2])
+        expected_c_tpl = np.array([-700.7, -0.5, 0.01, 300.3, 500.5])
+
+        expected_h = np.zeros(shape=self.n_bins, dtype=np.double)
+        expected_c = np.zeros(shape=self.n_bins, dtype=np.double)
+
+        self.fill_histo(expected_h, expected_h_tpl, self.ndims-1)
+        self.fill_histo(expected_c, expected_c_tpl, self.ndims-1)
+
+        n_elems = len(self.weights)
+        instance = HistogramndLut(np.concatenate((self.sample, self.sample)),
+                                  self.histo_range,
+                                  self.n_bins,
+                                  lut_format='csr',
+                                  sample_indices=np.tile(np.arange(n_elems), 2),
+                                  coefficients=np.full(2 * n_elems, 0.5))
+        self.assertIsNone(instance.lut)
+
+        histo, w_histo = instance.apply_lut(self.weights)
+
+        self.assertTrue(np.array_equal(histo, expected_h))
+        self.assertTrue(np.allclose(w_histo, expected_c))
+
+    def test_apply_lut_batch(self):
+        """
+        batch of weights with both LUT formats
+        """
+        weights = np.array((self.weights, 2 * self.weights, -self.weights))
+
+        for lut_format in ('dense', 'csr'):
+            instance = HistogramndLut(self.sample,
+                                      self.histo_range,
+                                      self.n_bins,
+                                      lut_format=lut_format)
+            histo, w_histo = instance.apply_lut_batch(weights,
+                                                      weight_min=-299.9)
+
+            shape = (len(weights),) + tuple(self.n_bins)
+            self.assertEqual(histo.shape, shape)
+            self.assertEqual(w_histo.shape, shape)
+            for frame in range(len(weights)):
+                expected_h, expected_c = instance.apply_lut(weights[frame],
+                                                            weight_min=-299.9)
+                self.assertTrue(np.array_equal(histo[frame], expected_h))
+                self.assertTrue(np.allclose(w_histo[frame], expected_c))
+            self.assertIsNone(instance.histo())
+
     def testNoneNativeTypes(self):
         type = self.sample.dtype.newbyteorder("B")
         sampleB = self.sample.astype(type)
@@ -253,12 +253,100 @@ class TestColormap(ParametricTestCase):
                     self._test(data, colors, vmin, vmax, normalization, None)
 
 
+class TestColormapper(ParametricTestCase):
+    """Test silx.math.colormap.Colormapper"""
+
+    def setUp(self):
+        self.colors = numpy.zeros((256, 4), dtype=numpy.uint8)
+        self.colors[:, 0] = numpy.arange(len(self.colors))
+        self.colors[:, 3] = 255
+        self.nan_color = (1, 2, 3, 4)
+
+    def test_cmap(self):
+        """Test that results are those of cmap"""
+        mapper = colormap.Colormapper(self.colors, self.nan_color)
+        for dtype in ('uint8', 'int8', 'uint16', '>i2', 'int32', 'float64'):
+            data = numpy.arange(-300, 300).astype(dtype).reshape(20, 30)
+            for normalization in TestColormap.NORMALIZATIONS:
+                with self.subTest(dtype=dtype, normalization=normalization):
+                    image = mapper.apply(data, 1, 200, normalization)
+                    expected = colormap.cmap(
+                        data, self.colors, 1, 200, normalization,
+                        self.nan_color)
+                    self.assertTrue(numpy.array_equal(image, expected))
+
+    def test_float32(self):
+        """Test the bounded error of float32 data"""
+        indices = numpy.arange(256, dtype=numpy.float32).reshape(-1, 1)
+        mapper = colormap.Colormapper(indices, (-1,))
+        data = numpy.linspace(-10, 300, 10000, dtype=numpy.float32)
+        data[:3] = numpy.nan, numpy.inf, -numpy.inf
+        for normalization in TestColormap.NORMALIZATIONS:
+            for vmin, vmax in ((1, 200), (100, 100.5)):
+                with self.subTest(normalization=normalization,
+                                  vmin=vmin, vmax=vmax):
+                    image = mapper.apply(data, vmin, vmax, normalization)
+                    expected = colormap.cmap(
+                        data, indices, vmin, vmax, normalization, (-1,))
+                    self.assertTrue(numpy.array_equal(
+                        numpy.isnan(image), numpy.isnan(expected)))
+                    self.assertLessEqual(numpy.max(numpy.abs(image - expected)),
+                                         mapper.FLOAT32_LUT_MAX_ERROR)
+
+    def test_float32_zeros(self):
+        """Test float32 signed zeros and negative values"""
+        indices = numpy.arange(256, dtype=numpy.float32).reshape(-1, 1)
+        mapper = colormap.Colormapper(indices, (-1,))
+        data = numpy.array((-0., 0., -1e-40, 1e-40, -1e-30, -1., -100., 5.),
+                           dtype=numpy.float32)
+        for normalization in TestColormap.NORMALIZATIONS:
+            for vmin, vmax in ((1, 1000), (0.5, 50)):
+                with self.subTest(normalization=normalization,
+                                  vmin=vmin, vmax=vmax):
+                    image = mapper.apply(data, vmin, vmax, normalization)
+                    expected = colormap.cmap(
+                        data, indices, vmin, vmax, normalization, (-1,))
+                    self.assertTrue(numpy.array_equal(
+                        image[:2], expected[:2]))
+                    self.assertLessEqual(numpy.max(numpy.abs(image - expected)),
+                                         mapper.FLOAT32_LUT_MAX_ERROR)
+
+    def test_out(self):
+        """Test writing to a provided array"""
+        mapper = colormap.Colormapper(self.colors)
+        data = numpy.arange(100, dtype=numpy.uint16).reshape(10, 10)
+        out = numpy.zeros((10, 10, 4), dtype=numpy.uint8)
+        image = mapper.apply(data, 10, 90, out=out)
+        self.assertIs(image, out)
+        self.assertTrue(numpy.array_equal(
+            out, colormap.cmap(data, self.colors, 10, 90)))
+
+        with self.assertRaises(ValueError):
+            mapper.apply(data, 10, 90, out=numpy.zeros((10, 10, 3), dtype=numpy.uint8))
+
+    def test_cache(self):
+        """Test the LRU of LUTs"""
+        mapper = colormap.Colormapper(self.colors, cache_size=2)
+        data = numpy.arange(100, dtype=numpy.uint8)
+        for vmax in (10, 20, 30):
+            mapper.apply(data, 0, vmax)
+        self.assertEqual(len(mapper._luts), 2)
+        mapper.apply(data, 0, 20)
+        mapper.apply(data, 0, 40)
+        self.assertEqual([key[2] for key in mapper._luts], [20, 40])
+
+        mapper.clear_cache()
+        self.assertEqual(len(mapper._luts), 0)
+
+
 def suite():
     test_suite = unittest.TestSuite()
     test_suite.addTest(
         unittest.defaultTestLoader.loadTestsFromTestCase(TestColormap))
     test_suite.addTest(
         unittest.defaultTestLoader.loadTestsFromTestCase(TestNormalization))
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestColormapper))
     return test_suite
 
 
@@ -144,6 +144,45 @@ class TestMinMax(ParametricTestCase):
 
                         self._test_min_max(data, min_positive)
 
+    def test_large_datasets(self):
+        """Test min_max with datasets processed by multiple threads"""
+        size = 1000003
+        for dtype in ('float32', 'float64', 'int16', 'uint8'):
+            data = numpy.random.random(size) * 200 - 100
+            data[size // 3] = -101  # Min in the middle
+            data[-1] = 101  # Max at the end
+            if dtype.startswith('float'):
+                data[:1000] = float('nan')
+            data = data.astype(dtype)
+            for min_positive in (True, False):
+                with self.subTest(dtype=dtype, min_positive=min_positive):
+                    self._test_min_max(data, min_positive)
+                    self._test_min_max(data, min_positive, finite=True)
+
+    def test_strided_datasets(self):
+        """Test min_max with non-contiguous datasets"""
+        data = numpy.arange(1000, dtype=numpy.float64).reshape(10, 100)
+        data[0, 1] = -1
+        data[0, 0] = numpy.nan
+        tests = {
+            'step': data.ravel()[::3],
+            'reversed': data.ravel()[::-1],
+            'column': data[:, 1],
+            '2D': data[:, ::2],
+            'transposed': data.T,
+        }
+        for name, array in tests.items():
+            for min_positive in (True, False):
+                with self.subTest(data=name, min_positive=min_positive):
+                    # Indices are those of the flattened data
+                    self._test_min_max(array.ravel(), min_positive)
+                    result = min_max(array, min_positive)
+                    expected = min_max(array.copy(), min_positive)
+                    for attr in ('minimum', 'maximum', 'min_positive',
+                                 'argmin', 'argmax', 'argmin_positive'):
+                        self.assertEqual(getattr(result, attr),
+                                         getattr(expected, attr))
+
     def test_nodata(self):
         """Test min_max with None and empty array"""
         for dtype in self.DTYPES:
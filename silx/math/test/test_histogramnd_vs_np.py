@@ -32,6 +32,7 @@ import operator
 import numpy as np
 
 from silx.math.chistogramnd import chistogramnd as histogramnd
+from silx.math.histogram import Histogramnd, iter_blocks
 
 # ==============================================================
 # ==============================================================
@@ -606,6 +607,43 @@ class _TestHistogramnd(unittest.TestCase):
                                     result_np_w_1[0].sum(dtype=np.float64)),
                         msg=self.state_msg)
 
+    def test_from_iterable(self):
+        """Test histogramming a sample by blocks"""
+        result_c = histogramnd(self.sample,
+                               self.histo_range,
+                               self.n_bins,
+                               weights=self.weights,
+                               weight_min=self.filter_min,
+                               last_bin_closed=True)
+
+        result_blocks = Histogramnd.from_iterable(
+            iter_blocks(self.sample, self.weights, block_size=30001),
+            self.histo_range,
+            self.n_bins,
+            weight_min=self.filter_min,
+            last_bin_closed=True)
+
+        self.assertTrue(np.array_equal(result_c[0], result_blocks.histo),
+                        msg=self.state_msg)
+        self.assertTrue(self.array_compare(result_c[1],
+                                           result_blocks.weighted_histo),
+                        msg=self.state_msg)
+        for edges, blocks_edges in zip(result_c[2], result_blocks.edges):
+            self.assertTrue(np.array_equal(edges, blocks_edges))
+
+        # Without weights
+        result_blocks = Histogramnd.from_iterable(
+            (block for block, _ in iter_blocks(self.sample, block_size=30001)),
+            self.histo_range,
+            self.n_bins,
+            last_bin_closed=True)
+        self.assertIsNone(result_blocks.weighted_histo)
+        self.assertEqual(result_blocks.histo.sum(),
+                         histogramnd(self.sample,
+                                     self.histo_range,
+                                     self.n_bins,
+                                     last_bin_closed=True)[0].sum())
+
 
 class _TestHistogramnd_1d(_TestHistogramnd):
 
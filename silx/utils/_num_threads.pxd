@@ -0,0 +1,62 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2026 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+"""
+Number of threads used by the OpenMP loops of silx Cython modules
+
+Cython modules can cimport it like that:
+
+.. code-block:: python
+
+    from ...utils._num_threads cimport get_max_num_threads
+
+"""
+
+cdef inline int get_max_num_threads() except -1:
+    """Returns the maximum number of threads to use in OpenMP loops
+
+    This is up to 4 threads in the CPU affinity of the process,
+    or less if the OMP_NUM_THREADS environment variable asks for less.
+    Only the first number of a comma-separated OMP_NUM_THREADS list
+    (i.e., the outermost level of parallelism) is used.
+    Invalid OMP_NUM_THREADS values are ignored.
+    """
+    import os
+
+    cdef int num_threads
+    if hasattr(os, 'sched_getaffinity'):
+        num_threads = min(4, len(os.sched_getaffinity(0)))
+    elif os.cpu_count() is not None:
+        num_threads = min(4, os.cpu_count())
+    else:  # Fallback
+        num_threads = 1
+
+    try:
+        requested = int(os.environ.get("OMP_NUM_THREADS", "").split(",")[0])
+    except ValueError:
+        requested = 0
+    if requested < 1:  # Not set or invalid
+        return max(1, num_threads)
+    return max(1, min(num_threads, requested))
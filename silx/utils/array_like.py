@@ -31,7 +31,8 @@ Classes:
     - :class:`DatasetView`: Similar to a numpy view, to access
       a h5py dataset as if it was transposed, without casting it into a
       numpy array (this lets h5py handle reading the data from the
-      file into memory, as needed).
+      file into memory, as needed). Slices of chunked datasets are read
+      by whole chunks which are kept in a cache.
     - :class:`ListOfImages`: Similar to a numpy view, to access
       a list of 2D numpy arrays as if it was a 3D array (possibly transposed),
       without casting it into a numpy array.
@@ -49,7 +50,11 @@ Functions:
 
 from __future__ import absolute_import, print_function, division
 
+import collections
+import concurrent.futures
+import logging
 import sys
+import threading
 
 import numpy
 import six
@@ -60,6 +65,13 @@ __license__ = "MIT"
 __date__ = "26/04/2017"
 
 
+_logger = logging.getLogger(__name__)
+
+
+CHUNK_CACHE_NBYTES = 64 * 1024 ** 2
+"""Default memory size of the chunk cache of :class:`DatasetView`"""
+
+
 def is_array(obj):
     """Return True if object implements necessary attributes to be
     considered similar to a numpy array.
@@ -416,6 +428,144 @@ class ListOfImages(object):
         return max_value
 
 
+class _ChunkCache(object):
+    """Cache of chunk-aligned blocks of a chunked dataset.
+
+    Blocks are regions of the dataset covering whole chunks. They are read
+    at once from the dataset, and the least recently used ones are
+    discarded when the cache grows over its maximum size.
+    Blocks can be loaded in a background thread with :meth:`prefetch`.
+
+    :param dataset: Chunked h5py dataset
+    :param int max_nbytes: Maximum memory size of the cached blocks
+    """
+
+    def __init__(self, dataset, max_nbytes=CHUNK_CACHE_NBYTES):
+        self.dataset = dataset
+        self.chunks = dataset.chunks
+        self.max_nbytes = max_nbytes
+        self._blocks = collections.OrderedDict()
+        self._nbytes = 0
+        self._pending = {}
+        self._lock = threading.RLock()
+        self._executor = None
+
+    def get_region(self, indices):
+        """Returns the block region covering a selection or None if the
+        selection cannot be read through the cache.
+
+        :param indices: Tuple of one int or slice per dimension, in the
+            dataset order
+        :return: Tuple of (start, stop) per dimension
+        """
+        region = []
+        for index, size, chunk in zip(indices, self.dataset.shape, self.chunks):
+            if isinstance(index, slice):
+                start, stop, step = index.indices(size)
+                if step != 1 or start >= stop:
+                    return None
+                region.append((start // chunk * chunk,
+                               min(- (- stop // chunk) * chunk, size)))
+            else:
+                start = index // chunk * chunk
+                region.append((start, min(start + chunk, size)))
+        region = tuple(region)
+
+        nbytes = self.dataset.dtype.itemsize
+        for start, stop in region:
+            nbytes *= stop - start
+        if nbytes > self.max_nbytes:
+            return None
+        return region
+
+    def _find(self, region):
+        """Returns a cached (region, block) containing region or None"""
+        for key in reversed(self._blocks):
+            if all(start <= r_start and r_stop <= stop
+                   for (start, stop), (r_start, r_stop) in zip(key, region)):
+                self._blocks.move_to_end(key)
+                return key, self._blocks[key]
+        return None
+
+    def _load(self, region):
+        """Read a block from the dataset and store it in the cache"""
+        block = self.dataset[tuple(slice(start, stop) for start, stop in region)]
+        with self._lock:
+            if region not in self._blocks:
+                self._blocks[region] = block
+                self._nbytes += block.nbytes
+                while self._nbytes > self.max_nbytes and len(self._blocks) > 1:
+                    _key, old_block = self._blocks.popitem(last=False)
+                    self._nbytes -= old_block.nbytes
+        return block
+
+    def _background_load(self, region):
+        """Load a block from the prefetching thread"""
+        try:
+            return self._load(region)
+        finally:
+            with self._lock:
+                self._pending.pop(region, None)
+
+    def read(self, indices, region):
+        """Returns the selection read from the block covering it.
+
+        :param indices: Tuple of one int or slice per dimension, in the
+            dataset order
+        :param region: Block region as returned by :meth:`get_region`
+        :return: Copy of the selected data, or numpy scalar if all indices
+            are int
+        """
+        with self._lock:
+            found = self._find(region)
+            future = self._pending.get(region) if found is None else None
+
+        if found is not None:
+            region, block = found
+        elif future is not None:
+            try:
+                block = future.result()
+            except Exception:
+                block = self._load(region)
+        else:
+            block = self._load(region)
+
+        selection = []
+        for index, size, (start, _stop) in zip(indices, self.dataset.shape, region):
+            if isinstance(index, slice):
+                index_start, index_stop, _step = index.indices(size)
+                index = slice(index_start - start, index_stop - start)
+            else:
+                index -= start
+            selection.append(index)
+        data = block[tuple(selection)]
+        if isinstance(data, numpy.ndarray):
+            data = data.copy()
+        return data
+
+    def prefetch(self, region):
+        """Load a block in a background thread if it is not yet cached
+
+        :param region: Block region as returned by :meth:`get_region`
+        """
+        with self._lock:
+            if region in self._pending or self._find(region) is not None:
+                return
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=1)
+            self._pending[region] = self._executor.submit(
+                self._background_load, region)
+
+    def __len__(self):
+        return len(self._blocks)
+
+    @property
+    def nbytes(self):
+        """Memory size of the cached blocks"""
+        return self._nbytes
+
+
 class DatasetView(object):
     """This class provides a way to transpose a dataset without
     casting it into a numpy array. This way, the dataset in a file need not
@@ -428,11 +578,26 @@ class DatasetView(object):
         in an unfavorable direction may still require the entire dataset to
         be read from disk.
 
+    Slices of chunked datasets are read by blocks of whole chunks covering
+    the requested slice. Those blocks are kept in a cache of limited size
+    shared with the transposed views, so that reading consecutive slices
+    in any direction does not read the same chunks again.
+    With ``prefetch=True``, the next block in the direction in which
+    the integer indices move is read in a background thread.
+
+    .. note::
+        The cache assumes that the dataset is not modified while it is
+        accessed through this view.
+
     :param dataset: h5py dataset
     :param transposition: List of dimensions sorted in the order of
         transposition (relative to the original h5py dataset)
+    :param int chunk_cache_nbytes: Maximum memory size of the chunk cache.
+        Set to 0 to read data directly from the dataset.
+    :param bool prefetch: True to read neighbouring blocks in background
     """
-    def __init__(self, dataset, transposition=None):
+    def __init__(self, dataset, transposition=None,
+                 chunk_cache_nbytes=CHUNK_CACHE_NBYTES, prefetch=False):
         """
 
         """
@@ -440,6 +605,14 @@ class DatasetView(object):
         self.dataset = dataset
         """original dataset"""
 
+        self.prefetch = prefetch
+        """Whether to read neighbouring blocks in a background thread"""
+
+        self._chunk_cache = None
+        if chunk_cache_nbytes > 0 and getattr(dataset, "chunks", None):
+            self._chunk_cache = _ChunkCache(dataset, chunk_cache_nbytes)
+        self._last_indices = None
+
         self.shape = dataset.shape
         """Tuple of array dimensions"""
         self.dtype = dataset.dtype
@@ -491,6 +664,73 @@ class DatasetView(object):
                                sorted(zip(self.transposition, indices)))
         return sorted_indices
 
+    def __normalize_indices(self, item):
+        """Returns item as a tuple of one non-negative int or slice per
+        dimension, or None if item uses other kind of indexing.
+        """
+        if not isinstance(item, tuple):
+            item = (item,)
+        if len(item) > self.ndim:
+            return None
+        indices = []
+        for index, size in zip(item, self.dataset.shape):
+            if isinstance(index, (bool, numpy.bool_)):
+                return None
+            elif isinstance(index, numbers.Integral):
+                index = int(index)
+                if index < 0:
+                    index += size
+                if not 0 <= index < size:
+                    return None
+            elif not isinstance(index, slice):
+                return None
+            indices.append(index)
+        indices += [slice(None)] * (self.ndim - len(indices))
+        return tuple(indices)
+
+    def __read(self, item):
+        """Read a selection of the dataset, using the chunk cache if possible
+
+        :param item: Index in the order of the dataset
+        :return: numpy array or numpy scalar
+        """
+        if self._chunk_cache is None:
+            return self.dataset[item]
+        indices = self.__normalize_indices(item)
+        region = None if indices is None else self._chunk_cache.get_region(indices)
+        if region is None:
+            return self.dataset[item]
+
+        data = self._chunk_cache.read(indices, region)
+        if self.prefetch and self._last_indices is not None:
+            self.__prefetch(indices, region)
+        self._last_indices = indices
+        return data
+
+    def __prefetch(self, indices, region):
+        """Prefetch the next block along dimensions indexed by moving ints
+
+        :param indices: Normalized indices of the current read
+        :param region: Block region of the current read
+        """
+        chunks = self._chunk_cache.chunks
+        for dim, (index, last_index) in enumerate(
+                zip(indices, self._last_indices)):
+            if (isinstance(index, slice) or isinstance(last_index, slice) or
+                    index == last_index):
+                continue
+            start, stop = region[dim]
+            if index > last_index:
+                if stop >= self.dataset.shape[dim]:
+                    continue
+                neighbour = stop, min(stop + chunks[dim], self.dataset.shape[dim])
+            else:
+                if start <= 0:
+                    continue
+                neighbour = start - chunks[dim], start
+            self._chunk_cache.prefetch(
+                region[:dim] + (neighbour,) + region[dim + 1:])
+
     def __getitem__(self, item):
         """Handle fancy indexing with regards to the dimension order as
         specified in :attr:`transposition`
@@ -508,7 +748,7 @@ class DatasetView(object):
         """
         # no transposition, let the original dataset handle indexing
         if self.transposition == list(range(self.ndim)):
-            return self.dataset[item]
+            return self.__read(item)
 
         # 1-D slicing: create a list of indices to switch to n-D slicing
         if not hasattr(item, "__len__"):
@@ -526,7 +766,7 @@ class DatasetView(object):
         # get list of indices sorted in the original dataset order
         sorted_indices = self.__sort_indices(item)
 
-        output_data_not_transposed = self.dataset[sorted_indices]
+        output_data_not_transposed = self.__read(sorted_indices)
 
         # now we must transpose the output data
         output_dimensions = []
@@ -584,8 +824,11 @@ class DatasetView(object):
         elif list(self.transposition) != list(range(self.ndim)):
             transposition = [self.transposition[i] for i in transposition]
 
-        return DatasetView(self.dataset,
-                           transposition)
+        view = DatasetView(self.dataset, transposition,
+                           chunk_cache_nbytes=0, prefetch=self.prefetch)
+        # Share the cache of chunks
+        view._chunk_cache = self._chunk_cache
+        return view
 
     @property
     def T(self):
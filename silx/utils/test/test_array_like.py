@@ -203,6 +203,65 @@ class TestTransposedDatasetView(unittest.TestCase):
                                           b[1]))
 
 
+class TestChunkedDatasetView(TestTransposedDatasetView):
+    """Same tests as TestTransposedDatasetView with a chunked dataset,
+    plus tests of the chunk cache"""
+
+    def setUp(self):
+        super(TestChunkedDatasetView, self).setUp()
+        self.h5f.close()
+        with h5py.File(self.h5_fname, "w") as f:
+            f.create_dataset("volume", data=self.volume, chunks=(2, 3, 4))
+        self.h5f = h5py.File(self.h5_fname, "r")
+
+    def testChunkCache(self):
+        a = DatasetView(self.h5f["volume"])
+        b = a.transpose((2, 0, 1))
+        for i in range(b.shape[0]):
+            self.assertTrue(numpy.array_equal(b[i], self.volume[:, :, i]))
+        # One block of chunks per 4 planes, shared by transposed views
+        self.assertIs(a._chunk_cache, b._chunk_cache)
+        self.assertEqual(len(a._chunk_cache), 5)
+
+        # returned data is a copy
+        frame = b[0]
+        frame[:] = -1
+        self.assertTrue(numpy.array_equal(b[0], self.volume[:, :, 0]))
+
+        self.assertEqual(a[-1, -2, -3], self.volume[-1, -2, -3])
+        # int indices give a numpy scalar, as with the dataset
+        self.assertNotIsInstance(a[1, 2, 3], numpy.ndarray)
+        self.assertEqual(type(a[1, 2, 3]), type(self.h5f["volume"][1, 2, 3]))
+        self.assertNotIsInstance(b[3, 1, 2], numpy.ndarray)
+        self.assertTrue(numpy.array_equal(
+            a[..., 3], self.volume[..., 3]))
+
+    def testChunkCacheMemoryLimit(self):
+        # Blocks covering a plane do not fit in the cache
+        a = DatasetView(self.h5f["volume"], chunk_cache_nbytes=100)
+        b = a.transpose((1, 0, 2))
+        self.assertTrue(numpy.array_equal(b[4], self.volume[:, 4, :]))
+        self.assertEqual(len(a._chunk_cache), 0)
+
+        a = DatasetView(self.h5f["volume"], chunk_cache_nbytes=0)
+        self.assertIsNone(a._chunk_cache)
+        self.assertTrue(numpy.array_equal(a[1], self.volume[1]))
+
+    def testPrefetch(self):
+        a = DatasetView(self.h5f["volume"], prefetch=True)
+        b = a.transpose((1, 0, 2))
+        self.assertTrue(numpy.array_equal(b[0], self.volume[:, 0, :]))
+        self.assertTrue(numpy.array_equal(b[1], self.volume[:, 1, :]))
+        cache = a._chunk_cache
+        # next block along the browsed dimension is loaded in background
+        next_region = ((0, 5), (3, 6), (0, 20))
+        future = cache._pending.get(next_region)
+        if future is not None:
+            future.result()
+        self.assertIsNotNone(cache._find(next_region))
+        self.assertTrue(numpy.array_equal(b[3], self.volume[:, 3, :]))
+
+
 class TestTransposedListOfImages(unittest.TestCase):
     def setUp(self):
         # images attributes
@@ -434,6 +493,8 @@ def suite():
     test_suite = unittest.TestSuite()
     test_suite.addTest(
         unittest.defaultTestLoader.loadTestsFromTestCase(TestTransposedDatasetView))
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestChunkedDatasetView))
     test_suite.addTest(
         unittest.defaultTestLoader.loadTestsFromTestCase(TestTransposedListOfImages))
     test_suite.addTest(